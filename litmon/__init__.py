@@ -1,22 +1,100 @@
 """Literature Monitoring Project, for the Methuselah Foundation
 
-The :module:`litmon.query` module contains a basic PubMed querier.
+The :module:`litmon.query` module contains a basic PubMed querier, and an
+asyncio-native one.
+
+The :module:`litmon.prefilter` module evaluates PubMed boolean queries over
+stored articles, locally.
 
 The :module:`litmon.model` module contains a model for vectorizing journal
 articles and scoring them (i.e. predicting their relevance to the mission of
 the Methuselah Foundation).
 
+The :module:`litmon.topics` module contains a model for scoring several topics
+at once, with a shared vectorizer.
+
+The :module:`litmon.ensemble` module contains a model that fuses the scores of
+several models, sharing vectorization between them.
+
+The :module:`litmon.calibrate` module contains score distribution sketches and
+calibration maps, which are stored with each trained model.
+
+The :module:`litmon.registry` module contains a versioned registry of trained
+models.
+
+The :module:`litmon.shared` module shares a trained model between scoring
+processes, through shared memory.
+
+The :module:`litmon.feedback` module contains a consolidated store of reviewer
+feedback.
+
+The :module:`litmon.active` module selects extra articles for reviewers to
+label, by active learning.
+
+The :module:`litmon.dedupe` module contains a detector for duplicate and
+near-duplicate articles.
+
+The :module:`litmon.monitor` module contains monthly statistics of articles
+and scores, and checks them for drift.
+
+The :module:`litmon.search` module contains a persisted full-text index of
+monthly databases.
+
+The :module:`litmon.tasks` module contains a work queue of leased tasks,
+shared by worker processes.
+
+The :module:`litmon.pipeline` module runs the live pipeline in a single
+process.
+
 The :module:`litmon.utils` folder contains common utilities used throughout
 this project.
 
 The :module:`litmon.cli` folder contains simple command line interfaces for
 this package's major functionalities.
+
+Attributes are imported lazily (PEP 562), so that importing this package (or
+any of its subpackages) doesn't pull in heavy dependencies until they are
+needed.
 """
 
 # flake8: noqa
 
-from litmon.model import ArticleScorer
-from litmon.query import PubMedQuerier
+from importlib import import_module
+from typing import Any
+
 
+# module containing each lazily-imported attribute
+_lazy = {
+    'ArticleDeduplicator': 'litmon.dedupe',
+    'ArticleIndex': 'litmon.search',
+    'ArticleScorer': 'litmon.model',
+    'AsyncPubMedQuerier': 'litmon.query',
+    'DriftMonitor': 'litmon.monitor',
+    'EnsembleScorer': 'litmon.ensemble',
+    'FeedbackStore': 'litmon.feedback',
+    'ModelRegistry': 'litmon.registry',
+    'MonthStats': 'litmon.monitor',
+    'ReviewQueue': 'litmon.active',
+    'MultiTopicScorer': 'litmon.topics',
+    'PubMedQuerier': 'litmon.query',
+    'QueryFilter': 'litmon.prefilter',
+    'ScoreCalibrator': 'litmon.calibrate',
+    'ScoreSketch': 'litmon.calibrate',
+    'SharedScorer': 'litmon.shared',
+    'TaskQueue': 'litmon.tasks',
+}
+
+__all__ = list(_lazy)
 
 __version__ = '0.0.23'
+
+
+def __getattr__(name: str) -> Any:
+    """Import attribute on first access"""
+    if name in _lazy:
+        return getattr(import_module(_lazy[name]), name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *_lazy])
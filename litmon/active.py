@@ -0,0 +1,241 @@
+"""Select articles for reviewers to label, by active learning"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from os import path
+from typing import TYPE_CHECKING, Any
+
+# heavy dependencies are imported when first used, for fast startup
+if TYPE_CHECKING:
+    from nptyping import NDArray
+    from pandas import DataFrame
+
+
+class ReviewQueue:
+    """Select extra articles for reviewers to label, and track them
+
+    Reviewers only label the top-scoring articles of each month, so feedback
+    labels are biased towards articles the model is already sure about. This
+    selects extra articles, whose labels teach the model the most:
+
+    #. :code:`'uncertainty'`: the articles closest to the decision boundary,
+       i.e. whose calibrated probability of being a target article is closest
+       to 0.5 (or, for uncalibrated models, whose score is closest to
+       :code:`boundary`)
+    #. :code:`'diversity'`: articles that cover the feature space, chosen by
+       greedy farthest-point sampling over the articles' (L2-normalized)
+       :code:`vhash` vectors. Each article is as dissimilar (by cosine
+       distance) as possible from the articles reviewers already see, and
+       from the articles selected before it.
+    #. :code:`'hybrid'`: diversity sampling among the :code:`pool` x
+       :code:`count` most uncertain articles, so selected articles are
+       uncertain, but not redundant
+
+    Both are computed over the whole month at once: uncertainty is a single
+    pass over the score array, and each diversity step is a single
+    (sparse) matrix-vector product.
+
+    Selected articles are appended to a log (:code:`fname`), with their month,
+    strategy, score, and uncertainty, and are never selected again. Their
+    labels reach the next fit through the feedback store (see
+    :class:`litmon.feedback.FeedbackStore`), which reads the
+    :code:`Review Queue` sheet of each feedback workbook.
+
+    Parameters
+    ----------
+    fname: str, optional, default='data/review-queue.csv'
+        log of selected articles. If None, selections aren't tracked.
+    pool: int, optional, default=5
+        size of the candidate pool of the :code:`'hybrid'` strategy, as a
+        multiple of :code:`count`
+    strategy: str, optional, default='hybrid'
+        :code:`'uncertainty'`, :code:`'diversity'`, or :code:`'hybrid'`
+    """
+
+    # name of results sheet with selected articles
+    sheet_name = 'Review Queue'
+
+    def __init__(
+        self,
+        fname: str = 'data/review-queue.csv',
+        /,
+        *,
+        pool: int = 5,
+        strategy: str = 'hybrid',
+    ):
+        if strategy not in ['uncertainty', 'diversity', 'hybrid']:
+            raise ValueError(f'Unknown strategy: {strategy}')
+        self._fname = fname
+        self._pool = pool
+        self._strategy = strategy
+
+    @property
+    def queued(self) -> set[str]:
+        """PubMed IDs of every article that has been selected"""
+        from pandas import read_csv
+        if self._fname is None or not path.isfile(self._fname):
+            return set()
+        return set(
+            read_csv(self._fname, dtype={'pubmed_id': str})['pubmed_id']
+        )
+
+    def select(
+        self,
+        articles: DataFrame,
+        scores: NDArray[(Any,), float],
+        features: Any,
+        count: int,
+        /,
+        *,
+        boundary: float = None,
+        exclude: NDArray[(Any,), bool] = None,
+        probs: NDArray[(Any,), float] = None,
+    ) -> DataFrame:
+        """Select articles for review
+
+        Parameters
+        ----------
+        articles: DataFrame
+            scored articles
+        scores: NDArray
+            score of each article
+        features: Any
+            vectorized articles (see
+            :meth:`~litmon.model.ArticleScorer.transform`). For ensembles,
+            the first group's features are used.
+        count: int
+            maximum number of articles to select
+        boundary: float, optional, default=None
+            score of the decision boundary, used for uncertainty if
+            :code:`probs` is None. If None, use the median score.
+        exclude: NDArray, optional, default=None
+            articles that can't be selected (e.g. because reviewers already
+            see them). Diversity is measured from these articles.
+        probs: NDArray, optional, default=None
+            calibrated probability of each article
+
+        Returns
+        -------
+        DataFrame
+            selected articles, in order of selection, with an
+            :code:`uncertainty` column (distance from the decision boundary,
+            lower is more uncertain)
+        """
+        from numpy import argsort, asarray, median, minimum, ones, zeros
+
+        # get uncertainty of each article
+        scores = asarray(scores, dtype=float)
+        if probs is not None:
+            uncertainty = abs(asarray(probs, dtype=float) - .5)
+        else:
+            if boundary is None:
+                boundary = median(scores) if scores.size else 0.
+            uncertainty = abs(scores - boundary)
+
+        # get candidates, most uncertain first
+        is_candidate = ones(scores.size, dtype=bool)
+        if exclude is not None:
+            is_candidate &= ~asarray(exclude, dtype=bool)
+        queued = self.queued
+        if queued:
+            is_candidate &= ~articles['pubmed_id'].astype(str).str[0:8] \
+                .isin(queued).to_numpy()
+        candidates = is_candidate.nonzero()[0]
+        candidates = candidates[
+            argsort(uncertainty[candidates], kind='stable')
+        ]
+
+        # select most uncertain articles
+        if self._strategy == 'uncertainty' or count >= candidates.size:
+            selected = candidates[0:count]
+
+        # select diverse articles
+        else:
+            if self._strategy == 'hybrid':
+                candidates = candidates[0:self._pool * count]
+            if isinstance(features, list):
+                features = features[0]
+            normalized = self.__class__._normalize(features)
+            pool = normalized[candidates]
+            if exclude is not None and asarray(exclude).any():
+                reviewed = normalized[asarray(exclude, dtype=bool)]
+                distance = 1 - self.__class__._dense(pool @ reviewed.T) \
+                    .max(axis=1)
+            else:
+                distance = zeros(candidates.size) + 2
+            selected = []
+            for _ in range(count):
+                idx = int(distance.argmax())
+                selected.append(candidates[idx])
+                distance = minimum(
+                    distance,
+                    1 - self.__class__._dense(pool @ pool[idx].T).ravel(),
+                )
+                distance[idx] = -1
+            selected = asarray(selected, dtype=int)
+
+        # return selected articles
+        return articles.iloc[selected].assign(
+            uncertainty=uncertainty[selected],
+        )
+
+    def record(self, selected: DataFrame, month: str, /):
+        """Append selected articles to the log
+
+        Parameters
+        ----------
+        selected: DataFrame
+            selected articles (see :meth:`select`)
+        month: str
+            month the articles were selected from, as YYYY-mm
+        """
+        from pandas import DataFrame
+        if self._fname is None or not selected.shape[0]:
+            return
+        DataFrame({
+            'pubmed_id': selected['pubmed_id'].astype(str).str[0:8],
+            'month': month,
+            'strategy': self._strategy,
+            'score': selected['score'],
+            'uncertainty': selected['uncertainty'],
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+        }).to_csv(
+            self._fname,
+            mode='a',
+            header=not path.isfile(self._fname),
+            index=False,
+        )
+
+    @classmethod
+    def _dense(cls, matrix: Any, /) -> NDArray[(Any, Any), float]:
+        """Convert a (sparse or dense) matrix product to a dense array"""
+        from numpy import asarray
+        from scipy.sparse import issparse
+        return matrix.toarray() if issparse(matrix) else asarray(matrix)
+
+    @classmethod
+    def _normalize(cls, features: Any, /) -> Any:
+        """L2-normalize each row of a (sparse or dense) feature matrix
+
+        Parameters
+        ----------
+        features: Any
+            feature matrix
+
+        Returns
+        -------
+        Any
+            normalized feature matrix (sparse, if :code:`features` is)
+        """
+        from numpy import asarray, sqrt
+        from scipy.sparse import diags, issparse
+        if issparse(features):
+            norms = sqrt(asarray(features.multiply(features).sum(axis=1)))
+            norms = norms.ravel()
+            norms[norms == 0] = 1
+            return (diags(1 / norms) @ features).tocsr()
+        features = asarray(features, dtype=float)
+        norms = sqrt((features ** 2).sum(axis=1, keepdims=True))
+        norms[norms == 0] = 1
+        return features / norms
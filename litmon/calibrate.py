@@ -0,0 +1,215 @@
+"""Score distributions and calibration maps for trained models"""
+
+from __future__ import annotations
+
+from typing import Any
+
+from nptyping import NDArray
+from numpy import asarray, exp, finfo, interp, linspace, maximum, quantile
+
+
+class ScoreSketch:
+    """Quantile sketch of a model's score distribution
+
+    The sketch stores the score at :code:`num_quantiles` evenly-spaced
+    quantiles of the scores it was built from. Because the quantiles are
+    evenly spaced, looking up the score at any quantile is O(1) (interpolating
+    between the two nearest stored quantiles), and looking up the quantile of
+    any score is O(log :code:`num_quantiles`). The sketch's size is fixed, no
+    matter how many scores it summarizes.
+
+    Parameters
+    ----------
+    scores: NDArray[(Any,), float]
+        scores to summarize
+    num_quantiles: int, optional, default=1001
+        number of quantiles stored. The sketch's resolution is
+        :code:`1 / (num_quantiles - 1)`.
+
+    Attributes
+    ----------
+    values: NDArray[(Any,), float]
+        score at each stored quantile
+    """
+    def __init__(
+        self,
+        scores: NDArray[(Any,), float],
+        /,
+        *,
+        num_quantiles: int = 1001,
+    ):
+        self.values = quantile(
+            asarray(scores, dtype=float),
+            linspace(0, 1, num_quantiles),
+        )
+
+    def quantile(self, q: float, /) -> float:
+        """Get score at quantile
+
+        Parameters
+        ----------
+        q: float
+            quantile, in [0, 1]
+
+        Returns
+        -------
+        float
+            estimated score at quantile :code:`q`
+        """
+        if not 0 <= q <= 1:
+            raise ValueError('q must be in [0, 1]')
+        pos = q * (self.values.size - 1)
+        lower = int(pos)
+        upper = min(lower + 1, self.values.size - 1)
+        frac = pos - lower
+        return float(
+            (1 - frac) * self.values[lower] + frac * self.values[upper]
+        )
+
+    def rank(
+        self,
+        scores: NDArray[(Any,), float],
+        /,
+    ) -> NDArray[(Any,), float]:
+        """Get quantile of each score
+
+        Parameters
+        ----------
+        scores: NDArray[(Any,), float]
+            scores to rank
+
+        Returns
+        -------
+        NDArray[(Any,), float]
+            estimated quantile (in [0, 1]) of each score
+        """
+        return interp(
+            asarray(scores, dtype=float),
+            self.values,
+            linspace(0, 1, self.values.size),
+        )
+
+
+class ScoreCalibrator:
+    """Map raw model scores to probabilities of being a target article
+
+    Raw scores (e.g. from :code:`sklearn.svm.LinearSVR`) aren't comparable
+    across retrains. This maps them to probabilities, so that a threshold
+    means the same thing for every model.
+
+    The map should be fit on held-out scores (e.g. cross-validated scores of
+    the training set, see :class:`~litmon.model.ArticleScorer`), since
+    in-sample scores are overconfident. If the articles being scored have a
+    different fraction of target articles than the articles the map was fit
+    on (e.g. a training set balanced to 25% target articles, versus unbalanced
+    months), set :attr:`prevalence`, and probabilities are corrected for the
+    difference in prior (Bayes' rule, assuming the score distribution of each
+    class is the same).
+
+    Parameters
+    ----------
+    scores: NDArray[(Any,), float]
+        raw scores
+    labels: NDArray[(Any,), bool]
+        whether each article is a target article
+    method: str, optional, default='isotonic'
+        calibration method. One of:
+
+        #. :code:`'isotonic'`: isotonic regression (monotonic, piecewise
+           linear)
+        #. :code:`'platt'`: Platt scaling (logistic regression on the score)
+    prevalence: float, optional, default=None
+        fraction of target articles in the articles being scored. If None,
+        assume it's the same as in :code:`labels`.
+
+    Attributes
+    ----------
+    prevalence: float
+        fraction of target articles in the articles being scored, or None
+    train_prevalence: float
+        fraction of target articles in :code:`labels`
+    """
+    def __init__(
+        self,
+        scores: NDArray[(Any,), float],
+        labels: NDArray[(Any,), bool],
+        /,
+        *,
+        method: str = 'isotonic',
+        prevalence: float = None,
+    ):
+        # check parameters
+        if method not in ['isotonic', 'platt']:
+            raise ValueError(f'Unknown calibration method: {method}')
+
+        # save parameters
+        self._method = method
+        self.prevalence = prevalence
+
+        # format data
+        scores = asarray(scores, dtype=float)
+        labels = asarray(labels, dtype=bool)
+        self.train_prevalence = float(labels.mean())
+
+        # fit isotonic regression, keeping only its breakpoints
+        if method == 'isotonic':
+            from sklearn.isotonic import IsotonicRegression
+            isotonic = IsotonicRegression(out_of_bounds='clip').fit(
+                scores,
+                labels,
+            )
+            self._x = isotonic.X_thresholds_
+            self._y = isotonic.y_thresholds_
+
+        # fit logistic regression, keeping only its coefficients
+        else:
+            from sklearn.linear_model import LogisticRegression
+            logistic = LogisticRegression().fit(scores[:, None], labels)
+            self._coef = float(logistic.coef_[0, 0])
+            self._intercept = float(logistic.intercept_[0])
+
+    def transform(
+        self,
+        scores: NDArray[(Any,), float],
+        /,
+    ) -> NDArray[(Any,), float]:
+        """Map raw scores to probabilities
+
+        Parameters
+        ----------
+        scores: NDArray[(Any,), float]
+            raw scores
+
+        Returns
+        -------
+        NDArray[(Any,), float]
+            probability that each article is a target article
+        """
+
+        # map scores to probabilities, at the training prevalence
+        scores = asarray(scores, dtype=float)
+        if self._method == 'isotonic':
+            probs = interp(scores, self._x, self._y)
+        else:
+            probs = 1 / (1 + exp(-(self._coef * scores + self._intercept)))
+
+        # correct for the prevalence of the articles being scored
+        if self.prevalence is None or not 0 < self.train_prevalence < 1:
+            return probs
+        pos = probs * self.prevalence / self.train_prevalence
+        neg = (1 - probs) * (1 - self.prevalence) / (1 - self.train_prevalence)
+        return pos / maximum(pos + neg, finfo(float).tiny)
+
+    def __setstate__(self, state: dict[str, Any]):
+        """Load pickled state, filling in fields missing from older versions
+
+        Parameters
+        ----------
+        state: dict[str, Any]
+            pickled state
+        """
+        self.__dict__.update({
+            'prevalence': None,
+            'train_prevalence': None,
+            **state,
+        })
@@ -2,7 +2,36 @@
 
 # flake8: noqa
 
-from litmon.cli.dbase import DBaseBuilder
-from litmon.cli.eval import ModelUser
-from litmon.cli.fit import ModelFitter
-from litmon.cli.mbox import PubMedIDExtractor
+from importlib import import_module
+from typing import Any
+
+
+# module containing each lazily-imported attribute
+_lazy = {
+    'ArticleSearcher': 'litmon.cli.search',
+    'Backtester': 'litmon.cli.backtest',
+    'DailyIngester': 'litmon.cli.daily',
+    'DBaseBuilder': 'litmon.cli.dbase',
+    'DBaseFilter': 'litmon.cli.refilter',
+    'DBaseSyncer': 'litmon.cli.sync',
+    'DriftReporter': 'litmon.cli.monitor',
+    'ModelUser': 'litmon.cli.eval',
+    'ModelFitter': 'litmon.cli.fit',
+    'ModelPromoter': 'litmon.cli.promote',
+    'PubMedIDExtractor': 'litmon.cli.mbox',
+    'ShardCoordinator': 'litmon.cli.shard',
+    'ShardWorker': 'litmon.cli.worker',
+}
+
+__all__ = list(_lazy)
+
+
+def __getattr__(name: str) -> Any:
+    """Import attribute on first access"""
+    if name in _lazy:
+        return getattr(import_module(_lazy[name]), name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *_lazy])
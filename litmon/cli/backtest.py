@@ -0,0 +1,322 @@
+"""Backtest models over a rolling time series"""
+
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import sha256
+import json
+from os import getpid, makedirs, path, replace
+from time import time
+from typing import Any
+
+from litmon.utils import atomic, cli, drange
+from litmon.utils.dates import add_months
+
+
+class Backtester:
+    """Backtest :class:`litmon.model.ArticleScorer` over a rolling time series
+
+    For each month in :code:`date_range`, a model is trained on the months
+    right before it, and then used to score that month's articles. The
+    training window either slides (the previous :code:`window` months) or
+    expands (every month since :code:`train_start`).
+
+    Each fold caches its fitted model and its vectorized test articles in
+    :code:`cache_dir`, keyed by a content hash of the fold's inputs (the
+    training and test database files, and the model parameters). Re-running a
+    backtest only recomputes folds whose inputs changed. Folds run in parallel,
+    across processes.
+
+    The results table has one row per month, with these columns:
+
+    #. :code:`month`: test month (YYYY-mm)
+    #. :code:`train_range`: training months (YYYY/mm-YYYY/mm)
+    #. :code:`articles`: number of test articles
+    #. :code:`positive`: number of positive (target) test articles
+    #. :code:`found`: number of positive test articles in the top
+       :code:`count` scores
+    #. :code:`recall`: recall@count, i.e. :code:`found / positive`
+    #. :code:`cached`: whether the fold's model was loaded from the cache
+    #. :code:`runtime`: time (s) taken by the fold
+
+    Parameters
+    ----------
+    date_range: str
+        months to score. Format: YYYY/mm-YYYY/mm
+    window: int, optional, default=12
+        number of months in the sliding training window. Ignored if
+        :code:`train_start` is provided.
+    train_start: str, optional, default=None
+        if provided, use an expanding training window that starts in this
+        month. Format: YYYY/mm
+    count: int, optional, default=30
+        number of top-scoring articles used to compute recall
+    cache_dir: str, optional, default='data/backtest-cache'
+        directory for cached models and vectorized articles
+    dbase_dir: str, optional, default='data'
+        directory to load database files from.
+        :code:`dbase_fname=f'{dbase_dir}/{year}-{month:02d}{dbase_suffix}.csv'`
+    dbase_suffix: str, optional, default='-fit'
+        suffix for training database files. See :code:`dbase_dir`
+    eval_suffix: str, optional, default='-eval'
+        suffix for test database files. See :code:`dbase_dir`
+    max_workers: int, optional, default=None
+        number of folds to run in parallel. If None, use one per core. If 1,
+        run all folds in this process.
+    results_fname: str, optional, default='data/backtest.csv'
+        output file for the results table. If None, don't write to file.
+    verbose: bool, optional, default=True
+        print results table to console
+    **kwargs: Any
+        Passed to :class:`litmon.model.ArticleScorer` on :code:`__init__`
+
+    Attributes
+    ----------
+    results: DataFrame
+        results table, with one row per month
+    """
+    def __init__(
+        self,
+        /,
+        date_range: str,
+        *,
+        window: int = 12,
+        train_start: str = None,
+        count: int = 30,
+        cache_dir: str = 'data/backtest-cache',
+        dbase_dir: str = 'data',
+        dbase_suffix: str = '-fit',
+        eval_suffix: str = '-eval',
+        max_workers: int = None,
+        results_fname: str = 'data/backtest.csv',
+        verbose: bool = True,
+        **kwargs
+    ):
+        # import heavy dependencies
+        from ezazure import Azure
+        from pandas import DataFrame
+
+        # get training months for each test month
+        folds = []
+        for year, month in drange(date_range):
+            last = add_months(year, month, -1)
+            first = (
+                tuple(int(x) for x in train_start.split('/'))
+                if train_start is not None
+                else add_months(year, month, -window)
+            )
+            folds.append({
+                'test_month': (year, month),
+                'train_range':
+                    f'{first[0]:4d}/{first[1]:02d}-{last[0]:4d}/{last[1]:02d}',
+            })
+
+        # download database files
+        months = {
+            (dbase_suffix, key)
+            for fold in folds
+            for key in drange(fold['train_range'])
+        } | {
+            (eval_suffix, fold['test_month'])
+            for fold in folds
+        }
+        for suffix, (year, month) in sorted(months):
+            Azure().download(f'{dbase_dir}/{year:4d}-{month:02d}{suffix}.csv')
+
+        # run folds
+        makedirs(cache_dir, exist_ok=True)
+        fold_kwargs = {
+            'count': count,
+            'cache_dir': cache_dir,
+            'dbase_dir': dbase_dir,
+            'dbase_suffix': dbase_suffix,
+            'eval_suffix': eval_suffix,
+            'model_kwargs': kwargs,
+        }
+        if max_workers == 1:
+            rows = [
+                self.__class__.run_fold(**fold, **fold_kwargs)
+                for fold in folds
+            ]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                rows = list(pool.map(
+                    self.__class__._run_fold,
+                    [fold | fold_kwargs for fold in folds],
+                ))
+
+        # compile results
+        self.results = DataFrame(rows)
+        if results_fname is not None:
+            with atomic(results_fname) as tmp_fname:
+                self.results.to_csv(tmp_fname, index=False)
+
+        # write results to console
+        if verbose:
+            print(self.results.to_string(index=False))
+
+    @classmethod
+    def run_fold(
+        cls,
+        /,
+        test_month: tuple[int, int],
+        train_range: str,
+        *,
+        count: int,
+        cache_dir: str,
+        dbase_dir: str,
+        dbase_suffix: str,
+        eval_suffix: str,
+        model_kwargs: dict[str, Any],
+    ) -> dict[str, Any]:
+        """Train on one window, and score the following month
+
+        Parameters
+        ----------
+        test_month: tuple[int, int]
+            :code:`(year, month)` to score
+        train_range: str
+            months to train on. Format: YYYY/mm-YYYY/mm
+        count: int
+            number of top-scoring articles used to compute recall
+        cache_dir: str
+            directory for cached models and vectorized articles
+        dbase_dir: str
+            directory to load database files from
+        dbase_suffix: str
+            suffix for training database files
+        eval_suffix: str
+            suffix for test database files
+        model_kwargs: dict[str, Any]
+            passed to :class:`litmon.model.ArticleScorer` on :code:`__init__`
+
+        Returns
+        -------
+        dict[str, Any]
+            row of results table (see :class:`Backtester`)
+        """
+        # import heavy dependencies
+        from numpy import load, ones, partition, save
+        from scipy.sparse import issparse, load_npz, save_npz
+
+        from litmon.cli.fit import ModelFitter
+        from litmon.model import ArticleScorer
+        from litmon.utils import read_articles
+
+        # start timer
+        start = time()
+
+        # hash fold inputs
+        year, month = test_month
+        train_fnames = [
+            f'{dbase_dir}/{y:4d}-{m:02d}{dbase_suffix}.csv'
+            for y, m in drange(train_range)
+        ]
+        test_fname = f'{dbase_dir}/{year:4d}-{month:02d}{eval_suffix}.csv'
+        model_hash = sha256(json.dumps(
+            [
+                [cls.file_hash(fname) for fname in train_fnames],
+                model_kwargs,
+            ],
+            sort_keys=True,
+            default=str,
+        ).encode()).hexdigest()[0:16]
+        test_hash = sha256(
+            f'{model_hash}-{cls.file_hash(test_fname)}'.encode()
+        ).hexdigest()[0:16]
+
+        # load cached model, or fit model
+        model_fname = f'{cache_dir}/model-{model_hash}'
+        cached = path.isfile(f'{model_fname}.pickle')
+        if cached:
+            model = ArticleScorer.load(model_fname)
+        else:
+            model = ModelFitter(
+                train_range,
+                dbase_dir=dbase_dir,
+                dbase_suffix=dbase_suffix,
+                model_fname=None,
+                **model_kwargs,
+            ).model
+
+            # save to cache, writing the pickle file last, so that it marks
+            # a complete save
+            tmp_fname = f'{model_fname}-{getpid()}'
+            model.save(tmp_fname)
+            replace(f'{tmp_fname}.bin', f'{model_fname}.bin')
+            replace(f'{tmp_fname}.pickle', f'{model_fname}.pickle')
+
+        # load cached vectorized articles, or vectorize articles
+        articles = read_articles(test_fname)
+        features_fname = f'{cache_dir}/features-{test_hash}'
+        if path.isfile(f'{features_fname}.npz'):
+            vectorized = load_npz(f'{features_fname}.npz')
+        elif path.isfile(f'{features_fname}.npy'):
+            vectorized = load(f'{features_fname}.npy')
+        else:
+            vectorized = model.transform(articles)
+            ext = 'npz' if issparse(vectorized) else 'npy'
+            with atomic(f'{features_fname}.{ext}') as tmp_fname, \
+                    open(tmp_fname, 'wb') as file:
+                if issparse(vectorized):
+                    save_npz(file, vectorized)
+                else:
+                    save(file, vectorized)
+
+        # score articles, compute recall@count
+        scores = model.model.predict(vectorized)
+        labels = articles['label'].to_numpy().astype(bool)
+        keep_me = (
+            scores >= partition(scores, -count)[-count]
+            if count < scores.size
+            else ones(scores.size, dtype=bool)
+        )
+        positive = int(labels.sum())
+        found = int((labels & keep_me).sum())
+
+        # return
+        return {
+            'month': f'{year:4d}-{month:02d}',
+            'train_range': train_range,
+            'articles': int(labels.size),
+            'positive': positive,
+            'found': found,
+            'recall': found / positive if positive else float('nan'),
+            'cached': cached,
+            'runtime': round(time() - start, 3),
+        }
+
+    @classmethod
+    def file_hash(cls, fname: str, /) -> str:
+        """Compute content hash of a file
+
+        Parameters
+        ----------
+        fname: str
+            file to hash
+
+        Returns
+        -------
+        str
+            sha256 hash of file contents
+        """
+        digest = sha256()
+        with open(fname, 'rb') as file:
+            while chunk := file.read(1 << 20):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @classmethod
+    def _run_fold(cls, kwargs: dict[str, Any], /) -> dict[str, Any]:
+        """Run :meth:`run_fold` with a dict of kwargs (for process pools)"""
+        return cls.run_fold(**kwargs)
+
+
+# command-line interface
+if __name__ == '__main__':
+    config = cli(
+        cls='litmon.cli.backtest.Backtester',
+        description='Backtest models over a rolling time series',
+        default=['backtest', 'fit'],
+    )
+    Backtester(**config)
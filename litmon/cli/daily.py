@@ -0,0 +1,354 @@
+"""Ingest and score a single day of articles"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+import json
+from os import path
+from typing import TYPE_CHECKING
+
+from litmon.cli.dbase import DBaseBuilder
+from litmon.cli.eval import ModelUser
+from litmon.query import PubMedQuerier
+from litmon.utils import atomic, cli, read_articles
+
+# heavy dependencies are imported when first used, for fast startup
+if TYPE_CHECKING:
+    from pandas import DataFrame
+
+
+class DailyIngester(DBaseBuilder):
+    """Incrementally ingest and score a single :code:`[edat]` day of articles
+
+    Instead of querying and scoring a whole month on the 1st of the next month,
+    this pulls one day at a time, so that each run does a small, constant
+    amount of work and results are at most a day stale. Each run:
+
+    #. Queries the articles entered on :code:`date`
+    #. Scores them with the current trained model
+    #. Merges them into the month's rolling top-:code:`count` articles (with
+       their explanations)
+    #. Re-writes the month's results file from the rolling top-:code:`count`
+       articles (which is the same report :class:`~litmon.cli.eval.ModelUser`
+       would produce, as a materialized view. See :meth:`materialize`.)
+    #. Appends them to the current month's database file, and records the day
+       as ingested
+
+    Once every day of a month has been ingested, the month's database file is
+    its complete store, so the monthly :class:`~litmon.pipeline.Pipeline`
+    reads it (see :meth:`ingested`), and re-materializes the month's results,
+    instead of re-querying and re-scoring the month.
+
+    The model is loaded from :code:`registry` (the version promoted by the
+    monthly run), if provided, else from :code:`model_fname`.
+
+    Days that have already been ingested are skipped, so it is always safe to
+    re-run. Nothing is appended until scoring succeeds, and articles already
+    in the month's database (e.g. appended by a run that was interrupted
+    before it recorded the day) aren't appended again.
+
+    Parameters
+    ----------
+    query: str
+        standard pubmed query for pulling these types of articles
+    date: str, optional, default=None
+        day to ingest. Format: YYYY/mm/dd. If None, use yesterday.
+    count: int, optional, default=30
+        number of top-scoring articles kept for each month
+    dbase_dir: str, optional, default='data'
+        directory to write database files to.
+        :code:`dbase_fname=f'{dbase_dir}/{year}-{month:02d}{dbase_suffix}.csv'`
+    dbase_suffix: str, optional, default='-eval'
+        suffix for each database file. See :code:`dbase_dir`
+    model_fname: str, optional, default='data/model'
+        Input filename for saved trained model, without file extension. See
+        :class:`~litmon.cli.eval.ModelUser`. Ignored if :code:`registry` is
+        provided.
+    model_version: str, optional, default='production'
+        version of the model to load from :code:`registry`
+    num_terms: int, optional, default=5
+        number of top contributing terms listed for each top-scoring article.
+        See :class:`~litmon.cli.eval.ModelUser`.
+    pmids_fname: str, optional, default='data/pmids.txt'
+        file containing positive (target) pmids. This is used for labeling
+        documents True/False.
+    registry: str, optional, default=None
+        root of a :class:`litmon.registry.ModelRegistry` to load the model
+        from
+    results_dir: str, optional, default='data'
+        directory to write results to.
+        :code:`results_fname=f'{results_dir}/{year}-{month:02d}{results_suffix}.xlsx'`
+    results_suffix: str, optional, default='-results'
+        suffix for each results file. See :code:`results_dir`
+    topk_suffix: str, optional, default='-topk'
+        suffix for the file holding each month's rolling top-scoring articles.
+        :code:`topk_fname=f'{results_dir}/{year}-{month:02d}{topk_suffix}.csv'`
+    verbose: bool, optional, default=True
+        write running status to console
+    write_csv: bool, optional, default=False
+        write results to csv file. See :class:`~litmon.cli.eval.ModelUser`.
+    write_xlsx: bool, optional, default=True
+        write results to xlsx file
+    **kwargs: Any
+        Passed to base class :class:`~litmon.query.PubMedQuerier`.
+    """
+    def __init__(
+        self,
+        /,
+        query: str,
+        date: str = None,
+        *,
+        count: int = 30,
+        dbase_dir: str = 'data',
+        dbase_suffix: str = '-eval',
+        model_fname: str = 'data/model',
+        model_version: str = 'production',
+        num_terms: int = 5,
+        pmids_fname: str = 'data/pmids.txt',
+        registry: str = None,
+        results_dir: str = 'data',
+        results_suffix: str = '-results',
+        topk_suffix: str = '-topk',
+        verbose: bool = True,
+        write_csv: bool = False,
+        write_xlsx: bool = True,
+        **kwargs
+    ):
+
+        # import heavy dependencies
+        from ezazure import Azure
+        from pandas import concat, read_csv
+
+        from litmon.model import ArticleScorer
+
+        # initialize base (skipping the monthly loop in DBaseBuilder)
+        PubMedQuerier.__init__(self, **kwargs)
+
+        # get date
+        qdate = (
+            datetime.strptime(date, '%Y/%m/%d').date()
+            if date
+            else datetime.now().date() - timedelta(days=1)
+        )
+        month_key = f'{qdate.year:4d}-{qdate.month:02d}'
+
+        # get month's existing files
+        days_fname = f'{dbase_dir}/{month_key}{dbase_suffix}-days.json'
+        dbase_fname = f'{dbase_dir}/{month_key}{dbase_suffix}.csv'
+        topk_fname = f'{results_dir}/{month_key}{topk_suffix}.csv'
+        for fname in [days_fname, dbase_fname, topk_fname]:
+            try:
+                Azure().download(fname)
+            except (FileNotFoundError, KeyError):
+                pass
+
+        # skip days that have already been ingested
+        days = (
+            json.load(open(days_fname, 'r'))
+            if path.isfile(days_fname)
+            else []
+        )
+        if qdate.isoformat() in days:
+            if verbose:
+                print(f'{qdate.isoformat()}: Already ingested')
+            return
+
+        # load positive pmids
+        Azure().download(pmids_fname)
+        pmids = open(pmids_fname).read().splitlines()
+
+        # query and label articles
+        articles = self.query_day(query, qdate)
+        self.__class__.label(articles, pmids)
+        articles = articles[[*self.header, 'label']]
+        dbase_articles = articles
+        num_articles = articles.shape[0]
+
+        # score articles
+        if registry is not None:
+            from litmon.registry import ModelRegistry
+            model = ModelRegistry(registry).load(model_version)
+        else:
+            Azure().download(f'{model_fname}.bin')
+            Azure().download(f'{model_fname}.pickle')
+            model = ArticleScorer.load(model_fname)
+        articles = articles.reset_index(drop=True)
+        ModelUser.add_columns(articles)
+        if articles.shape[0]:
+            articles.loc[:, 'score'] = model.predict(articles)
+        else:
+            articles.loc[:, 'score'] = []
+
+        # update rolling top-scoring articles, with their explanations
+        if path.isfile(topk_fname):
+            articles = concat([read_articles(topk_fname), articles])
+            articles = articles.drop_duplicates(subset='pubmed_id')
+        top_scoring = articles.nlargest(count, 'score').copy()
+        if num_terms and model.terms is not None:
+            top_scoring.loc[:, 'explanation'] = [
+                ', '.join(terms)
+                for terms in model.explain(top_scoring, num_terms=num_terms)
+            ]
+        with atomic(topk_fname) as tmp_fname:
+            top_scoring.to_csv(tmp_fname, index=False)
+
+        # materialize month's results
+        self.__class__.materialize(
+            qdate.year,
+            qdate.month,
+            results_dir=results_dir,
+            results_suffix=results_suffix,
+            topk_suffix=topk_suffix,
+            write_csv=write_csv,
+            write_xlsx=write_xlsx,
+        )
+
+        # append to month's database, skipping articles that were already
+        # appended
+        if path.isfile(dbase_fname):
+            dbase_articles = dbase_articles[
+                ~dbase_articles['pubmed_id'].astype(str).isin(set(read_csv(
+                    dbase_fname,
+                    usecols=['pubmed_id'],
+                    dtype=str,
+                )['pubmed_id']))
+            ]
+        dbase_articles.to_csv(
+            dbase_fname,
+            mode='a',
+            header=not path.isfile(dbase_fname),
+        )
+
+        # record ingested day
+        days.append(qdate.isoformat())
+        with atomic(days_fname) as tmp_fname, open(tmp_fname, 'w') as file:
+            json.dump(days, file, indent=4)
+
+        # write running status
+        if verbose:
+            print(
+                f'{qdate.isoformat()}: '
+                f'{num_articles:4d} Articles '
+                f'| {top_scoring["score"].min():.3f} Top-{count} Score'
+            )
+
+    @classmethod
+    def ingested(
+        cls,
+        year: int,
+        month: int,
+        /,
+        *,
+        dbase_dir: str = 'data',
+        dbase_suffix: str = '-eval',
+    ) -> bool:
+        """Check if every day of a month has been ingested
+
+        Parameters
+        ----------
+        year: int
+            year of month
+        month: int
+            month
+        dbase_dir: str, optional, default='data'
+            directory of database files
+        dbase_suffix: str, optional, default='-eval'
+            suffix of each database file
+
+        Returns
+        -------
+        bool
+            whether the month's database file holds every day of the month
+        """
+        from ezazure import Azure
+
+        # get ingested days
+        month_key = f'{year:4d}-{month:02d}'
+        days_fname = f'{dbase_dir}/{month_key}{dbase_suffix}-days.json'
+        try:
+            Azure().download(days_fname)
+        except (FileNotFoundError, KeyError):
+            pass
+        if not path.isfile(days_fname):
+            return False
+        days = set(json.load(open(days_fname, 'r')))
+
+        # check every day of month
+        day = datetime(year, month, 1).date()
+        while day.month == month:
+            if day.isoformat() not in days:
+                return False
+            day += timedelta(days=1)
+        return True
+
+    @classmethod
+    def materialize(
+        cls,
+        year: int,
+        month: int,
+        /,
+        *,
+        results_dir: str = 'data',
+        results_suffix: str = '-results',
+        topk_suffix: str = '-topk',
+        write_csv: bool = False,
+        write_xlsx: bool = True,
+    ) -> DataFrame:
+        """Write a month's results from its rolling top-scoring articles
+
+        Parameters
+        ----------
+        year: int
+            year of month
+        month: int
+            month
+        results_dir: str, optional, default='data'
+            directory of results and top-scoring articles files
+        results_suffix: str, optional, default='-results'
+            suffix for each results file
+        topk_suffix: str, optional, default='-topk'
+            suffix for each file of rolling top-scoring articles
+        write_csv: bool, optional, default=False
+            write results to csv file
+        write_xlsx: bool, optional, default=True
+            write results to xlsx file
+
+        Returns
+        -------
+        DataFrame
+            month's top-scoring articles, rearranged (see
+            :meth:`~litmon.cli.eval.ModelUser.rearrange`)
+        """
+        from ezazure import Azure
+
+        # load rolling top-scoring articles
+        month_key = f'{year:4d}-{month:02d}'
+        topk_fname = f'{results_dir}/{month_key}{topk_suffix}.csv'
+        Azure().download(topk_fname)
+        top_scoring = read_articles(topk_fname, dtype={'feedback': str})
+        top_scoring = ModelUser.rearrange(
+            top_scoring.fillna({'feedback': ''}),
+        )
+
+        # write results
+        if write_csv:
+            top_scoring.to_csv(
+                f'{results_dir}/{month_key}{results_suffix}.csv')
+        if write_xlsx:
+            ModelUser.write_xlsx(
+                f'{results_dir}/{month_key}{results_suffix}.xlsx',
+                {'Top-Scoring Articles': top_scoring},
+            )
+
+        # return
+        return top_scoring
+
+
+# command-line interface
+if __name__ == '__main__':
+    config = cli(
+        cls='litmon.cli.daily.DailyIngester',
+        description='Ingest and score a single day of articles',
+        default=['query', 'user', 'daily'],
+    )
+    DailyIngester(**config)
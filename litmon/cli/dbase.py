@@ -3,14 +3,20 @@
 from __future__ import annotations
 
 from copy import deepcopy
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta
+from hashlib import sha256
+import json
+from os import path
 from random import random, seed
+from shutil import rmtree
+from typing import TYPE_CHECKING
 
-from ezazure import Azure
-from pandas import DataFrame
+from litmon.query import AsyncPubMedQuerier, PubMedQuerier
+from litmon.utils import atomic, cli, drange
 
-from litmon.query import PubMedQuerier
-from litmon.utils import cli, drange
+# heavy dependencies are imported when first used, for fast startup
+if TYPE_CHECKING:
+    from pandas import DataFrame
 
 
 class DBaseBuilder(PubMedQuerier):
@@ -22,6 +28,12 @@ class DBaseBuilder(PubMedQuerier):
         standard pubmed query for pulling these types of articles
     date_range: str
         months to query. Format: YYYY/mm-YYYY/mm
+    async_kwargs: dict, optional, default=None
+        if provided, the days of each month are queried concurrently, through
+        an :class:`~litmon.query.AsyncPubMedQuerier` that is passed these
+        kwargs (e.g. :code:`max_concurrency`, :code:`api_key`) on
+        :code:`__init__()`, and each day is labeled as soon as it arrives. If
+        None, days are queried one at a time.
     balance_ratio: float, optional, default=3
         number negative (non-target) articles = number positive (target)
         articles * :code:`balance_ratio`. To turn off, set to 0.
@@ -30,15 +42,62 @@ class DBaseBuilder(PubMedQuerier):
         :code:`dbase_fname=f'{dbase_dir}/{year}-{month:02d}{dbase_suffix}.csv'`
     dbase_suffix: str, optional, default=''
         suffix appended to each output file. See :code:`dbase_dir`
+    dedupe_fname: str, optional, default=None
+        signature store for :class:`~litmon.dedupe.ArticleDeduplicator`. If
+        specified, then articles that duplicate (or nearly duplicate) an
+        article stored in any other month are dropped, and the articles that
+        are written (after balancing) are registered after each month.
+        Rebuilding a month replaces its entries. If the store can't be found /
+        downloaded, then a new one is created.
+    keep: bool, optional, default=False
+        keep each month's database in memory, in :code:`dbases`
+    monitor_fname: str, optional, default=None
+        time-series file of monthly statistics (see
+        :class:`~litmon.monitor.DriftMonitor`). If specified, then the
+        statistics of each month's query results (before duplicate removal
+        and balancing) are accumulated as each day arrives, and recorded
+        under stage :code:`ingest`.
+    only_missing: bool, optional, default=False
+        skip months whose database file already exists in :code:`dbase_dir`.
+        Use this to fill gaps in an existing data directory.
     pmids_fname: str, optional, default='data/pmids.txt'
         file containing positive (target) pmids. This is used for labeling
         documents True/False.
     random_seed: int, optional, default=271828
         random seed for :code:`random.seed()`. Set to 0 to turn off
+    resume: bool, optional, default=False
+        pick up where a previous (interrupted) run stopped: skip months that
+        the manifest lists as completed with the same query, and reuse the
+        checkpointed days of a partially-completed month
+    search_fname: str, optional, default=None
+        full-text search index (see :class:`~litmon.search.ArticleIndex`).
+        If specified, then each month is (re-)indexed as soon as its database
+        file is written.
+    topics: dict[str, str], optional, default=None
+        file containing positive (target) pmids of each topic, keyed by topic
+        name. If provided, :code:`query` should be the union of every topic's
+        query: each article is fetched and stored once, with an extra
+        :code:`label_{topic}` column for each topic (see
+        :class:`~litmon.topics.MultiTopicScorer`). An article that is positive
+        for any topic is also positive in :code:`label`.
     verbose: bool, optional, default=True
         write running status to console
     **kwargs: Any
         Passed to base class :class:`~litmon.query.PubMedQuerier`.
+
+    Attributes
+    ----------
+    dbases: dict[tuple[int, int], DataFrame]
+        database for each month built, keyed by :code:`(year, month)`. This is
+        only filled if :code:`keep==True`.
+
+    Notes
+    -----
+    Each day's query results are checkpointed (atomically) to
+    :code:`{dbase_dir}/checkpoints/`, and each completed month is recorded in
+    the manifest :code:`{dbase_dir}/manifest{dbase_suffix}.json`, along with
+    a hash of the query and its article counts. Checkpoints for a month are
+    deleted once that month is completed.
     """
     def __init__(
         self,
@@ -46,77 +105,169 @@ class DBaseBuilder(PubMedQuerier):
         query: str,
         date_range: str,
         *,
+        async_kwargs: dict = None,
         balance_ratio: float = 3,
         dbase_dir: str = 'data',
         dbase_suffix: str = '',
+        dedupe_fname: str = None,
+        keep: bool = False,
+        monitor_fname: str = None,
+        only_missing: bool = False,
         pmids_fname: str = 'data/pmids.txt',
         random_seed: int = 271828,
+        resume: bool = False,
+        search_fname: str = None,
+        topics: dict[str, str] = None,
         verbose: bool = True,
         **kwargs
     ):
 
+        # import heavy dependencies
+        import asyncio
+
+        from ezazure import Azure
+        from pandas import DataFrame, read_pickle
+
+        from litmon.dedupe import ArticleDeduplicator
+        from litmon.monitor import DriftMonitor, MonthStats
+        from litmon.search import ArticleIndex
+
         # set seed
         if random_seed >= 0:
             seed(random_seed)
 
-        # initialize base
+        # initialize base, and async querier, sharing the querier's session
+        # (closing the base's own session, to release its connection pool)
         PubMedQuerier.__init__(self, **kwargs)
+        if async_kwargs is not None:
+            self._async_querier = AsyncPubMedQuerier(**kwargs, **async_kwargs)
+            self._session.close()
+            self._session = self._pubmed._session = \
+                self._async_querier._session
 
         # load positive pmids
         Azure().download(pmids_fname)
         pmids = open(pmids_fname).read().splitlines()
 
+        # load positive pmids of each topic
+        topic_pmids = {}
+        for topic, topic_fname in (topics or {}).items():
+            Azure().download(topic_fname)
+            topic_pmids[topic] = open(topic_fname).read().splitlines()
+
+        # load duplicate-detection signature store
+        if dedupe_fname is not None:
+            try:
+                Azure().download(dedupe_fname)
+                dedupe = ArticleDeduplicator.load(dedupe_fname)
+            except (FileNotFoundError, KeyError):
+                dedupe = ArticleDeduplicator()
+
+        # initialize in-memory databases
+        self.dbases = {}
+
         # get file header
         file_header = deepcopy(self.header)
         file_header.append('label')
+        file_header += [f'label_{topic}' for topic in topic_pmids]
+
+        # load manifest of completed months
+        manifest_fname = f'{dbase_dir}/manifest{dbase_suffix}.json'
+        manifest = (
+            json.load(open(manifest_fname, 'r'))
+            if path.isfile(manifest_fname)
+            else {}
+        )
+        query_hash = self.__class__.query_hash(query)
 
         # build database for each month
         for year, month in drange(date_range):
 
+            # skip completed months
+            month_key = f'{year:4d}-{month:02d}'
+            dbase_fname = f'{dbase_dir}/{month_key}{dbase_suffix}.csv'
+            if only_missing and path.isfile(dbase_fname):
+                continue
+            if (
+                resume
+                and manifest.get(month_key, {}).get('query_hash')
+                == query_hash
+            ):
+                continue
+
             # initialize df
-            articles = DataFrame([], columns=file_header)
+            articles = DataFrame([], columns=file_header).astype({
+                'publication_date': 'datetime64[ns]',
+                **{
+                    col: bool
+                    for col in file_header
+                    if col.startswith('label')
+                },
+            })
 
-            # run query for each date
+            # get each date, and its checkpoint file
+            qdates = []
             qdate = date(year, month, 1)
             while qdate.month == month:
+                qdates.append(qdate)
+                qdate += timedelta(days=1)
+            checkpoint_fnames = [
+                self.__class__.checkpoint_fname(
+                    query,
+                    qdate,
+                    dbase_dir=dbase_dir,
+                    dbase_suffix=dbase_suffix,
+                )
+                for qdate in qdates
+            ]
 
-                # create query
-                datestr = qdate.strftime('%Y/%m/%d')
-                cur_query = f'{query} AND ({datestr} [edat])'
-
-                # run query
-                qarticles = self.query(cur_query)
+            # prepare checkpoint directory
+            checkpoint_dir = path.dirname(checkpoint_fnames[0])
+            if not resume:
+                rmtree(checkpoint_dir, ignore_errors=True)
 
-                # remove articles with bad dates
-                drop_idx = []
-                for idx, article in qarticles.iterrows():
-                    if not (
-                        type(article['publication_date']) is date
-                        and article['publication_date'] == qdate
-                    ):
-                        drop_idx.append(idx)
-                qarticles.drop(index=drop_idx, inplace=True)
+            # load checkpointed results, or run query for each date, labeling
+            # articles positive / negative
+            if async_kwargs is not None:
+                days = asyncio.run(self._query_days(
+                    query,
+                    qdates,
+                    checkpoint_fnames,
+                    pmids,
+                    topic_pmids,
+                ))
+            else:
+                days = []
+                for qdate, checkpoint_fname in zip(qdates, checkpoint_fnames):
+                    if path.isfile(checkpoint_fname):
+                        qarticles = read_pickle(checkpoint_fname)
+                    else:
+                        qarticles = self.query_day(query, qdate)
+                        with atomic(checkpoint_fname) as tmp_fname:
+                            qarticles.to_pickle(tmp_fname)
+                    self.__class__.label(qarticles, pmids, topics=topic_pmids)
+                    days.append(qarticles)
 
-                # append to df
+            # append to df, in date order, accumulating statistics
+            stats = MonthStats()
+            for qarticles in days:
                 articles = articles.append(qarticles)
-
-                # increment day
-                qdate += timedelta(days=1)
+                stats.update(qarticles)
 
             # reset indices
             articles.reset_index(drop=True, inplace=True)
 
-            # label articles positive / negative
-            for _, article in articles.iterrows():
-                cur_pmid = article['pubmed_id']
-                cur_pmid = cur_pmid[0:min(len(cur_pmid), 8)]
-                article['label'] = any([
-                    cur_pmid == pmid
-                    for pmid in pmids
-                ])
+            # remove duplicates of articles stored in other months (ignoring
+            # this month's own entries, if it's being rebuilt)
+            if dedupe_fname is not None:
+                articles = dedupe.drop(
+                    articles,
+                    month=month_key,
+                    register=False,
+                )
 
             # balance df
-            if balance_ratio > 0:
+            if balance_ratio > 0 and articles.shape[0] > 0:
                 prob_incl = (
                     balance_ratio
                     * articles['label'].sum()
@@ -129,8 +280,37 @@ class DBaseBuilder(PubMedQuerier):
                 articles.drop(index=drop_idx, inplace=True)
 
             # write to file
-            articles.to_csv(
-                f'{dbase_dir}/{year:4d}-{month:02d}{dbase_suffix}.csv')
+            with atomic(dbase_fname) as tmp_fname:
+                articles.to_csv(tmp_fname)
+            if keep:
+                self.dbases[(year, month)] = articles
+
+            # register the articles that were written, and save
+            # duplicate-detection signature store
+            if dedupe_fname is not None:
+                dedupe.add(articles, month=month_key)
+                dedupe.save(dedupe_fname)
+
+            # index month for full-text search
+            if search_fname is not None:
+                with ArticleIndex(search_fname) as index:
+                    index.add(articles, month_key, fname=dbase_fname)
+
+            # record month's statistics
+            if monitor_fname is not None:
+                DriftMonitor(monitor_fname).record(month_key, 'ingest', stats)
+
+            # record completed month
+            manifest[month_key] = {
+                'query_hash': query_hash,
+                'articles': int(articles.shape[0]),
+                'positive': int(articles['label'].sum()),
+                'completed': datetime.now().isoformat(timespec='seconds'),
+            }
+            with atomic(manifest_fname) as tmp_fname, \
+                    open(tmp_fname, 'w') as file:
+                json.dump(manifest, file, indent=4)
+            rmtree(checkpoint_dir, ignore_errors=True)
 
             # write running status
             if verbose:
@@ -140,6 +320,228 @@ class DBaseBuilder(PubMedQuerier):
                     f'| {articles["label"].sum():3d} Positive'
                 )
 
+    def query_day(self, query: str, qdate: date, /) -> DataFrame:
+        """Query all articles entered on a single day
+
+        Articles whose publication date doesn't match :code:`qdate` are
+        removed.
+
+        Parameters
+        ----------
+        query: str
+            standard pubmed query
+        qdate: date
+            entry date (:code:`[edat]`) to query
+
+        Returns
+        -------
+        DataFrame
+            resulting articles, with a :code:`datetime64` publication date
+        """
+
+        # run query
+        qarticles = self.query(self.__class__.day_query(query, qdate))
+
+        # remove articles with bad dates
+        return self.__class__.drop_bad_dates(qarticles, qdate)
+
+    async def _query_days(
+        self,
+        query: str,
+        qdates: list[date],
+        checkpoint_fnames: list[str],
+        pmids: list[str],
+        topic_pmids: dict[str, list[str]],
+        /,
+    ) -> list[DataFrame]:
+        """Query days concurrently, through the async querier
+
+        Each day is checkpointed and labeled as soon as it arrives, while the
+        other days are still being fetched.
+
+        Parameters
+        ----------
+        query: str
+            standard pubmed query
+        qdates: list[date]
+            entry dates (:code:`[edat]`) to query
+        checkpoint_fnames: list[str]
+            checkpoint file of each date. Checkpointed dates aren't re-queried.
+        pmids: list[str]
+            positive (target) PubMed IDs
+        topic_pmids: dict[str, list[str]]
+            positive (target) PubMed IDs of each topic
+
+        Returns
+        -------
+        list[DataFrame]
+            labeled articles of each date, in the order of :code:`qdates`
+        """
+        import asyncio
+
+        from pandas import read_pickle
+
+        async def query_day(qdate: date, checkpoint_fname: str) -> DataFrame:
+            if path.isfile(checkpoint_fname):
+                qarticles = read_pickle(checkpoint_fname)
+            else:
+                qarticles = await self.query_day_async(query, qdate)
+                with atomic(checkpoint_fname) as tmp_fname:
+                    qarticles.to_pickle(tmp_fname)
+            self.__class__.label(qarticles, pmids, topics=topic_pmids)
+            return qarticles
+
+        return await asyncio.gather(*[
+            query_day(qdate, checkpoint_fname)
+            for qdate, checkpoint_fname in zip(qdates, checkpoint_fnames)
+        ])
+
+    async def query_day_async(self, query: str, qdate: date, /) -> DataFrame:
+        """Query all articles entered on a single day, asynchronously
+
+        This is :meth:`query_day`, run through the async querier. It's only
+        available if :code:`async_kwargs` was provided.
+
+        Parameters
+        ----------
+        query: str
+            standard pubmed query
+        qdate: date
+            entry date (:code:`[edat]`) to query
+
+        Returns
+        -------
+        DataFrame
+            resulting articles, with a :code:`datetime64` publication date
+        """
+        qarticles = await self._async_querier.query(
+            self.__class__.day_query(query, qdate),
+        )
+        self.count += qarticles.shape[0]
+        return self.__class__.drop_bad_dates(qarticles, qdate)
+
+    @classmethod
+    def query_hash(cls, query: str, /) -> str:
+        """Hash a query, to identify its manifest entries and checkpoints
+
+        Parameters
+        ----------
+        query: str
+            standard pubmed query
+
+        Returns
+        -------
+        str
+            short hash of :code:`query`
+        """
+        return sha256(query.encode()).hexdigest()[0:16]
+
+    @classmethod
+    def checkpoint_fname(
+        cls,
+        query: str,
+        qdate: date,
+        /,
+        *,
+        dbase_dir: str = 'data',
+        dbase_suffix: str = '',
+    ) -> str:
+        """Get the checkpoint file of a single day's query results
+
+        Parameters
+        ----------
+        query: str
+            standard pubmed query
+        qdate: date
+            entry date (:code:`[edat]`) that was queried
+        dbase_dir: str, optional, default='data'
+            database directory
+        dbase_suffix: str, optional, default=''
+            suffix of the month's database file
+
+        Returns
+        -------
+        str
+            :code:`{dbase_dir}/checkpoints/{YYYY-mm}{dbase_suffix}-{query
+            hash}/{dd}.pickle`
+        """
+        return (
+            f'{dbase_dir}/checkpoints/'
+            f'{qdate.year:4d}-{qdate.month:02d}{dbase_suffix}-'
+            f'{cls.query_hash(query)}/{qdate.day:02d}.pickle'
+        )
+
+    @classmethod
+    def day_query(cls, query: str, qdate: date, /) -> str:
+        """Restrict a query to a single entry date
+
+        Parameters
+        ----------
+        query: str
+            standard pubmed query
+        qdate: date
+            entry date (:code:`[edat]`)
+
+        Returns
+        -------
+        str
+            query for articles entered on :code:`qdate`
+        """
+        datestr = qdate.strftime('%Y/%m/%d')
+        return f'{query} AND ({datestr} [edat])'
+
+    @classmethod
+    def drop_bad_dates(cls, qarticles: DataFrame, qdate: date, /) -> DataFrame:
+        """Remove articles whose publication date doesn't match the query date
+
+        Parameters
+        ----------
+        qarticles: DataFrame
+            articles queried for :code:`qdate`
+        qdate: date
+            entry date (:code:`[edat]`) that was queried
+
+        Returns
+        -------
+        DataFrame
+            articles published on :code:`qdate`
+        """
+        from pandas import Timestamp
+        return qarticles[
+            qarticles['publication_date'] == Timestamp(qdate)
+        ].copy()
+
+    @classmethod
+    def label(
+        cls,
+        articles: DataFrame,
+        pmids: list[str],
+        /,
+        *,
+        topics: dict[str, list[str]] = None,
+    ):
+        """Label articles positive / negative, in place
+
+        Parameters
+        ----------
+        articles: DataFrame
+            articles to label. The :code:`label` column is set to whether each
+            article's PubMed ID is in :code:`pmids` (or in any topic's pmids).
+        pmids: list[str]
+            positive (target) PubMed IDs
+        topics: dict[str, list[str]], optional, default=None
+            positive (target) PubMed IDs of each topic, keyed by topic name.
+            The :code:`label_{topic}` column is set to whether each article's
+            PubMed ID is in the topic's pmids.
+        """
+        cur_pmids = articles['pubmed_id'].astype(str).str[0:8]
+        label = cur_pmids.isin(set(pmids)).to_numpy()
+        for topic, topic_pmids in (topics or {}).items():
+            topic_label = cur_pmids.isin(set(topic_pmids)).to_numpy()
+            articles.loc[:, f'label_{topic}'] = topic_label
+            label = label | topic_label
+        articles.loc[:, 'label'] = label
+
 
 # command-line interface
 if __name__ == '__main__':
@@ -147,5 +549,6 @@ if __name__ == '__main__':
         cls='litmon.cli.dbase.DBaseBuilder',
         description='Build database of articles',
         default=['query', 'user', 'fit_dates', 'dbase_fit'],
+        flags=['resume', 'only_missing'],
     )
     DBaseBuilder(**config)
@@ -10,5 +10,6 @@ if __name__ == '__main__':
         cls='litmon.cli.dbase.DBaseBuilder',
         description='Build database of articles',
         default=['query', 'user', 'eval_dates', 'dbase_eval'],
+        flags=['resume', 'only_missing'],
     )
     DBaseBuilder(**config)
@@ -1,11 +1,17 @@
 """Score journal articles in eval set"""
 
-from ezazure import Azure
-from numpy import ones, sort
-from pandas import DataFrame, ExcelWriter, read_csv
+from __future__ import annotations
 
-from litmon.model import ArticleScorer
-from litmon.utils import cli, drange
+from typing import TYPE_CHECKING, Any
+
+from litmon.utils import cli, drange, read_articles
+
+# heavy dependencies are imported when first used, for fast startup
+if TYPE_CHECKING:
+    from nptyping import NDArray
+    from pandas import DataFrame
+
+    from litmon.model import ArticleScorer
 
 
 class ModelUser:
@@ -16,13 +22,25 @@ class ModelUser:
 
     Top-scoring articles are written to excel files.
 
+    If the model is a :class:`litmon.topics.MultiTopicScorer`, then each
+    month's articles are vectorized once, and scored for every topic at once.
+    Each topic also gets its own results, written to
+    :code:`f'{results_dir}/{year}-{month:02d}{results_suffix}-{topic}.xlsx'`,
+    with the topic's :code:`label_{topic}` column as its label, and with
+    :code:`prob` and :code:`quantile` thresholds looked up from the topic's
+    own head.
+
     Parameters
     ----------
     date_range: str
         months to use for training. Format: YYYY/mm-YYYY/mm
     count: int, optional, default=30
         Write the top-scoring :code:`count` articles to file.
-        If :code:`thresh` is specified, then this is ignored.
+        If :code:`thresh`, :code:`prob`, or :code:`quantile` is specified,
+        then this is ignored.
+    dbases: dict[tuple[int, int], DataFrame], optional, default=None
+        in-memory databases, keyed by :code:`(year, month)`. Months that are
+        included here are used instead of loading database files.
     dbase_dir: str, optional, default='data'
         directory to load database files from.
         :code:`dbase_fname=f'{dbase_dir}/{year}-{month:02d}{dbase_suffix}.csv'`
@@ -32,15 +50,67 @@ class ModelUser:
         whether missing articles should be included in the output
         :code:`*.xlsx` file. The default value for this is expected to change
         in the future.
+    model: ArticleScorer, optional, default=None
+        trained model. If provided, this is used instead of loading
+        :code:`model_fname`.
     model_fname: str, optional, default='data/model'
         Input filename for saved trained model. This should NOT have a file
         extension, because a :code:`model_fname.bin` and a
         :code:`model_fname.pickle` file are loaded in.
+    model_version: str, optional, default='production'
+        version of the model to load from :code:`registry` (see
+        :class:`litmon.registry.ModelRegistry`), e.g. a digest, :code:`v3`,
+        or :code:`production`
+    monitor_fname: str, optional, default=None
+        time-series file of monthly statistics (see
+        :class:`litmon.monitor.DriftMonitor`). If specified, then the
+        statistics of each month's articles and scores are recorded under
+        stage :code:`score`.
+    num_terms: int, optional, default=5
+        number of top contributing terms listed in the :code:`explanation`
+        column of top-scoring articles (see
+        :meth:`litmon.model.ArticleScorer.explain`). If 0, or if the model
+        doesn't store terms, the column is left out.
+    prob: float, optional, default=None
+        If specified, then write all articles whose calibrated probability of
+        being a target article is >= :code:`prob` (see
+        :meth:`litmon.model.ArticleScorer.predict_proba`). Unlike raw scores,
+        probabilities are comparable across retrained models.
+    registry: str, optional, default=None
+        root of a :class:`litmon.registry.ModelRegistry`. If provided (and
+        :code:`model` isn't), the model is loaded from the registry, instead
+        of from :code:`model_fname`.
+    quantile: float, optional, default=None
+        If specified, then write all articles that score at least as high as
+        this quantile of the model's training scores (e.g. :code:`0.99` for the
+        top 1%). The threshold is looked up from the model's stored score
+        sketch (:attr:`litmon.model.ArticleScorer.sketch`), so it is the same
+        for every month.
     results_dir: str, optional, default='data'
         directory to write results to.
         :code:`results_fname=f'{results_dir}/{year}-{month:02d}{results_suffix}.xlsx'`
     results_suffix: str, optional, default='-results'
         suffix for each results file. See :code:`results_dir`
+    review_count: int, optional, default=0
+        number of extra articles selected for reviewers to label, by active
+        learning (see :class:`litmon.active.ReviewQueue`), from the articles
+        that aren't top-scoring, and aren't already labeled. They are written
+        to the :code:`Review Queue` sheet of the results file. If 0, no
+        articles are selected.
+    review_fname: str, optional, default='data/review-queue.csv'
+        log of articles selected for review. Logged articles are never
+        selected again.
+    review_pool: int, optional, default=5
+        size of the candidate pool of the :code:`'hybrid'` strategy, as a
+        multiple of :code:`review_count`
+    review_strategy: str, optional, default='hybrid'
+        how articles are selected for review: :code:`'uncertainty'`,
+        :code:`'diversity'`, or :code:`'hybrid'`
+    shadow_version: str, optional, default=None
+        version of a second model in :code:`registry` (e.g.
+        :code:`production~1`, the previously-promoted model) to score the
+        same articles with, for comparison. Its results are written to
+        :code:`f'{results_dir}/{year}-{month:02d}{results_suffix}-shadow.xlsx'`.
     thresh: float, optional, default=None
         If specified, then write all articles with score >= :code:`thresh`
         (instead of the top :code:`count` articles)
@@ -49,6 +119,25 @@ class ModelUser:
         listed in :code:`results_dir`, but with a :code:`.csv` extension.
     write_xlsx: bool, optional, default=Treu
         write results to xlsx file
+
+    Attributes
+    ----------
+    results: dict[tuple[int, int], DataFrame]
+        top-scoring articles for each month, keyed by :code:`(year, month)`
+    review_results: dict[tuple[int, int], DataFrame]
+        articles selected for review, for each month, with an
+        :code:`uncertainty` column. This is only filled if
+        :code:`review_count` is provided.
+    shadow_results: dict[tuple[int, int], DataFrame]
+        top-scoring articles of the shadow model, for each month. This is only
+        filled if :code:`shadow_version` is provided.
+    shadow_stats: dict[tuple[int, int], dict[str, float]]
+        comparison of the model with the shadow model, for each month:
+        :code:`overlap` (Jaccard similarity of their top-scoring articles) and
+        :code:`rank_corr` (Spearman correlation of their scores)
+    topic_results: dict[tuple[int, int], dict[str, DataFrame]]
+        top-scoring articles of each topic, for each month. This is only
+        filled for multi-topic models.
     """
     def __init__(
         self,
@@ -56,125 +145,451 @@ class ModelUser:
         date_range: str,
         *,
         count: int = 30,
+        dbases: dict[tuple[int, int], DataFrame] = None,
         dbase_dir: str = 'data',
         dbase_suffix: str = '-eval',
         include_missed: bool = True,
+        model: ArticleScorer = None,
         model_fname: str = 'data/model',
+        model_version: str = 'production',
+        monitor_fname: str = None,
+        num_terms: int = 5,
+        registry: str = None,
         results_dir: str = 'data',
+        prob: float = None,
+        quantile: float = None,
         results_suffix: str = '-results',
+        review_count: int = 0,
+        review_fname: str = 'data/review-queue.csv',
+        review_pool: int = 5,
+        review_strategy: str = 'hybrid',
+        shadow_version: str = None,
         thresh: float = None,
         write_csv: bool = False,
         write_xlsx: bool = True,
     ):
+        # import heavy dependencies
+        from ezazure import Azure
+        from numpy import array
+
+        from litmon.model import ArticleScorer
+
         # initialize azure client
         azure = Azure()
 
-        # load in model
-        azure.download(f'{model_fname}.bin')
-        azure.download(f'{model_fname}.pickle')
-        model = ArticleScorer.load(model_fname)
+        # load in model (and shadow model)
+        shadow = None
+        if registry is not None:
+            from litmon.registry import ModelRegistry
+            registry = ModelRegistry(registry)
+            if model is None:
+                model = registry.load(model_version)
+            if shadow_version is not None:
+                shadow = registry.load(shadow_version)
+        elif shadow_version is not None:
+            raise ValueError('shadow_version requires a registry')
+        if model is None:
+            azure.download(f'{model_fname}.bin')
+            azure.download(f'{model_fname}.pickle')
+            model = ArticleScorer.load(model_fname)
+
+        # get multi-topic heads
+        topics = getattr(model, 'topics', None) or []
 
-        # set flags
-        use_count = not thresh
+        # initialize review queue
+        if review_count:
+            from litmon.active import ReviewQueue
+            queue = ReviewQueue(
+                review_fname,
+                pool=review_pool,
+                strategy=review_strategy,
+            )
+
+        # initialize results
+        self.results = {}
+        self.review_results = {}
+        self.shadow_results = {}
+        self.shadow_stats = {}
+        self.topic_results = {}
 
         # process one month at a time
         for year, month in drange(date_range):
 
             # load in data
-            dbase_fname = \
-                f'{dbase_dir}/{year:4d}-{month:02d}{dbase_suffix}.csv'
-            azure.download(dbase_fname)
-            articles = read_csv(dbase_fname)
-
-            # add feedback column
-            articles.loc[:, 'feedback'] = \
-                ['' for _ in range(articles.shape[0])]
-
-            # add link column
-            articles.loc[:, 'link'] = \
-                ['' for _ in range(articles.shape[0])]
-            link_iloc = articles.columns.get_loc('link')
-            pmid_iloc = articles.columns.get_loc('pubmed_id')
-            for row in range(articles.shape[0]):
-                pmid = articles.iloc[row, pmid_iloc][0:8]
-                articles.iloc[row, link_iloc] = \
-                    f'https://pubmed.ncbi.nlm.nih.gov/{pmid}/'
-
-            # score each article
-            scores = model.predict(articles)
-            articles.loc[:, 'score'] = scores
-
-            # get indices of top-scoring articles
-            if use_count and count >= articles.shape[0]:
-                keep_me = ones(articles.shape[0], dtype=bool)
+            if dbases is not None and (year, month) in dbases:
+                articles = dbases[(year, month)].reset_index(drop=True)
             else:
-                if use_count:
-                    thresh = sort(scores)[-count]
-                keep_me = scores >= thresh
-
-            # extract top-scoring articles
-            top_scoring = \
-                self.__class__.rearrange(articles.iloc[keep_me, :])
-
-            # write csv results
-            if write_csv:
-                results_fname = \
-                    f'{results_dir}/{year}-{month:02d}{results_suffix}.csv'
-                top_scoring.to_csv(results_fname)
-
-            # done, if not writing xlsx
-            if not write_xlsx:
-                continue
-
-            # extract missed articles
-            if include_missed:
-                is_missed = articles['label'].to_numpy() * ~keep_me
-                missed = self.__class__.rearrange(articles.iloc[is_missed, :])
-
-            # open xlsx file
-            results_fname = \
-                f'{results_dir}/{year}-{month:02d}{results_suffix}.xlsx'
-            writer = ExcelWriter(results_fname, engine='xlsxwriter')
-
-            # declare cell formats
-            cell_format = writer.book.add_format()
-            cell_format.set_text_wrap()
-            cell_format.set_align('top')
-            cell_format.set_align('left')
-
-            # process args
-            sheet_names = ['Top-Scoring Articles']
-            dfs = [top_scoring]
-            if include_missed:
-                sheet_names.append('Missed Articles')
-                dfs.append(missed)
-
-            # write dfs to excel
-            for sheet_name, df in zip(sheet_names, dfs):
-
-                # write data
-                df.to_excel(
-                    writer,
-                    sheet_name=sheet_name,
-                    index=False,
+                dbase_fname = \
+                    f'{dbase_dir}/{year:4d}-{month:02d}{dbase_suffix}.csv'
+                azure.download(dbase_fname)
+                articles = read_articles(dbase_fname)
+
+            # add feedback and link columns
+            self.__class__.add_columns(articles)
+
+            # vectorize articles once, score union (and each topic)
+            features = model.transform(articles)
+            scores = array(model.model.predict(features))
+            topic_scores = model.score_topics(features) if topics else None
+
+            # record statistics of articles and scores
+            if monitor_fname is not None:
+                from litmon.monitor import DriftMonitor, MonthStats
+                DriftMonitor(monitor_fname).record(
+                    f'{year}-{month:02d}',
+                    'score',
+                    MonthStats().update(articles).add_scores(scores),
+                )
+
+            # select articles for review, that reviewers wouldn't see
+            review = None
+            if review_count:
+                articles.loc[:, 'score'] = scores
+                is_top = self.__class__.select_top(
+                    scores,
+                    model,
+                    count=count,
+                    prob=prob,
+                    quantile=quantile,
+                    thresh=thresh,
+                )
+                is_labeled = articles['label'].fillna(False) \
+                    .to_numpy(dtype=bool)
+                review = queue.select(
+                    articles,
+                    scores,
+                    features,
+                    review_count,
+                    boundary=scores[is_top].min() if is_top.any() else None,
+                    exclude=is_top | is_labeled,
+                    probs=(
+                        model.calibrator.transform(scores)
+                        if model.calibrator is not None
+                        else None
+                    ),
+                )
+                self.review_results[(year, month)] = review
+                if write_xlsx:
+                    queue.record(review, f'{year}-{month:02d}')
+
+            # report top-scoring articles
+            results_root = f'{results_dir}/{year}-{month:02d}{results_suffix}'
+            report_kwargs = {
+                'count': count,
+                'include_missed': include_missed,
+                'num_terms': num_terms,
+                'prob': prob,
+                'quantile': quantile,
+                'thresh': thresh,
+                'write_csv': write_csv,
+                'write_xlsx': write_xlsx,
+            }
+            self.results[(year, month)] = self.__class__.report(
+                articles,
+                scores,
+                model,
+                results_root,
+                review=review,
+                **report_kwargs,
+            )
+
+            # report top-scoring articles of shadow model, and compare
+            if shadow is not None:
+                shadow_articles = articles.copy()
+                shadow_scores = shadow.predict(shadow_articles)
+                top = self.results[(year, month)]
+                shadow_top = self.__class__.report(
+                    shadow_articles,
+                    shadow_scores,
+                    shadow,
+                    f'{results_root}-shadow',
+                    **report_kwargs,
+                )
+                self.shadow_results[(year, month)] = shadow_top
+                self.shadow_stats[(year, month)] = self.__class__.compare(
+                    top,
+                    shadow_top,
+                    scores,
+                    shadow_scores,
+                )
+
+            # report top-scoring articles of each topic
+            if topics:
+                self.topic_results[(year, month)] = {}
+            for idx, topic in enumerate(topics):
+                topic_articles = articles.copy()
+                if f'label_{topic}' in topic_articles:
+                    topic_articles.loc[:, 'label'] = \
+                        topic_articles[f'label_{topic}'] \
+                        .fillna(False).astype(bool)
+                self.topic_results[(year, month)][topic] = \
+                    self.__class__.report(
+                        topic_articles,
+                        topic_scores[:, idx],
+                        model.heads[topic],
+                        f'{results_root}-{topic}',
+                        **report_kwargs,
+                    )
+
+    @classmethod
+    def report(
+        cls,
+        articles: DataFrame,
+        scores: NDArray[(Any,), float],
+        model: ArticleScorer,
+        results_root: str,
+        /,
+        *,
+        count: int = 30,
+        include_missed: bool = True,
+        num_terms: int = 5,
+        prob: float = None,
+        quantile: float = None,
+        review: DataFrame = None,
+        thresh: float = None,
+        write_csv: bool = False,
+        write_xlsx: bool = True,
+    ) -> DataFrame:
+        """Extract top-scoring articles, and write them to file
+
+        Parameters
+        ----------
+        articles: DataFrame
+            scored articles, with feedback and link columns (see
+            :meth:`add_columns`)
+        scores: NDArray
+            raw score of each article
+        model: ArticleScorer
+            model that produced :code:`scores`, used for its thresholds and
+            explanations (it doesn't need a :code:`vhash` table)
+        results_root: str
+            output filename, without file extension
+        review: DataFrame, optional, default=None
+            articles selected for review, written to the
+            :code:`Review Queue` sheet (see
+            :class:`litmon.active.ReviewQueue`)
+        **kwargs: Any
+            see :class:`ModelUser`
+
+        Returns
+        -------
+        DataFrame
+            top-scoring articles
+        """
+
+        # record scores
+        articles.loc[:, 'score'] = scores
+
+        # get indices of top-scoring articles
+        keep_me = cls.select_top(
+            scores,
+            model,
+            count=count,
+            prob=prob,
+            quantile=quantile,
+            thresh=thresh,
+        )
+
+        # extract top-scoring articles, explaining their scores
+        top_scoring = articles.iloc[keep_me, :].copy()
+        if num_terms and model.terms is not None:
+            top_scoring.loc[:, 'explanation'] = [
+                ', '.join(terms)
+                for terms in model.explain(
+                    top_scoring,
+                    num_terms=num_terms,
                 )
+            ]
+        top_scoring = cls.rearrange(top_scoring)
 
-                # format data
-                worksheet = writer.sheets[sheet_name]
-                worksheet.set_column(0, 2, 75, cell_format)
-                worksheet.set_column(6, 7, 75, cell_format)
-                worksheet.set_column(8, 10, 30, cell_format)
-                worksheet.set_column(11, 13, 75, cell_format)
-                for row in range(1, df.shape[0]):
-                    worksheet.set_row(row, 200)
+        # write csv results
+        if write_csv:
+            top_scoring.to_csv(f'{results_root}.csv')
 
-            # save xlsx file
-            writer.save()
+        # done, if not writing xlsx
+        if not write_xlsx:
+            return top_scoring
+
+        # extract missed articles
+        if include_missed:
+            is_missed = articles['label'].to_numpy() * ~keep_me
+            missed = cls.rearrange(articles.iloc[is_missed, :])
+
+        # process args
+        sheets = {'Top-Scoring Articles': top_scoring}
+        if include_missed:
+            sheets['Missed Articles'] = missed
+        if review is not None:
+            from litmon.active import ReviewQueue
+            sheets[ReviewQueue.sheet_name] = cls.rearrange(review)
+
+        # write xlsx file
+        cls.write_xlsx(f'{results_root}.xlsx', sheets)
+
+        # return
+        return top_scoring
+
+    @classmethod
+    def select_top(
+        cls,
+        scores: NDArray[(Any,), float],
+        model: ArticleScorer,
+        /,
+        *,
+        count: int = 30,
+        prob: float = None,
+        quantile: float = None,
+        thresh: float = None,
+    ) -> NDArray[(Any,), bool]:
+        """Find top-scoring articles
+
+        Parameters
+        ----------
+        scores: NDArray
+            raw score of each article
+        model: ArticleScorer
+            model that produced :code:`scores`, used for its thresholds
+        **kwargs: Any
+            see :class:`ModelUser`
+
+        Returns
+        -------
+        NDArray
+            whether each article is top-scoring
+        """
+        from numpy import ones, partition
+
+        # get fixed score threshold
+        if thresh is None and prob is None and quantile is not None:
+            thresh = model.sketch.quantile(quantile)
+        if prob is not None and model.calibrator is None:
+            raise ValueError('prob requires a calibrated model')
+
+        # get indices of top-scoring articles
+        if thresh is not None:
+            return scores >= thresh
+        if prob is not None:
+            return model.calibrator.transform(scores) >= prob
+        if count >= scores.size:
+            return ones(scores.size, dtype=bool)
+        return scores >= partition(scores, -count)[-count]
+
+    @classmethod
+    def compare(
+        cls,
+        top: DataFrame,
+        shadow_top: DataFrame,
+        scores: NDArray[(Any,), float],
+        shadow_scores: NDArray[(Any,), float],
+        /,
+    ) -> dict[str, float]:
+        """Compare a model's results with a shadow model's results
+
+        Parameters
+        ----------
+        top: DataFrame
+            model's top-scoring articles
+        shadow_top: DataFrame
+            shadow model's top-scoring articles
+        scores: NDArray
+            model's score of every article
+        shadow_scores: NDArray
+            shadow model's score of every article
+
+        Returns
+        -------
+        dict[str, float]
+            :code:`overlap`: Jaccard similarity of the top-scoring articles'
+            PubMed IDs, and :code:`rank_corr`: Spearman correlation of the
+            scores
+        """
+        from pandas import Series
+        pmids = set(top['pubmed_id'].astype(str))
+        shadow_pmids = set(shadow_top['pubmed_id'].astype(str))
+        union = pmids | shadow_pmids
+        return {
+            'overlap': len(pmids & shadow_pmids) / len(union) if union else 1.,
+            'rank_corr': float(
+                Series(scores).corr(Series(shadow_scores), method='spearman')
+            ),
+        }
+
+    @classmethod
+    def add_columns(cls, articles: DataFrame, /):
+        """Add (empty) feedback and (PubMed) link columns, in place
+
+        Parameters
+        ----------
+        articles: DataFrame
+            articles to modify
+        """
+
+        # add feedback column
+        articles.loc[:, 'feedback'] = \
+            ['' for _ in range(articles.shape[0])]
+
+        # add link column
+        pmids = articles['pubmed_id'].astype(str).str[0:8]
+        articles.loc[:, 'link'] = \
+            ('https://pubmed.ncbi.nlm.nih.gov/' + pmids + '/').to_numpy()
+
+    @classmethod
+    def write_xlsx(cls, fname: str, sheets: dict[str, DataFrame], /):
+        """Write formatted results to xlsx file
+
+        Parameters
+        ----------
+        fname: str
+            output file
+        sheets: dict[str, DataFrame]
+            data to write to each sheet, keyed by sheet name. Each df should
+            already be formatted with :meth:`rearrange`.
+        """
+
+        # open xlsx file
+        from pandas import ExcelWriter
+        writer = ExcelWriter(
+            fname,
+            date_format='yyyy-mm-dd',
+            datetime_format='yyyy-mm-dd',
+            engine='xlsxwriter',
+        )
+
+        # declare cell formats
+        cell_format = writer.book.add_format()
+        cell_format.set_text_wrap()
+        cell_format.set_align('top')
+        cell_format.set_align('left')
+
+        # write dfs to excel
+        for sheet_name, df in sheets.items():
+
+            # write data
+            df.to_excel(
+                writer,
+                sheet_name=sheet_name,
+                index=False,
+            )
+
+            # format data
+            worksheet = writer.sheets[sheet_name]
+            worksheet.set_column(0, 2, 75, cell_format)
+            worksheet.set_column(6, 7, 75, cell_format)
+            worksheet.set_column(8, 10, 30, cell_format)
+            worksheet.set_column(11, 13, 75, cell_format)
+            worksheet.set_column(16, 16, 30, cell_format)
+            for row in range(1, df.shape[0]):
+                worksheet.set_row(row, 200)
+
+        # save xlsx file
+        writer.save()
 
     @classmethod
     def rearrange(cls, df: DataFrame, /) -> DataFrame:
         """Rearrange columns, sort by scores
 
+        The :code:`explanation` column is kept (last) if :code:`df` has one.
+
         Parameters
         ----------
         df: DataFrame
@@ -203,6 +618,8 @@ class ModelUser:
             'conclusions',
             'copyrights',
         ]
+        if 'explanation' in df:
+            order.append('explanation')
         return df[order].sort_values(by='score', ascending=False)
 
 
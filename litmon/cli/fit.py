@@ -1,10 +1,15 @@
 """Fit ML model"""
 
-from ezazure import Azure
-from pandas import DataFrame, read_csv, read_excel
+from __future__ import annotations
 
-from litmon.model import ArticleScorer
-from litmon.utils import cli, drange
+from time import time
+from typing import TYPE_CHECKING
+
+from litmon.utils import cli, drange, read_articles
+
+# heavy dependencies are imported when first used, for fast startup
+if TYPE_CHECKING:
+    from pandas import DataFrame
 
 
 class ModelFitter:
@@ -16,75 +21,298 @@ class ModelFitter:
         months to use for training. Format: YYYY/mm-YYYY/mm
     fback_range: str, optional, default=None
         additional feedback files to use in training
+    data: DataFrame, optional, default=None
+        training data. If provided, this is used instead of loading data from
+        :code:`date_range` and :code:`fback_range`. (See :meth:`load_data`.)
     dbase_dir: str, optional, default='data'
         directory to load database files from.
         :code:`dbase_fname=f'{dbase_dir}/{year}-{month:02d}{dbase_suffix}.csv'`
     dbase_suffix: str, optional, default='-fit'
         suffix for each database file. See :code:`dbase_dir`
+    ensemble: list[dict], optional, default=None
+        if provided, fit a :class:`litmon.ensemble.EnsembleScorer`, with a
+        member for each dict. Each dict overrides :code:`kwargs` for its
+        member (e.g. :code:`{'ml_model': 'sklearn.linear_model.Ridge'}`), and
+        may have a :code:`weight` key (default 1).
     fback_dir: str, optional, default='data'
         directory to load feedback files from.
         :code:`fback_fname=f'{fback_dir}/{year}-{month:02d}{fback_suffix}.xlsx'`
     fback_optional: bool, optional, default=True
         if True, and feedback file cannot be found / downloaded, then skip
+    fback_store: str, optional, default='data/feedback'
+        filename prefix of the consolidated feedback store. See
+        :class:`litmon.feedback.FeedbackStore`.
     fback_suffix: str, optional, default='-feedback'
         suffix for each feedback file. See :code:`fback_dir`
+    fusion: str, optional, default='rank'
+        how the scores of :code:`ensemble` members are fused. See
+        :class:`litmon.ensemble.EnsembleScorer`.
     model_fname: str, optional, default='data/model'
         Output filename for saving trained model to. This should NOT have a
         file extension, because a :code:`model_fname.bin` and a
-        :code:`model_fname.pickle` file are created
+        :code:`model_fname.pickle` file are created. If None, then the model
+        isn't saved.
+    promote: bool, optional, default=True
+        promote the new version to :code:`production` in :code:`registry`
+    registry: str, optional, default=None
+        root of a :class:`litmon.registry.ModelRegistry`. If provided, the
+        trained model is registered as a new version, with its training
+        range, feedback range, parameters, training metrics, and fit time.
+    sketch_range: str, optional, default=None
+        months of unbalanced (e.g. :code:`-eval`) databases, whose scores
+        replace the training scores in the model's score sketch, and whose
+        fraction of target articles corrects its calibrated probabilities
+        (see :meth:`litmon.model.ArticleScorer.summarize`). This makes
+        :code:`quantile` and :code:`prob` thresholds (see
+        :class:`~litmon.cli.eval.ModelUser`) select the intended articles of
+        unbalanced months. Format: YYYY/mm-YYYY/mm. If None, the model is
+        summarized by its training scores.
+    sketch_suffix: str, optional, default='-eval'
+        suffix for each database file of :code:`sketch_range`. See
+        :code:`dbase_dir`
+    topics: list[str] | dict[str, str], optional, default=None
+        if provided, fit a :class:`litmon.topics.MultiTopicScorer` with a head
+        for each of these topics, from the :code:`label_{topic}` columns of
+        the databases (see :class:`litmon.cli.dbase.DBaseBuilder`). A dict
+        keyed by topic (e.g. the :code:`topics` of
+        :class:`~litmon.cli.dbase.DBaseBuilder`) can also be passed.
     **kwargs: Any
         Passed to :class:`litmon.model.ArticleScorer` on :code:`__init__`
+
+    Attributes
+    ----------
+    model: ArticleScorer
+        trained model
+    version: str
+        digest of the model's version in :code:`registry` (None, if there's
+        no registry)
     """
     def __init__(
         self,
         /,
         date_range: str,
-        fback_range: bool = None,
+        fback_range: str = None,
         *,
+        data: DataFrame = None,
         dbase_dir: str = 'data',
         dbase_suffix: str = '-fit',
+        ensemble: list[dict] = None,
         fback_dir: str = 'data',
         fback_optional: bool = True,
+        fback_store: str = 'data/feedback',
         fback_suffix: str = '-feedback',
+        fusion: str = 'rank',
         model_fname: str = 'data/model',
+        promote: bool = True,
+        registry: str = None,
+        sketch_range: str = None,
+        sketch_suffix: str = '-eval',
+        topics: list[str] | dict[str, str] = None,
         **kwargs
     ):
 
+        # load in data
+        if data is None:
+            data = self.__class__.load_data(
+                date_range,
+                fback_range,
+                dbase_dir=dbase_dir,
+                dbase_suffix=dbase_suffix,
+                fback_dir=fback_dir,
+                fback_optional=fback_optional,
+                fback_store=fback_store,
+                fback_suffix=fback_suffix,
+            )
+
+        # fit model
+        start = time()
+        if topics:
+            from litmon.topics import MultiTopicScorer
+            self.model = MultiTopicScorer(list(topics), **kwargs).fit(data)
+        elif ensemble:
+            from litmon.ensemble import EnsembleScorer
+            from litmon.model import ArticleScorer
+            members = [dict(member) for member in ensemble]
+            weights = [member.pop('weight', 1.) for member in members]
+            self.model = EnsembleScorer(
+                [ArticleScorer(**{**kwargs, **member}) for member in members],
+                fusion=fusion,
+                weights=weights,
+                **kwargs,
+            ).fit(data)
+        else:
+            from litmon.model import ArticleScorer
+            self.model = ArticleScorer(**kwargs).fit(data)
+
+        # summarize scores of unbalanced months
+        if sketch_range is not None:
+            from pandas import concat
+            self.model.summarize(concat([
+                self.__class__.read_dbase(
+                    f'{dbase_dir}/{year:4d}-{month:02d}{sketch_suffix}.csv'
+                )
+                for year, month in drange(sketch_range)
+            ], ignore_index=True))
+        fit_seconds = time() - start
+
+        # save model
+        if model_fname is not None:
+            self.model.save(model_fname)
+
+        # register model
+        self.version = None
+        if registry is not None:
+            from litmon.registry import ModelRegistry
+            registry = ModelRegistry(registry)
+            self.version = registry.register(self.model, metadata={
+                'date_range': date_range,
+                'fback_range': fback_range,
+                'sketch_range': sketch_range,
+                'params': {
+                    **kwargs,
+                    **({'topics': list(topics)} if topics else {}),
+                    **(
+                        {'ensemble': ensemble, 'fusion': fusion}
+                        if ensemble
+                        else {}
+                    ),
+                },
+                'metrics': {
+                    'num_articles': int(data.shape[0]),
+                    'num_positive': int((data['label'] >= 1).sum()),
+                    'matrix_info': self.model.matrix_info,
+                },
+                'fit_seconds': round(fit_seconds, 3),
+            })
+            if promote:
+                registry.promote(self.version)
+
+    @classmethod
+    def load_data(
+        cls,
+        /,
+        date_range: str,
+        fback_range: str = None,
+        *,
+        dbase_dir: str = 'data',
+        dbase_suffix: str = '-fit',
+        fback_dir: str = 'data',
+        fback_optional: bool = True,
+        fback_store: str = 'data/feedback',
+        fback_suffix: str = '-feedback',
+    ) -> DataFrame:
+        """Load training data
+
+        Feedback workbooks are ingested into the feedback store (see
+        :class:`litmon.feedback.FeedbackStore`) the first time they're seen,
+        and never downloaded or parsed again. Feedback labels are then joined
+        to the training articles by PubMed ID: they replace the labels of
+        articles that are already in the training databases, and the remaining
+        articles with feedback are added.
+
+        Parameters
+        ----------
+        date_range: str
+            months to use for training. Format: YYYY/mm-YYYY/mm
+        fback_range: str, optional, default=None
+            additional feedback files to use in training
+        dbase_dir: str, optional, default='data'
+            directory to load database files from
+        dbase_suffix: str, optional, default='-fit'
+            suffix for each database file
+        fback_dir: str, optional, default='data'
+            directory to load feedback files from
+        fback_optional: bool, optional, default=True
+            if True, and feedback file cannot be found / downloaded, then skip
+        fback_store: str, optional, default='data/feedback'
+            filename prefix of the consolidated feedback store
+        fback_suffix: str, optional, default='-feedback'
+            suffix for each feedback file
+
+        Returns
+        -------
+        DataFrame
+            training articles, with a float :code:`label` column
+        """
+
         # load in standard data
+        from ezazure import Azure
+        from pandas import DataFrame, concat
+
+        from litmon.feedback import FeedbackStore
         data = DataFrame()
         for year, month in drange(date_range):
-            dbase_fname = \
+            data = data.append(cls.read_dbase(
                 f'{dbase_dir}/{year:4d}-{month:02d}{dbase_suffix}.csv'
-            Azure().download(dbase_fname)
-            data = data.append(read_csv(dbase_fname))
+            ))
 
-        # convert label to float
-        data.loc[:, 'label'] = data.loc[:, 'label'].astype(float)
+        # convert labels (including each topic's label) to float
+        for col in data.columns:
+            if col == 'label' or col.startswith('label_'):
+                data.loc[:, col] = data.loc[:, col].astype(float)
 
         # add in feedback data
         if fback_range is not None:
-            for year, month in drange(fback_range):
-                fback_fname = \
-                    f'{fback_dir}/{year:4d}-{month:02d}{fback_suffix}.xlsx'
+
+            # load feedback store
+            store = FeedbackStore(fback_store)
+            for fname in store.fnames:
+                try:
+                    Azure().download(fname)
+                except (FileNotFoundError, KeyError):
+                    pass
+            store = FeedbackStore(fback_store)
+
+            # ingest new feedback files
+            fback_fnames = [
+                f'{fback_dir}/{year:4d}-{month:02d}{fback_suffix}.xlsx'
+                for year, month in drange(fback_range)
+            ]
+            for fback_fname in fback_fnames:
+                if store.has(fback_fname):
+                    continue
                 try:
                     Azure().download(fback_fname)
                 except FileNotFoundError as e:
                     if fback_optional:
                         continue
                     raise e
-                fdata = read_excel(fback_fname)
-                fdata.loc[:, 'label'] = fdata.loc[:, 'feedback']
-                fdata.drop(columns=['feedback'], inplace=True)
-                data = data.append(fdata)
+                store.ingest(fback_fname)
+
+            # replace labels of articles with feedback
+            fdata = store.articles(fback_fnames)
+            pmids = data['pubmed_id'].astype(str).str[0:8]
+            has_feedback = pmids.isin(fdata['pubmed_id']).to_numpy()
+            data.loc[has_feedback, 'label'] = pmids[has_feedback].map(
+                fdata.set_index('pubmed_id')['label']
+            ).to_numpy()
+
+            # add remaining articles with feedback
+            data = concat([data, fdata[~fdata['pubmed_id'].isin(pmids)]])
 
         # drop missing label
         data.dropna(subset=['label'], inplace=True)
 
-        # fit model
-        model = ArticleScorer(**kwargs).fit(data)
+        # return
+        return data
 
-        # save model
-        model.save(model_fname)
+    @classmethod
+    def read_dbase(cls, fname: str, /) -> DataFrame:
+        """Download (if needed) and read a database file
+
+        Parameters
+        ----------
+        fname: str
+            database file
+
+        Returns
+        -------
+        DataFrame
+            articles
+        """
+        from ezazure import Azure
+        Azure().download(fname)
+        return read_articles(fname)
 
 
 # command-line interface
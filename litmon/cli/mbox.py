@@ -3,14 +3,14 @@
 from __future__ import annotations
 
 import re
-from typing import Any
-
-from ezazure import Azure
-from nptyping import NDArray
-from numpy import unique
+from typing import TYPE_CHECKING, Any
 
 from litmon.utils import cli
 
+# heavy dependencies are imported when first used, for fast startup
+if TYPE_CHECKING:
+    from nptyping import NDArray
+
 
 class PubMedIDExtractor:
     """Extract PubMed IDs from mbox email dumps
@@ -35,6 +35,8 @@ class PubMedIDExtractor:
     ):
 
         # load mboxes
+        from ezazure import Azure
+        from numpy import unique
         mbox = []
         for fname in mbox_fname:
             Azure().download(fname)
@@ -0,0 +1,100 @@
+"""Report data drift and score-distribution shifts"""
+
+from __future__ import annotations
+
+from litmon.utils import cli, drange
+
+
+class DriftReporter:
+    """Check recorded monthly statistics, and report drift
+
+    Statistics are recorded while databases are built (stage :code:`ingest`,
+    see :class:`~litmon.cli.dbase.DBaseBuilder`) and while articles are scored
+    (stage :code:`score`, see :class:`~litmon.cli.eval.ModelUser`), with
+    :code:`monitor_fname`. This checks each month against the months before
+    it (see :class:`litmon.monitor.DriftMonitor`), without reading any
+    database.
+
+    Parameters
+    ----------
+    date_range: str, optional, default=None
+        months to check. Format: YYYY/mm-YYYY/mm. If None, check every
+        recorded month.
+    monitor_fname: str, optional, default='data/monitor.json'
+        time-series file of monthly statistics
+    report_fname: str, optional, default='data/monitor-report.csv'
+        output file, with every check of every month. If None, the report
+        isn't written.
+    stages: list[str], optional, default=['ingest', 'score']
+        stages whose statistics are checked
+    verbose: bool, optional, default=True
+        print alerts to console
+    **kwargs: Any
+        thresholds, passed to :class:`litmon.monitor.DriftMonitor` on
+        :code:`__init__()`
+
+    Attributes
+    ----------
+    alerts: DataFrame
+        checks that failed
+    report: DataFrame
+        every check of every month
+    """
+    def __init__(
+        self,
+        /,
+        date_range: str = None,
+        *,
+        monitor_fname: str = 'data/monitor.json',
+        report_fname: str = 'data/monitor-report.csv',
+        stages: list[str] = ['ingest', 'score'],
+        verbose: bool = True,
+        **kwargs,
+    ):
+        from pandas import DataFrame, concat
+
+        from litmon.monitor import DriftMonitor
+        monitor = DriftMonitor(monitor_fname, **kwargs)
+
+        # check each month
+        months = (
+            [f'{year:4d}-{month:02d}' for year, month in drange(date_range)]
+            if date_range is not None
+            else sorted(monitor.series)
+        )
+        self.report: DataFrame = concat(
+            [
+                monitor.check(month, stage)
+                for month in months
+                for stage in stages
+            ] or [DataFrame([], columns=DriftMonitor.columns)],
+            ignore_index=True,
+        )
+        self.alerts: DataFrame = self.report[self.report['alert'].astype(bool)]
+
+        # write report
+        if report_fname is not None:
+            self.report.to_csv(report_fname, index=False)
+
+        # print alerts
+        if verbose:
+            for _, alert in self.alerts.iterrows():
+                print(
+                    f'{alert["month"]} {alert["stage"]:>6s}: '
+                    f'{alert["check"]} = {alert["value"]:.4g} '
+                    f'(baseline {alert["baseline"]:.4g})'
+                )
+            print(
+                f'{self.alerts.shape[0]} alerts in '
+                f'{self.report["month"].nunique()} months'
+            )
+
+
+# command-line interface
+if __name__ == '__main__':
+    config = cli(
+        cls='litmon.cli.monitor.DriftReporter',
+        description='Report data drift and score-distribution shifts',
+        default=['eval_dates', 'monitor'],
+    )
+    DriftReporter(**config)
@@ -0,0 +1,101 @@
+"""Promote or roll back registered models"""
+
+from __future__ import annotations
+
+from argparse import ArgumentParser
+
+
+class ModelPromoter:
+    """Promote a registered model version, or roll back a promotion
+
+    See :class:`litmon.registry.ModelRegistry`.
+
+    Parameters
+    ----------
+    ref: str, optional, default=None
+        version to promote (e.g. a digest, or :code:`v3`). If None, nothing is
+        promoted.
+    alias: str, optional, default='production'
+        alias to promote the version to, or to roll back
+    registry: str, optional, default='data/registry'
+        root of the model registry
+    rollback: bool, optional, default=False
+        point :code:`alias` back at the version it was promoted from (instead
+        of promoting :code:`ref`)
+    verbose: bool, optional, default=True
+        print every version, marking the ones that aliases point at
+
+    Attributes
+    ----------
+    digest: str
+        digest of the version :code:`alias` points at
+    """
+    def __init__(
+        self,
+        ref: str = None,
+        /,
+        *,
+        alias: str = 'production',
+        registry: str = 'data/registry',
+        rollback: bool = False,
+        verbose: bool = True,
+    ):
+        from litmon.registry import ModelRegistry
+        registry = ModelRegistry(registry)
+
+        # promote, or roll back
+        if rollback:
+            self.digest = registry.rollback(alias=alias)
+        elif ref is not None:
+            self.digest = registry.promote(ref, alias=alias)
+        else:
+            self.digest = registry.aliases.get(alias)
+
+        # print versions
+        if verbose:
+            aliases = registry.aliases
+            for version in registry.versions:
+                names = [
+                    name
+                    for name, digest in aliases.items()
+                    if digest == version['digest']
+                ]
+                metadata = version['metadata']
+                print(
+                    f'v{version["number"]:<3d} '
+                    f'{version["digest"]} '
+                    f'{version["created"]} '
+                    f'{metadata.get("date_range") or "":>15s} '
+                    f'{", ".join(names)}'
+                )
+
+
+# command-line interface
+if __name__ == '__main__':
+    parser = ArgumentParser(
+        description='Promote or roll back registered models',
+    )
+    parser.add_argument(
+        'ref',
+        nargs='?',
+        help='version to promote (digest, or vN). Omit to list versions.',
+    )
+    parser.add_argument(
+        '-a',
+        '--alias',
+        default='production',
+        help='alias to promote to, or to roll back',
+    )
+    parser.add_argument(
+        '-r',
+        '--registry',
+        default='data/registry',
+        help='root of the model registry',
+    )
+    parser.add_argument(
+        '--rollback',
+        action='store_true',
+        help='point alias back at the version it was promoted from',
+    )
+    args = vars(parser.parse_args())
+    ModelPromoter(args.pop('ref'), **args)
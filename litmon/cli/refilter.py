@@ -0,0 +1,132 @@
+"""Re-filter stored databases with an edited query"""
+
+from __future__ import annotations
+
+from os import path
+from typing import TYPE_CHECKING
+
+from litmon.utils import atomic, cli, drange, read_articles
+
+# heavy dependencies are imported when first used, for fast startup
+if TYPE_CHECKING:
+    from pandas import DataFrame
+
+
+class DBaseFilter:
+    """Re-filter stored monthly databases with an edited query, locally
+
+    Editing :code:`query` would otherwise mean re-running
+    :class:`~litmon.cli.dbase.DBaseBuilder` over every month. Instead, build
+    each month once with a broad (superset) query, and then evaluate the
+    edited query over the stored articles with
+    :class:`~litmon.prefilter.QueryFilter`, writing the matching articles to
+    a new database file. Nothing is downloaded from PubMed.
+
+    The edited query must be narrower than the query the source databases
+    were built with: articles that the source query didn't return can't be
+    recovered locally.
+
+    Parameters
+    ----------
+    query: str
+        PubMed boolean query to evaluate
+    date_range: str
+        months to filter. Format: YYYY/mm-YYYY/mm
+    dbase_dir: str, optional, default='data'
+        directory of database files.
+        :code:`dbase_fname=f'{dbase_dir}/{year}-{month:02d}{dbase_suffix}.csv'`
+    dbase_suffix: str, optional, default='-filtered'
+        suffix of each output database file. See :code:`dbase_dir`
+    keep: bool, optional, default=False
+        keep each month's filtered database in memory, in :code:`dbases`
+    source_suffix: str, optional, default='-superset'
+        suffix of each source database file. See :code:`dbase_dir`
+    unindexed: str, optional, default='match'
+        how to evaluate search tags whose data isn't stored (see
+        :class:`~litmon.prefilter.QueryFilter`)
+    verbose: bool, optional, default=True
+        write running status to console
+
+    Attributes
+    ----------
+    counts: dict[str, tuple[int, int]]
+        number of source articles, and of matching articles, for each month
+        (keyed by YYYY-mm)
+    dbases: dict[tuple[int, int], DataFrame]
+        filtered database for each month, keyed by :code:`(year, month)`. This
+        is only filled if :code:`keep==True`.
+    """
+    def __init__(
+        self,
+        /,
+        query: str,
+        date_range: str,
+        *,
+        dbase_dir: str = 'data',
+        dbase_suffix: str = '-filtered',
+        keep: bool = False,
+        source_suffix: str = '-superset',
+        unindexed: str = 'match',
+        verbose: bool = True,
+    ):
+
+        # import heavy dependencies
+        from ezazure import Azure
+
+        from litmon.prefilter import QueryFilter
+
+        # check parameters
+        if source_suffix == dbase_suffix:
+            raise ValueError('dbase_suffix must differ from source_suffix')
+
+        # parse query once, failing before any files are read
+        parsed = QueryFilter.parse(query)
+
+        # filter each month
+        self.counts: dict[str, tuple[int, int]] = {}
+        self.dbases: dict[tuple[int, int], DataFrame] = {}
+        for year, month in drange(date_range):
+
+            # load source database, skipping months that haven't been built
+            month_key = f'{year:4d}-{month:02d}'
+            source_fname = f'{dbase_dir}/{month_key}{source_suffix}.csv'
+            try:
+                Azure().download(source_fname)
+            except (FileNotFoundError, KeyError):
+                pass
+            if not path.isfile(source_fname):
+                if verbose:
+                    print(f'{month_key}: Skipped (no {source_fname})')
+                continue
+            articles = read_articles(source_fname, index_col=0)
+
+            # evaluate query, write matching articles
+            num_source = articles.shape[0]
+            articles = QueryFilter(articles, unindexed=unindexed) \
+                .filter(parsed)
+            dbase_fname = f'{dbase_dir}/{month_key}{dbase_suffix}.csv'
+            with atomic(dbase_fname) as tmp_fname:
+                articles.to_csv(tmp_fname)
+            if keep:
+                self.dbases[(year, month)] = articles
+
+            # record counts
+            self.counts[month_key] = (num_source, int(articles.shape[0]))
+
+            # write running status
+            if verbose:
+                print(
+                    f'{month_key}: '
+                    f'{self.counts[month_key][1]:4d} '
+                    f'/ {self.counts[month_key][0]:4d} Articles Matched'
+                )
+
+
+# command-line interface
+if __name__ == '__main__':
+    config = cli(
+        cls='litmon.cli.refilter.DBaseFilter',
+        description='Re-filter stored databases with an edited query',
+        default=['query', 'eval_dates', 'refilter'],
+    )
+    DBaseFilter(**config)
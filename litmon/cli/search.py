@@ -0,0 +1,149 @@
+"""Search monthly databases by keyword"""
+
+from __future__ import annotations
+
+from argparse import ArgumentParser
+from typing import TYPE_CHECKING
+
+# heavy dependencies are imported when first used, for fast startup
+if TYPE_CHECKING:
+    from pandas import DataFrame
+
+
+class ArticleSearcher:
+    """Search monthly databases by keyword, through a full-text index
+
+    Matching articles are ranked with BM25 (see
+    :meth:`litmon.search.ArticleIndex.search`), and their PubMed IDs, scores,
+    and links are printed.
+
+    Parameters
+    ----------
+    terms: str
+        keywords to search for. Every keyword must match (a trailing :code:`*`
+        matches any word starting with the keyword), and double-quoted
+        keywords are matched as phrases.
+    date_range: str, optional, default=None
+        only return articles published in these months. Format:
+        YYYY/mm-YYYY/mm
+    dbase_dir: str, optional, default='data'
+        directory of database files to index (see :code:`update_range`)
+    dbase_suffix: str, optional, default='-eval'
+        suffix of database files to index (see :code:`update_range`)
+    index_fname: str, optional, default='data/search.db'
+        full-text search index
+    limit: int, optional, default=20
+        maximum number of articles returned. If 0, return all matches.
+    syntax: bool, optional, default=False
+        pass :code:`terms` to SQLite as an FTS5 query (with :code:`AND`,
+        :code:`OR`, :code:`NOT`, and column filters like
+        :code:`title: aging`)
+    update_range: str, optional, default=None
+        before searching, index database files of these months that changed
+        since they were last indexed. Format: YYYY/mm-YYYY/mm
+    verbose: bool, optional, default=True
+        print results to console
+
+    Attributes
+    ----------
+    results: DataFrame
+        matching articles, best match first
+    updated: list[str]
+        months that were (re-)indexed, as YYYY-mm
+    """
+    def __init__(
+        self,
+        terms: str,
+        /,
+        *,
+        date_range: str = None,
+        dbase_dir: str = 'data',
+        dbase_suffix: str = '-eval',
+        index_fname: str = 'data/search.db',
+        limit: int = 20,
+        syntax: bool = False,
+        update_range: str = None,
+        verbose: bool = True,
+    ):
+        from litmon.search import ArticleIndex
+        with ArticleIndex(index_fname) as index:
+
+            # index changed databases
+            self.updated = (
+                index.update(
+                    update_range,
+                    dbase_dir=dbase_dir,
+                    dbase_suffix=dbase_suffix,
+                )
+                if update_range is not None
+                else []
+            )
+
+            # search
+            self.results: DataFrame = index.search(
+                terms,
+                date_range=date_range,
+                limit=limit,
+                syntax=syntax,
+            )
+
+        # print results
+        if verbose:
+            if self.updated:
+                print(f'Indexed {len(self.updated)} months')
+            for _, article in self.results.iterrows():
+                print(
+                    f'{article["pubmed_id"]:>8s} '
+                    f'{article["publication_date"]:%Y-%m-%d} '
+                    f'{article["score"]:6.2f} '
+                    f'{article["link"]} '
+                    f'{str(article["title"])[0:60]}'
+                )
+
+
+# command-line interface
+if __name__ == '__main__':
+    parser = ArgumentParser(
+        description='Search monthly databases by keyword',
+    )
+    parser.add_argument('terms', help='keywords to search for')
+    parser.add_argument(
+        '-d',
+        '--date-range',
+        help='only return articles published in these months',
+    )
+    parser.add_argument(
+        '-n',
+        '--limit',
+        type=int,
+        default=20,
+        help='maximum number of articles returned (0 for all)',
+    )
+    parser.add_argument(
+        '-i',
+        '--index-fname',
+        default='data/search.db',
+        help='full-text search index',
+    )
+    parser.add_argument(
+        '-u',
+        '--update-range',
+        help='first, index changed databases of these months',
+    )
+    parser.add_argument(
+        '--dbase-dir',
+        default='data',
+        help='directory of database files to index',
+    )
+    parser.add_argument(
+        '--dbase-suffix',
+        default='-eval',
+        help='suffix of database files to index',
+    )
+    parser.add_argument(
+        '--syntax',
+        action='store_true',
+        help='pass terms to SQLite as an FTS5 query',
+    )
+    args = vars(parser.parse_args())
+    ArticleSearcher(args.pop('terms'), **args)
@@ -0,0 +1,273 @@
+"""Build database of articles, with a queue of tasks shared by workers"""
+
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from inspect import signature
+import json
+from os import path
+from time import sleep, time
+from typing import Any, Union
+
+from litmon.cli.dbase import DBaseBuilder
+from litmon.cli.worker import ShardWorker
+from litmon.query import PubMedQuerier
+from litmon.utils import atomic, cli, drange
+from litmon.utils.dates import split_range, windows
+
+
+class ShardCoordinator(DBaseBuilder):
+    """Build database of articles for each month, with a queue of workers
+
+    This builds the same databases as :class:`~litmon.cli.dbase.DBaseBuilder`,
+    but the queries are run by any number of
+    :class:`~litmon.cli.worker.ShardWorker` processes:
+
+    #. The date range is split into tasks (each day, each month, or
+       :code:`tasks` shards of consecutive months, balanced by the article
+       count of each month recorded in :code:`monitor_fname`), which are added
+       to a :class:`~litmon.tasks.TaskQueue`.
+    #. :code:`workers` local worker processes are started. (More workers can be
+       started separately, e.g. :code:`python litmon/cli/worker.py`, with the
+       same configuration.) Each worker claims tasks, and writes a partition
+       file for each day.
+    #. Once every task is completed, the partition manifests of all tasks are
+       merged into :code:`{dbase_dir}/partitions{dbase_suffix}.json`.
+    #. The database of each month is assembled from its partitions, by
+       :class:`~litmon.cli.dbase.DBaseBuilder` (which removes duplicates,
+       balances, and writes each month, and records it in the manifest).
+
+    Like :code:`resume` in :class:`~litmon.cli.dbase.DBaseBuilder`, months
+    that are already completed (in the manifest, with the same query) are
+    skipped, and so are tasks that are already completed (in the queue). To
+    rebuild from scratch, delete the queue and the manifest.
+
+    Parameters
+    ----------
+    query: str
+        standard pubmed query for pulling these types of articles
+    date_range: str
+        months to query. Format: YYYY/mm-YYYY/mm
+    dbase_dir: str, optional, default='data'
+        directory to output database files to
+    dbase_suffix: str, optional, default=''
+        suffix appended to each output file
+    lease: float, optional, default=600
+        seconds a claimed task is leased to its worker
+    max_attempts: int, optional, default=3
+        number of times a task is claimed, before it's marked failed
+    monitor_fname: str, optional, default=None
+        time-series file of monthly statistics (see
+        :class:`~litmon.cli.dbase.DBaseBuilder`). Its article counts are also
+        used to balance shards.
+    poll: float, optional, default=5
+        seconds between checks of the queue, while waiting for workers
+    queue_fname: str, optional, default=None
+        task queue. If None, use :code:`{dbase_dir}/queue{dbase_suffix}.db`.
+    rate: float, optional, default=3
+        maximum number of requests per second, across all local workers
+    tasks: Union[str, int], optional, default='day'
+        size of each task: :code:`day`, :code:`month`, or a number of shards
+        (see :meth:`litmon.utils.dates.split_range`)
+    timeout: float, optional, default=None
+        seconds to wait for workers, before raising a :code:`TimeoutError`. If
+        None, wait indefinitely.
+    verbose: bool, optional, default=True
+        write running status to console
+    workers: int, optional, default=0
+        number of local worker processes. If 0, wait for workers started
+        separately.
+    **kwargs: Any
+        Passed to base class :class:`~litmon.cli.dbase.DBaseBuilder` (and to
+        each local :class:`~litmon.cli.worker.ShardWorker`, if it takes them).
+
+    Attributes
+    ----------
+    partitions: dict[str, dict[str, Any]]
+        manifest of each day's partition (its :code:`fname`, which is deleted
+        once its month is assembled, the number of
+        :code:`articles` and :code:`positive` articles, the :code:`task` that
+        wrote it, and the :code:`worker` that ran the task), keyed by date
+        (YYYY-mm-dd)
+    """
+    def __init__(
+        self,
+        /,
+        query: str,
+        date_range: str,
+        *,
+        dbase_dir: str = 'data',
+        dbase_suffix: str = '',
+        lease: float = 600,
+        max_attempts: int = 3,
+        monitor_fname: str = None,
+        poll: float = 5,
+        queue_fname: str = None,
+        rate: float = 3,
+        tasks: Union[str, int] = 'day',
+        timeout: float = None,
+        verbose: bool = True,
+        workers: int = 0,
+        **kwargs
+    ):
+        from litmon.monitor import DriftMonitor
+        from litmon.tasks import TaskQueue
+
+        # load manifest of completed months
+        manifest_fname = f'{dbase_dir}/manifest{dbase_suffix}.json'
+        manifest = (
+            json.load(open(manifest_fname, 'r'))
+            if path.isfile(manifest_fname)
+            else {}
+        )
+        query_hash = self.__class__.query_hash(query)
+        months = {
+            f'{year:4d}-{month:02d}'
+            for year, month in drange(date_range)
+            if manifest.get(f'{year:4d}-{month:02d}', {}).get('query_hash')
+            != query_hash
+        }
+
+        # split remaining days into tasks
+        days = [
+            str(day)
+            for day in windows(date_range, freq='day')[:, 0]
+            if str(day)[0:7] in months
+        ]
+        if isinstance(tasks, int):
+            volumes = (
+                DriftMonitor(monitor_fname).history('ingest')['count']
+                if monitor_fname is not None and path.isfile(monitor_fname)
+                else {}
+            )
+            shards = {
+                f'{year:4d}-{month:02d}': shard
+                for shard in split_range(
+                    date_range,
+                    tasks,
+                    volumes=dict(volumes),
+                )
+                for year, month in drange(shard)
+            }
+            keys = [shards[day[0:7]] for day in days]
+        elif tasks in ('day', 'month'):
+            keys = [day if tasks == 'day' else day[0:7] for day in days]
+        else:
+            raise ValueError(f'Unknown task size: {tasks!r}')
+        payloads = {}
+        for key, day in zip(keys, days):
+            payloads.setdefault(key, {'dates': []})['dates'].append(day)
+
+        # add tasks to queue
+        if queue_fname is None:
+            queue_fname = f'{dbase_dir}/queue{dbase_suffix}.db'
+        with TaskQueue(
+            queue_fname,
+            lease=lease,
+            max_attempts=max_attempts,
+        ) as queue:
+            if queue.get('query_hash', query_hash) != query_hash:
+                raise ValueError(f'{queue_fname} holds tasks of another query')
+            queue.set('query_hash', query_hash)
+            num_added = queue.add(payloads)
+        if verbose:
+            print(f'{num_added} tasks added to {queue_fname}')
+
+        # run local workers
+        if workers > 0:
+            worker_kwargs = {
+                key: value
+                for key, value in kwargs.items()
+                if key in signature(ShardWorker).parameters
+                or key in signature(PubMedQuerier).parameters
+            } | {
+                'query': query,
+                'dbase_dir': dbase_dir,
+                'dbase_suffix': dbase_suffix,
+                'lease': lease,
+                'max_attempts': max_attempts,
+                'queue_fname': queue_fname,
+                'rate': rate,
+                'verbose': verbose,
+            }
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for future in [
+                    pool.submit(self.__class__._run_worker, worker_kwargs)
+                    for _ in range(workers)
+                ]:
+                    future.result()
+
+        # wait for every task to finish
+        start = time()
+        with TaskQueue(
+            queue_fname,
+            lease=lease,
+            max_attempts=max_attempts,
+        ) as queue:
+            while (counts := queue.counts())['pending'] + counts['leased']:
+                if timeout is not None and time() - start > timeout:
+                    raise TimeoutError(
+                        f'{counts["pending"]} pending and {counts["leased"]} '
+                        f'leased tasks in {queue_fname}'
+                    )
+                if verbose:
+                    print(
+                        f'{counts["done"]} / {sum(counts.values())} '
+                        f'tasks done'
+                    )
+                sleep(poll)
+
+            # check for failed tasks
+            failed = queue.tasks('failed')
+            if failed:
+                raise RuntimeError(
+                    f'{len(failed)} tasks failed: '
+                    + ', '.join(
+                        f'{key} ({task["error"]})'
+                        for key, task in failed.items()
+                    )
+                )
+
+            # merge partition manifests
+            self.partitions: dict[str, dict[str, Any]] = {
+                day: partition | {'task': key, 'worker': task['worker']}
+                for key, task in queue.tasks('done').items()
+                for day, partition in task['result']['partitions'].items()
+            }
+        partitions_fname = f'{dbase_dir}/partitions{dbase_suffix}.json'
+        with atomic(partitions_fname) as tmp_fname, \
+                open(tmp_fname, 'w') as file:
+            json.dump(
+                dict(sorted(self.partitions.items())),
+                file,
+                indent=4,
+            )
+
+        # assemble each month's database from its partitions
+        kwargs.pop('resume', None)
+        DBaseBuilder.__init__(
+            self,
+            query,
+            date_range,
+            dbase_dir=dbase_dir,
+            dbase_suffix=dbase_suffix,
+            monitor_fname=monitor_fname,
+            resume=True,
+            verbose=verbose,
+            **kwargs,
+        )
+
+    @classmethod
+    def _run_worker(cls, kwargs: dict[str, Any], /) -> list[str]:
+        """Run a :class:`~litmon.cli.worker.ShardWorker` (for process pools)"""
+        return ShardWorker(**kwargs).completed
+
+
+# command-line interface
+if __name__ == '__main__':
+    config = cli(
+        cls='litmon.cli.shard.ShardCoordinator',
+        description='Build database of articles, with a queue of workers',
+        default=['query', 'user', 'fit_dates', 'dbase_fit', 'shard'],
+    )
+    ShardCoordinator(**config)
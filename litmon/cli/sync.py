@@ -0,0 +1,380 @@
+"""Refresh databases with revised PubMed records"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from hashlib import sha256
+import json
+from os import path
+from typing import TYPE_CHECKING
+
+from litmon.cli.dbase import DBaseBuilder
+from litmon.query import PubMedQuerier
+from litmon.utils import atomic, cli, drange, read_articles
+
+# heavy dependencies are imported when first used, for fast startup
+if TYPE_CHECKING:
+    from pandas import DataFrame, Series
+
+
+class DBaseSyncer(DBaseBuilder):
+    """Incrementally refresh monthly databases from revised PubMed records
+
+    PubMed records get revised after they are entered (e.g. abstracts are
+    added, and MeSH keywords are filled in), but
+    :class:`~litmon.cli.dbase.DBaseBuilder` only snapshots each month once.
+    Instead of re-querying whole months, this only pulls the records of each
+    month (by :code:`[edat]`) that were modified (:code:`datetype=mdat`) since
+    the month was last synced, and upserts them into the month's database:
+
+    #. Records already in the database are updated in place, if their
+       content changed.
+    #. Records with a PubMed ID above the month's PMID watermark (the highest
+       PubMed ID in the database) are new, and are appended (if
+       :code:`insert`, and their publication date is in the month).
+    #. Other records are skipped: they were dropped when the database was
+       built (e.g. by balancing or duplicate removal).
+
+    Each month's sync state is kept in
+    :code:`{dbase_dir}/{year}-{month:02d}{dbase_suffix}-sync.json`, with the
+    modification-date watermark (the :code:`maxdate` of the last sync), the
+    PMID watermark, and a content hash of each record. The first sync of a
+    month starts from the date the month was completed in the
+    :class:`~litmon.cli.dbase.DBaseBuilder` manifest (or the start of the
+    month), and hashes the database's current contents.
+
+    If a query returns :code:`max_results` records, there may be more, so its
+    modification-date window is split in two, and each half is queried
+    separately, down to single days. If a single day still has too many
+    records, the modification-date watermark is only advanced to that day, so
+    the next sync pulls that day's records again (rather than skipping the
+    ones that were cut off).
+
+    Months without a database file are skipped: build them first, with
+    :class:`~litmon.cli.dbase.DBaseBuilder`.
+
+    Parameters
+    ----------
+    query: str
+        standard pubmed query for pulling these types of articles
+    date_range: str
+        months to sync. Format: YYYY/mm-YYYY/mm
+    dbase_dir: str, optional, default='data'
+        directory of database files.
+        :code:`dbase_fname=f'{dbase_dir}/{year}-{month:02d}{dbase_suffix}.csv'`
+    dbase_suffix: str, optional, default='-eval'
+        suffix of each database file. See :code:`dbase_dir`
+    insert: bool, optional, default=True
+        append new records. Turn this off for balanced databases, so that
+        only existing records are updated.
+    max_results: int, optional, default=10000
+        maximum number of modified records pulled by a single query. Windows
+        with more records are split (see above).
+    pmids_fname: str, optional, default='data/pmids.txt'
+        file containing positive (target) pmids. This is used for labeling
+        documents True/False.
+    search_fname: str, optional, default=None
+        full-text search index (see :class:`~litmon.search.ArticleIndex`).
+        If specified, then each month that changed is re-indexed.
+    until: str, optional, default=None
+        sync records modified up to this day. Format: YYYY/mm/dd. If None,
+        use today.
+    verbose: bool, optional, default=True
+        write running status to console
+    **kwargs: Any
+        Passed to base class :class:`~litmon.query.PubMedQuerier`.
+
+    Attributes
+    ----------
+    stats: dict[str, dict[str, int]]
+        number of :code:`modified` records pulled, and records
+        :code:`inserted`, :code:`updated`, and :code:`unchanged`, for each
+        month synced (keyed by YYYY-mm)
+    """
+    def __init__(
+        self,
+        /,
+        query: str,
+        date_range: str,
+        *,
+        dbase_dir: str = 'data',
+        dbase_suffix: str = '-eval',
+        insert: bool = True,
+        max_results: int = 10000,
+        pmids_fname: str = 'data/pmids.txt',
+        search_fname: str = None,
+        until: str = None,
+        verbose: bool = True,
+        **kwargs
+    ):
+
+        # import heavy dependencies
+        from ezazure import Azure
+        from pandas import concat, to_numeric
+
+        from litmon.search import ArticleIndex
+
+        # initialize base (skipping the monthly loop in DBaseBuilder)
+        PubMedQuerier.__init__(self, max_results=max_results, **kwargs)
+
+        # load positive pmids
+        Azure().download(pmids_fname)
+        pmids = open(pmids_fname).read().splitlines()
+
+        # get end of modification-date window
+        maxdate = (
+            until
+            if until is not None
+            else datetime.now().strftime('%Y/%m/%d')
+        )
+
+        # load manifest of completed months
+        manifest_fname = f'{dbase_dir}/manifest{dbase_suffix}.json'
+        manifest = (
+            json.load(open(manifest_fname, 'r'))
+            if path.isfile(manifest_fname)
+            else {}
+        )
+
+        # sync each month
+        self.stats = {}
+        for year, month in drange(date_range):
+
+            # get month's files, skipping months that haven't been built
+            month_key = f'{year:4d}-{month:02d}'
+            dbase_fname = f'{dbase_dir}/{month_key}{dbase_suffix}.csv'
+            sync_fname = f'{dbase_dir}/{month_key}{dbase_suffix}-sync.json'
+            for fname in [dbase_fname, sync_fname]:
+                try:
+                    Azure().download(fname)
+                except (FileNotFoundError, KeyError):
+                    pass
+            if not path.isfile(dbase_fname):
+                continue
+            articles = read_articles(
+                dbase_fname,
+                index_col=0,
+                dtype={'pubmed_id': str},
+            )
+            keys = self.__class__.pmid_keys(articles)
+
+            # load sync state, or initialize it from the database
+            if path.isfile(sync_fname):
+                state = json.load(open(sync_fname, 'r'))
+            else:
+                completed = manifest.get(month_key, {}).get('completed')
+                state = {
+                    'watermark': (
+                        completed[0:10].replace('-', '/')
+                        if completed
+                        else f'{year:4d}/{month:02d}/01'
+                    ),
+                    'max_pmid': int(
+                        to_numeric(keys, errors='coerce').fillna(0).max()
+                        if keys.size
+                        else 0
+                    ),
+                    'hashes': dict(zip(keys, self.content_hash(articles))),
+                }
+            hashes = state['hashes']
+
+            # query records modified since the watermark
+            qarticles, truncated = self._query_modified(
+                f'{query} AND ({year:4d}/{month:02d} [edat])',
+                state['watermark'],
+                maxdate,
+            )
+            if verbose and truncated is not None:
+                print(
+                    f'{month_key}: Warning: records modified on {truncated} '
+                    f'truncated at {max_results}. Syncing again from '
+                    f'{truncated}'
+                )
+            qkeys = self.__class__.pmid_keys(qarticles)
+            qarticles = qarticles[~qkeys.duplicated()].copy()
+            qkeys = qkeys[qarticles.index]
+            self.__class__.label(qarticles, pmids)
+            qhashes = self.content_hash(qarticles)
+
+            # classify records as new, changed, or unchanged
+            existing = qkeys.isin(hashes)
+            changed = existing & (qhashes != qkeys.map(hashes))
+            new = (
+                ~existing
+                & (to_numeric(qkeys, errors='coerce') > state['max_pmid'])
+                & (qarticles['publication_date'].dt.year == year)
+                & (qarticles['publication_date'].dt.month == month)
+                & insert
+            )
+
+            # update changed records in place
+            position = dict(zip(keys, articles.index))
+            columns = [col for col in articles.columns if col in qarticles]
+            if changed.any():
+                articles.loc[
+                    [position[key] for key in qkeys[changed]],
+                    columns,
+                ] = qarticles.loc[changed, columns].to_numpy()
+
+            # append new records
+            inserts = qarticles[new].reindex(columns=articles.columns)
+            start = articles.index.max() + 1 if articles.shape[0] else 0
+            inserts.index = range(start, start + inserts.shape[0])
+            articles = concat([articles, inserts])
+
+            # write database
+            if changed.any() or new.any():
+                with atomic(dbase_fname) as tmp_fname:
+                    articles.to_csv(tmp_fname)
+                if search_fname is not None:
+                    with ArticleIndex(search_fname) as index:
+                        index.add(articles, month_key, fname=dbase_fname)
+
+            # record sync state
+            upserted = changed | new
+            hashes.update(zip(qkeys[upserted], qhashes[upserted]))
+            if new.any():
+                state['max_pmid'] = max(
+                    state['max_pmid'],
+                    int(to_numeric(qkeys[new]).max()),
+                )
+            state['watermark'] = maxdate if truncated is None else truncated
+            state['synced'] = datetime.now().isoformat(timespec='seconds')
+            with atomic(sync_fname) as tmp_fname, \
+                    open(tmp_fname, 'w') as file:
+                json.dump(state, file)
+
+            # record stats
+            self.stats[month_key] = {
+                'modified': int(qarticles.shape[0]),
+                'inserted': int(new.sum()),
+                'updated': int(changed.sum()),
+                'unchanged': int((existing & ~changed).sum()),
+            }
+
+            # write running status
+            if verbose:
+                print(
+                    f'{month_key}: '
+                    f'{self.stats[month_key]["modified"]:4d} Modified '
+                    f'| {self.stats[month_key]["inserted"]:4d} Inserted '
+                    f'| {self.stats[month_key]["updated"]:4d} Updated'
+                )
+
+    def _query_modified(
+        self,
+        query: str,
+        mindate: str,
+        maxdate: str,
+        /,
+    ) -> tuple[DataFrame, str | None]:
+        """Query records modified in a window, splitting truncated windows
+
+        Parameters
+        ----------
+        query: str
+            query to send to PubMed servers
+        mindate: str
+            first modification date. Format: YYYY/mm/dd
+        maxdate: str
+            last modification date. Format: YYYY/mm/dd
+
+        Returns
+        -------
+        DataFrame
+            modified records
+        str | None
+            first day whose records were truncated at :code:`max_results`
+            (even when queried alone), or None if no records were truncated
+        """
+        from pandas import concat
+
+        # query window
+        articles = self.query(query, search_params={
+            'datetype': 'mdat',
+            'mindate': mindate,
+            'maxdate': maxdate,
+        })
+        if not articles.shape[0] >= self._max_results > 0:
+            return articles, None
+        if mindate >= maxdate:
+            return articles, mindate
+
+        # split truncated window in two
+        start = datetime.strptime(mindate, '%Y/%m/%d')
+        middle = start + (datetime.strptime(maxdate, '%Y/%m/%d') - start) / 2
+        first, first_truncated = self._query_modified(
+            query,
+            mindate,
+            middle.strftime('%Y/%m/%d'),
+        )
+        second, second_truncated = self._query_modified(
+            query,
+            (middle + timedelta(days=1)).strftime('%Y/%m/%d'),
+            maxdate,
+        )
+        return (
+            concat([first, second], ignore_index=True),
+            first_truncated or second_truncated,
+        )
+
+    def content_hash(self, articles: DataFrame, /) -> Series:
+        """Hash the contents of each article
+
+        Every field in :attr:`header` is hashed, except :code:`xml`. Fields
+        are normalized the same way whether they were just queried or read
+        back from a database file, so unchanged records hash the same.
+
+        Parameters
+        ----------
+        articles: DataFrame
+            articles to hash
+
+        Returns
+        -------
+        Series
+            16-character hex digest of each article
+        """
+        from pandas import Series
+        fields = [field for field in self.header if field != 'xml']
+        canon = articles.reindex(columns=fields)
+        canon['publication_date'] = canon['publication_date'] \
+            .dt.strftime('%Y-%m-%d')
+        canon = canon.fillna('').astype(str)
+        return Series(
+            [
+                sha256('\x1f'.join(row).encode()).hexdigest()[0:16]
+                for row in canon.itertuples(index=False)
+            ],
+            index=articles.index,
+            dtype=str,
+        )
+
+    @classmethod
+    def pmid_keys(cls, articles: DataFrame, /) -> Series:
+        """Get the key of each article's PubMed ID
+
+        Keys are the first 8 characters of the PubMed ID, matching
+        :meth:`~litmon.cli.dbase.DBaseBuilder.label`.
+
+        Parameters
+        ----------
+        articles: DataFrame
+            articles
+
+        Returns
+        -------
+        Series
+            key of each article
+        """
+        return articles['pubmed_id'].astype(str).str[0:8]
+
+
+# command-line interface
+if __name__ == '__main__':
+    config = cli(
+        cls='litmon.cli.sync.DBaseSyncer',
+        description='Refresh databases with revised PubMed records',
+        default=['query', 'user', 'eval_dates', 'sync'],
+    )
+    DBaseSyncer(**config)
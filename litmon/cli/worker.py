@@ -0,0 +1,241 @@
+"""Ingest shards of a database, as a worker of a shared task queue"""
+
+from __future__ import annotations
+
+from datetime import date
+from functools import partial
+from os import getpid, path
+from socket import gethostname
+from time import time
+from typing import Any
+
+from litmon.cli.dbase import DBaseBuilder
+from litmon.query import PubMedQuerier
+from litmon.utils import atomic, cli
+
+
+class ShardWorker(DBaseBuilder):
+    """Claim ingestion tasks from a shared queue, and write their partitions
+
+    Tasks are added to the queue by
+    :class:`~litmon.cli.shard.ShardCoordinator`. Each task is a set of days
+    (a day, a month, or a shard of months). For each day, the worker queries
+    PubMed, labels the articles, and writes them to the day's partition file
+    (the checkpoint file of :class:`~litmon.cli.dbase.DBaseBuilder`, see
+    :meth:`~litmon.cli.dbase.DBaseBuilder.checkpoint_fname`). Then, it
+    completes the task with a partition manifest: the file, and the number of
+    articles and positive articles, of each day. Days whose partition file
+    already exists aren't queried again, so a task that's retried (e.g. after
+    its worker died) only queries its remaining days.
+
+    Any number of workers can share a queue, each in its own process, as long
+    as they share :code:`queue_fname` and :code:`dbase_dir`. Requests from
+    every worker are throttled together (see
+    :meth:`litmon.tasks.TaskQueue.throttle`), so throughput scales with the
+    number of workers, up to :code:`rate`.
+
+    Parameters
+    ----------
+    query: str
+        standard pubmed query. This must be the coordinator's query.
+    dbase_dir: str, optional, default='data'
+        database directory, holding the partition files
+    dbase_suffix: str, optional, default=''
+        suffix of each month's database file
+    lease: float, optional, default=600
+        seconds a claimed task is leased to this worker. The lease is renewed
+        after each day.
+    max_attempts: int, optional, default=3
+        number of times a task is claimed, before it's marked failed
+    max_tasks: int, optional, default=None
+        stop after completing this many tasks. If None, stop when no task can
+        be claimed.
+    pmids_fname: str, optional, default='data/pmids.txt'
+        file containing positive (target) pmids
+    queue_fname: str, optional, default=None
+        task queue (see :class:`~litmon.tasks.TaskQueue`). If None, use
+        :code:`{dbase_dir}/queue{dbase_suffix}.db`.
+    rate: float, optional, default=3
+        maximum number of requests per second, across all workers (NCBI
+        allows 3 without an API key, and 10 with one). Set to 0 to turn off.
+    topics: dict[str, str], optional, default=None
+        file containing positive (target) pmids of each topic, keyed by topic
+        name (see :class:`~litmon.cli.dbase.DBaseBuilder`)
+    verbose: bool, optional, default=True
+        write running status to console
+    worker_id: str, optional, default=None
+        unique name of this worker. If None, use :code:`{hostname}-{pid}`.
+    **kwargs: Any
+        Passed to base class :class:`~litmon.query.PubMedQuerier`.
+
+    Attributes
+    ----------
+    completed: list[str]
+        keys of the tasks completed by this worker
+    """
+    def __init__(
+        self,
+        /,
+        query: str,
+        *,
+        dbase_dir: str = 'data',
+        dbase_suffix: str = '',
+        lease: float = 600,
+        max_attempts: int = 3,
+        max_tasks: int = None,
+        pmids_fname: str = 'data/pmids.txt',
+        queue_fname: str = None,
+        rate: float = 3,
+        topics: dict[str, str] = None,
+        verbose: bool = True,
+        worker_id: str = None,
+        **kwargs
+    ):
+
+        # import heavy dependencies
+        from ezazure import Azure
+
+        from litmon.tasks import TaskQueue
+
+        # initialize base (skipping the monthly loop in DBaseBuilder)
+        PubMedQuerier.__init__(self, **kwargs)
+        self.completed: list[str] = []
+        if worker_id is None:
+            worker_id = f'{gethostname()}-{getpid()}'
+
+        # open queue, and check it holds tasks for this query
+        if queue_fname is None:
+            queue_fname = f'{dbase_dir}/queue{dbase_suffix}.db'
+        queue = TaskQueue(queue_fname, lease=lease, max_attempts=max_attempts)
+        if queue.get('query_hash') != self.__class__.query_hash(query):
+            queue.close()
+            raise ValueError(f'{queue_fname} holds tasks of another query')
+
+        # throttle requests across workers
+        if rate > 0:
+            self._pubmed.throttle = partial(queue.throttle, rate)
+
+        # load positive pmids
+        Azure().download(pmids_fname)
+        pmids = open(pmids_fname).read().splitlines()
+        topic_pmids = {}
+        for topic, topic_fname in (topics or {}).items():
+            Azure().download(topic_fname)
+            topic_pmids[topic] = open(topic_fname).read().splitlines()
+
+        # claim tasks until none are left
+        with queue:
+            while max_tasks is None or len(self.completed) < max_tasks:
+                task = queue.claim(worker_id)
+                if task is None:
+                    break
+                key, payload = task
+                start = time()
+
+                # write each day's partition, renewing the lease after each
+                # day (and giving up on the task if the lease was lost)
+                try:
+                    partitions = {}
+                    for day in payload['dates']:
+                        qdate = date.fromisoformat(day)
+                        fname = self.__class__.checkpoint_fname(
+                            query,
+                            qdate,
+                            dbase_dir=dbase_dir,
+                            dbase_suffix=dbase_suffix,
+                        )
+                        partitions[day] = self._write_partition(
+                            query,
+                            qdate,
+                            fname,
+                            pmids,
+                            topic_pmids,
+                        )
+                        if not queue.renew(key, worker_id):
+                            break
+
+                # release task, to be retried by any worker
+                except Exception as error:
+                    queue.fail(key, worker_id, repr(error))
+                    if verbose:
+                        print(f'{key}: Failed ({error!r})')
+                    continue
+
+                # complete task, with its partition manifest
+                if (
+                    len(partitions) == len(payload['dates'])
+                    and queue.complete(key, worker_id, {
+                        'worker': worker_id,
+                        'seconds': round(time() - start, 3),
+                        'partitions': partitions,
+                    })
+                ):
+                    self.completed.append(key)
+
+                    # write running status
+                    if verbose:
+                        num_articles = sum(
+                            partition['articles']
+                            for partition in partitions.values()
+                        )
+                        print(
+                            f'{key}: {num_articles:4d} Articles '
+                            f'| {worker_id}'
+                        )
+
+    def _write_partition(
+        self,
+        query: str,
+        qdate: date,
+        fname: str,
+        pmids: list[str],
+        topic_pmids: dict[str, list[str]],
+        /,
+    ) -> dict[str, Any]:
+        """Query, label, and write a single day's partition
+
+        If the partition file already exists, it's read instead of queried.
+
+        Parameters
+        ----------
+        query: str
+            standard pubmed query
+        qdate: date
+            entry date (:code:`[edat]`) to query
+        fname: str
+            partition file
+        pmids: list[str]
+            positive (target) PubMed IDs
+        topic_pmids: dict[str, list[str]]
+            positive (target) PubMed IDs of each topic
+
+        Returns
+        -------
+        dict[str, Any]
+            partition manifest: :code:`fname`, and the number of
+            :code:`articles` and :code:`positive` articles
+        """
+        from pandas import read_pickle
+        if path.isfile(fname):
+            qarticles = read_pickle(fname)
+            self.__class__.label(qarticles, pmids, topics=topic_pmids)
+        else:
+            qarticles = self.query_day(query, qdate)
+            self.__class__.label(qarticles, pmids, topics=topic_pmids)
+            with atomic(fname) as tmp_fname:
+                qarticles.to_pickle(tmp_fname)
+        return {
+            'fname': fname,
+            'articles': int(qarticles.shape[0]),
+            'positive': int(qarticles['label'].sum()),
+        }
+
+
+# command-line interface
+if __name__ == '__main__':
+    config = cli(
+        cls='litmon.cli.worker.ShardWorker',
+        description='Ingest shards of a database, as a worker',
+        default=['query', 'user', 'shard'],
+    )
+    ShardWorker(**config)
@@ -0,0 +1,564 @@
+"""Detect duplicate and near-duplicate journal articles"""
+
+from __future__ import annotations
+
+from copy import copy
+from os import makedirs, path, replace
+import pickle
+import re
+from typing import Any
+from zlib import crc32
+
+from nptyping import NDArray
+from numpy import (
+    array,
+    full,
+    iinfo,
+    ones,
+    random,
+    uint32,
+    uint64,
+    vstack,
+    zeros,
+)
+from pandas import DataFrame, isna
+
+
+class ArticleDeduplicator:
+    """Detect duplicate and near-duplicate journal articles
+
+    Errata, preprints, and re-indexed records can show up under several
+    different :code:`[edat]` days. This class removes them in three layers:
+
+    #. Exact matches on PubMed ID or DOI (a hash join against every key seen
+       so far)
+    #. Near-duplicates, found by computing a MinHash signature over each
+       article's :code:`title` and :code:`abstract`, and then looking up
+       candidates with banded locality-sensitive hashing (LSH). Candidates are
+       kept as duplicates only if their estimated Jaccard similarity is at
+       least :code:`threshold`.
+    #. A persisted signature store (:meth:`save` / :meth:`load`), so that each
+       new month is checked against all previous months in linear time,
+       instead of pairwise.
+
+    Each stored key and signature records the month it was registered under,
+    so a month can be rebuilt: its previous entries are removed (see
+    :meth:`remove`) before it's checked again, instead of every article
+    matching itself. Removing a month only touches that month's keys and LSH
+    buckets (its entries are marked as removed, and the store is only
+    compacted once most of its entries are removed), so rebuilding a month
+    takes time proportional to the month, not to the store.
+
+    Parameters
+    ----------
+    num_perm: int, optional, default=128
+        number of hash permutations in each MinHash signature
+    num_bands: int, optional, default=32
+        number of LSH bands. Must evenly divide :code:`num_perm`. More bands
+        finds more (lower-similarity) candidates.
+    shingle_size: int, optional, default=3
+        number of consecutive words in each shingle
+    threshold: float, optional, default=0.8
+        minimum estimated Jaccard similarity to call two articles
+        near-duplicates
+    text_cols: list[str], optional, default=None
+        columns used to compute signatures. If None, use :code:`title` and
+        :code:`abstract`.
+    random_seed: int, optional, default=271828
+        seed for generating the MinHash permutations. This must stay fixed for
+        the lifetime of a signature store.
+
+    Attributes
+    ----------
+    keys: dict[str, str]
+        month of every PubMed ID and DOI that has been registered
+    """
+
+    # mersenne prime used for universal hashing
+    _prime = (1 << 31) - 1
+
+    def __init__(
+        self,
+        /,
+        *,
+        num_perm: int = 128,
+        num_bands: int = 32,
+        shingle_size: int = 3,
+        threshold: float = 0.8,
+        text_cols: list[str] = None,
+        random_seed: int = 271828,
+    ):
+        # check parameters
+        if num_perm % num_bands:
+            raise ValueError('num_bands must evenly divide num_perm')
+
+        # get default parameters
+        if text_cols is None:
+            text_cols = ['title', 'abstract']
+
+        # save parameters
+        self._num_perm = num_perm
+        self._num_bands = num_bands
+        self._shingle_size = shingle_size
+        self._threshold = threshold
+        self._text_cols = text_cols
+
+        # create hash permutations
+        rng = random.default_rng(random_seed)
+        self._a = rng.integers(1, self._prime, num_perm, dtype=uint64)
+        self._b = rng.integers(0, self._prime, num_perm, dtype=uint64)
+
+        # initialize store
+        self._clear()
+
+    def __setstate__(self, state: dict[str, Any]):
+        """Load pickled state, filling in fields missing from older versions
+
+        Stores pickled before entries recorded their month register every
+        entry under no month (None), so rebuilding a month never removes them.
+
+        Parameters
+        ----------
+        state: dict[str, Any]
+            pickled state
+        """
+        state = dict(state)
+        num_entries = len(state['_signatures'])
+        for name in ['months', 'pmids']:
+            if name in state:
+                state[f'_{name}'] = state.pop(name)
+        if isinstance(state['keys'], set):
+            state['keys'] = dict.fromkeys(state['keys'])
+        self.__dict__.update({
+            '_entry_keys': [[] for _ in range(num_entries)],
+            '_months': [None] * num_entries,
+            '_num_removed': 0,
+            '_text_index': [True] * num_entries,
+            **state,
+        })
+        if '_month_entries' not in state:
+            self._month_entries = {}
+            for idx, month in enumerate(self._months):
+                self._month_entries.setdefault(month, []).append(idx)
+
+    def drop(
+        self,
+        articles: DataFrame,
+        /,
+        *,
+        month: str = None,
+        register: bool = True,
+    ) -> DataFrame:
+        """Remove duplicates, and register the remaining articles
+
+        Articles are checked both against the store and against each other,
+        so the first occurrence of an article within :code:`articles` is
+        kept.
+
+        Parameters
+        ----------
+        articles: DataFrame
+            articles to deduplicate
+        month: str, optional, default=None
+            month the articles belong to (e.g. :code:`YYYY-mm`). Entries
+            previously registered under this month are removed first, so
+            rebuilding a month gives the same result.
+        register: bool, optional, default=True
+            keep the remaining articles in the store. If False, the store is
+            unchanged (e.g. so that only the articles that are eventually
+            written are registered, with :meth:`add`): articles are checked
+            against a temporary index of :code:`articles`, and against the
+            store's entries from other months. This requires :code:`month`.
+
+        Returns
+        -------
+        DataFrame
+            articles that are not duplicates
+        """
+        if not register and month is None:
+            raise ValueError('register=False requires a month')
+
+        # register in store, or in a temporary index of this month
+        if register:
+            if month is not None:
+                self.remove(month)
+            index, skip_month = self, None
+        else:
+            index, skip_month = copy(self), month
+            index._clear()
+
+        # check each article
+        keep_me = ones(articles.shape[0], dtype=bool)
+        for row, (_, article) in enumerate(articles.iterrows()):
+            keys = self._keys(article)
+            text = self._text(article)
+            signature = self.signature(text)
+            if self._matches(keys, signature, text, skip_month=skip_month) \
+                    or index is not self \
+                    and index._matches(keys, signature, text):
+                keep_me[row] = False
+                continue
+            index._register(
+                keys,
+                signature,
+                month=month,
+                index=bool(text.strip()),
+            )
+
+        # return
+        return articles.iloc[keep_me, :]
+
+    def add(self, articles: DataFrame, /, *, month: str = None):
+        """Register articles, without checking them for duplicates
+
+        Parameters
+        ----------
+        articles: DataFrame
+            articles to register (e.g. those returned by :meth:`drop`)
+        month: str, optional, default=None
+            month the articles belong to. Entries previously registered under
+            this month are replaced.
+        """
+        if month is not None:
+            self.remove(month)
+        for _, article in articles.iterrows():
+            text = self._text(article)
+            self._register(
+                self._keys(article),
+                self.signature(text),
+                month=month,
+                index=bool(text.strip()),
+            )
+
+    def remove(self, month: str, /) -> int:
+        """Remove every entry registered under a month
+
+        Parameters
+        ----------
+        month: str
+            month to remove
+
+        Returns
+        -------
+        int
+            number of articles removed
+        """
+
+        # remove month's keys and buckets, marking its entries as removed
+        entries = self._month_entries.pop(month, [])
+        for idx in entries:
+            for key in self._entry_keys[idx]:
+                if key in self.keys and self.keys[key] == month:
+                    del self.keys[key]
+            if self._text_index[idx]:
+                bands = self._bands(self._signatures[idx])
+                for bucket, band in zip(self._buckets, bands):
+                    if idx in bucket.get(band, []):
+                        bucket[band].remove(idx)
+                        if not bucket[band]:
+                            del bucket[band]
+            self._entry_keys[idx] = None
+            self._signatures[idx] = None
+        self._num_removed += len(entries)
+
+        # compact store, once most of it is removed
+        if self._num_removed > len(self._months) // 2:
+            self._compact()
+        return len(entries)
+
+    def signature(self, text: str, /) -> NDArray[(Any,), uint32]:
+        """Compute MinHash signature of text
+
+        Parameters
+        ----------
+        text: str
+            text to compute signature of
+
+        Returns
+        -------
+        NDArray[(Any,), uint32]
+            MinHash signature, of length :code:`num_perm`
+        """
+
+        # handle empty text
+        words = re.findall(r'\w+', text.lower())
+        if not words:
+            return full(self._num_perm, iinfo(uint32).max, dtype=uint32)
+
+        # hash each shingle
+        num_shingles = max(len(words) - self._shingle_size + 1, 1)
+        shingles = array(
+            [
+                crc32(' '.join(
+                    words[start:start+self._shingle_size]
+                ).encode())
+                for start in range(num_shingles)
+            ],
+            dtype=uint64,
+        ) % self._prime
+
+        # compute minimum permuted hash
+        permuted = (
+            self._a[None, :] * shingles[:, None] + self._b[None, :]
+        ) % self._prime
+        return permuted.min(axis=0).astype(uint32)
+
+    @property
+    def months(self) -> list[str]:
+        """Month each registered article was registered under"""
+        return [self._months[idx] for idx in self._live()]
+
+    @property
+    def pmids(self) -> list[str]:
+        """PubMed ID of each registered article"""
+        return [self._pmids[idx] for idx in self._live()]
+
+    @property
+    def signatures(self) -> NDArray[(Any, Any), uint32]:
+        """MinHash signature of each registered article
+
+        :code:`signatures[x]` is for :code:`pmids[x]`.
+        """
+        live = self._live()
+        if not live:
+            return zeros((0, self._num_perm), dtype=uint32)
+        return vstack([self._signatures[idx] for idx in live])
+
+    def save(self, fname: str, /):
+        """Save signature store to file
+
+        The file is written atomically, so an interrupted save never corrupts
+        an existing store.
+
+        Parameters
+        ----------
+        fname: str
+            output file
+        """
+        if dirname := path.dirname(fname):
+            makedirs(dirname, exist_ok=True)
+        with open(f'{fname}.tmp', 'wb') as file:
+            pickle.dump(self, file)
+        replace(f'{fname}.tmp', fname)
+
+    @classmethod
+    def load(cls, fname: str, /) -> ArticleDeduplicator:
+        """Load signature store from file
+
+        Parameters
+        ----------
+        fname: str
+            input file
+
+        Returns
+        -------
+        ArticleDeduplicator
+            loaded instance
+        """
+        return pickle.load(open(fname, 'rb'))
+
+    def _bands(self, signature: NDArray[(Any,), uint32]) -> list[bytes]:
+        """Split signature into LSH band keys
+
+        Parameters
+        ----------
+        signature: NDArray[(Any,), uint32]
+            MinHash signature
+
+        Returns
+        -------
+        list[bytes]
+            key for each band
+        """
+        return [
+            band.tobytes()
+            for band in signature.reshape(self._num_bands, -1)
+        ]
+
+    def _clear(self):
+        """Empty the store"""
+        self.keys: dict[str, str] = {}
+        self._months: list[str] = []
+        self._pmids: list[str] = []
+        self._entry_keys: list[list[str]] = []
+        self._text_index: list[bool] = []
+        self._signatures: list[NDArray[(Any,), uint32]] = []
+        self._buckets: list[dict[bytes, list[int]]] = [
+            {} for _ in range(self._num_bands)
+        ]
+        self._month_entries: dict[str, list[int]] = {}
+        self._num_removed = 0
+
+    def _compact(self):
+        """Re-register the entries that weren't removed"""
+        entries = [
+            (
+                self._entry_keys[idx],
+                self._signatures[idx],
+                self._months[idx],
+                bool(self._text_index[idx]),
+            )
+            for idx in self._live()
+        ]
+        self._clear()
+        for keys, signature, month, index in entries:
+            self._register(keys, signature, month=month, index=index)
+
+    def _is_near_duplicate(
+        self,
+        signature: NDArray[(Any,), uint32],
+        /,
+        *,
+        skip_month: str = None,
+    ) -> bool:
+        """Check if signature matches a registered signature
+
+        Parameters
+        ----------
+        signature: NDArray[(Any,), uint32]
+            MinHash signature
+        skip_month: str, optional, default=None
+            ignore signatures registered under this month
+
+        Returns
+        -------
+        bool
+            whether a registered article is a near-duplicate
+        """
+
+        # get candidates that share at least one band
+        candidates = {
+            idx
+            for bucket, key in zip(self._buckets, self._bands(signature))
+            for idx in bucket.get(key, [])
+            if skip_month is None or self._months[idx] != skip_month
+        }
+        if not candidates:
+            return False
+
+        # estimate jaccard similarity of candidates
+        registered = array([self._signatures[idx] for idx in candidates])
+        similarity = (registered == signature[None, :]).mean(axis=1)
+        return bool((similarity >= self._threshold).any())
+
+    def _keys(self, article: Any) -> list[str]:
+        """Get exact-match keys for an article
+
+        Parameters
+        ----------
+        article: Any
+            row of articles dataframe
+
+        Returns
+        -------
+        list[str]
+            normalized PubMed ID and DOI, if present
+        """
+        keys = []
+        for field in ['pubmed_id', 'doi']:
+            value = article.get(field)
+            if value is None or isna(value) or not str(value).strip():
+                continue
+            value = str(value).split()[0].lower()
+            if field == 'pubmed_id':
+                value = value[0:min(len(value), 8)]
+            keys.append(f'{field}:{value}')
+        return keys
+
+    def _live(self) -> list[int]:
+        """Get index of each entry that wasn't removed"""
+        return [
+            idx
+            for idx, keys in enumerate(self._entry_keys)
+            if keys is not None
+        ]
+
+    def _matches(
+        self,
+        keys: list[str],
+        signature: NDArray[(Any,), uint32],
+        text: str,
+        /,
+        *,
+        skip_month: str = None,
+    ) -> bool:
+        """Check if an article is an exact or near duplicate
+
+        Parameters
+        ----------
+        keys: list[str]
+            exact-match keys, from :meth:`_keys`
+        signature: NDArray[(Any,), uint32]
+            MinHash signature
+        text: str
+            text the signature was computed from
+        skip_month: str, optional, default=None
+            ignore entries registered under this month
+
+        Returns
+        -------
+        bool
+            whether a registered article is a duplicate
+        """
+        return any(
+            key in self.keys
+            and (skip_month is None or self.keys[key] != skip_month)
+            for key in keys
+        ) or bool(text.strip()) and self._is_near_duplicate(
+            signature,
+            skip_month=skip_month,
+        )
+
+    def _register(
+        self,
+        keys: list[str],
+        signature: NDArray[(Any,), uint32],
+        *,
+        month: str = None,
+        index: bool = True,
+    ):
+        """Add article to store
+
+        Parameters
+        ----------
+        keys: list[str]
+            exact-match keys, from :meth:`_keys`
+        signature: NDArray[(Any,), uint32]
+            MinHash signature
+        month: str, optional, default=None
+            month the article belongs to
+        index: bool, optional, default=True
+            add signature to the LSH buckets. This is turned off for articles
+            without any text, which would otherwise all match each other.
+        """
+        idx = len(self._pmids)
+        self.keys.update(dict.fromkeys(keys, month))
+        self._months.append(month)
+        self._month_entries.setdefault(month, []).append(idx)
+        self._pmids.append(keys[0].split(':', 1)[1] if keys else '')
+        self._entry_keys.append(keys)
+        self._text_index.append(index)
+        self._signatures.append(signature)
+        if not index:
+            return
+        for bucket, key in zip(self._buckets, self._bands(signature)):
+            bucket.setdefault(key, []).append(idx)
+
+    def _text(self, article: Any) -> str:
+        """Get text used for computing signatures
+
+        Parameters
+        ----------
+        article: Any
+            row of articles dataframe
+
+        Returns
+        -------
+        str
+            concatenated :code:`text_cols`
+        """
+        return ' '.join(
+            str(article[field])
+            for field in self._text_cols
+            if field in article and not isna(article[field])
+        )
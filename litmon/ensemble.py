@@ -0,0 +1,396 @@
+"""Score journal articles with an ensemble of models"""
+
+from __future__ import annotations
+
+from copy import copy
+import json
+from os import path, remove
+import pickle
+from secrets import token_hex
+from tempfile import gettempdir
+from typing import Any
+
+from nptyping import NDArray
+from numpy import array, asarray, column_stack, zeros
+from pandas import DataFrame
+from scipy.sparse import issparse
+from vhash import VHash
+
+from litmon.model import ArticleScorer
+from litmon.topics import predict_stacked
+
+
+class EnsembleScorer(ArticleScorer):
+    """Score journal articles with an ensemble of models
+
+    Each member is an :class:`~litmon.model.ArticleScorer` (e.g. with a
+    different :code:`ml_model`, or different :code:`ml_kwargs`). Members that
+    vectorize articles the same way (i.e. with the same :code:`vhash_kwargs`,
+    :code:`use_cols`, :code:`dtype`, and :code:`batch_size`) form a group,
+    which shares one :code:`vhash.VHash` table: each group vectorizes
+    articles once, and all linear members of a group are scored with a single
+    matrix multiply (see :func:`~litmon.topics.predict_stacked`). So an
+    ensemble of models that only differ after vectorization costs little more
+    than a single model.
+
+    Member scores are fused into one score, with either:
+
+    #. :code:`'rank'`: the weighted mean of each member's training quantile
+       of the article's score (see :meth:`~litmon.calibrate.ScoreSketch.rank`)
+    #. :code:`'score'`: the weighted mean of each member's score, standardized
+       by the median and interquartile range of its training scores
+
+    Fused scores are then summarized in :attr:`sketch` and :attr:`calibrator`,
+    so this is itself an :class:`~litmon.model.ArticleScorer`, and can be used
+    anywhere a single model is expected (e.g. by
+    :class:`~litmon.cli.eval.ModelUser`). :code:`model.predict(transform(X))`
+    is still equivalent to :code:`predict(X)`, but :meth:`transform` returns
+    the feature matrix of each group.
+
+    Parameters
+    ----------
+    members: list[ArticleScorer]
+        models to fit (see :meth:`fit`)
+    fusion: str, optional, default='rank'
+        how member scores are fused: :code:`'rank'` or :code:`'score'`
+    weights: list[float], optional, default=None
+        weight of each member. If None, weigh members equally.
+    **kwargs: Any
+        passed to :class:`~litmon.model.ArticleScorer` on :code:`__init__()`,
+        for the fused model (e.g. :code:`calibration`, :code:`label_field`, or
+        :code:`num_quantiles`)
+
+    Attributes
+    ----------
+    groups: list[list[int]]
+        index of each member, in groups of members that share vectorization
+    members: list[ArticleScorer]
+        member models. The members of each group share a :code:`vhash` table.
+    """
+    def __init__(
+        self,
+        members: list[ArticleScorer],
+        /,
+        *,
+        fusion: str = 'rank',
+        weights: list[float] = None,
+        **kwargs,
+    ):
+        ArticleScorer.__init__(self, **kwargs)
+
+        # check parameters
+        if not members:
+            raise ValueError('Ensemble has no members')
+        if fusion not in ['rank', 'score']:
+            raise ValueError(f'Unknown fusion: {fusion}')
+        if weights is not None and len(weights) != len(members):
+            raise ValueError('Need one weight per member')
+
+        # save parameters
+        self.members = list(members)
+        self._fusion = fusion
+        self._weights = (
+            [1.] * len(members)
+            if weights is None
+            else [float(weight) for weight in weights]
+        )
+
+        # group members that vectorize articles the same way
+        groups: dict[str, list[int]] = {}
+        for m, member in enumerate(self.members):
+            key = json.dumps(
+                [
+                    member._vhash_kwargs,
+                    member._use_cols,
+                    member._dtype,
+                    member._batch_size,
+                ],
+                sort_keys=True,
+                default=str,
+            )
+            groups.setdefault(key, []).append(m)
+        self.groups = list(groups.values())
+
+    def fit(self, X: DataFrame, /) -> EnsembleScorer:
+        """Fit each group's vectorizer, each member, and the fused model
+
+        Parameters
+        ----------
+        X: DataFrame
+            data to use for fitting
+
+        Returns
+        -------
+        EnsembleScorer
+            Calling instance
+        """
+        labels = X[self._label_field].to_numpy()
+        cat_labels = list((labels >= 1).astype(int))
+        vectorized = []
+        held_out = zeros((labels.size, len(self.members)))
+        for group in self.groups:
+            leader = self.members[group[0]]
+
+            # train group's vectorizer, and vectorize documents once
+            text = leader._extract_text(X)
+            leader.vhash = VHash(**leader._vhash_kwargs).fit(text, cat_labels)
+            sparse = [self.members[m]._sparse for m in group]
+            vectorized.append(leader._vectorize(
+                text,
+                sparse=(
+                    False if False in sparse
+                    else True if all(sparse)
+                    else None
+                ),
+            ))
+
+            # train each member on the shared feature matrix
+            for m in group:
+                member = self.members[m]
+                member.vhash = leader.vhash
+                _, held_out[:, m] = member._fit_model(
+                    vectorized[-1],
+                    labels,
+                    text,
+                )
+
+            # score most frequent training terms, vectorizing them once
+            features = {}
+            for m in group:
+                member = self.members[m]
+                if member._vocab_size:
+                    if member._vocab_size not in features:
+                        terms = member._count_terms(text)
+                        features[member._vocab_size] = \
+                            terms, member._vectorize_terms(terms)
+                    member.terms, member_features = \
+                        features[member._vocab_size]
+                    member.term_weights = member._weigh_terms(member_features)
+
+        # fuse member scores, and summarize fused held-out training scores
+        self.model = _FusedModel(self)
+        self._summarize(self.model.fuse(held_out), labels)
+        self.matrix_info = self.members[0].matrix_info
+
+        # explain fused scores with the terms of the first member that has
+        # them, weighing each member that shares them (see _FusedModel)
+        self.terms = self.term_weights = None
+        explainers = [
+            m for m, member in enumerate(self.members)
+            if member.terms is not None
+        ]
+        if explainers:
+            self.terms = self.members[explainers[0]].terms
+            self._use_cols = self.members[explainers[0]]._use_cols
+            explainers = [
+                m for m in explainers if self.members[m].terms == self.terms
+            ]
+            self.term_weights = asarray(sum(
+                self._weights[m] / self.model.scales[m]
+                * self.members[m].term_weights
+                for m in explainers
+            ) / sum(self._weights[m] for m in explainers), dtype='float32')
+
+        # return
+        return self
+
+    def transform(self, X: DataFrame, /) -> list[Any]:
+        """Vectorize articles, once per group
+
+        Parameters
+        ----------
+        X: DataFrame
+            articles to vectorize
+
+        Returns
+        -------
+        list[Any]
+            vectorized articles of each group (see :attr:`groups` and
+            :meth:`~litmon.model.ArticleScorer.transform`)
+        """
+        vectorized = []
+        for group in self.groups:
+            leader = self.members[group[0]]
+            vectorized.append(leader._vectorize(
+                leader._extract_text(X),
+                sparse=all(self.members[m]._sparse for m in group),
+            ))
+        self.matrix_info = self.members[self.groups[0][0]].matrix_info
+        return vectorized
+
+    def predict_members(self, X: DataFrame, /) -> DataFrame:
+        """Predict scores of each article, for each member (before fusion)
+
+        Parameters
+        ----------
+        X: DataFrame
+            articles to score
+
+        Returns
+        -------
+        DataFrame
+            one column of scores per member, in the order of :attr:`members`,
+            with the same index as :code:`X`
+        """
+        return DataFrame(
+            self.model.score_members(self.transform(X)),
+            index=X.index,
+        )
+
+    def save(self, fname: str, /):
+        """Save instance to file
+
+        Like :meth:`~litmon.model.ArticleScorer.save`, this saves two files:
+        :code:`fname.bin` (with the :code:`vhash` table of each group) and
+        :code:`fname.pickle`. Use :meth:`~litmon.model.ArticleScorer.load` to
+        load them.
+
+        Parameters
+        ----------
+        fname: str
+            Output file, without file extension
+        """
+
+        # serialize each group's vhash table
+        tables = []
+        tmp_fname = f'{gettempdir()}/litmon-{token_hex(8)}.bin'
+        try:
+            for group in self.groups:
+                self.members[group[0]].vhash.save(tmp_fname)
+                tables.append(open(tmp_fname, 'rb').read())
+        finally:
+            if path.isfile(tmp_fname):
+                remove(tmp_fname)
+        pickle.dump(tables, open(f'{fname}.bin', 'wb'))
+
+        # pickle instance, without vhash tables
+        out = copy(self)
+        out.members = [copy(member) for member in self.members]
+        for member in out.members:
+            member.vhash = None
+        pickle.dump(out, open(f'{fname}.pickle', 'wb'))
+
+    def _load_vhash(self, fname: str, /):
+        """Load the vhash table of each group, saved by :meth:`save`
+
+        Parameters
+        ----------
+        fname: str
+            :code:`.bin` file written by :meth:`save`
+        """
+        tables = pickle.load(open(fname, 'rb'))
+        tmp_fname = f'{gettempdir()}/litmon-{token_hex(8)}.bin'
+        try:
+            for group, table in zip(self.groups, tables):
+                with open(tmp_fname, 'wb') as file:
+                    file.write(table)
+                vhash = VHash.load(tmp_fname)
+                for m in group:
+                    self.members[m].vhash = vhash
+        finally:
+            if path.isfile(tmp_fname):
+                remove(tmp_fname)
+
+
+class _FusedModel:
+    """Score each group's feature matrix with each member, and fuse scores
+
+    This is the :code:`model` of an :class:`EnsembleScorer`. It only keeps
+    each member's ml model and training score summary (not its :code:`vhash`
+    table), so it pickles with the ensemble.
+
+    Parameters
+    ----------
+    ensemble: EnsembleScorer
+        ensemble, with fitted members
+
+    Attributes
+    ----------
+    centers: list[float]
+        median training score of each member
+    scales: list[float]
+        interquartile range of each member's training scores (1, if it's 0)
+    """
+    def __init__(self, ensemble: EnsembleScorer, /):
+        members = ensemble.members
+        self.fusion = ensemble._fusion
+        self.groups = ensemble.groups
+        self.models = [member.model for member in members]
+        self.sketches = [member.sketch for member in members]
+        self.dense = [member._sparse is False for member in members]
+        self.weights = array(ensemble._weights)
+        self.centers = [sketch.quantile(.5) for sketch in self.sketches]
+        self.scales = [
+            (sketch.quantile(.75) - sketch.quantile(.25)) or 1.
+            for sketch in self.sketches
+        ]
+
+    def predict(self, vectorized: list[Any], /) -> NDArray[(Any,), float]:
+        """Predict fused scores
+
+        Parameters
+        ----------
+        vectorized: list[Any]
+            vectorized articles of each group (see
+            :meth:`EnsembleScorer.transform`)
+
+        Returns
+        -------
+        NDArray
+            fused score of each article
+        """
+        return self.fuse(self.score_members(vectorized))
+
+    def fuse(
+        self,
+        scores: NDArray[(Any, Any), float],
+        /,
+    ) -> NDArray[(Any,), float]:
+        """Fuse the scores of each member
+
+        Parameters
+        ----------
+        scores: NDArray
+            (articles x members) scores
+
+        Returns
+        -------
+        NDArray
+            fused score of each article
+        """
+        if self.fusion == 'rank':
+            fused = column_stack([
+                sketch.rank(scores[:, m])
+                for m, sketch in enumerate(self.sketches)
+            ])
+        else:
+            fused = (scores - self.centers) / self.scales
+        return fused.reshape(scores.shape) @ self.weights / self.weights.sum()
+
+    def score_members(
+        self,
+        vectorized: list[Any],
+        /,
+    ) -> NDArray[(Any, Any), float]:
+        """Score vectorized articles with each member
+
+        Parameters
+        ----------
+        vectorized: list[Any]
+            vectorized articles of each group (see
+            :meth:`EnsembleScorer.transform`)
+
+        Returns
+        -------
+        NDArray
+            (articles x members) scores
+        """
+        scores = zeros((vectorized[0].shape[0], len(self.models)))
+        for group, features in zip(self.groups, vectorized):
+            if issparse(features) and any(self.dense[m] for m in group):
+                features = features.toarray()
+            scores[:, group] = predict_stacked(
+                [self.models[m] for m in group],
+                features,
+            )
+        return scores
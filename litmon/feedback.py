@@ -0,0 +1,309 @@
+"""Consolidated store of reviewer feedback on scored articles"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from hashlib import sha256
+import json
+from os import path
+from typing import TYPE_CHECKING, Any
+
+from litmon.utils import atomic
+
+# heavy dependencies are imported when first used, for fast startup
+if TYPE_CHECKING:
+    from pandas import DataFrame
+
+
+class FeedbackStore:
+    """Consolidated store of reviewer feedback on scored articles
+
+    Reviewers fill in the :code:`feedback` column of each month's
+    :code:`*-results.xlsx` file, and upload it as a :code:`*-feedback.xlsx`
+    file. Instead of re-parsing every feedback workbook on every run, each
+    workbook is parsed once (with a streaming, read-only xlsx reader) by
+    :meth:`ingest`, and appended to three files:
+
+    #. :code:`{prefix}-labels.csv`: one row per feedback entry, with columns
+       :code:`pubmed_id`, :code:`label`, :code:`timestamp` (when the entry was
+       ingested), and :code:`source` (workbook it came from)
+    #. :code:`{prefix}-articles.csv`: the article fields of each PubMed ID
+       that has feedback, recorded the first time it's seen
+    #. :code:`{prefix}-sources.json`: content hash of each ingested workbook,
+       keyed by workbook name
+
+    Entries are only ever appended. If an article gets feedback more than
+    once, the most recent entry wins (see :meth:`labels`).
+
+    The store is kept as csv, rather than a columnar format (e.g. parquet or
+    feather): csv files can be appended to in place, so ingesting a workbook
+    only writes its new rows, whereas a parquet or feather file would be
+    rewritten in full each time. Columnar formats would also need
+    :code:`pyarrow`, which isn't a dependency. The store is read once per
+    training run, and holds one row per reviewed article, so parsing it isn't
+    a bottleneck.
+
+    PubMed IDs are truncated to their first 8 characters, matching
+    :meth:`litmon.cli.dbase.DBaseBuilder.label`.
+
+    Parameters
+    ----------
+    prefix: str, optional, default='data/feedback'
+        filename prefix of the store's files
+    """
+
+    # workbook columns that aren't article fields
+    _skip_cols = ['explanation', 'feedback', 'label', 'link', 'score']
+
+    def __init__(self, prefix: str = 'data/feedback', /):
+        self._labels_fname = f'{prefix}-labels.csv'
+        self._articles_fname = f'{prefix}-articles.csv'
+        self._sources_fname = f'{prefix}-sources.json'
+        self._sources: dict[str, str] = (
+            json.load(open(self._sources_fname, 'r'))
+            if path.isfile(self._sources_fname)
+            else {}
+        )
+
+    @property
+    def fnames(self) -> list[str]:
+        """Files that make up this store"""
+        return [self._labels_fname, self._articles_fname, self._sources_fname]
+
+    def has(self, fname: str, /) -> bool:
+        """Check if a workbook has been ingested
+
+        Parameters
+        ----------
+        fname: str
+            feedback workbook
+
+        Returns
+        -------
+        bool
+            whether a workbook with the same name has been ingested
+        """
+        return path.basename(fname) in self._sources
+
+    def ingest(self, fname: str, /, *, force: bool = False) -> int:
+        """Parse a feedback workbook, and append its entries to the store
+
+        Workbooks that have already been ingested are skipped, unless
+        :code:`force`, in which case they are re-ingested only if their
+        contents changed. Entries that aren't numbers (e.g. blank or
+        mistyped cells) are skipped.
+
+        Parameters
+        ----------
+        fname: str
+            feedback workbook
+        force: bool, optional, default=False
+            re-ingest workbook if its contents changed
+
+        Returns
+        -------
+        int
+            number of feedback entries added
+        """
+        from pandas import DataFrame, to_numeric
+
+        # skip ingested workbooks
+        source = path.basename(fname)
+        if self.has(fname) and not force:
+            return 0
+        digest = self.__class__._file_hash(fname)
+        if self._sources.get(source) == digest:
+            return 0
+
+        # parse workbook, keep rows with numeric feedback
+        rows = self.__class__.read_workbook(fname)
+        feedback = to_numeric(rows['feedback'], errors='coerce')
+        rows = rows[feedback.notna()].copy()
+        rows['pubmed_id'] = rows['pubmed_id'].astype(str).str[0:8]
+
+        # append labels
+        labels = DataFrame({
+            'pubmed_id': rows['pubmed_id'],
+            'label': feedback[feedback.notna()].astype(float),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'source': source,
+        })
+        self.__class__._append(self._labels_fname, labels)
+
+        # append articles that haven't been seen
+        seen = (
+            set(self.__class__._read(self._articles_fname)['pubmed_id'])
+            if path.isfile(self._articles_fname)
+            else set()
+        )
+        articles = rows.drop(
+            columns=[col for col in self._skip_cols if col in rows],
+        )
+        articles = articles[~articles['pubmed_id'].isin(seen)]
+        articles = articles.drop_duplicates(subset='pubmed_id')
+        self.__class__._append(self._articles_fname, articles)
+
+        # record ingested workbook
+        self._sources[source] = digest
+        with atomic(self._sources_fname) as tmp_fname, \
+                open(tmp_fname, 'w') as file:
+            json.dump(self._sources, file, indent=4)
+
+        # return
+        return labels.shape[0]
+
+    def labels(self, /, sources: list[str] = None) -> DataFrame:
+        """Get the most recent feedback label for each PubMed ID
+
+        Parameters
+        ----------
+        sources: list[str], optional, default=None
+            only use feedback from these workbooks (by name). If None, use
+            all feedback.
+
+        Returns
+        -------
+        DataFrame
+            one row per PubMed ID, with columns :code:`pubmed_id`,
+            :code:`label`, :code:`timestamp`, and :code:`source`
+        """
+        from pandas import DataFrame
+        if not path.isfile(self._labels_fname):
+            return DataFrame(
+                [],
+                columns=['pubmed_id', 'label', 'timestamp', 'source'],
+            )
+        labels = self.__class__._read(self._labels_fname)
+        if sources is not None:
+            labels = labels[labels['source'].isin(
+                [path.basename(source) for source in sources]
+            )]
+        return labels.drop_duplicates(subset='pubmed_id', keep='last') \
+            .reset_index(drop=True)
+
+    def articles(self, /, sources: list[str] = None) -> DataFrame:
+        """Get articles that have feedback, labeled with their feedback
+
+        Parameters
+        ----------
+        sources: list[str], optional, default=None
+            only use feedback from these workbooks (by name). If None, use
+            all feedback.
+
+        Returns
+        -------
+        DataFrame
+            articles, joined by PubMed ID to their most recent :code:`label`
+        """
+        from pandas import DataFrame
+        labels = self.labels(sources)
+        if not path.isfile(self._articles_fname):
+            return DataFrame([], columns=['pubmed_id', 'label'])
+        return self.__class__._read(self._articles_fname).merge(
+            labels[['pubmed_id', 'label']],
+            on='pubmed_id',
+        )
+
+    @classmethod
+    def read_workbook(cls, fname: str, /) -> DataFrame:
+        """Read the first sheet of a feedback workbook, and its review queue
+
+        Articles in the :code:`Review Queue` sheet (see
+        :class:`litmon.active.ReviewQueue`) are appended after the first
+        sheet's articles.
+
+        This uses :code:`openpyxl` in read-only mode, which streams rows
+        instead of loading the whole workbook (and its formatting) into memory.
+
+        Parameters
+        ----------
+        fname: str
+            feedback workbook
+
+        Returns
+        -------
+        DataFrame
+            one row per article, with the workbook's header as columns
+        """
+        from openpyxl import load_workbook
+        from pandas import DataFrame, concat
+
+        from litmon.active import ReviewQueue
+        workbook = load_workbook(fname, read_only=True, data_only=True)
+        try:
+            sheets = []
+            for idx, worksheet in enumerate(workbook.worksheets):
+                if idx and worksheet.title != ReviewQueue.sheet_name:
+                    continue
+                rows = worksheet.iter_rows(values_only=True)
+                header = next(rows, ())
+                sheets.append(DataFrame(
+                    [
+                        row
+                        for row in rows
+                        if any(cell is not None for cell in row)
+                    ],
+                    columns=header,
+                ))
+            return concat(sheets, ignore_index=True)
+        finally:
+            workbook.close()
+
+    @classmethod
+    def _append(cls, fname: str, df: DataFrame, /):
+        """Append rows to a csv file
+
+        Parameters
+        ----------
+        fname: str
+            csv file
+        df: DataFrame
+            rows to append
+        """
+        if not df.shape[0]:
+            return
+        if path.isfile(fname):
+            columns = cls._read(fname, nrows=0).columns
+            df = df.reindex(columns=columns)
+        df.to_csv(fname, mode='a', header=not path.isfile(fname), index=False)
+
+    @classmethod
+    def _file_hash(cls, fname: str, /) -> str:
+        """Compute content hash of a file
+
+        Parameters
+        ----------
+        fname: str
+            file to hash
+
+        Returns
+        -------
+        str
+            sha256 hash of file contents
+        """
+        with open(fname, 'rb') as file:
+            return sha256(file.read()).hexdigest()
+
+    @classmethod
+    def _read(cls, fname: str, /, **kwargs: Any) -> DataFrame:
+        """Read a store file, keeping PubMed IDs as strings
+
+        Date columns are parsed as :code:`datetime64` (see
+        :meth:`litmon.utils.files.read_articles`), so articles with feedback
+        can be concatenated with training databases without changing their
+        dtypes.
+
+        Parameters
+        ----------
+        fname: str
+            csv file
+        **kwargs: Any
+            passed to :code:`pandas.read_csv`
+
+        Returns
+        -------
+        DataFrame
+            file contents
+        """
+        from litmon.utils import read_articles
+        return read_articles(fname, dtype={'pubmed_id': str}, **kwargs)
@@ -2,15 +2,30 @@
 
 from __future__ import annotations
 
+from copy import copy
 from importlib import import_module
 import pickle
 from typing import Any
 
 from nptyping import NDArray
-from numpy import array
+from numpy import (
+    arange,
+    array,
+    asarray,
+    count_nonzero,
+    diff,
+    lexsort,
+    repeat,
+    split,
+    vstack,
+    zeros,
+)
 from pandas import DataFrame
+from scipy.sparse import csr_matrix, issparse, vstack as sparse_vstack
 from vhash import VHash
 
+from litmon.calibrate import ScoreCalibrator, ScoreSketch
+
 
 class ArticleScorer:
     """Score journal articles based on their similarity to a training set
@@ -19,8 +34,53 @@ class ArticleScorer:
     articles with :code:`vhash.VHash`, and then predicts scores with a machine
     learning model (default :code:`sklearn.svm.LinearSVR`).
 
+    Documents are vectorized in batches of :code:`batch_size`, as
+    :code:`dtype` (float32, by default) arrays. If the batches are sparse
+    enough (at most :attr:`max_sparse_density` of their values are non-zero),
+    each batch is converted to a (scipy CSR) sparse matrix before the next is
+    computed, so memory scales with the number of non-zero features. Otherwise
+    (e.g. with :code:`vhash.VHash`'s default, fully dense, output) batches are
+    kept dense, since a CSR matrix also stores a column index for every value,
+    which would roughly double the memory of a dense matrix. The resulting
+    footprint is recorded in :attr:`matrix_info`.
+
+    After fitting, the distribution of training scores is summarized in
+    :attr:`sketch`, and a map from scores to probabilities is stored in
+    :attr:`calibrator`. Both are saved with the model, so that thresholds can
+    be chosen without re-scoring the training set, and are comparable across
+    retrains. By default, both are computed from in-sample training scores,
+    which are overconfident. With :code:`calibration_folds=k`, they're instead
+    computed from held-out scores: each training article is scored by a model
+    fit on the other :code:`k - 1` folds (sharing the vectorizer, which is fit
+    once on every article). This fits :code:`k` more models, so training takes
+    about :code:`k + 1` times as long. Training sets are usually balanced,
+    though, so their scores don't look like the scores of the (unbalanced)
+    months being scored: use :meth:`summarize` to rebuild :attr:`sketch` from
+    scored months, and to correct :attr:`calibrator` for their fraction of
+    target articles.
+
+    After fitting, the most frequent training terms are also scored on their
+    own, and stored in :attr:`terms` and :attr:`term_weights`, so that
+    :meth:`explain` can find the terms that contribute most to each article's
+    score without re-vectorizing anything.
+
     Parameters
     ----------
+    batch_size: int, optional, default=1000
+        number of documents vectorized at a time. This bounds the size of the
+        dense intermediate matrix returned by :code:`vhash.VHash.transform`.
+    calibration: str, optional, default='isotonic'
+        method used to map scores to probabilities. See
+        :class:`~litmon.calibrate.ScoreCalibrator`. If None, don't calibrate.
+    calibration_folds: int, optional, default=0
+        number of cross-validation folds used to get held-out training scores,
+        for :attr:`sketch` and :attr:`calibrator`. Each fold fits another
+        :code:`ml_model`, so e.g. 5 folds make :meth:`fit` about 6 times
+        slower. If less than 2 (or if either class has fewer articles than
+        folds), use in-sample training scores.
+    dtype: str, optional, default='float32'
+        dtype of the feature matrix. Use :code:`'float64'` if your
+        :code:`ml_model` needs full precision.
     label_field: str, optional, default='label'
         name of label field in dataframe used for fitting
     ml_model: str, optional, default='sklearn.svm.LinearSVR'
@@ -29,6 +89,14 @@ class ArticleScorer:
         it is compliant to the sklearn api.
     ml_kwargs: dict, optional, default={}
         passed to :code:`ml_model` on :code:`__init__()`
+    num_quantiles: int, optional, default=1001
+        number of quantiles stored in :attr:`sketch`
+    sparse: bool, optional, default=None
+        pass a sparse feature matrix to :code:`ml_model`. If None, use a
+        sparse matrix if the vectorized documents are sparse enough (see
+        above), and :code:`ml_model` accepts one, and a dense matrix
+        otherwise. If True, always use a sparse matrix, and raise an error if
+        :code:`ml_model` doesn't accept sparse input.
     use_cols: list[str], optional, default=None
         Article columns to use. If None, use:
 
@@ -43,23 +111,58 @@ class ArticleScorer:
 
     vhash_kwargs: dict, optional, default={}
         passed to :code:`vhash.VHash` on :code:`__init__()`
+    vocab_size: int, optional, default=20000
+        number of most frequent training terms (words) stored in
+        :attr:`terms`. If 0, don't store terms, and don't support
+        :meth:`explain`.
 
     Attributes
     ----------
+    calibrator: ScoreCalibrator
+        map from scores to probabilities. None if :code:`calibration` is None,
+        or if the training set only has one class.
+    matrix_info: dict[str, Any]
+        memory footprint of the most recent feature matrix, with keys
+        :code:`shape`, :code:`nnz` (number of non-zero values), :code:`dtype`,
+        :code:`sparse`, :code:`nbytes` (actual size), and :code:`dense_nbytes`
+        (size as a dense matrix)
+    max_sparse_density: float
+        (class attribute) largest fraction of non-zero values of batches that
+        are converted to sparse matrices, when :code:`sparse` is None. At
+        1/3, a float32 CSR matrix (with int32 column indices) takes at most
+        about 2/3 of the memory of the dense matrix.
     model: Type[ml_model]
         ml model for scoring
+    sketch: ScoreSketch
+        quantile sketch of the held-out training scores, or of the scores of
+        the articles passed to :meth:`summarize`
+    terms: list[str]
+        most frequent training terms. None if :code:`vocab_size` is 0.
+    term_weights: NDArray
+        score contribution of each term in :attr:`terms`, i.e. the (intercept
+        free) score of a document containing only that term
     vhash: vhash.VHash
         vectorizing hash table
     """
+    # densest batches stored as sparse matrices, when sparse is None
+    max_sparse_density = 1 / 3
+
     def __init__(
         self,
         /,
         *,
+        batch_size: int = 1000,
+        calibration: str = 'isotonic',
+        calibration_folds: int = 0,
+        dtype: str = 'float32',
         label_field: str = 'label',
         ml_model: str = 'sklearn.svm.LinearSVR',
         ml_kwargs: dict = {},
+        num_quantiles: int = 1001,
+        sparse: bool = None,
         use_cols: list[str] = None,
         vhash_kwargs: dict = {},
+        vocab_size: int = 20000,
     ):
         # get default parameters
         if use_cols is None:
@@ -75,11 +178,52 @@ class ArticleScorer:
             ]
 
         # save parameters
+        self._batch_size = batch_size
+        self._calibration = calibration
+        self._calibration_folds = calibration_folds
+        self._dtype = dtype
         self._label_field = label_field
         self._ml_model = ml_model
         self._ml_kwargs = ml_kwargs
+        self._num_quantiles = num_quantiles
+        self._sparse = sparse
         self._use_cols = use_cols
         self._vhash_kwargs = vhash_kwargs
+        self._vocab_size = vocab_size
+
+        # initialize state
+        self.calibrator: ScoreCalibrator = None
+        self.matrix_info: dict[str, Any] = {}
+        self.sketch: ScoreSketch = None
+        self.terms: list[str] = None
+        self.term_weights: NDArray[(Any,), float] = None
+
+    def __setstate__(self, state: dict[str, Any]):
+        """Load pickled state, filling in fields missing from older versions
+
+        Models pickled before sparse support vectorized all documents at once
+        into a dense float64 matrix, so they keep doing so.
+
+        Parameters
+        ----------
+        state: dict[str, Any]
+            pickled state
+        """
+        self.__dict__.update({
+            '_batch_size': None,
+            '_calibration': None,
+            '_calibration_folds': 0,
+            '_dtype': 'float64',
+            '_num_quantiles': 1001,
+            '_sparse': False,
+            '_vocab_size': 0,
+            'calibrator': None,
+            'matrix_info': {},
+            'sketch': None,
+            'terms': None,
+            'term_weights': None,
+            **state,
+        })
 
     def fit(self, X: DataFrame, /) -> ArticleScorer:
         """Fit model
@@ -95,10 +239,6 @@ class ArticleScorer:
             Calling instance
         """
 
-        # import ml class
-        ml_module, ml_class = self._ml_model.rsplit('.', maxsplit=1)
-        ml_class = getattr(import_module(ml_module), ml_class)
-
         # get fitting text and labels
         text = self._extract_text(X)
         labels = X[self._label_field].to_numpy()
@@ -108,14 +248,185 @@ class ArticleScorer:
         self.vhash = VHash(**self._vhash_kwargs).fit(text, cat_labels)
 
         # vectorize documents
-        vectorized = self.vhash.transform(text)
+        vectorized = self._vectorize(text, sparse=self._sparse)
 
         # train ml model
-        self.model = ml_class(**self._ml_kwargs).fit(vectorized, labels)
+        self._fit_model(vectorized, labels, text)
+
+        # score most frequent training terms
+        if self._vocab_size:
+            self.terms = self._count_terms(text)
+            self.term_weights = self._weigh_terms(
+                self._vectorize_terms(self.terms),
+            )
 
         # return
         return self
 
+    def _fit_model(
+        self,
+        vectorized: Any,
+        labels: NDArray[(Any,), float],
+        text: list[str],
+        /,
+    ) -> tuple[Any, NDArray[(Any,), float]]:
+        """Train ml model on vectorized documents, then summarize its scores
+
+        This sets :attr:`model`, :attr:`sketch`, and :attr:`calibrator`, from
+        held-out scores (see :meth:`_held_out_scores`).
+
+        Parameters
+        ----------
+        vectorized: Any
+            vectorized documents (see :meth:`_vectorize`)
+        labels: NDArray
+            label of each document
+        text: list[str]
+            documents, used to re-vectorize them densely if :code:`ml_model`
+            doesn't accept sparse input
+
+        Returns
+        -------
+        Any
+            vectorized documents used for training (dense, if they had to be
+            re-vectorized)
+        NDArray
+            held-out score of each document
+        """
+
+        # import ml class
+        ml_module, ml_class = self._ml_model.rsplit('.', maxsplit=1)
+        ml_class = getattr(import_module(ml_module), ml_class)
+
+        # train ml model, checking that it accepts sparse input
+        try:
+            self.model = ml_class(**self._ml_kwargs).fit(vectorized, labels)
+        except TypeError as e:
+            if not issparse(vectorized):
+                raise e
+            if self._sparse:
+                raise ValueError(
+                    f'{self._ml_model} does not accept sparse input. '
+                    'Use sparse=False.'
+                ) from e
+            vectorized = self._vectorize(text, sparse=False)
+            self.model = ml_class(**self._ml_kwargs).fit(vectorized, labels)
+        self._sparse = issparse(vectorized)
+
+        # summarize held-out training scores
+        scores = self._held_out_scores(ml_class, vectorized, labels)
+        self._summarize(scores, labels)
+
+        # return
+        return vectorized, scores
+
+    def _held_out_scores(
+        self,
+        ml_class: type,
+        vectorized: Any,
+        labels: NDArray[(Any,), float],
+        /,
+    ) -> NDArray[(Any,), float]:
+        """Score each training document with a model fit without it
+
+        Documents are split into :code:`calibration_folds` stratified folds,
+        and each fold is scored by an :code:`ml_model` fit on the other folds.
+
+        Parameters
+        ----------
+        ml_class: type
+            class of :code:`ml_model`
+        vectorized: Any
+            vectorized documents
+        labels: NDArray
+            label of each document
+
+        Returns
+        -------
+        NDArray
+            held-out score of each document. These are in-sample scores (from
+            :attr:`model`), if there are too few documents of either class.
+        """
+        from sklearn.model_selection import StratifiedKFold
+
+        # get number of folds
+        is_target = labels >= 1
+        num_folds = min(
+            self._calibration_folds,
+            int(is_target.sum()),
+            int((~is_target).sum()),
+        )
+        if num_folds < 2:
+            return array(self.model.predict(vectorized))
+
+        # score each fold
+        scores = zeros(labels.size)
+        folds = StratifiedKFold(num_folds, shuffle=True, random_state=0)
+        for train, test in folds.split(zeros(labels.size), is_target):
+            scores[test] = ml_class(**self._ml_kwargs) \
+                .fit(vectorized[train], labels[train]) \
+                .predict(vectorized[test])
+        return scores
+
+    def _summarize(
+        self,
+        scores: NDArray[(Any,), float],
+        labels: NDArray[(Any,), float],
+        /,
+    ):
+        """Summarize training scores
+
+        This sets :attr:`sketch`, and :attr:`calibrator`.
+
+        Parameters
+        ----------
+        scores: NDArray
+            training score of each document
+        labels: NDArray
+            label of each document
+        """
+
+        # summarize training scores
+        self.sketch = ScoreSketch(scores, num_quantiles=self._num_quantiles)
+
+        # calibrate scores (requires both classes)
+        is_target = labels >= 1
+        self.calibrator = (
+            ScoreCalibrator(scores, is_target, method=self._calibration)
+            if self._calibration is not None
+            and 0 < is_target.sum() < is_target.size
+            else None
+        )
+
+    def summarize(self, X: DataFrame, /) -> ArticleScorer:
+        """Summarize the scores of articles like those that will be scored
+
+        Training sets are usually balanced, so thresholds looked up from
+        training scores don't select the intended fraction of an unbalanced
+        month. This rebuilds :attr:`sketch` from the scores of :code:`X`
+        (e.g. previous months' unbalanced databases), and, if :code:`X` is
+        labeled, sets the prevalence of :attr:`calibrator` to the fraction of
+        target articles in :code:`X`.
+
+        Parameters
+        ----------
+        X: DataFrame
+            unbalanced articles
+
+        Returns
+        -------
+        ArticleScorer
+            Calling instance
+        """
+        self.sketch = ScoreSketch(
+            self.predict(X),
+            num_quantiles=self._num_quantiles,
+        )
+        if self.calibrator is not None and self._label_field in X:
+            labels = X[self._label_field].fillna(0).astype(float)
+            self.calibrator.prevalence = float((labels >= 1).mean())
+        return self
+
     def fit_predict(self, X: DataFrame, /) -> NDArray[(Any,), float]:
         """Fit model, predict scores
 
@@ -144,9 +455,116 @@ class ArticleScorer:
         NDArray
             Score for each article in :code:`dbase_fname`
         """
-        text = self._extract_text(X)
-        vectorized = self.vhash.transform(text)
-        return array(self.model.predict(vectorized))
+        return array(self.model.predict(self.transform(X)))
+
+    def explain(
+        self,
+        X: DataFrame,
+        /,
+        *,
+        num_terms: int = 5,
+    ) -> list[list[str]]:
+        """Get the terms that contribute most to each article's score
+
+        Each article's contribution from each of :attr:`terms` that it
+        contains is the term's weight (see :attr:`term_weights`). These are
+        computed for all articles at once, as a sparse (articles x terms)
+        matrix, and the top :code:`num_terms` positive contributions of each
+        article are kept. This doesn't vectorize articles with
+        :code:`vhash.VHash`, so it's much faster than :meth:`predict`.
+
+        The explanation is approximate, because :code:`vhash.VHash`
+        normalizes each document, and also uses multi-word phrases.
+
+        Parameters
+        ----------
+        X: DataFrame
+            articles to explain
+        num_terms: int, optional, default=5
+            maximum number of terms for each article
+
+        Returns
+        -------
+        list[list[str]]
+            top terms of each article, highest contribution first
+
+        Raises
+        ------
+        ValueError
+            if this model doesn't store terms (e.g. it was fit with
+            :code:`vocab_size=0`, or by an older version)
+        """
+        from sklearn.feature_extraction.text import CountVectorizer
+
+        # check for terms, and handle empty input
+        if self.terms is None:
+            raise ValueError('Model does not store terms. Re-fit it.')
+        if not X.shape[0]:
+            return []
+
+        # get contribution of each term in each article
+        presence = CountVectorizer(vocabulary=self.terms, binary=True) \
+            .transform(self._extract_text(X))
+        contributions = presence.multiply(self.term_weights).tocsr()
+        contributions.eliminate_zeros()
+
+        # rank terms within each article, highest contribution first
+        data = contributions.data
+        indptr = contributions.indptr
+        rows = repeat(arange(contributions.shape[0]), diff(indptr))
+        order = lexsort((-data, rows))
+        rank = arange(data.size) - indptr[rows[order]]
+
+        # keep top positive contributions
+        keep_me = order[(rank < num_terms) & (data[order] > 0)]
+
+        # group terms by article
+        terms = asarray(self.terms, dtype=object)
+        terms = terms[contributions.indices[keep_me]]
+        bounds = rows[keep_me].searchsorted(arange(1, X.shape[0]))
+        return [list(group) for group in split(terms, bounds)]
+
+    def predict_proba(self, X: DataFrame, /) -> NDArray[(Any,), float]:
+        """Predict probability that each article is a target article
+
+        Parameters
+        ----------
+        X: DataFrame
+            articles to score
+
+        Returns
+        -------
+        NDArray
+            calibrated probability for each article in :code:`X`
+
+        Raises
+        ------
+        ValueError
+            if this model wasn't calibrated
+        """
+        if self.calibrator is None:
+            raise ValueError('Model is not calibrated')
+        return self.calibrator.transform(self.predict(X))
+
+    def transform(self, X: DataFrame, /) -> Any:
+        """Vectorize articles
+
+        :code:`predict(X)` is equivalent to
+        :code:`model.predict(transform(X))`, so the vectorized articles can be
+        cached and re-scored.
+
+        Parameters
+        ----------
+        X: DataFrame
+            articles to vectorize
+
+        Returns
+        -------
+        Any
+            vectorized articles, as a :code:`scipy.sparse.csr_matrix` if the
+            model uses sparse input, else as a dense :code:`numpy.ndarray`
+        """
+        return self._vectorize(self._extract_text(X), sparse=self._sparse)
 
     def save(self, fname: str, /):
         """Save instance to file
@@ -162,10 +580,9 @@ class ArticleScorer:
             Output file, without file extension
         """
         self.vhash.save(f'{fname}.bin')
-        X = self.vhash
-        self.vhash = None
-        pickle.dump(self, open(f'{fname}.pickle', 'wb'))
-        self.vhash = X
+        out = copy(self)
+        out.vhash = None
+        pickle.dump(out, open(f'{fname}.pickle', 'wb'))
 
     @classmethod
     def load(cls, fname: str, /) -> ArticleScorer:
@@ -186,9 +603,170 @@ class ArticleScorer:
             loaded instance
         """
         out = pickle.load(open(f'{fname}.pickle', 'rb'))
-        out.vhash = VHash.load(f'{fname}.bin')
+        out._load_vhash(f'{fname}.bin')
         return out
 
+    def _load_vhash(self, fname: str, /):
+        """Load the vectorizing hash table saved by :meth:`save`
+
+        Parameters
+        ----------
+        fname: str
+            :code:`.bin` file written by :meth:`save`
+        """
+        self.vhash = VHash.load(fname)
+
+    def _count_terms(self, text: list[str], /) -> list[str]:
+        """Get the most frequent terms (words) in documents
+
+        Parameters
+        ----------
+        text: list[str]
+            documents
+
+        Returns
+        -------
+        list[str]
+            at most :code:`vocab_size` terms, excluding english stop words
+        """
+        from sklearn.feature_extraction.text import CountVectorizer
+        return CountVectorizer(
+            stop_words='english',
+            max_features=self._vocab_size,
+        ).fit(text).get_feature_names_out().tolist()
+
+    def _vectorize_terms(
+        self,
+        terms: list[str],
+        /,
+    ) -> NDArray[(Any, Any), float]:
+        """Vectorize each term on its own
+
+        Parameters
+        ----------
+        terms: list[str]
+            terms to vectorize
+
+        Returns
+        -------
+        NDArray
+            dense (terms x features) matrix
+        """
+        if not terms:
+            return asarray(self.vhash.transform(['']), dtype=self._dtype)[0:0]
+        batch_size = self._batch_size or len(terms)
+        return vstack([
+            asarray(
+                self.vhash.transform(terms[start:start+batch_size]),
+                dtype=self._dtype,
+            )
+            for start in range(0, len(terms), batch_size)
+        ])
+
+    def _weigh_terms(
+        self,
+        features: NDArray[(Any, Any), float],
+        /,
+    ) -> NDArray[(Any,), float]:
+        """Score each vectorized term on its own, without the intercept
+
+        For linear models, this is the dot product of each term's features
+        with the model's coefficients.
+
+        Parameters
+        ----------
+        features: NDArray
+            vectorized terms (see :meth:`_vectorize_terms`)
+
+        Returns
+        -------
+        NDArray
+            weight of each term
+        """
+        from numpy import zeros
+        coef = asarray(getattr(self.model, 'coef_', [])).ravel()
+        if coef.size == features.shape[1]:
+            weights = features @ coef
+        elif features.shape[0]:
+            empty = zeros((1, features.shape[1]), dtype=features.dtype)
+            weights = (
+                array(self.model.predict(features))
+                - array(self.model.predict(empty))
+            )
+        else:
+            weights = zeros(0)
+        return asarray(weights, dtype='float32')
+
+    def _vectorize(self, text: list[str], /, *, sparse: bool) -> Any:
+        """Vectorize documents in batches, and record the memory footprint
+
+        Parameters
+        ----------
+        text: list[str]
+            documents to vectorize
+        sparse: bool
+            return a sparse matrix. If None, return a sparse matrix if at most
+            :attr:`max_sparse_density` of the first batch's values are
+            non-zero.
+
+        Returns
+        -------
+        Any
+            vectorized documents, as a :code:`scipy.sparse.csr_matrix` if
+            sparse, else as a dense :code:`numpy.ndarray`
+        """
+
+        # handle empty input
+        if not text:
+            return asarray(self.vhash.transform(text), dtype=self._dtype)
+
+        # vectorize each batch
+        batch_size = self._batch_size or len(text)
+        batches = []
+        for start in range(0, len(text), batch_size):
+            batch = asarray(
+                self.vhash.transform(text[start:start+batch_size]),
+                dtype=self._dtype,
+            )
+            if sparse is None:
+                sparse = bool(
+                    count_nonzero(batch)
+                    <= self.max_sparse_density * batch.size
+                )
+            batches.append(csr_matrix(batch) if sparse else batch)
+
+        # combine batches
+        if sparse:
+            vectorized = sparse_vstack(batches, format='csr')
+        else:
+            vectorized = vstack(batches)
+
+        # record memory footprint
+        self.matrix_info = {
+            'shape': vectorized.shape,
+            'nnz': (
+                vectorized.nnz
+                if sparse
+                else int((vectorized != 0).sum())
+            ),
+            'dtype': str(vectorized.dtype),
+            'sparse': sparse,
+            'nbytes': (
+                vectorized.data.nbytes
+                + vectorized.indices.nbytes
+                + vectorized.indptr.nbytes
+                if sparse
+                else vectorized.nbytes
+            ),
+            'dense_nbytes':
+                vectorized.shape[0]
+                * vectorized.shape[1]
+                * vectorized.dtype.itemsize,
+        }
+
+        # return
+        return vectorized
+
     def _extract_text(self, df: DataFrame) -> list[str]:
         """Extract text columns from a dataframe
 
@@ -0,0 +1,443 @@
+"""Monitor data drift and score distributions across months"""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+import fcntl
+import json
+from math import log
+from os import makedirs, path
+from statistics import median
+from typing import TYPE_CHECKING, Any, Iterator
+
+from litmon.utils import atomic
+
+# heavy dependencies are imported when first used, for fast startup
+if TYPE_CHECKING:
+    from nptyping import NDArray
+    from pandas import DataFrame
+
+
+class MonthStats:
+    """Streaming statistics of one month's articles (and their scores)
+
+    Statistics are accumulated one chunk at a time (e.g. one day of query
+    results, or one month of scored articles), from data that is already in
+    memory, so they never need an extra pass over the stored databases:
+
+    #. :code:`count`: number of articles
+    #. :code:`positive_rate`: fraction of articles labeled positive
+    #. :code:`fill_rates`: fraction of articles with a non-empty value, for
+       each field
+    #. :code:`token_hist`: histogram of the number of tokens (words) of each
+       field, with power-of-2 bins (0, 1, 2-3, 4-7, ..., 1024+)
+    #. :code:`score_quantiles`: quantiles of the articles' scores (if scores
+       were added)
+
+    Parameters
+    ----------
+    fields: list[str], optional, default=None
+        fields whose fill rates and token lengths are tracked. If None, use
+        :attr:`default_fields`.
+    """
+
+    # fields tracked by default
+    default_fields = [
+        'abstract',
+        'authors',
+        'conclusions',
+        'journal',
+        'keywords',
+        'methods',
+        'results',
+        'title',
+    ]
+
+    # number of token-length histogram bins
+    num_bins = 12
+
+    # score quantiles that are recorded
+    quantiles = [.01, .05, .25, .5, .75, .95, .99]
+
+    def __init__(self, /, *, fields: list[str] = None):
+        self.fields = list(fields or self.__class__.default_fields)
+        self.count = 0
+        self._positive = 0
+        self._filled = {field: 0 for field in self.fields}
+        self._hist = {field: [0] * self.num_bins for field in self.fields}
+        self._scores = []
+
+    def update(self, articles: DataFrame, /) -> MonthStats:
+        """Add a chunk of articles
+
+        Parameters
+        ----------
+        articles: DataFrame
+            chunk of articles
+
+        Returns
+        -------
+        MonthStats
+            calling instance
+        """
+        from numpy import bincount, floor, log2, maximum, minimum
+
+        # count articles, and positive articles
+        self.count += int(articles.shape[0])
+        if 'label' in articles:
+            self._positive += int(
+                articles['label'].fillna(False).astype(bool).sum()
+            )
+
+        # count filled fields, and histogram their token lengths
+        for field in self.fields:
+            if field not in articles:
+                self._hist[field][0] += int(articles.shape[0])
+                continue
+            tokens = articles[field].fillna('').astype(str) \
+                .str.count(r'\S+').to_numpy()
+            self._filled[field] += int((tokens > 0).sum())
+            bins = minimum(
+                (floor(log2(maximum(tokens, 1))) + (tokens > 0))
+                .astype(int),
+                self.num_bins - 1,
+            )
+            counts = bincount(bins, minlength=self.num_bins)
+            self._hist[field] = [
+                total + int(count)
+                for total, count in zip(self._hist[field], counts)
+            ]
+
+        # return
+        return self
+
+    def add_scores(self, scores: NDArray[(Any,), float], /) -> MonthStats:
+        """Add the scores of a chunk of articles
+
+        Parameters
+        ----------
+        scores: NDArray
+            score of each article
+
+        Returns
+        -------
+        MonthStats
+            calling instance
+        """
+        from numpy import asarray
+        self._scores.append(asarray(scores, dtype=float))
+        return self
+
+    def summary(self) -> dict[str, Any]:
+        """Summarize statistics, compactly
+
+        Returns
+        -------
+        dict[str, Any]
+            JSON-serializable statistics (see :class:`MonthStats`)
+        """
+        from numpy import concatenate, quantile
+        out = {
+            'count': self.count,
+            'positive_rate': round(self._positive / (self.count or 1), 6),
+            'fill_rates': {
+                field: round(filled / (self.count or 1), 6)
+                for field, filled in self._filled.items()
+            },
+            'token_hist': self._hist,
+        }
+        scores = concatenate(self._scores) if self._scores else []
+        if len(scores):
+            out['score_quantiles'] = {
+                str(q): round(float(value), 6)
+                for q, value in zip(
+                    self.quantiles,
+                    quantile(scores, self.quantiles),
+                )
+            }
+        return out
+
+
+class DriftMonitor:
+    """Time series of monthly statistics, checked against thresholds
+
+    Each month's statistics (see :class:`MonthStats`) are stored in a compact
+    JSON file, keyed by month (YYYY-mm) and by stage (e.g. :code:`ingest`,
+    from :class:`~litmon.cli.dbase.DBaseBuilder`, and :code:`score`, from
+    :class:`~litmon.cli.eval.ModelUser`). Files are rewritten atomically,
+    while holding an inter-process lock, so stages can record concurrently.
+
+    Each month is checked against a baseline: the previous :code:`window`
+    months recorded for the same stage. These checks are run (see
+    :meth:`check`):
+
+    #. :code:`count`: ratio of the article count to the baseline's median
+       count, which must be in [:code:`min_count_ratio`,
+       :code:`max_count_ratio`]
+    #. :code:`fill_rate:{field}`: drop of the field's fill rate from the
+       baseline's median fill rate, which must be at most
+       :code:`max_fill_drop` (e.g. when PubMed stops returning a field)
+    #. :code:`token_psi:{field}`: population stability index of the field's
+       token-length histogram, against the baseline's pooled histogram, which
+       must be at most :code:`max_psi`
+    #. :code:`positive_rate`: relative change of the positive rate from the
+       baseline's median positive rate, which must be at most
+       :code:`max_positive_shift`
+    #. :code:`score_shift`: change of the median score from the baseline's
+       median, in units of the baseline's median interquartile range, which
+       must be at most :code:`max_score_shift`
+
+    Parameters
+    ----------
+    fname: str, optional, default='data/monitor.json'
+        time-series file
+    max_count_ratio: float, optional, default=2
+        see above
+    max_fill_drop: float, optional, default=0.2
+        see above
+    max_positive_shift: float, optional, default=0.5
+        see above
+    max_psi: float, optional, default=0.25
+        see above
+    max_score_shift: float, optional, default=1
+        see above
+    min_count_ratio: float, optional, default=0.5
+        see above
+    window: int, optional, default=6
+        number of previous months in each baseline
+    """
+
+    # columns of each check
+    columns = ['month', 'stage', 'check', 'value', 'baseline', 'alert']
+
+    def __init__(
+        self,
+        fname: str = 'data/monitor.json',
+        /,
+        *,
+        max_count_ratio: float = 2,
+        max_fill_drop: float = .2,
+        max_positive_shift: float = .5,
+        max_psi: float = .25,
+        max_score_shift: float = 1,
+        min_count_ratio: float = .5,
+        window: int = 6,
+    ):
+        self.fname = fname
+        self._max_count_ratio = max_count_ratio
+        self._max_fill_drop = max_fill_drop
+        self._max_positive_shift = max_positive_shift
+        self._max_psi = max_psi
+        self._max_score_shift = max_score_shift
+        self._min_count_ratio = min_count_ratio
+        self._window = window
+
+    def record(self, month: str, stage: str, stats: MonthStats, /):
+        """Record a month's statistics
+
+        Parameters
+        ----------
+        month: str
+            month, as YYYY-mm
+        stage: str
+            stage that computed the statistics (e.g. :code:`ingest`)
+        stats: MonthStats
+            statistics to record (replacing any previous record of the same
+            month and stage)
+        """
+        with self._edit() as series:
+            series.setdefault(month, {})[stage] = stats.summary()
+
+    @property
+    def series(self) -> dict[str, dict[str, dict[str, Any]]]:
+        """Recorded statistics, keyed by month, then by stage"""
+        if not path.isfile(self.fname):
+            return {}
+        return json.load(open(self.fname, 'r'))
+
+    def history(self, stage: str = 'ingest', /) -> DataFrame:
+        """Get the scalar statistics of each recorded month
+
+        Parameters
+        ----------
+        stage: str, optional, default='ingest'
+            stage whose statistics are returned
+
+        Returns
+        -------
+        DataFrame
+            one row per month (sorted), with columns :code:`count`,
+            :code:`positive_rate`, :code:`fill_rate:{field}`, and
+            :code:`score:{quantile}`
+        """
+        from pandas import DataFrame
+        rows = {}
+        for month, stages in sorted(self.series.items()):
+            if stage not in stages:
+                continue
+            stats = stages[stage]
+            rows[month] = {
+                'count': stats['count'],
+                'positive_rate': stats['positive_rate'],
+                **{
+                    f'fill_rate:{field}': rate
+                    for field, rate in stats['fill_rates'].items()
+                },
+                **{
+                    f'score:{q}': value
+                    for q, value in stats.get('score_quantiles', {}).items()
+                },
+            }
+        return DataFrame.from_dict(rows, orient='index')
+
+    def check(self, month: str, stage: str = 'ingest', /) -> DataFrame:
+        """Check a month's statistics against its baseline
+
+        Parameters
+        ----------
+        month: str
+            month, as YYYY-mm
+        stage: str, optional, default='ingest'
+            stage whose statistics are checked
+
+        Returns
+        -------
+        DataFrame
+            one row per check, with columns :code:`month`, :code:`stage`,
+            :code:`check`, :code:`value`, :code:`baseline`, and :code:`alert`.
+            Empty, if the month (or its baseline) isn't recorded.
+        """
+        from pandas import DataFrame
+
+        # get month's statistics, and its baseline
+        columns = self.__class__.columns
+        series = self.series
+        stats = series.get(month, {}).get(stage)
+        base = [
+            series[prev][stage]
+            for prev in sorted(series)
+            if prev < month and stage in series[prev]
+        ][-self._window:]
+        if stats is None or not base:
+            return DataFrame([], columns=columns)
+        rows = []
+
+        # check article count
+        base_count = median(prev['count'] for prev in base)
+        ratio = stats['count'] / base_count if base_count else 1.
+        rows.append([
+            'count',
+            stats['count'],
+            base_count,
+            not self._min_count_ratio <= ratio <= self._max_count_ratio,
+        ])
+
+        # check positive rate
+        base_rate = median(prev['positive_rate'] for prev in base)
+        rows.append([
+            'positive_rate',
+            stats['positive_rate'],
+            base_rate,
+            bool(base_rate)
+            and abs(stats['positive_rate'] - base_rate) / base_rate
+            > self._max_positive_shift,
+        ])
+
+        # check each field's fill rate, and token-length distribution
+        for field, rate in stats['fill_rates'].items():
+            base_fills = [
+                prev['fill_rates'][field]
+                for prev in base
+                if field in prev['fill_rates']
+            ]
+            if not base_fills:
+                continue
+            base_fill = median(base_fills)
+            rows.append([
+                f'fill_rate:{field}',
+                rate,
+                base_fill,
+                base_fill - rate > self._max_fill_drop,
+            ])
+            psi = self.__class__.psi(
+                stats['token_hist'][field],
+                [
+                    sum(counts)
+                    for counts in zip(*[
+                        prev['token_hist'][field]
+                        for prev in base
+                        if field in prev['token_hist']
+                    ])
+                ],
+            )
+            rows.append([f'token_psi:{field}', psi, 0., psi > self._max_psi])
+
+        # check median score
+        base_scores = [
+            prev['score_quantiles']
+            for prev in base
+            if 'score_quantiles' in prev
+        ]
+        if 'score_quantiles' in stats and base_scores:
+            base_median = median(prev['0.5'] for prev in base_scores)
+            base_iqr = median(
+                prev['0.75'] - prev['0.25'] for prev in base_scores
+            ) or 1.
+            shift = abs(stats['score_quantiles']['0.5'] - base_median) \
+                / base_iqr
+            rows.append([
+                'score_shift',
+                shift,
+                0.,
+                shift > self._max_score_shift,
+            ])
+
+        # return
+        return DataFrame(
+            [[month, stage, *row] for row in rows],
+            columns=columns,
+        ).astype({'alert': bool})
+
+    @classmethod
+    def psi(cls, counts: list[int], base_counts: list[int], /) -> float:
+        """Compute the population stability index of a histogram
+
+        Parameters
+        ----------
+        counts: list[int]
+            histogram
+        base_counts: list[int]
+            baseline histogram, with the same bins
+
+        Returns
+        -------
+        float
+            population stability index (0 if either histogram is empty)
+        """
+        total = sum(counts)
+        base_total = sum(base_counts)
+        if not total or not base_total:
+            return 0.
+        eps = 1E-4
+        return round(sum(
+            (p - q) * log(p / q)
+            for p, q in (
+                (max(count / total, eps), max(base / base_total, eps))
+                for count, base in zip(counts, base_counts)
+            )
+        ), 6)
+
+    @contextmanager
+    def _edit(self) -> Iterator[dict[str, Any]]:
+        """Read, modify, and atomically rewrite the file, under a lock"""
+        makedirs(path.dirname(self.fname) or '.', exist_ok=True)
+        with open(f'{self.fname}.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                series = self.series
+                yield series
+                with atomic(self.fname) as tmp_fname, \
+                        open(tmp_fname, 'w') as file:
+                    json.dump(series, file, separators=(',', ':'))
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
@@ -0,0 +1,521 @@
+"""Run the live pipeline in a single process"""
+
+from __future__ import annotations
+
+from argparse import ArgumentParser
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from hashlib import sha256
+from inspect import signature
+import json
+from os import path
+from time import time
+from typing import TYPE_CHECKING, Any, Callable
+
+from litmon.cli.daily import DailyIngester
+from litmon.cli.dbase import DBaseBuilder
+from litmon.cli.eval import ModelUser
+from litmon.cli.fit import ModelFitter
+from litmon.utils import atomic, drange, read_articles, unpack
+from litmon.utils.config import ConfigSchema
+from litmon.utils.genconf import genconf
+
+# heavy dependencies are imported when first used, for fast startup
+if TYPE_CHECKING:
+    from pandas import DataFrame
+
+    from litmon.model import ArticleScorer
+
+
+class Pipeline:
+    """Run the live pipeline in a single process
+
+    This replaces running :code:`genconf`, :code:`dbase_eval`, :code:`fit`, and
+    :code:`eval` as four separate processes that hand off data through files.
+    Instead, the stages run as a DAG in one process:
+
+    .. code-block:: text
+
+        genconf --> dbase --> eval
+               \\--> fit --/
+
+    Stages run as soon as their inputs are ready (so :code:`dbase` and
+    :code:`fit` run concurrently), and pass their outputs (databases and the
+    trained :class:`~litmon.model.ArticleScorer`) to downstream stages in
+    memory. Artifacts (e.g. the trained model) are still persisted, but in the
+    background, while downstream stages run.
+
+    The configuration of every stage is validated by :code:`genconf` (see
+    :class:`~litmon.utils.config.ConfigSchema`), so a bad configuration fails
+    before any articles are downloaded.
+
+    Months whose every day was already ingested by
+    :class:`~litmon.cli.daily.DailyIngester` aren't re-queried or re-scored:
+    :code:`dbase` reads the month's accumulated daily database, and
+    :code:`eval` re-writes the month's results from its rolling top-scoring
+    articles (see :meth:`~litmon.cli.daily.DailyIngester.materialize`), i.e.
+    the monthly report is a materialized view of the daily store. (Their
+    articles aren't added to drift monitors again, either.)
+
+    Each stage also computes a content hash of its inputs (its resolved
+    configuration, with defaults filled in, plus the hashes of its upstream
+    stages, plus the training data for :code:`fit`). If a stage's hash matches
+    the hash recorded in :code:`cache_fname` from a previous run, and its
+    artifacts exist, then the stage is skipped and its artifacts are loaded
+    instead.
+
+    Parameters
+    ----------
+    template_fname: str, optional, default='config/live-template.yaml'
+        template configuration file, passed to
+        :meth:`litmon.utils.genconf.genconf`
+    config: dict[str, Any], optional, default=None
+        configuration. If provided, this is used instead of generating a config
+        from :code:`template_fname`.
+    cache_fname: str, optional, default='data/pipeline-cache.json'
+        file recording the input hash of each stage
+    verbose: bool, optional, default=True
+        write running status to console
+
+    Attributes
+    ----------
+    outputs: dict[str, Any]
+        output of each stage
+    hashes: dict[str, str]
+        input hash of each stage
+    skipped: list[str]
+        stages that were skipped, because their inputs were unchanged
+    """
+
+    # dependencies of each stage
+    stages = {
+        'genconf': [],
+        'dbase': ['genconf'],
+        'fit': ['genconf'],
+        'eval': ['dbase', 'fit'],
+    }
+
+    # class constructed by each stage, and the config fields it unpacks
+    fields = {
+        'dbase': (
+            'litmon.cli.dbase.DBaseBuilder',
+            ['query', 'user', 'eval_dates', 'dbase_eval'],
+        ),
+        'fit': ('litmon.cli.fit.ModelFitter', ['fit_dates', 'fit', 'fback']),
+        'eval': ('litmon.cli.eval.ModelUser', ['eval_dates', 'eval']),
+    }
+
+    def __init__(
+        self,
+        /,
+        template_fname: str = 'config/live-template.yaml',
+        *,
+        config: dict[str, Any] = None,
+        cache_fname: str = 'data/pipeline-cache.json',
+        verbose: bool = True,
+    ):
+        # save parameters
+        self._template_fname = template_fname
+        self._config = config
+        self._verbose = verbose
+
+        # load cache
+        cache = (
+            json.load(open(cache_fname, 'r'))
+            if path.isfile(cache_fname)
+            else {}
+        )
+
+        # initialize state
+        self.outputs: dict[str, Any] = {}
+        self.hashes: dict[str, str] = {}
+        self.skipped: list[str] = []
+        self._cache = cache
+        self._persisting: list[Future] = []
+
+        # run stages as their dependencies complete
+        pending = dict(self.stages)
+        running: dict[Future, str] = {}
+        with ThreadPoolExecutor() as pool:
+            self._pool = pool
+            while pending or running:
+
+                # launch ready stages
+                for stage, deps in list(pending.items()):
+                    if all(dep in self.outputs for dep in deps):
+                        running[pool.submit(self._run, stage)] = stage
+                        del pending[stage]
+
+                # collect completed stages
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    self.outputs[stage], self.hashes[stage] = future.result()
+
+            # finish persisting artifacts
+            for future in self._persisting:
+                future.result()
+
+        # save cache
+        with atomic(cache_fname) as tmp_fname, open(tmp_fname, 'w') as file:
+            json.dump(self.hashes, file, indent=4)
+
+    def _run(self, stage: str) -> tuple[Any, str]:
+        """Run a single stage
+
+        Parameters
+        ----------
+        stage: str
+            name of stage
+
+        Returns
+        -------
+        Any
+            output of stage
+        str
+            input hash of stage
+        """
+        start = time()
+        output, digest = getattr(self, f'_{stage}')()
+        if self._verbose:
+            status = 'skipped' if stage in self.skipped else 'ran'
+            print(f'{stage}: {status} in {time() - start:.1f}s')
+        return output, digest
+
+    def _genconf(self) -> tuple[dict[str, Any], str]:
+        """Generate and validate configuration
+
+        Raises
+        ------
+        ConfigError
+            if the configuration of any stage is invalid
+
+        Returns
+        -------
+        dict[str, Any]
+            configuration
+        str
+            hash of configuration
+        """
+        config = (
+            self._config
+            if self._config is not None
+            else genconf(self._template_fname)
+        )
+        for stage in self.__class__.fields:
+            self.__class__._resolve(config, stage)
+        return config, self.__class__.hash(config)
+
+    def _dbase(self) -> tuple[dict[tuple[int, int], DataFrame], str]:
+        """Build evaluation databases
+
+        Returns
+        -------
+        dict[tuple[int, int], DataFrame]
+            database for each month
+        str
+            input hash
+        """
+
+        # get configuration
+        config, resolved = self.__class__._resolve(
+            self.outputs['genconf'],
+            'dbase',
+        )
+        digest = self.__class__.hash('dbase', resolved)
+
+        # get database filenames
+        dbase_dir = resolved['dbase_dir']
+        dbase_suffix = resolved['dbase_suffix']
+        fnames = {
+            (year, month):
+                f'{dbase_dir}/{year:4d}-{month:02d}{dbase_suffix}.csv'
+            for year, month in drange(config['date_range'])
+        }
+
+        # skip if unchanged, or if every day was ingested by daily runs
+        if self._is_cached('dbase', digest, fnames.values()) \
+                or self.__class__.is_daily(
+                    config['date_range'],
+                    dbase_dir=dbase_dir,
+                    dbase_suffix=dbase_suffix,
+                ):
+            from ezazure import Azure
+            for fname in fnames.values():
+                Azure().download(fname)
+            return {
+                key: read_articles(fname)
+                for key, fname in fnames.items()
+            }, digest
+
+        # build databases
+        return DBaseBuilder(**config, keep=True).dbases, digest
+
+    def _fit(self) -> tuple[ArticleScorer, str]:
+        """Train model
+
+        Returns
+        -------
+        ArticleScorer
+            trained model
+        str
+            input hash
+        """
+
+        # get configuration
+        config, resolved = self.__class__._resolve(
+            self.outputs['genconf'],
+            'fit',
+        )
+        config.pop('model_fname', None)
+        model_fname = resolved['model_fname']
+
+        # load data
+        data_kwargs = {
+            key: value
+            for key, value in config.items()
+            if key in signature(ModelFitter.load_data).parameters
+        }
+        from pandas.util import hash_pandas_object
+
+        from litmon.model import ArticleScorer
+        data = ModelFitter.load_data(**data_kwargs)
+        data_hash = sha256(
+            hash_pandas_object(data, index=False).to_numpy().tobytes()
+        ).hexdigest()
+        digest = self.__class__.hash('fit', resolved, data_hash)
+
+        # skip if unchanged
+        model_fnames = [f'{model_fname}.bin', f'{model_fname}.pickle']
+        if self._is_cached('fit', digest, model_fnames):
+            return ArticleScorer.load(model_fname), digest
+
+        # fit model, save in background
+        model_kwargs = {
+            key: value
+            for key, value in config.items()
+            if key not in data_kwargs
+        }
+        model = ModelFitter(
+            **data_kwargs,
+            data=data,
+            model_fname=None,
+            **model_kwargs,
+        ).model
+        self._persist(model.save, model_fname)
+        return model, digest
+
+    def _eval(self) -> tuple[dict[tuple[int, int], DataFrame], str]:
+        """Score articles, write results
+
+        Returns
+        -------
+        dict[tuple[int, int], DataFrame]
+            top-scoring articles for each month
+        str
+            input hash
+        """
+
+        # get configuration
+        config, resolved = self.__class__._resolve(
+            self.outputs['genconf'],
+            'eval',
+        )
+        digest = self.__class__.hash(
+            'eval',
+            resolved,
+            self.hashes['dbase'],
+            self.hashes['fit'],
+        )
+
+        # get results filenames
+        results_dir = resolved['results_dir']
+        results_suffix = resolved['results_suffix']
+        extensions = [
+            ext
+            for ext, flag in [('csv', 'write_csv'), ('xlsx', 'write_xlsx')]
+            if resolved[flag]
+        ]
+        fnames = [
+            f'{results_dir}/{year}-{month:02d}{results_suffix}.{ext}'
+            for year, month in drange(config['date_range'])
+            for ext in extensions
+        ]
+
+        # skip if unchanged
+        if self._is_cached('eval', digest, fnames):
+            return None, digest
+
+        # materialize results of months ingested by daily runs
+        _, dbase_resolved = self.__class__._resolve(
+            self.outputs['genconf'],
+            'dbase',
+        )
+        if self.__class__.is_daily(
+            config['date_range'],
+            dbase_dir=dbase_resolved['dbase_dir'],
+            dbase_suffix=dbase_resolved['dbase_suffix'],
+        ):
+            topk_suffix = self.outputs['genconf'] \
+                .get('daily', {}) \
+                .get('topk_suffix', '-topk')
+            return {
+                (year, month): DailyIngester.materialize(
+                    year,
+                    month,
+                    results_dir=results_dir,
+                    results_suffix=results_suffix,
+                    topk_suffix=topk_suffix,
+                    write_csv=resolved['write_csv'],
+                    write_xlsx=resolved['write_xlsx'],
+                )
+                for year, month in drange(config['date_range'])
+            }, digest
+
+        # score articles
+        return ModelUser(
+            **config,
+            dbases=self.outputs['dbase'],
+            model=self.outputs['fit'],
+        ).results, digest
+
+    def _is_cached(self, stage: str, digest: str, fnames: list[str]) -> bool:
+        """Check if stage can be skipped
+
+        Parameters
+        ----------
+        stage: str
+            name of stage
+        digest: str
+            input hash of stage
+        fnames: list[str]
+            artifacts that must exist to skip stage
+
+        Returns
+        -------
+        bool
+            whether the stage can be skipped
+        """
+        cached = (
+            self._cache.get(stage) == digest
+            and all(path.isfile(fname) for fname in fnames)
+        )
+        if cached:
+            self.skipped.append(stage)
+        return cached
+
+    def _persist(self, func: Callable, /, *args: Any):
+        """Persist artifact in background
+
+        Parameters
+        ----------
+        func: Callable
+            function that persists the artifact
+        *args: Any
+            passed to :code:`func`
+        """
+        self._persisting.append(self._pool.submit(func, *args))
+
+    @classmethod
+    def is_daily(
+        cls,
+        date_range: str,
+        /,
+        *,
+        dbase_dir: str,
+        dbase_suffix: str,
+    ) -> bool:
+        """Check if every day of every month was ingested by daily runs
+
+        Parameters
+        ----------
+        date_range: str
+            months to check. Format: YYYY/mm-YYYY/mm
+        dbase_dir: str
+            directory of database files
+        dbase_suffix: str
+            suffix of each database file
+
+        Returns
+        -------
+        bool
+            whether every month's database is a complete daily store (see
+            :meth:`~litmon.cli.daily.DailyIngester.ingested`)
+        """
+        months = list(drange(date_range))
+        return len(months) > 0 and all(
+            DailyIngester.ingested(
+                year,
+                month,
+                dbase_dir=dbase_dir,
+                dbase_suffix=dbase_suffix,
+            )
+            for year, month in months
+        )
+
+    @classmethod
+    def hash(cls, /, *args: Any) -> str:
+        """Compute content hash
+
+        Parameters
+        ----------
+        *args: Any
+            json-serializable objects to hash
+
+        Returns
+        -------
+        str
+            hash of :code:`args`
+        """
+        return sha256(
+            json.dumps(args, sort_keys=True, default=str).encode()
+        ).hexdigest()
+
+    @classmethod
+    def _resolve(
+        cls,
+        config: dict[str, Any],
+        stage: str,
+        /,
+    ) -> tuple[dict[str, Any], dict[str, Any]]:
+        """Unpack and validate the configuration of a stage
+
+        Parameters
+        ----------
+        config: dict[str, Any]
+            full configuration
+        stage: str
+            name of stage
+
+        Returns
+        -------
+        dict[str, Any]
+            unpacked configuration
+        dict[str, Any]
+            resolved configuration, with defaults filled in
+        """
+        name, fields = cls.fields[stage]
+        config = unpack(config, fields)
+        return config, ConfigSchema(name).validate(config)
+
+
+# command-line interface
+if __name__ == '__main__':
+    parser = ArgumentParser('Run the live pipeline in a single process')
+    parser.add_argument(
+        '-t',
+        '--template_fname',
+        default='config/live-template.yaml',
+        help='Template configuration yaml file',
+    )
+    parser.add_argument(
+        '--cache_fname',
+        default='data/pipeline-cache.json',
+        help='File recording the input hash of each stage',
+    )
+    args = parser.parse_args()
+    Pipeline(args.template_fname, cache_fname=args.cache_fname)
@@ -0,0 +1,568 @@
+"""Evaluate PubMed boolean queries over stored articles"""
+
+from __future__ import annotations
+
+import re
+from typing import Any, Union
+
+from nptyping import NDArray
+from numpy import array, ones, searchsorted, zeros
+from pandas import DataFrame, DateOffset, Timestamp, isna
+from scipy.sparse import csc_matrix
+
+# parsed query: ('and' | 'or' | 'not', left, right), ('term', tokens, tag,
+# prefix), ('range', tag, start, stop)
+Node = tuple[Any, ...]
+
+
+class QueryFilter:
+    """Evaluate PubMed boolean queries over stored articles
+
+    PubMed queries (e.g. the :code:`query` of :code:`config/std.yaml`) can
+    otherwise only run server-side, so editing the query means re-downloading
+    every month. Instead, this indexes a stored (superset) corpus once, and
+    then evaluates any number of queries against it, each in milliseconds.
+
+    Each text field is indexed as a sparse (articles x terms) matrix, stored
+    by column (so each column is a posting list), over a shared sorted
+    vocabulary. A term is a single column lookup, and a wildcard (e.g.
+    :code:`mitochondri*`) is the range of columns that share its prefix,
+    found by binary search of the vocabulary. Phrases (e.g.
+    :code:`"regenerative medicine"`) are looked up term by term, and then
+    checked against the text of the remaining candidates.
+
+    The PubMed syntax is supported as follows:
+
+    #. :code:`AND`, :code:`OR`, and :code:`NOT` are evaluated left to right,
+       with equal precedence (as PubMed does). Parentheses group terms, and
+       adjacent terms are joined with :code:`AND`.
+    #. Terms are case-insensitive, and are split into words the same way as
+       the indexed text, so e.g. :code:`7-ketocholesterol` is searched as the
+       phrase :code:`"7 ketocholesterol"`.
+    #. Search tags restrict a term to some fields: :code:`[ti]`,
+       :code:`[ab]`, :code:`[tiab]`, :code:`[tw]`, and :code:`[all]` for
+       text, and :code:`[mh]`, :code:`[majr]`, :code:`[ot]`, and :code:`[kw]`
+       for keywords. Untagged terms search every indexed field.
+    #. Date tags (:code:`[dp]`, :code:`[edat]`, :code:`[pdat]`, ...) are
+       compared with :code:`publication_date`. Dates can be single
+       (:code:`2013/09 [dp]`) or ranges (:code:`2007 : 2025[dp]`).
+    #. :code:`hasabstract` matches articles with a non-empty abstract.
+    #. Other tags (e.g. :code:`english[la]`) refer to metadata that isn't
+       stored. These match every article if :code:`unindexed='match'`
+       (because the stored corpus was already pulled by a query that
+       applied them), or raise a :code:`ValueError` if
+       :code:`unindexed='raise'`.
+
+    Parameters
+    ----------
+    articles: DataFrame
+        articles to index
+    fields: list[str], optional, default=None
+        text columns to index. If None, use :code:`title`, :code:`abstract`,
+        and :code:`keywords`.
+    unindexed: str, optional, default='match'
+        how to evaluate search tags whose data isn't stored: :code:`'match'`
+        or :code:`'raise'`
+
+    Attributes
+    ----------
+    vocab: NDArray[(Any,), str]
+        sorted vocabulary, shared by every field's index
+    """
+
+    # fields searched by each text search tag
+    _text_tags = {
+        'ti': ['title'],
+        'ab': ['abstract'],
+        'tiab': ['title', 'abstract'],
+        'tw': None,
+        'all': None,
+        'mh': ['keywords'],
+        'majr': ['keywords'],
+        'mesh': ['keywords'],
+        'ot': ['keywords'],
+        'kw': ['keywords'],
+    }
+
+    # date search tags, all compared with publication_date
+    _date_tags = ['dp', 'pdat', 'edat', 'crdt', 'mhda', 'dcom', 'lr']
+
+    # pattern of indexed words
+    _word = re.compile(r'[a-z0-9]+')
+
+    # pattern of query tokens
+    _token = re.compile(r'\s*(?:"[^"]*"|[()]|\[[^\]]*\]|:|[^\s()"\[\]:]+)')
+
+    def __init__(
+        self,
+        articles: DataFrame,
+        /,
+        *,
+        fields: list[str] = None,
+        unindexed: str = 'match',
+    ):
+        # check parameters
+        if unindexed not in ['match', 'raise']:
+            raise ValueError(f'Unknown unindexed policy: {unindexed}')
+
+        # get default parameters
+        if fields is None:
+            fields = ['title', 'abstract', 'keywords']
+
+        # save parameters
+        self._articles = articles
+        self._fields = fields
+        self._unindexed = unindexed
+        self._size = articles.shape[0]
+
+        # tokenize each field, joining each document's words with spaces
+        self._text = {
+            field: array([
+                ' '.join(self.__class__.words(value))
+                for value in (
+                    articles[field]
+                    if field in articles
+                    else [''] * self._size
+                )
+            ], dtype=object)
+            for field in fields
+        }
+
+        # build shared, sorted vocabulary
+        vocab = set()
+        for text in self._text.values():
+            for doc in text:
+                vocab.update(doc.split())
+        self.vocab = array(sorted(vocab), dtype=str)
+
+        # build inverted index of each field
+        self._index = {
+            field: self._build_index(text)
+            for field, text in self._text.items()
+        }
+
+        # store non-text fields
+        self._has_abstract = (
+            array([
+                not isna(value) and bool(str(value).strip())
+                for value in articles['abstract']
+            ], dtype=bool)
+            if 'abstract' in articles
+            else ones(self._size, dtype=bool)
+        )
+        self._dates = (
+            articles['publication_date'].to_numpy(dtype='datetime64[ns]')
+            if 'publication_date' in articles
+            else None
+        )
+
+    def filter(self, query: Union[str, Node], /) -> DataFrame:
+        """Get the indexed articles that match a query
+
+        Parameters
+        ----------
+        query: str | Node
+            PubMed boolean query, or a query parsed with :meth:`parse`
+
+        Returns
+        -------
+        DataFrame
+            matching articles
+        """
+        return self._articles[self.match(query)]
+
+    def match(self, query: Union[str, Node], /) -> NDArray[(Any,), bool]:
+        """Evaluate a query over the indexed articles
+
+        Parameters
+        ----------
+        query: str | Node
+            PubMed boolean query, or a query parsed with :meth:`parse`
+
+        Returns
+        -------
+        NDArray[(Any,), bool]
+            whether each indexed article matches
+
+        Raises
+        ------
+        ValueError
+            if the query can't be parsed, or if it uses a search tag that
+            can't be evaluated
+        """
+        if isinstance(query, str):
+            query = self.__class__.parse(query)
+        return self._evaluate(query)
+
+    @classmethod
+    def parse(cls, query: str, /) -> Node:
+        """Parse a PubMed boolean query
+
+        Parameters
+        ----------
+        query: str
+            PubMed boolean query
+
+        Returns
+        -------
+        Node
+            parsed query, as nested tuples:
+            :code:`('and' | 'or' | 'not', left, right)`,
+            :code:`('term', words, tag, is_prefix)`, or
+            :code:`('range', tag, start, stop)`
+
+        Raises
+        ------
+        ValueError
+            if the query is malformed
+        """
+
+        # split query into tokens
+        tokens = []
+        position = 0
+        query = query.strip()
+        while position < len(query):
+            found = cls._token.match(query, position)
+            if found is None or found.end() == position:
+                raise ValueError(f'Cannot parse query at: {query[position:]}')
+            tokens.append(found.group().strip())
+            position = found.end()
+
+        # parse tokens
+        node, position = cls._parse_expr(tokens, 0)
+        if position != len(tokens):
+            raise ValueError(f'Unexpected {tokens[position]} in query')
+        return node
+
+    @classmethod
+    def words(cls, value: Any, /) -> list[str]:
+        """Split a field's value into lowercase words
+
+        Parameters
+        ----------
+        value: Any
+            field value (missing values have no words)
+
+        Returns
+        -------
+        list[str]
+            words of value
+        """
+        if not isinstance(value, (list, tuple)) and isna(value):
+            return []
+        return cls._word.findall(str(value).lower())
+
+    def _build_index(self, text: NDArray[(Any,), str]) -> csc_matrix:
+        """Build (articles x vocab) binary presence matrix, by column
+
+        Parameters
+        ----------
+        text: NDArray[(Any,), str]
+            space-joined words of each article
+
+        Returns
+        -------
+        csc_matrix
+            presence of each vocabulary term in each article
+        """
+        rows, cols = [], []
+        for row, doc in enumerate(text):
+            terms = sorted(set(doc.split()))
+            rows += [row] * len(terms)
+            cols += terms
+        cols = searchsorted(self.vocab, array(cols, dtype=str)) \
+            if cols else array([], dtype=int)
+        return csc_matrix(
+            (ones(len(rows), dtype=bool), (array(rows, dtype=int), cols)),
+            shape=(self._size, self.vocab.size),
+        )
+
+    def _evaluate(self, node: Node) -> NDArray[(Any,), bool]:
+        """Evaluate parsed query
+
+        Parameters
+        ----------
+        node: Node
+            parsed query (see :meth:`parse`)
+
+        Returns
+        -------
+        NDArray[(Any,), bool]
+            whether each indexed article matches
+        """
+
+        # evaluate boolean operators
+        if node[0] in ['and', 'or', 'not']:
+            left = self._evaluate(node[1])
+            right = self._evaluate(node[2])
+            if node[0] == 'and':
+                return left & right
+            if node[0] == 'or':
+                return left | right
+            return left & ~right
+
+        # evaluate date ranges
+        if node[0] == 'range':
+            return self._match_dates(*node[1:])
+
+        # evaluate terms
+        _, words, tag, is_prefix = node
+        if tag is None and not is_prefix and words == ['hasabstract']:
+            return self._has_abstract.copy()
+        if tag in self.__class__._date_tags:
+            return self._match_dates(tag, ' '.join(words), None)
+        if tag is not None and tag not in self.__class__._text_tags:
+            return self._match_unindexed(tag)
+        fields = (
+            self.__class__._text_tags[tag]
+            if tag is not None
+            else None
+        ) or self._fields
+        missing = [field for field in fields if field not in self._index]
+        if missing:
+            if self._unindexed == 'raise':
+                raise ValueError(f'Fields not indexed: {missing}')
+            fields = [field for field in fields if field in self._index]
+        matches = zeros(self._size, dtype=bool)
+        for field in fields:
+            matches |= self._match_words(field, words, is_prefix)
+        return matches
+
+    def _match_dates(
+        self,
+        tag: str,
+        start: str,
+        stop: str = None,
+    ) -> NDArray[(Any,), bool]:
+        """Match articles by publication date
+
+        Parameters
+        ----------
+        tag: str
+            date search tag
+        start: str
+            first date. Format: YYYY, YYYY/mm, or YYYY/mm/dd
+        stop: str, optional, default=None
+            last date (inclusive). If None, use :code:`start`.
+
+        Returns
+        -------
+        NDArray[(Any,), bool]
+            whether each article was published in the date range
+        """
+        if tag not in self.__class__._date_tags:
+            return self._match_unindexed(tag)
+        if self._dates is None:
+            return self._match_unindexed(tag)
+        first = self.__class__._date_bounds(start)[0]
+        last = self.__class__._date_bounds(stop or start)[1]
+        return (self._dates >= first) & (self._dates < last)
+
+    def _match_unindexed(self, tag: str) -> NDArray[(Any,), bool]:
+        """Match a search tag whose data isn't stored
+
+        Parameters
+        ----------
+        tag: str
+            search tag
+
+        Returns
+        -------
+        NDArray[(Any,), bool]
+            every article matches
+
+        Raises
+        ------
+        ValueError
+            if :code:`unindexed='raise'`
+        """
+        if self._unindexed == 'raise':
+            raise ValueError(f'Search tag [{tag}] is not indexed')
+        return ones(self._size, dtype=bool)
+
+    def _match_words(
+        self,
+        field: str,
+        words: list[str],
+        is_prefix: bool,
+    ) -> NDArray[(Any,), bool]:
+        """Match a term, prefix, or phrase in one field
+
+        Parameters
+        ----------
+        field: str
+            indexed field
+        words: list[str]
+            words of term. If there are several, they're matched as a phrase.
+        is_prefix: bool
+            whether the last word is a prefix (wildcard)
+
+        Returns
+        -------
+        NDArray[(Any,), bool]
+            whether each article matches
+        """
+
+        # look up each word's posting lists
+        index = self._index[field]
+        matches = ones(self._size, dtype=bool)
+        for num, word in enumerate(words):
+            start = searchsorted(self.vocab, word, side='left')
+            if is_prefix and num == len(words) - 1:
+                stop = searchsorted(self.vocab, word + '\uffff', side='left')
+            else:
+                stop = start + int(
+                    start < self.vocab.size and self.vocab[start] == word
+                )
+            found = zeros(self._size, dtype=bool)
+            found[index[:, start:stop].indices] = True
+            matches &= found
+
+        # check phrases in the candidates' text
+        if len(words) > 1:
+            text = self._text[field]
+            phrase = ' '.join(words)
+            pattern = re.compile(
+                rf'(?:^| ){re.escape(phrase)}{"" if is_prefix else "(?: |$)"}'
+            )
+            for row in matches.nonzero()[0]:
+                matches[row] = pattern.search(text[row]) is not None
+
+        # return
+        return matches
+
+    @classmethod
+    def _date_bounds(cls, value: str) -> tuple[Timestamp, Timestamp]:
+        """Get the first and (exclusive) last instant of a date
+
+        Parameters
+        ----------
+        value: str
+            date. Format: YYYY, YYYY/mm, or YYYY/mm/dd
+
+        Returns
+        -------
+        Timestamp
+            start of date
+        Timestamp
+            start of next date
+        """
+        parts = [int(part) for part in re.findall(r'\d+', value)]
+        if not 1 <= len(parts) <= 3:
+            raise ValueError(f'Cannot parse date: {value}')
+        year, month, day = (parts + [1, 1])[0:3]
+        start = Timestamp(year, month, day)
+        step = ['years', 'months', 'days'][len(parts) - 1]
+        return start, start + DateOffset(**{step: 1})
+
+    @classmethod
+    def _parse_expr(cls, tokens: list[str], position: int) -> tuple[Node, int]:
+        """Parse operands joined by operators, left to right
+
+        Parameters
+        ----------
+        tokens: list[str]
+            query tokens
+        position: int
+            position of first token of expression
+
+        Returns
+        -------
+        Node
+            parsed expression
+        int
+            position of first token after expression
+        """
+        node, position = cls._parse_operand(tokens, position)
+        while position < len(tokens) and tokens[position] != ')':
+            operator = 'and'
+            if tokens[position] in ['AND', 'OR', 'NOT']:
+                operator = tokens[position].lower()
+                position += 1
+            right, position = cls._parse_operand(tokens, position)
+            node = (operator, node, right)
+        return node, position
+
+    @classmethod
+    def _parse_operand(
+        cls,
+        tokens: list[str],
+        position: int,
+    ) -> tuple[Node, int]:
+        """Parse a parenthesized expression, term, phrase, or date range
+
+        Parameters
+        ----------
+        tokens: list[str]
+            query tokens
+        position: int
+            position of first token of operand
+
+        Returns
+        -------
+        Node
+            parsed operand
+        int
+            position of first token after operand
+        """
+
+        # check for end of query
+        if position >= len(tokens):
+            raise ValueError('Unexpected end of query')
+        token = tokens[position]
+
+        # parse parenthesized expression
+        if token == '(':
+            node, position = cls._parse_expr(tokens, position + 1)
+            if position >= len(tokens) or tokens[position] != ')':
+                raise ValueError('Unbalanced parentheses in query')
+            return node, position + 1
+        if token in [')', ':', 'AND', 'OR', 'NOT'] or token.startswith('['):
+            raise ValueError(f'Unexpected {token} in query')
+        position += 1
+
+        # parse date range
+        if position < len(tokens) and tokens[position] == ':':
+            if position + 1 >= len(tokens):
+                raise ValueError('Unexpected end of query')
+            stop = tokens[position + 1]
+            tag, position = cls._parse_tag(tokens, position + 2)
+            if tag is None:
+                raise ValueError(f'Date range {token} : {stop} has no tag')
+            return ('range', tag, token, stop), position
+
+        # parse term or phrase
+        tag, position = cls._parse_tag(tokens, position)
+        text = token.strip('"')
+        is_prefix = text.endswith('*')
+        words = cls.words(text.rstrip('*'))
+        if not words:
+            raise ValueError(f'Empty term in query: {token}')
+        return ('term', words, tag, is_prefix), position
+
+    @classmethod
+    def _parse_tag(
+        cls,
+        tokens: list[str],
+        position: int,
+    ) -> tuple[str, int]:
+        """Parse an optional search tag, e.g. :code:`[tiab]`
+
+        Parameters
+        ----------
+        tokens: list[str]
+            query tokens
+        position: int
+            position of possible tag
+
+        Returns
+        -------
+        str
+            lowercase tag, without brackets (or None, if there isn't one)
+        int
+            position of first token after tag
+        """
+        if position < len(tokens) and tokens[position].startswith('['):
+            tag = tokens[position][1:-1].strip().lower()
+            return tag.split(':')[0], position + 1
+        return None, position
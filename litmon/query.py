@@ -2,10 +2,16 @@
 
 from __future__ import annotations
 
-from retry import retry
-from pandas import DataFrame
-from pymed import PubMed
-from pymed.article import PubMedArticle
+from time import monotonic
+from typing import TYPE_CHECKING, AsyncIterator, Iterable, Union
+from xml.etree import ElementTree
+
+# heavy dependencies are imported when first used, for fast startup
+if TYPE_CHECKING:
+    from pandas import DataFrame
+    from pymed.article import PubMedArticle
+
+    from litmon.utils.session import RequestMetrics
 
 
 class PubMedQuerier:
@@ -21,6 +27,12 @@ class PubMedQuerier:
     max_results: int, optional, default=1000
         Maximum number of PubMed articles retrieved in any single query.
         Required by the :code:`pymed.PubMed` tool
+    base_url: str, optional, default='https://eutils.ncbi.nlm.nih.gov'
+        E-utilities base url. Change this to test against a local server.
+    retry_kwargs: dict, optional, default={}
+        passed to :class:`~litmon.utils.session.ResilientSession` on
+        :code:`__init__()`, to configure backoff, the retry budget, and the
+        circuit breaker
 
     Attributes
     ----------
@@ -28,6 +40,9 @@ class PubMedQuerier:
         total number of articles queried by this instance
     header: list[str]
         name of each field pulled from pubmed
+    metrics: RequestMetrics
+        counters for attempts, latency, and bytes of all requests made by this
+        instance
     """
     def __init__(
         self,
@@ -36,11 +51,21 @@ class PubMedQuerier:
         tool: str,
         *,
         max_results: int = 1000,
+        base_url: str = 'https://eutils.ncbi.nlm.nih.gov',
+        retry_kwargs: dict = {},
     ):
+        from pymed.article import PubMedArticle
+
+        from litmon.utils.pubmed import ResilientPubMed
+        from litmon.utils.session import ResilientSession
+
         # initialize tool
-        self._pubmed = PubMed(
+        self._session = ResilientSession(**retry_kwargs)
+        self._pubmed = ResilientPubMed(
             tool=tool,
             email=email,
+            session=self._session,
+            base_url=base_url,
         )
 
         # get file header
@@ -57,47 +82,463 @@ class PubMedQuerier:
         # initialize count of articles
         self.count = 0
 
-    @retry(delay=3)
-    def query(self, query: str, /) -> DataFrame:
+        # initialize progress of partially-downloaded query
+        self._partial = None
+
+    @property
+    def metrics(self) -> RequestMetrics:
+        """Counters for all requests made by this instance"""
+        return self._session.metrics
+
+    def query(
+        self,
+        query: str,
+        /,
+        *,
+        search_params: dict[str, str] = None,
+    ) -> DataFrame:
         """Query PubMed servers
 
-        This function is encased in an infinite retry loop, which is necessary
-        due to frequent connection interruptions or failures to properly
-        download data.
+        Each request is retried with exponential backoff (see
+        :class:`~litmon.utils.session.ResilientSession`). If a request still
+        fails, the error is raised, but the batches that were already
+        downloaded are kept: calling this function again with the same query
+        resumes from the first batch that failed.
 
         Parameters
         ----------
         query: str
             query to send to PubMed servers
+        search_params: dict[str, str], optional, default=None
+            extra E-utilities parameters for the search request, e.g.
+            :code:`{'datetype': 'mdat', 'mindate': '2020/01/01', 'maxdate':
+            '2020/01/31'}` to only get records modified in January 2020
 
         Returns
         -------
         DataFrame
-            resulting articles
+            resulting articles. :code:`publication_date` is a
+            :code:`datetime64` column.
         """
+        from pymed.helpers import batches
 
-        # query pubmed
-        articles_it = self._pubmed.query(
-            query,
-            max_results=self._max_results,
-        )
+        # resume partially-downloaded query, or get article ids
+        key = [query, search_params]
+        if self._partial is not None and self._partial['query'] == key:
+            article_ids = self._partial['article_ids']
+            rows = self._partial['rows']
+        else:
+            parameters = self._pubmed.parameters
+            self._pubmed.parameters = parameters | (search_params or {})
+            try:
+                article_ids = self._pubmed._getArticleIds(
+                    query=query,
+                    max_results=self._max_results,
+                )
+            finally:
+                self._pubmed.parameters = parameters
+            rows = []
+            self._partial = {
+                'query': key,
+                'article_ids': article_ids,
+                'rows': rows,
+                'fetched': 0,
+            }
+
+        # download each batch of articles
+        for batch in batches(article_ids[self._partial['fetched']:], 250):
+            rows.extend(self._rows(
+                self._pubmed._getArticles(article_ids=batch),
+            ))
+            self._partial['fetched'] += len(batch)
 
         # convert to df
-        articles_df = DataFrame(
-            [
-                [
-                    getattr(article, field)
-                    if hasattr(article, field)
-                    else ''
-                    for field in self.header
-                ]
-                for article in articles_it
-            ],
-            columns=self.header,
-        )
+        self._partial = None
+        articles_df = self._frame(rows)
 
         # update count of articles pulled
         self.count += articles_df.shape[0]
 
         # return
         return articles_df
+
+    def _rows(self, articles: Iterable[PubMedArticle], /) -> list[list]:
+        """Get the value of each header field of each article
+
+        Parameters
+        ----------
+        articles: Iterable[PubMedArticle]
+            parsed articles
+
+        Returns
+        -------
+        list[list]
+            one row per article, with one value per field in :attr:`header`.
+            Missing fields are empty strings.
+        """
+        return [
+            [
+                getattr(article, field)
+                if hasattr(article, field)
+                else ''
+                for field in self.header
+            ]
+            for article in articles
+        ]
+
+    def _frame(self, rows: list[list], /) -> DataFrame:
+        """Convert rows of articles to a df
+
+        Parameters
+        ----------
+        rows: list[list]
+            rows of articles (see :meth:`_rows`)
+
+        Returns
+        -------
+        DataFrame
+            articles, with a :code:`datetime64` publication date (missing
+            dates become NaT)
+        """
+        from pandas import DataFrame, to_datetime
+        articles_df = DataFrame(rows, columns=self.header)
+        articles_df['publication_date'] = to_datetime(
+            articles_df['publication_date'],
+            errors='coerce',
+        )
+        return articles_df
+
+
+class _RateLimiter:
+    """Space out requests, so that at most :code:`rate` start each second
+
+    Each call to :meth:`wait` reserves the next free slot, and sleeps until
+    it. Reserving doesn't await, so no lock is needed within an event loop.
+
+    Parameters
+    ----------
+    rate: float
+        maximum number of requests per second
+    """
+    def __init__(self, rate: float, /):
+        self._interval = 1 / rate
+        self._next = 0.
+
+    async def wait(self):
+        """Wait for the next free slot"""
+        import asyncio
+
+        now = monotonic()
+        slot = max(now, self._next)
+        self._next = slot + self._interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class AsyncPubMedQuerier(PubMedQuerier):
+    """Asyncio-native PubMed querier
+
+    This has the same parameters, attributes, and output schema as
+    :class:`PubMedQuerier`, but :meth:`query` is a coroutine, and
+    :meth:`stream` yields batches of articles as they arrive. E.g.
+
+    .. code-block:: python
+
+        querier = AsyncPubMedQuerier(email, tool, max_concurrency=3)
+        articles = await querier.query('aging AND (2020/01/01 [edat])')
+        async for batch in querier.stream('aging AND (2020/01 [edat])'):
+            ...
+
+    Requests share the querier's pooled, resilient session (see
+    :class:`~litmon.utils.session.ResilientSession`), and each blocking
+    request runs in a worker thread. At most :code:`max_concurrency` requests
+    are in flight at once, and requests are started at most
+    :code:`rate_limit` times per second, as required by NCBI (3 per second,
+    or 10 per second with an API key). Each response body is parsed as part
+    of its (retried) request, and articles are then extracted in worker
+    threads too, outside the concurrency limit, so extracting one batch
+    overlaps with fetching the next.
+
+    Unlike :meth:`PubMedQuerier.query`, a failed query isn't resumed: it has
+    to be re-run from the start.
+
+    Parameters
+    ----------
+    email: str
+        passed to :class:`PubMedQuerier`
+    tool: str
+        passed to :class:`PubMedQuerier`
+    max_concurrency: int, optional, default=3
+        maximum number of requests in flight at once
+    rate_limit: float, optional, default=None
+        maximum number of requests started per second. If None, use NCBI's
+        limit: 10 with an :code:`api_key`, else 3.
+    api_key: str, optional, default=None
+        NCBI API key, sent with each request
+    batch_size: int, optional, default=250
+        number of articles fetched in each request
+    **kwargs: Any
+        passed to :class:`PubMedQuerier`
+    """
+    def __init__(
+        self,
+        /,
+        email: str,
+        tool: str,
+        *,
+        max_concurrency: int = 3,
+        rate_limit: float = None,
+        api_key: str = None,
+        batch_size: int = 250,
+        **kwargs
+    ):
+        # initialize base
+        PubMedQuerier.__init__(self, email=email, tool=tool, **kwargs)
+        if api_key is not None:
+            self._pubmed.parameters['api_key'] = api_key
+
+        # save parameters
+        if rate_limit is None:
+            rate_limit = 10 if api_key is not None else 3
+        self._max_concurrency = max_concurrency
+        self._limiter = _RateLimiter(rate_limit)
+        self._batch_size = batch_size
+
+        # concurrency limit, created in the running event loop
+        self._loop = None
+        self._semaphore = None
+
+    async def query(
+        self,
+        query: str,
+        /,
+        *,
+        search_params: dict[str, str] = None,
+    ) -> DataFrame:
+        """Query PubMed servers
+
+        Parameters
+        ----------
+        query: str
+            query to send to PubMed servers
+        search_params: dict[str, str], optional, default=None
+            extra E-utilities parameters for the search request (see
+            :meth:`PubMedQuerier.query`)
+
+        Returns
+        -------
+        DataFrame
+            resulting articles, in the order returned by PubMed.
+            :code:`publication_date` is a :code:`datetime64` column.
+        """
+        import asyncio
+
+        from pymed.helpers import batches
+
+        article_ids = await self._get_article_ids(query, search_params)
+        rows = await asyncio.gather(*[
+            self._get_rows(batch)
+            for batch in batches(article_ids, self._batch_size)
+        ])
+        articles_df = self._frame([row for batch in rows for row in batch])
+        self.count += articles_df.shape[0]
+        return articles_df
+
+    async def stream(
+        self,
+        query: str,
+        /,
+        *,
+        search_params: dict[str, str] = None,
+    ) -> AsyncIterator[DataFrame]:
+        """Query PubMed servers, yielding batches of articles as they arrive
+
+        Batches are fetched concurrently, and yielded in the order they finish
+        (not necessarily the order returned by PubMed). If the caller stops
+        iterating early, the remaining fetches are cancelled.
+
+        Parameters
+        ----------
+        query: str
+            query to send to PubMed servers
+        search_params: dict[str, str], optional, default=None
+            extra E-utilities parameters for the search request (see
+            :meth:`PubMedQuerier.query`)
+
+        Yields
+        ------
+        DataFrame
+            batch of resulting articles, with the same columns as
+            :meth:`query`
+        """
+        import asyncio
+
+        from pymed.helpers import batches
+
+        article_ids = await self._get_article_ids(query, search_params)
+        tasks = [
+            asyncio.ensure_future(self._get_rows(batch))
+            for batch in batches(article_ids, self._batch_size)
+        ]
+        try:
+            for task in asyncio.as_completed(tasks):
+                articles_df = self._frame(await task)
+                self.count += articles_df.shape[0]
+                yield articles_df
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _get(
+        self,
+        url: str,
+        parameters: dict,
+        /,
+        output: str = 'json',
+    ) -> Union[dict, ElementTree.Element]:
+        """Make a request to PubMed, within the concurrency and rate limits
+
+        The response is parsed as part of the request, so a truncated body is
+        retried like any other failed request.
+
+        Parameters
+        ----------
+        url: str
+            last part of the url, appended to the base url
+        parameters: dict
+            query parameters
+        output: str, optional, default='json'
+            requested response format
+
+        Returns
+        -------
+        Union[dict, ElementTree.Element]
+            parsed json response, or root of parsed xml response
+        """
+        import asyncio
+
+        from litmon.utils.pubmed import ResilientPubMed
+
+        # create concurrency limit in this event loop
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+
+        # make request
+        async with self._semaphore:
+            await self._limiter.wait()
+            return await asyncio.to_thread(
+                self._session.get,
+                f'{self._pubmed._base_url}{url}',
+                params=parameters | {'retmode': output},
+                parse=ResilientPubMed.parser(output),
+            )
+
+    async def _get_article_ids(
+        self,
+        query: str,
+        search_params: dict[str, str] = None,
+        /,
+    ) -> list[str]:
+        """Get the ids of all articles matching a query
+
+        The first page of ids gives the total count, then the remaining pages
+        are requested concurrently.
+
+        Parameters
+        ----------
+        query: str
+            query to send to PubMed servers
+        search_params: dict[str, str], optional, default=None
+            extra E-utilities parameters for the search request
+
+        Returns
+        -------
+        list[str]
+            PubMed ids, at most :code:`max_results` of them
+        """
+        import asyncio
+
+        # get first page (max_results=-1 retrieves everything, like pymed)
+        max_results = (
+            self._max_results
+            if self._max_results >= 0
+            else float('inf')
+        )
+        parameters = self._pubmed.parameters | (search_params or {}) | {
+            'term': query,
+            'retmax': min(max_results, 50000),
+        }
+        result = (await self._get(
+            '/entrez/eutils/esearch.fcgi',
+            parameters,
+        )).get('esearchresult', {})
+        article_ids = result.get('idlist', [])
+        total = min(int(result.get('count', 0)), max_results)
+
+        # get remaining pages
+        pages = await asyncio.gather(*[
+            self._get(
+                '/entrez/eutils/esearch.fcgi',
+                parameters | {
+                    'retstart': start,
+                    'retmax': min(parameters['retmax'], total - start),
+                },
+            )
+            for start in range(len(article_ids), total, parameters['retmax'])
+        ])
+        for page in pages:
+            article_ids += page.get('esearchresult', {}).get('idlist', [])
+
+        # return
+        return article_ids[0:total]
+
+    async def _get_rows(self, article_ids: list[str], /) -> list[list]:
+        """Fetch a batch of articles, and extract them in a worker thread
+
+        Parameters
+        ----------
+        article_ids: list[str]
+            PubMed ids to fetch
+
+        Returns
+        -------
+        list[list]
+            rows of articles (see :meth:`PubMedQuerier._rows`)
+        """
+        import asyncio
+
+        root = await self._get(
+            '/entrez/eutils/efetch.fcgi',
+            self._pubmed.parameters | {'id': article_ids},
+            output='xml',
+        )
+        return await asyncio.to_thread(self._parse, root)
+
+    def _parse(self, root: ElementTree.Element, /) -> list[list]:
+        """Extract rows of articles from a parsed efetch response
+
+        Parameters
+        ----------
+        root: ElementTree.Element
+            root of efetch xml response
+
+        Returns
+        -------
+        list[list]
+            rows of articles (see :meth:`PubMedQuerier._rows`)
+        """
+        from pymed.article import PubMedArticle
+        from pymed.book import PubMedBookArticle
+
+        return self._rows([
+            *[
+                PubMedArticle(xml_element=article)
+                for article in root.iter('PubmedArticle')
+            ],
+            *[
+                PubMedBookArticle(xml_element=book)
+                for book in root.iter('PubmedBookArticle')
+            ],
+        ])
@@ -0,0 +1,351 @@
+"""Versioned registry of trained models"""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+from copy import deepcopy
+from datetime import datetime
+import fcntl
+from hashlib import sha256
+import json
+from os import makedirs, path, remove, replace
+from secrets import token_hex
+from threading import Lock
+from typing import TYPE_CHECKING, Any, Iterator
+
+from litmon.utils import atomic
+
+# heavy dependencies are imported when first used, for fast startup
+if TYPE_CHECKING:
+    from litmon.model import ArticleScorer
+
+
+class ModelRegistry:
+    """Versioned registry of trained models, with promotion and rollback
+
+    Each registered model is stored once, under the digest of its contents
+    (:code:`{root}/artifacts/model-{digest}.bin` and :code:`.pickle`), so
+    artifacts are immutable, and registering an identical model twice
+    stores it once. The registry index (:code:`{root}/registry.json`) records
+    each version's metadata (e.g. training range, feedback range, model
+    parameters, metrics, and fit time), and the promotion history of each
+    alias (e.g. :code:`production`).
+
+    Versions can be referenced by:
+
+    #. digest (or a unique prefix of it)
+    #. version number, e.g. :code:`v3`
+    #. alias, e.g. :code:`production` (the version currently promoted to it)
+    #. previous promotion of an alias, e.g. :code:`production~1` (the version
+       promoted before the current one)
+
+    :meth:`promote` and :meth:`rollback` only rewrite the index (atomically,
+    while holding an inter-process lock), so switching versions is instant.
+
+    Loaded models are cached in memory (by digest), and artifacts are only
+    downloaded (with :code:`ezazure.Azure`) if they aren't already in
+    :code:`{root}/artifacts`. Because artifacts never change, a pinned
+    version is never re-downloaded. The index is also downloaded when the
+    registry is opened, if it isn't stored locally. (Uploading the index and
+    new artifacts is left to the caller, e.g. :code:`cmd/live-pipeline`.)
+
+    Parameters
+    ----------
+    root: str, optional, default='data/registry'
+        registry directory
+
+    Attributes
+    ----------
+    root: str
+        registry directory
+    """
+
+    # loaded models, keyed by artifact file root
+    _cache: dict[str, ArticleScorer] = {}
+
+    # guards the cache
+    _cache_lock = Lock()
+
+    def __init__(self, root: str = 'data/registry', /):
+        from ezazure import Azure
+        self.root = root
+
+        # download index, if it isn't stored locally
+        makedirs(root, exist_ok=True)
+        try:
+            Azure().download(f'{root}/registry.json')
+        except (FileNotFoundError, KeyError):
+            pass
+
+    def register(
+        self,
+        model: ArticleScorer,
+        /,
+        *,
+        metadata: dict[str, Any] = None,
+    ) -> str:
+        """Store a trained model, and record a new version of it
+
+        Parameters
+        ----------
+        model: ArticleScorer
+            trained model
+        metadata: dict[str, Any], optional, default=None
+            JSON-serializable metadata to record with the version
+
+        Returns
+        -------
+        str
+            digest of new version
+        """
+
+        # save model, and hash its contents
+        makedirs(f'{self.root}/artifacts', exist_ok=True)
+        tmp_fname = f'{self.root}/artifacts/tmp-{token_hex(8)}'
+        try:
+            model.save(tmp_fname)
+            hasher = sha256()
+            for ext in ['bin', 'pickle']:
+                with open(f'{tmp_fname}.{ext}', 'rb') as file:
+                    for chunk in iter(lambda: file.read(1 << 20), b''):
+                        hasher.update(chunk)
+            digest = hasher.hexdigest()[0:16]
+
+            # move into content-addressed storage, unless already stored
+            fname = self.fname(digest)
+            for ext in ['bin', 'pickle']:
+                if not path.isfile(f'{fname}.{ext}'):
+                    replace(f'{tmp_fname}.{ext}', f'{fname}.{ext}')
+
+        # remove temporary files
+        finally:
+            for ext in ['bin', 'pickle']:
+                if path.isfile(f'{tmp_fname}.{ext}'):
+                    remove(f'{tmp_fname}.{ext}')
+
+        # record version
+        with self._edit() as index:
+            index['versions'].append({
+                'digest': digest,
+                'number': len(index['versions']) + 1,
+                'created': datetime.now().isoformat(timespec='seconds'),
+                'metadata': metadata or {},
+            })
+
+        # return
+        return digest
+
+    def promote(self, ref: str, /, *, alias: str = 'production') -> str:
+        """Point an alias at a version
+
+        Parameters
+        ----------
+        ref: str
+            version to promote (see :class:`ModelRegistry`)
+        alias: str, optional, default='production'
+            alias to point at the version
+
+        Returns
+        -------
+        str
+            digest of promoted version
+        """
+        with self._edit() as index:
+            digest = self._resolve(index, ref)
+            history = index['aliases'].setdefault(alias, [])
+            if not history or history[-1] != digest:
+                history.append(digest)
+        return digest
+
+    def rollback(self, /, *, alias: str = 'production') -> str:
+        """Point an alias back at the version it was promoted from
+
+        Parameters
+        ----------
+        alias: str, optional, default='production'
+            alias to roll back
+
+        Returns
+        -------
+        str
+            digest of the version the alias now points at
+
+        Raises
+        ------
+        ValueError
+            if the alias has no earlier version
+        """
+        with self._edit() as index:
+            history = index['aliases'].get(alias, [])
+            if len(history) < 2:
+                raise ValueError(f'{alias} has no earlier version')
+            history.pop()
+            return history[-1]
+
+    def resolve(self, ref: str, /) -> str:
+        """Get the digest of a version
+
+        Parameters
+        ----------
+        ref: str
+            version (see :class:`ModelRegistry`)
+
+        Returns
+        -------
+        str
+            digest of version
+
+        Raises
+        ------
+        KeyError
+            if no version matches :code:`ref`
+        """
+        return self._resolve(self._read(), ref)
+
+    def info(self, ref: str, /) -> dict[str, Any]:
+        """Get the record of a version
+
+        Parameters
+        ----------
+        ref: str
+            version (see :class:`ModelRegistry`)
+
+        Returns
+        -------
+        dict[str, Any]
+            :code:`digest`, :code:`number`, :code:`created` time, and
+            :code:`metadata` of the version (the first record of it, if it
+            was registered more than once)
+        """
+        index = self._read()
+        digest = self._resolve(index, ref)
+        return deepcopy(next(
+            version
+            for version in index['versions']
+            if version['digest'] == digest
+        ))
+
+    @property
+    def versions(self) -> list[dict[str, Any]]:
+        """Record of each version, in order of registration"""
+        return self._read()['versions']
+
+    @property
+    def aliases(self) -> dict[str, str]:
+        """Digest of the version each alias points at"""
+        return {
+            alias: history[-1]
+            for alias, history in self._read()['aliases'].items()
+            if history
+        }
+
+    def fname(self, ref: str, /) -> str:
+        """Get the artifact file root of a version (without extension)
+
+        Parameters
+        ----------
+        ref: str
+            version (see :class:`ModelRegistry`). Digests are used as-is.
+
+        Returns
+        -------
+        str
+            file root, as passed to
+            :meth:`~litmon.model.ArticleScorer.load`
+        """
+        digest = ref if self._is_digest(ref) else self.resolve(ref)
+        return f'{self.root}/artifacts/model-{digest}'
+
+    def load(self, ref: str = 'production', /) -> ArticleScorer:
+        """Load a version, from the in-memory cache if possible
+
+        The returned model is shared with other callers that load the same
+        version, so it must not be modified.
+
+        Parameters
+        ----------
+        ref: str, optional, default='production'
+            version (see :class:`ModelRegistry`)
+
+        Returns
+        -------
+        ArticleScorer
+            loaded model
+        """
+        from ezazure import Azure
+
+        from litmon.model import ArticleScorer
+
+        # check cache
+        fname = self.fname(self.resolve(ref))
+        cls = self.__class__
+        with cls._cache_lock:
+            if fname in cls._cache:
+                return cls._cache[fname]
+
+        # load model, downloading artifacts that aren't stored locally
+        makedirs(f'{self.root}/artifacts', exist_ok=True)
+        for ext in ['bin', 'pickle']:
+            Azure().download(f'{fname}.{ext}')
+        model = ArticleScorer.load(fname)
+        with cls._cache_lock:
+            return cls._cache.setdefault(fname, model)
+
+    @contextmanager
+    def _edit(self) -> Iterator[dict[str, Any]]:
+        """Read, modify, and atomically rewrite the index, under a lock"""
+        makedirs(self.root, exist_ok=True)
+        with open(f'{self.root}/registry.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                index = self._read()
+                yield index
+                with atomic(f'{self.root}/registry.json') as tmp_fname, \
+                        open(tmp_fname, 'w') as file:
+                    json.dump(index, file, indent=4, default=str)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read(self) -> dict[str, Any]:
+        """Read the index"""
+        fname = f'{self.root}/registry.json'
+        if not path.isfile(fname):
+            return {'versions': [], 'aliases': {}}
+        return json.load(open(fname, 'r'))
+
+    @classmethod
+    def _is_digest(cls, ref: str, /) -> bool:
+        """Check if a reference is a full digest"""
+        return len(ref) == 16 and all(c in '0123456789abcdef' for c in ref)
+
+    @classmethod
+    def _resolve(cls, index: dict[str, Any], ref: str, /) -> str:
+        """Get the digest of a version, from a loaded index"""
+
+        # resolve aliases, and previous promotions of aliases
+        alias, _, back = ref.partition('~')
+        if alias in index['aliases']:
+            history = index['aliases'][alias]
+            back = int(back or 0)
+            if back >= len(history):
+                raise KeyError(f'{alias} has no version {ref}')
+            return history[-1 - back]
+
+        # resolve version numbers
+        if ref[0:1] == 'v' and ref[1:].isdigit():
+            for version in index['versions']:
+                if version['number'] == int(ref[1:]):
+                    return version['digest']
+
+        # resolve digests, and unique prefixes of digests
+        matches = {
+            version['digest']
+            for version in index['versions']
+            if ref and version['digest'].startswith(ref)
+        }
+        if len(matches) != 1:
+            raise KeyError(
+                f'{"Ambiguous" if matches else "Unknown"} model version: '
+                f'{ref}'
+            )
+        return matches.pop()
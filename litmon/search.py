@@ -0,0 +1,347 @@
+"""Persisted full-text index of monthly databases"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from os import makedirs, path
+import re
+import sqlite3
+from typing import TYPE_CHECKING, Any
+
+from litmon.utils import drange, read_articles
+
+# heavy dependencies are imported when first used, for fast startup
+if TYPE_CHECKING:
+    from pandas import DataFrame
+
+
+class ArticleIndex:
+    """Persisted full-text index of monthly databases, for ad-hoc search
+
+    Articles are stored in a SQLite database, with an FTS5 (full-text search)
+    inverted index over their :code:`title`, :code:`abstract`, and
+    :code:`keywords` (stemmed with the porter stemmer). Searches are ranked
+    with BM25, and can be restricted to a range of publication dates, which
+    are indexed separately. Searching the whole corpus takes milliseconds,
+    instead of reading every monthly csv file.
+
+    The index is built incrementally, one month at a time: :meth:`add`
+    replaces a month's articles, and :meth:`update` only re-indexes database
+    files that changed since they were last indexed.
+    :class:`~litmon.cli.dbase.DBaseBuilder` and
+    :class:`~litmon.cli.sync.DBaseSyncer` call :meth:`add` after writing each
+    month, if they're given a :code:`search_fname`.
+
+    Instances are context managers, which close the database on exit.
+
+    Parameters
+    ----------
+    fname: str, optional, default='data/search.db'
+        SQLite database file. It is created if it doesn't exist.
+
+    Attributes
+    ----------
+    fname: str
+        SQLite database file
+    """
+
+    # relative weight of each indexed field, in BM25 ranking
+    _weights = {'title': 3.0, 'abstract': 1.0, 'keywords': 2.0}
+
+    def __init__(self, fname: str = 'data/search.db', /):
+        if dirname := path.dirname(fname):
+            makedirs(dirname, exist_ok=True)
+        self.fname = fname
+        self._conn = sqlite3.connect(fname)
+        fields = ', '.join(self.__class__._weights)
+        self._conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS articles (
+                rowid INTEGER PRIMARY KEY,
+                month TEXT NOT NULL,
+                pubmed_id TEXT NOT NULL,
+                publication_date TEXT,
+                doi TEXT,
+                journal TEXT,
+                title TEXT,
+                abstract TEXT,
+                keywords TEXT
+            );
+            CREATE INDEX IF NOT EXISTS articles_month
+                ON articles (month);
+            CREATE INDEX IF NOT EXISTS articles_publication_date
+                ON articles (publication_date);
+            CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+                {fields},
+                content='articles',
+                content_rowid='rowid',
+                tokenize='porter unicode61'
+            );
+            CREATE TABLE IF NOT EXISTS months (
+                month TEXT PRIMARY KEY,
+                fname TEXT,
+                mtime REAL,
+                size INTEGER,
+                num_articles INTEGER,
+                indexed TEXT
+            );
+        """)
+
+    def __enter__(self) -> ArticleIndex:
+        return self
+
+    def __exit__(self, *args: Any):
+        self.close()
+
+    def add(
+        self,
+        articles: DataFrame,
+        month: str,
+        /,
+        *,
+        fname: str = None,
+    ):
+        """Index a month's articles, replacing any that were already indexed
+
+        Parameters
+        ----------
+        articles: DataFrame
+            month's articles
+        month: str
+            month, as YYYY-mm
+        fname: str, optional, default=None
+            database file that :code:`articles` were read from. If provided,
+            :meth:`update` skips this month until the file changes.
+        """
+
+        # get rows to insert
+        columns = [
+            'pubmed_id',
+            'publication_date',
+            'doi',
+            'journal',
+            *self.__class__._weights,
+        ]
+        values = articles.reindex(columns=columns)
+        values = values.astype(str).astype(object).where(values.notna(), None)
+        values['pubmed_id'] = values['pubmed_id'].str[0:8]
+        values['publication_date'] = values['publication_date'].str[0:10]
+        rows = [(month, *row) for row in values.itertuples(index=False)]
+
+        # replace month's articles, and record month, in one transaction
+        stat = (
+            (path.getmtime(fname), path.getsize(fname))
+            if fname is not None
+            else (None, None)
+        )
+        with self._conn:
+            self._delete(month)
+            self._conn.executemany(
+                """
+                INSERT INTO articles (
+                    month, pubmed_id, publication_date, doi, journal, title,
+                    abstract, keywords
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                rows,
+            )
+            fields = ', '.join(self.__class__._weights)
+            self._conn.execute(
+                f"""
+                INSERT INTO articles_fts (rowid, {fields})
+                SELECT rowid, {fields} FROM articles WHERE month = ?
+                """,
+                (month,),
+            )
+            self._conn.execute(
+                'INSERT OR REPLACE INTO months VALUES (?, ?, ?, ?, ?, ?)',
+                (
+                    month,
+                    fname,
+                    *stat,
+                    len(rows),
+                    datetime.now().isoformat(timespec='seconds'),
+                ),
+            )
+
+    def close(self):
+        """Close the database"""
+        self._conn.close()
+
+    @property
+    def months(self) -> dict[str, int]:
+        """Number of articles indexed for each month (keyed by YYYY-mm)"""
+        return dict(self._conn.execute(
+            'SELECT month, num_articles FROM months ORDER BY month'
+        ).fetchall())
+
+    def search(
+        self,
+        terms: str,
+        /,
+        *,
+        date_range: str = None,
+        limit: int = 20,
+        syntax: bool = False,
+    ) -> DataFrame:
+        """Search indexed articles, best matches first
+
+        Parameters
+        ----------
+        terms: str
+            keywords to search for. Every keyword must match (a trailing
+            :code:`*` matches any word starting with the keyword), and
+            double-quoted keywords are matched as phrases.
+        date_range: str, optional, default=None
+            only return articles published in these months. Format:
+            YYYY/mm-YYYY/mm
+        limit: int, optional, default=20
+            maximum number of articles returned. If 0, return all matches.
+        syntax: bool, optional, default=False
+            if True, :code:`terms` is passed to SQLite as an FTS5 query (with
+            :code:`AND`, :code:`OR`, :code:`NOT`, :code:`NEAR()`, and column
+            filters like :code:`title: aging`)
+
+        Returns
+        -------
+        DataFrame
+            :code:`pubmed_id`, :code:`title`, :code:`publication_date`,
+            :code:`month`, BM25 :code:`score` (higher is better), and
+            PubMed :code:`link` of each matching article
+
+        Raises
+        ------
+        ValueError
+            if :code:`terms` can't be parsed
+        """
+        from pandas import DataFrame, to_datetime
+
+        # build query
+        weights = ', '.join(str(w) for w in self.__class__._weights.values())
+        sql = f"""
+            SELECT
+                a.pubmed_id,
+                a.title,
+                a.publication_date,
+                a.month,
+                -bm25(articles_fts, {weights}) AS score
+            FROM articles_fts
+            JOIN articles AS a ON a.rowid = articles_fts.rowid
+            WHERE articles_fts MATCH ?
+        """
+        params = [terms if syntax else self.__class__.fts_query(terms)]
+        if date_range is not None:
+            months = drange(date_range)
+            sql += ' AND a.publication_date >= ? AND a.publication_date < ?'
+            params += [
+                f'{months[0][0]:4d}-{months[0][1]:02d}-01',
+                f'{months[-1][0]:4d}-{months[-1][1]:02d}-32',
+            ]
+        sql += ' ORDER BY score DESC, a.publication_date DESC'
+        if limit:
+            sql += ' LIMIT ?'
+            params.append(limit)
+
+        # run query
+        try:
+            rows = self._conn.execute(sql, params).fetchall()
+        except sqlite3.OperationalError as e:
+            raise ValueError(f'Cannot search for {terms}: {e}') from e
+
+        # format results
+        results = DataFrame(rows, columns=[
+            'pubmed_id',
+            'title',
+            'publication_date',
+            'month',
+            'score',
+        ])
+        results['publication_date'] = to_datetime(results['publication_date'])
+        results['link'] = \
+            'https://pubmed.ncbi.nlm.nih.gov/' + results['pubmed_id'] + '/'
+        return results
+
+    def update(
+        self,
+        date_range: str,
+        /,
+        *,
+        dbase_dir: str = 'data',
+        dbase_suffix: str = '-eval',
+    ) -> list[str]:
+        """Index database files that changed since they were last indexed
+
+        Months without a database file are skipped.
+
+        Parameters
+        ----------
+        date_range: str
+            months to index. Format: YYYY/mm-YYYY/mm
+        dbase_dir: str, optional, default='data'
+            directory of database files.
+            :code:`dbase_fname=f'{dbase_dir}/{year}-{month:02d}{dbase_suffix}.csv'`
+        dbase_suffix: str, optional, default='-eval'
+            suffix of each database file. See :code:`dbase_dir`
+
+        Returns
+        -------
+        list[str]
+            months that were (re-)indexed, as YYYY-mm
+        """
+        indexed = {
+            month: (fname, mtime, size)
+            for month, fname, mtime, size in self._conn.execute(
+                'SELECT month, fname, mtime, size FROM months'
+            )
+        }
+        updated = []
+        for year, month in drange(date_range):
+            month_key = f'{year:4d}-{month:02d}'
+            fname = f'{dbase_dir}/{month_key}{dbase_suffix}.csv'
+            if not path.isfile(fname):
+                continue
+            stat = (fname, path.getmtime(fname), path.getsize(fname))
+            if indexed.get(month_key) == stat:
+                continue
+            self.add(read_articles(fname), month_key, fname=fname)
+            updated.append(month_key)
+        return updated
+
+    @classmethod
+    def fts_query(cls, terms: str, /) -> str:
+        """Convert keywords to an FTS5 query
+
+        Each keyword (or double-quoted phrase) is quoted, so that punctuation
+        (e.g. in :code:`7-ketocholesterol`) is never read as FTS5 syntax, and
+        keywords are joined with :code:`AND`.
+
+        Parameters
+        ----------
+        terms: str
+            keywords
+
+        Returns
+        -------
+        str
+            FTS5 query
+        """
+        keywords = []
+        for keyword in re.findall(r'"[^"]*"\*?|[^\s"]+', terms):
+            is_prefix = keyword.endswith('*')
+            keyword = keyword.rstrip('*').strip('"').strip()
+            if keyword:
+                keywords.append(f'"{keyword}"' + ('*' if is_prefix else ''))
+        if not keywords:
+            raise ValueError('No keywords to search for')
+        return ' AND '.join(keywords)
+
+    def _delete(self, month: str, /):
+        """Remove a month's articles from the index"""
+        fields = ', '.join(self.__class__._weights)
+        self._conn.execute(
+            f"""
+            INSERT INTO articles_fts (articles_fts, rowid, {fields})
+            SELECT 'delete', rowid, {fields} FROM articles WHERE month = ?
+            """,
+            (month,),
+        )
+        self._conn.execute('DELETE FROM articles WHERE month = ?', (month,))
@@ -0,0 +1,406 @@
+"""Share a trained model between scoring processes"""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+from copy import copy
+import fcntl
+import json
+from os import path, remove
+import pickle
+from secrets import token_hex
+from tempfile import gettempdir
+from threading import Lock
+from typing import TYPE_CHECKING, Any, Iterator
+
+# heavy dependencies are imported when first used, for fast startup
+if TYPE_CHECKING:
+    from multiprocessing.shared_memory import SharedMemory
+
+    from litmon.model import ArticleScorer
+
+
+class SharedScorer:
+    """Share a trained :class:`~litmon.model.ArticleScorer` between processes
+
+    Instead of each scoring process calling
+    :meth:`~litmon.model.ArticleScorer.load` and holding its own copy of the
+    model, one process publishes a loaded model into a
+    :code:`multiprocessing.shared_memory` segment (with :meth:`publish`), and
+    the other processes attach to it by name (with :meth:`attach`). The
+    segment holds:
+
+    #. A reference count, and a header describing the segment's layout
+    #. Every numpy array of the model (its term weights, the ml model's
+       weights, the score sketch, and the calibration map). Attached
+       processes use these as read-only views of the segment, with zero
+       copies.
+    #. The serialized :code:`vhash.VHash` table.
+
+    :code:`vhash.VHash` is a native hash table, which can't be placed in a
+    segment. Instead, processes forked from the publishing process (e.g. the
+    workers of a :code:`ProcessPoolExecutor`, with the default :code:`fork`
+    start method on linux) inherit the publisher's table, whose pages are
+    shared copy-on-write, since vectorizing only reads them. Only processes
+    started otherwise (e.g. with the :code:`spawn` start method) build their
+    own table from the serialized one (but never read the model files, or
+    download them). See :attr:`inherited`.
+
+    What's still copied into each attached process: the table (if not
+    inherited, which takes about 5 times as much memory as its serialized
+    size), and the unpickled skeleton of the model, i.e. its parameters,
+    its most frequent training terms, and the arrays of any nested models
+    (e.g. the heads of a :class:`~litmon.topics.MultiTopicScorer`, or the
+    members of an :class:`~litmon.ensemble.EnsembleScorer`).
+
+    Each :meth:`publish` or :meth:`attach` adds a reference, and each
+    :meth:`release` removes one. The segment is freed when the last reference
+    is released. (If the publishing process exits first, new processes can no
+    longer attach, but processes that already attached keep working.)
+    Instances are also context managers, which release their reference on
+    exit. E.g.
+
+    .. code-block:: python
+
+        # in the parent process
+        with SharedScorer.publish(ArticleScorer.load('data/model')) as shared:
+
+            # in each worker process
+            with SharedScorer.attach(shared.name) as worker:
+                scores = worker.model.predict(articles)
+
+    Don't construct this class directly: use :meth:`publish` or
+    :meth:`attach`.
+
+    Attributes
+    ----------
+    model: ArticleScorer
+        shared model
+    name: str
+        name of shared memory segment
+    nbytes: int
+        size of shared memory segment
+    inherited: bool
+        whether :attr:`model`'s :code:`vhash.VHash` table is the publisher's
+        (i.e. this is the publishing process, or was forked from it), rather
+        than built from the segment
+    """
+
+    # objects of an ArticleScorer whose arrays are shared (None: the model)
+    _holders = [None, 'model', 'sketch', 'calibrator']
+
+    # vhash table of each segment published by this process, which forked
+    # processes inherit
+    _tables: dict[str, Any] = {}
+
+    # alignment of each array in the segment
+    _align = 64
+
+    # guards patching the resource tracker (see _open)
+    _tracker_lock = Lock()
+
+    def __init__(
+        self,
+        shm: SharedMemory,
+        model: ArticleScorer,
+        /,
+        *,
+        inherited: bool = True,
+        untracked: bool = False,
+    ):
+        self.model = model
+        self.name = shm.name
+        self.nbytes = shm.size
+        self.inherited = inherited
+        self._shm = shm
+        self._published = False
+        self._released = False
+        self._untracked = untracked
+
+    def __enter__(self) -> SharedScorer:
+        return self
+
+    def __exit__(self, *args: Any):
+        self.release()
+
+    @classmethod
+    def publish(
+        cls,
+        model: ArticleScorer,
+        /,
+        *,
+        name: str = None,
+    ) -> SharedScorer:
+        """Publish a model into shared memory
+
+        Parameters
+        ----------
+        model: ArticleScorer
+            trained model to share
+        name: str, optional, default=None
+            name of shared memory segment. If None, a random name is used.
+
+        Returns
+        -------
+        SharedScorer
+            owner of the first reference to the segment. (Its :attr:`model` is
+            :code:`model`, itself.)
+        """
+        from multiprocessing.shared_memory import SharedMemory
+
+        from numpy import ndarray
+
+        # strip arrays from model, keeping a skeleton
+        skeleton = copy(model)
+        skeleton.vhash = None
+        arrays = []
+        for holder in cls._holders:
+            obj = model if holder is None else getattr(model, holder, None)
+            if obj is None:
+                continue
+            obj = skeleton if holder is None else copy(obj)
+            for attr, value in vars(obj).items():
+                if isinstance(value, ndarray):
+                    arrays.append((holder, attr, value))
+                    setattr(obj, attr, None)
+            if holder is not None:
+                setattr(skeleton, holder, obj)
+
+        # serialize vhash table
+        tmp_fname = f'{gettempdir()}/litmon-{token_hex(8)}.bin'
+        try:
+            model.vhash.save(tmp_fname)
+            vhash_bytes = open(tmp_fname, 'rb').read()
+        finally:
+            if path.isfile(tmp_fname):
+                remove(tmp_fname)
+
+        # lay out segment
+        skeleton_bytes = pickle.dumps(skeleton)
+        layout = {'arrays': [], 'skeleton': None, 'vhash': None}
+        offset = 0
+        for holder, attr, value in arrays:
+            layout['arrays'].append({
+                'holder': holder,
+                'attr': attr,
+                'dtype': value.dtype.str,
+                'shape': list(value.shape),
+                'offset': offset,
+            })
+            offset = cls._aligned(offset + value.nbytes)
+        layout['skeleton'] = [offset, len(skeleton_bytes)]
+        offset += len(skeleton_bytes)
+        layout['vhash'] = [offset, len(vhash_bytes)]
+        offset += len(vhash_bytes)
+        header = json.dumps(layout).encode()
+        data_start = cls._aligned(16 + len(header))
+
+        # create segment
+        shm = SharedMemory(
+            name=name,
+            create=True,
+            size=max(data_start + offset, 1),
+        )
+        try:
+            shm.buf[8:16] = len(header).to_bytes(8, 'little')
+            shm.buf[16:16+len(header)] = header
+            for (_, _, value), spec in zip(arrays, layout['arrays']):
+                start = data_start + spec['offset']
+                shm.buf[start:start+value.nbytes] = \
+                    value.tobytes(order='C')
+            for key, data in [
+                ('skeleton', skeleton_bytes),
+                ('vhash', vhash_bytes),
+            ]:
+                start = data_start + layout[key][0]
+                shm.buf[start:start+len(data)] = data
+            cls._set_refcount(shm, 1)
+        except BaseException as e:
+            shm.close()
+            shm.unlink()
+            raise e
+
+        # keep vhash table, for forked processes
+        cls._tables[shm.name] = model.vhash
+        shared = cls(shm, model)
+        shared._published = True
+
+        # return
+        return shared
+
+    @classmethod
+    def attach(cls, name: str, /) -> SharedScorer:
+        """Attach to a published model
+
+        Parameters
+        ----------
+        name: str
+            name of shared memory segment (see :attr:`name`)
+
+        Returns
+        -------
+        SharedScorer
+            owner of a new reference to the segment. Its :attr:`model`'s
+            arrays are read-only views of the segment.
+
+        Raises
+        ------
+        FileNotFoundError
+            if the segment doesn't exist (e.g. it was already freed)
+        """
+        from numpy import dtype, ndarray
+        from vhash import VHash
+
+        # open segment, add reference
+        shm, untracked = cls._open(name)
+        with cls._lock(name):
+            refcount = cls._get_refcount(shm)
+            if refcount <= 0:
+                shm.close()
+                raise FileNotFoundError(f'Shared model {name} was released')
+            cls._set_refcount(shm, refcount + 1)
+
+        # read header
+        header_len = int.from_bytes(shm.buf[8:16], 'little')
+        layout = json.loads(bytes(shm.buf[16:16+header_len]))
+        data_start = cls._aligned(16 + header_len)
+
+        # load skeleton
+        start, size = layout['skeleton']
+        start += data_start
+        model = pickle.loads(shm.buf[start:start+size])
+
+        # point arrays at segment
+        for spec in layout['arrays']:
+            array = ndarray(
+                spec['shape'],
+                dtype=dtype(spec['dtype']),
+                buffer=shm.buf,
+                offset=data_start + spec['offset'],
+            )
+            array.flags.writeable = False
+            holder = spec['holder']
+            setattr(
+                model if holder is None else getattr(model, holder),
+                spec['attr'],
+                array,
+            )
+
+        # use publisher's vhash table, if inherited, else load it
+        model.vhash = cls._tables.get(name)
+        inherited = model.vhash is not None
+        if not inherited:
+            start, size = layout['vhash']
+            start += data_start
+            tmp_fname = f'{gettempdir()}/litmon-{token_hex(8)}.bin'
+            try:
+                with open(tmp_fname, 'wb') as file:
+                    file.write(shm.buf[start:start+size])
+                model.vhash = VHash.load(tmp_fname)
+            finally:
+                if path.isfile(tmp_fname):
+                    remove(tmp_fname)
+
+        # return
+        return cls(shm, model, inherited=inherited, untracked=untracked)
+
+    def release(self):
+        """Release this reference, freeing the segment if it was the last
+
+        After releasing, :attr:`model` must not be used in an attached
+        process, because its arrays point into the freed segment. Releasing
+        twice has no effect.
+        """
+        if self._released:
+            return
+        self._released = True
+        self.model = None
+        if self._published:
+            self.__class__._tables.pop(self.name, None)
+        with self.__class__._lock(self.name):
+            refcount = self.__class__._get_refcount(self._shm) - 1
+            self.__class__._set_refcount(self._shm, refcount)
+            try:
+                self._shm.close()
+            except BufferError:
+                pass  # arrays still in use, unmapped when garbage collected
+            if refcount <= 0:
+                if self._untracked:
+                    from multiprocessing import resource_tracker
+                    resource_tracker.register(self._shm._name, 'shared_memory')
+                try:
+                    self._shm.unlink()
+                except FileNotFoundError:
+                    pass
+        if refcount <= 0:
+            lock_fname = self.__class__._lock_fname(self.name)
+            if path.isfile(lock_fname):
+                remove(lock_fname)
+
+    @property
+    def refcount(self) -> int:
+        """Number of unreleased references to the segment"""
+        return self.__class__._get_refcount(self._shm)
+
+    @classmethod
+    def _aligned(cls, offset: int, /) -> int:
+        """Round offset up to array alignment"""
+        return -(-offset // cls._align) * cls._align
+
+    @classmethod
+    def _get_refcount(cls, shm: SharedMemory, /) -> int:
+        """Read reference count from segment"""
+        return int.from_bytes(shm.buf[0:8], 'little', signed=True)
+
+    @classmethod
+    def _set_refcount(cls, shm: SharedMemory, refcount: int, /):
+        """Write reference count to segment"""
+        shm.buf[0:8] = refcount.to_bytes(8, 'little', signed=True)
+
+    @classmethod
+    @contextmanager
+    def _lock(cls, name: str, /) -> Iterator[None]:
+        """Hold an inter-process lock on a segment's reference count"""
+        with open(cls._lock_fname(name), 'a') as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+    @classmethod
+    def _lock_fname(cls, name: str, /) -> str:
+        """Get lock file of a segment"""
+        return f'{gettempdir()}/litmon-{name.lstrip("/")}.lock'
+
+    @classmethod
+    def _open(cls, name: str, /) -> tuple[SharedMemory, bool]:
+        """Open existing segment, without tracking it for cleanup
+
+        Python's resource tracker would otherwise free the segment when this
+        process exits, even though other processes still hold references.
+        Before python 3.13, this is done by suppressing registration while the
+        segment is opened. (Unregistering afterwards would also unregister the
+        publisher's segment, if the tracker is shared with a forked parent.)
+
+        Returns
+        -------
+        SharedMemory
+            opened segment
+        bool
+            whether registration was suppressed, i.e. the segment must be
+            registered before unlinking it
+        """
+        from multiprocessing import resource_tracker
+        from multiprocessing.shared_memory import SharedMemory
+        try:
+            return SharedMemory(name=name, track=False), False
+        except TypeError:
+            pass
+        with cls._tracker_lock:
+            register = resource_tracker.register
+            resource_tracker.register = lambda *args: None
+            try:
+                return SharedMemory(name=name), True
+            finally:
+                resource_tracker.register = register
@@ -0,0 +1,366 @@
+"""Work queue of leased tasks, shared by processes on one machine"""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+from datetime import datetime
+import json
+from os import makedirs, path
+import sqlite3
+from time import sleep, time
+from typing import Any, Iterator
+
+
+class TaskQueue:
+    """Work queue of leased tasks, stored in a SQLite database
+
+    A coordinator adds tasks (see :meth:`add`), and any number of worker
+    processes claim them (see :meth:`claim`). A claimed task is leased to its
+    worker for :code:`lease` seconds: the worker renews the lease while it's
+    working (see :meth:`renew`), and then marks the task completed, with a
+    json-serializable result, e.g. a manifest of what it wrote (see
+    :meth:`complete`), or releases it after an error (see :meth:`fail`). If a
+    worker dies, its lease expires, and the task is claimed by another worker.
+    A task that fails :code:`max_attempts` times is marked failed, and isn't
+    claimed again.
+
+    Every operation is a single (immediate) transaction, so the queue can be
+    shared by any number of processes. The queue also holds a request
+    throttle shared by every worker (see :meth:`throttle`).
+
+    Instances are context managers, which close the database on exit.
+
+    Parameters
+    ----------
+    fname: str
+        SQLite database file. It is created if it doesn't exist.
+    lease: float, optional, default=600
+        seconds a claimed task is leased to its worker
+    max_attempts: int, optional, default=3
+        number of times a task is claimed, before it's marked failed
+
+    Attributes
+    ----------
+    fname: str
+        SQLite database file
+    """
+
+    # status of each task
+    statuses = ['pending', 'leased', 'done', 'failed']
+
+    def __init__(
+        self,
+        fname: str,
+        /,
+        *,
+        lease: float = 600,
+        max_attempts: int = 3,
+    ):
+        if dirname := path.dirname(fname):
+            makedirs(dirname, exist_ok=True)
+        self.fname = fname
+        self._lease = lease
+        self._max_attempts = max_attempts
+        self._conn = sqlite3.connect(fname, timeout=60, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                key TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                worker TEXT,
+                lease_until REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                error TEXT,
+                updated TEXT
+            );
+            CREATE INDEX IF NOT EXISTS tasks_status
+                ON tasks (status, lease_until);
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+
+    def __enter__(self) -> TaskQueue:
+        return self
+
+    def __exit__(self, *args: Any):
+        self.close()
+
+    def add(self, tasks: dict[str, Any], /) -> int:
+        """Add tasks, skipping tasks that were already added
+
+        Parameters
+        ----------
+        tasks: dict[str, Any]
+            json-serializable payload of each task, keyed by a unique task key
+
+        Returns
+        -------
+        int
+            number of tasks added
+        """
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                'INSERT OR IGNORE INTO tasks (key, payload, updated) '
+                'VALUES (?, ?, ?)',
+                [
+                    (key, json.dumps(payload), self.__class__._now())
+                    for key, payload in tasks.items()
+                ],
+            )
+            return conn.total_changes - before
+
+    def claim(self, worker: str, /) -> tuple[str, Any] | None:
+        """Claim the next pending task (or a task whose lease expired)
+
+        Parameters
+        ----------
+        worker: str
+            unique name of the worker claiming the task
+
+        Returns
+        -------
+        tuple[str, Any] | None
+            key and payload of the claimed task, or None if no task can be
+            claimed
+        """
+        now = time()
+        with self._transaction() as conn:
+
+            # fail expired tasks that were already claimed too many times
+            conn.execute(
+                "UPDATE tasks SET status = 'failed', error = 'lease expired' "
+                "WHERE status = 'leased' AND lease_until < ? "
+                "AND attempts >= ?",
+                (now, self._max_attempts),
+            )
+
+            # lease next task
+            row = conn.execute(
+                "SELECT key, payload FROM tasks "
+                "WHERE status = 'pending' "
+                "OR status = 'leased' AND lease_until < ? "
+                "ORDER BY key LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE tasks SET status = 'leased', worker = ?, "
+                "lease_until = ?, attempts = attempts + 1, updated = ? "
+                "WHERE key = ?",
+                (worker, now + self._lease, self.__class__._now(), row[0]),
+            )
+        return row[0], json.loads(row[1])
+
+    def renew(self, key: str, worker: str, /) -> bool:
+        """Extend the lease of a claimed task
+
+        Parameters
+        ----------
+        key: str
+            task key
+        worker: str
+            worker that claimed the task
+
+        Returns
+        -------
+        bool
+            whether the worker still holds the lease. (If it doesn't, the
+            lease expired, and the task may have been claimed by another
+            worker.)
+        """
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE tasks SET lease_until = ? "
+                "WHERE key = ? AND worker = ? AND status = 'leased'",
+                (time() + self._lease, key, worker),
+            ).rowcount > 0
+
+    def complete(self, key: str, worker: str, /, result: Any = None) -> bool:
+        """Mark a claimed task completed
+
+        Parameters
+        ----------
+        key: str
+            task key
+        worker: str
+            worker that claimed the task
+        result: Any, optional, default=None
+            json-serializable result of the task
+
+        Returns
+        -------
+        bool
+            whether the task was marked completed. (It isn't, if the worker
+            no longer holds the lease.)
+        """
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE tasks SET status = 'done', result = ?, "
+                "lease_until = NULL, updated = ? "
+                "WHERE key = ? AND worker = ? AND status = 'leased'",
+                (json.dumps(result), self.__class__._now(), key, worker),
+            ).rowcount > 0
+
+    def fail(self, key: str, worker: str, /, error: str = None):
+        """Release a claimed task after an error
+
+        The task is claimed again (by any worker), unless it has already been
+        claimed :code:`max_attempts` times, in which case it's marked failed.
+
+        Parameters
+        ----------
+        key: str
+            task key
+        worker: str
+            worker that claimed the task
+        error: str, optional, default=None
+            description of the error
+        """
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE tasks SET status = CASE WHEN attempts >= ? "
+                "THEN 'failed' ELSE 'pending' END, "
+                "error = ?, lease_until = NULL, updated = ? "
+                "WHERE key = ? AND worker = ? AND status = 'leased'",
+                (
+                    self._max_attempts,
+                    error,
+                    self.__class__._now(),
+                    key,
+                    worker,
+                ),
+            )
+
+    def throttle(self, rate: float, /):
+        """Wait for the next free request slot
+
+        Slots are shared by every process using this queue, so that at most
+        :code:`rate` requests start each second across all workers (e.g. the
+        NCBI limit of 3 requests per second, or 10 with an API key).
+
+        Parameters
+        ----------
+        rate: float
+            maximum number of requests per second
+        """
+        with self._transaction():
+            now = time()
+            slot = max(now, self.get('next_slot', 0))
+            self.set('next_slot', slot + 1 / rate)
+        if slot > now:
+            sleep(slot - now)
+
+    def get(self, key: str, default: Any = None, /) -> Any:
+        """Get a value stored with the queue
+
+        Parameters
+        ----------
+        key: str
+            name of the value
+        default: Any, optional, default=None
+            returned if the value isn't stored
+
+        Returns
+        -------
+        Any
+            stored value
+        """
+        row = self._conn.execute(
+            'SELECT value FROM meta WHERE key = ?',
+            (key,),
+        ).fetchone()
+        return json.loads(row[0]) if row is not None else default
+
+    def set(self, key: str, value: Any, /):
+        """Store a value with the queue (e.g. settings shared by workers)
+
+        Parameters
+        ----------
+        key: str
+            name of the value
+        value: Any
+            json-serializable value
+        """
+        self._conn.execute(
+            'INSERT OR REPLACE INTO meta VALUES (?, ?)',
+            (key, json.dumps(value)),
+        )
+
+    def counts(self) -> dict[str, int]:
+        """Number of tasks with each status
+
+        Leased tasks whose lease expired are counted as pending (or failed,
+        if they were already claimed :code:`max_attempts` times).
+
+        Returns
+        -------
+        dict[str, int]
+            number of tasks, keyed by status
+        """
+        counts = dict.fromkeys(self.__class__.statuses, 0)
+        counts |= dict(self._conn.execute(
+            "SELECT CASE WHEN status != 'leased' OR lease_until >= ? "
+            "THEN status WHEN attempts >= ? THEN 'failed' "
+            "ELSE 'pending' END AS current, COUNT(*) "
+            "FROM tasks GROUP BY current",
+            (time(), self._max_attempts),
+        ).fetchall())
+        return counts
+
+    def tasks(self, status: str = None, /) -> dict[str, dict[str, Any]]:
+        """Get tasks, with their status, worker, and result
+
+        Parameters
+        ----------
+        status: str, optional, default=None
+            only get tasks with this status. If None, get every task.
+
+        Returns
+        -------
+        dict[str, dict[str, Any]]
+            :code:`payload`, :code:`status`, :code:`worker`,
+            :code:`attempts`, :code:`result`, and :code:`error` of each task,
+            keyed by task key (sorted)
+        """
+        rows = self._conn.execute(
+            'SELECT key, payload, status, worker, attempts, result, error '
+            'FROM tasks WHERE ? IS NULL OR status = ? ORDER BY key',
+            (status, status),
+        ).fetchall()
+        return {
+            key: {
+                'payload': json.loads(payload),
+                'status': status,
+                'worker': worker,
+                'attempts': attempts,
+                'result': json.loads(result) if result is not None else None,
+                'error': error,
+            }
+            for key, payload, status, worker, attempts, result, error in rows
+        }
+
+    def close(self):
+        """Close the database"""
+        self._conn.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run statements in an immediate (write-locked) transaction"""
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield self._conn
+        except BaseException:
+            self._conn.execute('ROLLBACK')
+            raise
+        self._conn.execute('COMMIT')
+
+    @classmethod
+    def _now(cls) -> str:
+        """Current time, as an iso-formatted string"""
+        return datetime.now().isoformat(timespec='seconds')
@@ -0,0 +1,244 @@
+"""Score journal articles for several topics at once"""
+
+from __future__ import annotations
+
+from copy import copy
+from typing import Any
+
+from nptyping import NDArray
+from numpy import array, asarray, column_stack
+from pandas import DataFrame
+from vhash import VHash
+
+from litmon.model import ArticleScorer
+
+
+class MultiTopicScorer(ArticleScorer):
+    """Score journal articles for several topics, with a shared vectorizer
+
+    Monitoring several topics with separate
+    :class:`~litmon.model.ArticleScorer` models would vectorize the same
+    articles once per topic. Instead, this fits a single :code:`vhash.VHash`
+    table (on the union :code:`label`, i.e. whether an article belongs to any
+    topic), vectorizes the articles once, and then fits one ml model (a head)
+    per topic on the shared feature matrix. Each topic's labels are read from
+    the :code:`label_{topic}` column (see
+    :class:`~litmon.cli.dbase.DBaseBuilder`). Articles with a missing topic
+    label (e.g. articles added from feedback) are only used by the union
+    model.
+
+    This is itself an :class:`~litmon.model.ArticleScorer` for the union of
+    all topics, so it can be used anywhere a single model is expected. Use
+    :meth:`predict_topics` to score every topic at once: when every head is a
+    linear model, all heads are scored with a single matrix multiply.
+
+    Parameters
+    ----------
+    topics: list[str]
+        name of each topic
+    **kwargs: Any
+        passed to :class:`~litmon.model.ArticleScorer` on :code:`__init__()`,
+        for the union model and for each head
+
+    Attributes
+    ----------
+    heads: dict[str, ArticleScorer]
+        model of each topic, without its own :code:`vhash` table (see
+        :meth:`head`)
+    topics: list[str]
+        name of each topic
+    """
+    def __init__(self, topics: list[str], /, **kwargs):
+        ArticleScorer.__init__(self, **kwargs)
+        self.topics = list(topics)
+        self.heads: dict[str, ArticleScorer] = {}
+        self._kwargs = kwargs
+
+    def fit(self, X: DataFrame, /) -> MultiTopicScorer:
+        """Fit shared vectorizer, union model, and each topic's head
+
+        Parameters
+        ----------
+        X: DataFrame
+            data to use for fitting, with a :code:`label` column, and a
+            :code:`label_{topic}` column for each topic
+
+        Returns
+        -------
+        MultiTopicScorer
+            Calling instance
+        """
+
+        # get fitting text and union labels
+        text = self._extract_text(X)
+        labels = X[self._label_field].to_numpy()
+
+        # train vectorizer, and vectorize documents once
+        cat_labels = list((labels >= 1).astype(int))
+        self.vhash = VHash(**self._vhash_kwargs).fit(text, cat_labels)
+        vectorized = self._vectorize(text, sparse=self._sparse)
+
+        # train union model
+        vectorized, _ = self._fit_model(vectorized, labels, text)
+
+        # train each topic's head on the shared feature matrix
+        self.heads = {}
+        for topic in self.topics:
+            head = ArticleScorer(**self._kwargs)
+            head._sparse = self._sparse
+            topic_labels = X[f'{self._label_field}_{topic}'].to_numpy()
+            has_label = X[f'{self._label_field}_{topic}'].notna().to_numpy()
+            head._fit_model(
+                vectorized[has_label],
+                topic_labels[has_label].astype(float),
+                [doc for doc, keep in zip(text, has_label) if keep],
+            )
+            self.heads[topic] = head
+
+        # score most frequent training terms, vectorizing them once
+        if self._vocab_size:
+            self.terms = self._count_terms(text)
+            features = self._vectorize_terms(self.terms)
+            self.term_weights = self._weigh_terms(features)
+            for head in self.heads.values():
+                head.terms = self.terms
+                head.term_weights = head._weigh_terms(features)
+
+        # return
+        return self
+
+    def summarize(self, X: DataFrame, /) -> MultiTopicScorer:
+        """Summarize the scores of articles like those that will be scored
+
+        This summarizes the union model (see
+        :meth:`litmon.model.ArticleScorer.summarize`), and each topic's head,
+        whose calibrator prevalence comes from the :code:`label_{topic}`
+        column of :code:`X` (if present).
+
+        Parameters
+        ----------
+        X: DataFrame
+            unbalanced articles
+
+        Returns
+        -------
+        MultiTopicScorer
+            Calling instance
+        """
+        super().summarize(X)
+        for topic in self.topics:
+            X_topic = X.drop(columns=self._label_field, errors='ignore')
+            if f'{self._label_field}_{topic}' in X:
+                X_topic[self._label_field] = \
+                    X[f'{self._label_field}_{topic}']
+            head = self.head(topic).summarize(X_topic)
+            self.heads[topic].sketch = head.sketch
+            self.heads[topic].calibrator = head.calibrator
+        return self
+
+    def head(self, topic: str, /) -> ArticleScorer:
+        """Get a standalone model for one topic
+
+        Parameters
+        ----------
+        topic: str
+            name of topic
+
+        Returns
+        -------
+        ArticleScorer
+            topic's head, sharing this instance's :code:`vhash` table
+        """
+        head = copy(self.heads[topic])
+        head.vhash = self.vhash
+        return head
+
+    def predict_topics(self, X: DataFrame, /) -> DataFrame:
+        """Predict scores of each article, for each topic
+
+        Parameters
+        ----------
+        X: DataFrame
+            articles to score
+
+        Returns
+        -------
+        DataFrame
+            one column of scores per topic, with the same index as :code:`X`
+        """
+        return DataFrame(
+            self.score_topics(self.transform(X)),
+            columns=self.topics,
+            index=X.index,
+        )
+
+    def score_topics(self, vectorized: Any, /) -> NDArray[(Any, Any), float]:
+        """Score vectorized articles for each topic
+
+        If every head is a linear model (with :code:`coef_` and
+        :code:`intercept_`), all heads are scored with one matrix multiply.
+        Otherwise, each head is scored on its own.
+
+        Parameters
+        ----------
+        vectorized: Any
+            vectorized articles (see
+            :meth:`~litmon.model.ArticleScorer.transform`)
+
+        Returns
+        -------
+        NDArray
+            (articles x topics) scores, with columns in the order of
+            :attr:`topics`
+        """
+        return predict_stacked(
+            [self.heads[topic].model for topic in self.topics],
+            vectorized,
+        )
+
+
+def predict_stacked(
+    models: list[Any],
+    vectorized: Any,
+    /,
+) -> NDArray[(Any, Any), float]:
+    """Score vectorized articles with several ml models
+
+    If every model is linear (with :code:`coef_` and :code:`intercept_`), all
+    models are scored with one matrix multiply. Otherwise, each model is
+    scored on its own.
+
+    Parameters
+    ----------
+    models: list[Any]
+        ml models, fit on the same features
+    vectorized: Any
+        vectorized articles (see
+        :meth:`~litmon.model.ArticleScorer.transform`)
+
+    Returns
+    -------
+    NDArray
+        (articles x models) scores, with columns in the order of
+        :code:`models`
+    """
+
+    # score each model on its own, if any isn't linear
+    if not all(
+        hasattr(model, 'coef_')
+        and hasattr(model, 'intercept_')
+        and asarray(model.coef_).size == vectorized.shape[1]
+        for model in models
+    ):
+        return column_stack([
+            array(model.predict(vectorized)) for model in models
+        ]).reshape(vectorized.shape[0], len(models))
+
+    # stack coefficients, score all models at once
+    coefs = column_stack([
+        asarray(model.coef_).ravel() for model in models
+    ]).astype(vectorized.dtype)
+    intercepts = array([
+        asarray(model.intercept_).ravel()[0] for model in models
+    ])
+    return asarray(vectorized @ coefs) + intercepts
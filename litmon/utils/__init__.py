@@ -2,5 +2,37 @@
 
 # flake8: noqa
 
-from litmon.utils.cli import cli
-from litmon.utils.dates import drange
+from importlib import import_module
+from typing import Any
+
+# the cli function shares its name with its module, so it's imported eagerly
+# (otherwise, importing the litmon.utils.cli module would shadow it)
+from litmon.utils.cli import cli, unpack
+
+
+# module containing each lazily-imported attribute
+_lazy = {
+    'ConfigError': 'litmon.utils.config',
+    'ConfigSchema': 'litmon.utils.config',
+    'add_months': 'litmon.utils.dates',
+    'atomic': 'litmon.utils.files',
+    'drange': 'litmon.utils.dates',
+    'load_config': 'litmon.utils.config',
+    'parse_range': 'litmon.utils.dates',
+    'read_articles': 'litmon.utils.files',
+    'split_range': 'litmon.utils.dates',
+    'windows': 'litmon.utils.dates',
+}
+
+__all__ = ['cli', 'unpack', *_lazy]
+
+
+def __getattr__(name: str) -> Any:
+    """Import attribute on first access"""
+    if name in _lazy:
+        return getattr(import_module(_lazy[name]), name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *_lazy])
@@ -3,26 +3,36 @@
 from argparse import ArgumentParser
 from typing import Any
 
-import yaml
+from litmon.utils.config import ConfigError, ConfigSchema, load_config
 
 
 def cli(
     cls: str,
     description: str,
     default: list[str],
+    flags: list[str] = [],
 ) -> dict[str, Any]:
     """Create CLI that loads kwargs from config files
 
+    The loaded parameters are validated against the signature of :code:`cls`
+    (see :class:`litmon.utils.config.ConfigSchema`), so bad configurations
+    fail before any work is done.
+
     Parameters
     ----------
     cls: str
-        Class to be constructed from configuration parameters.
-        This is only used as a :code:`help` prompt.
+        Class to be constructed from configuration parameters, as a full
+        import path
     description: str
         Description of the program, printed out if the user uses the :code:`-h`
         flag
     default: list[str]
         Default fields to use from file (if not overridden by user)
+    flags: list[str], optional, default=[]
+        Boolean keyword arguments that can be switched on from the command
+        line. E.g. :code:`flags=['only_missing']` adds an
+        :code:`--only-missing` switch, which sets :code:`only_missing=True`
+        (overriding the configuration file).
 
     Returns
     -------
@@ -45,18 +55,72 @@ def cli(
         nargs='+',
         help=f'Unpack these files in config_fname to construct {cls}'
     )
+    parser.add_argument(
+        '-s',
+        '--set',
+        default=[],
+        nargs='+',
+        metavar='FIELD.KEY=VALUE',
+        help='Override values in config_fname',
+    )
+    for flag in flags:
+        parser.add_argument(
+            f'--{flag.replace("_", "-")}',
+            action='store_true',
+            help=f'Set {flag}=True when constructing {cls}',
+        )
     args = parser.parse_args()
 
-    # load configuration file
-    config = yaml.safe_load(open(args.config_fname, 'r'))
+    # load and unpack configuration file
+    try:
+        out = unpack(
+            load_config(args.config_fname, overrides=args.set),
+            args.fields,
+        )
+
+        # set flags
+        for flag in flags:
+            if getattr(args, flag):
+                out[flag] = True
+
+        # validate
+        ConfigSchema(cls).validate(out)
+    except ConfigError as error:
+        parser.error(str(error))
+
+    # return
+    return out
+
+
+def unpack(config: dict[str, Any], fields: list[str], /) -> dict[str, Any]:
+    """Unpack fields from a loaded configuration file
 
-    # unpack fields
+    Fields that are dictionaries are merged together. Other fields are used
+    as-is. (See :meth:`cli`.)
+
+    Parameters
+    ----------
+    config: dict[str, Any]
+        loaded configuration file
+    fields: list[str]
+        fields to unpack
+
+    Returns
+    -------
+    dict[str, Any]
+        unpacked parameters
+
+    Raises
+    ------
+    ConfigError
+        if a field is missing from :code:`config`
+    """
     out = {}
-    for field in args.fields:
+    for field in fields:
+        if field not in config:
+            raise ConfigError(f'Missing config field: {field}')
         if type(config[field]) is dict:
             out = out | config[field]
         else:
             out[field] = config[field]
-
-    # return
     return out
@@ -0,0 +1,384 @@
+"""Typed, validated configuration"""
+
+from __future__ import annotations
+
+from copy import deepcopy
+from datetime import datetime
+from hashlib import sha256
+from importlib import import_module
+from inspect import Parameter, signature
+import json
+import os
+from os import path
+from threading import Lock
+from typing import Any, Callable
+
+from litmon.utils.dates import drange, parse_range
+
+
+class ConfigError(ValueError):
+    """Invalid configuration"""
+
+
+# classes that each CLI class passes its **kwargs to
+kwargs_targets = {
+    'litmon.cli.backtest.Backtester': ['litmon.model.ArticleScorer'],
+    'litmon.cli.daily.DailyIngester': ['litmon.query.PubMedQuerier'],
+    'litmon.cli.dbase.DBaseBuilder': ['litmon.query.PubMedQuerier'],
+    'litmon.cli.fit.ModelFitter': ['litmon.model.ArticleScorer'],
+    'litmon.cli.monitor.DriftReporter': ['litmon.monitor.DriftMonitor'],
+    'litmon.cli.shard.ShardCoordinator': [
+        'litmon.cli.dbase.DBaseBuilder',
+        'litmon.query.PubMedQuerier',
+    ],
+    'litmon.cli.sync.DBaseSyncer': ['litmon.query.PubMedQuerier'],
+    'litmon.cli.worker.ShardWorker': ['litmon.query.PubMedQuerier'],
+}
+
+# prefix of environment variables that override configuration files
+env_prefix = 'LITMON__'
+
+# parsed configuration files, keyed by filename, with their mtime and size
+_cache: dict[str, tuple[tuple[int, int], dict[str, Any]]] = {}
+_cache_lock = Lock()
+
+
+def _check_date(value: str, /):
+    """Check a date is formatted YYYY/mm/dd"""
+    datetime.strptime(value, '%Y/%m/%d')
+
+
+def _check_month(value: str, /):
+    """Check a month is formatted YYYY/mm"""
+    datetime.strptime(value, '%Y/%m')
+
+
+def _check_range(value: str, /):
+    """Check a date range is formatted YYYY/mm-YYYY/mm, and isn't empty"""
+    start, stop = parse_range(value)
+    if stop <= start or not drange(value):
+        raise ValueError('empty date range')
+
+
+# checks of formatted string parameters, keyed by parameter name
+formats: dict[str, tuple[Callable[[str], None], str]] = {
+    'date': (_check_date, 'YYYY/mm/dd'),
+    'date_range': (_check_range, 'YYYY/mm-YYYY/mm'),
+    'fback_range': (_check_range, 'YYYY/mm-YYYY/mm'),
+    'sketch_range': (_check_range, 'YYYY/mm-YYYY/mm'),
+    'train_start': (_check_month, 'YYYY/mm'),
+    'until': (_check_date, 'YYYY/mm/dd'),
+    'update_range': (_check_range, 'YYYY/mm-YYYY/mm'),
+}
+
+# checks of annotated types. (Other annotations, e.g. DataFrame, are objects
+# that can't be written in a configuration file, and aren't checked.)
+_types: dict[str, Callable[[Any], bool]] = {
+    'Any': lambda value: True,
+    'bool': lambda value: isinstance(value, bool),
+    'dict': lambda value: isinstance(value, dict),
+    'float': lambda value:
+        isinstance(value, (int, float)) and not isinstance(value, bool),
+    'int': lambda value:
+        isinstance(value, int) and not isinstance(value, bool),
+    'list': lambda value: isinstance(value, list),
+    'str': lambda value: isinstance(value, str),
+    'tuple': lambda value: isinstance(value, (list, tuple)),
+}
+
+
+class ConfigSchema:
+    """Typed schema of the parameters of a CLI class
+
+    The schema is read from the signature of the class's :code:`__init__()`:
+    each parameter's type annotation, and its default value (parameters
+    without defaults are required). If the class takes :code:`**kwargs`, the
+    parameters of the classes they're passed to (see :code:`kwargs_targets`)
+    are also included.
+
+    Parameters
+    ----------
+    cls: str
+        class, as a full import path (e.g. :code:`litmon.cli.eval.ModelUser`)
+
+    Attributes
+    ----------
+    params: dict[str, tuple[str, Any]]
+        annotation and default value of each parameter, keyed by name. The
+        default of a required parameter is :code:`inspect.Parameter.empty`.
+    strict: bool
+        whether unknown parameters are rejected. (This is False if the class
+        takes :code:`**kwargs`, but doesn't have a known target.)
+    """
+    def __init__(self, cls: str, /):
+        self.cls = cls
+        self.params: dict[str, tuple[str, Any]] = {}
+        self.strict = True
+        for target in [cls, *kwargs_targets.get(cls, [])]:
+            module, _, name = target.rpartition('.')
+            params = signature(getattr(import_module(module), name)).parameters
+            for param in params.values():
+                if param.kind is Parameter.VAR_KEYWORD:
+                    self.strict &= cls in kwargs_targets
+                elif param.kind in (
+                    Parameter.POSITIONAL_OR_KEYWORD,
+                    Parameter.KEYWORD_ONLY,
+                ):
+                    self.params.setdefault(param.name, (
+                        param.annotation
+                        if isinstance(param.annotation, str)
+                        else getattr(param.annotation, '__name__', 'Any'),
+                        param.default,
+                    ))
+
+    def validate(self, config: dict[str, Any], /) -> dict[str, Any]:
+        """Validate configuration, and fill in defaults
+
+        Every problem is reported at once: missing required parameters,
+        unknown parameters, values of the wrong type, and badly formatted
+        dates.
+
+        Parameters
+        ----------
+        config: dict[str, Any]
+            unpacked configuration (see :meth:`litmon.utils.cli.unpack`)
+
+        Returns
+        -------
+        dict[str, Any]
+            resolved configuration: every parameter, with its configured or
+            default value
+
+        Raises
+        ------
+        ConfigError
+            if the configuration is invalid
+        """
+        errors = []
+
+        # check required and unknown parameters
+        for name, (_, default) in self.params.items():
+            if default is Parameter.empty and config.get(name) is None:
+                errors.append(f'{name}: missing required parameter')
+        if self.strict:
+            errors += [
+                f'{name}: unknown parameter'
+                for name in config
+                if name not in self.params
+            ]
+
+        # check types and formats
+        for name, value in config.items():
+            if name not in self.params or value is None:
+                continue
+            annotation, _ = self.params[name]
+            if not self.__class__.matches(value, annotation):
+                errors.append(
+                    f'{name}: expected {annotation}, got {value!r}'
+                )
+            elif name in formats and isinstance(value, str):
+                check, fmt = formats[name]
+                try:
+                    check(value)
+                except ValueError:
+                    errors.append(f'{name}: expected {fmt}, got {value!r}')
+
+        # report problems
+        if errors:
+            raise ConfigError(
+                f'Invalid configuration for {self.cls}:\n  '
+                + '\n  '.join(errors)
+            )
+
+        # fill in defaults
+        return {
+            name: default
+            for name, (_, default) in self.params.items()
+            if default is not Parameter.empty
+        } | config
+
+    def hash(self, config: dict[str, Any], /) -> str:
+        """Hash the resolved configuration
+
+        Configurations that only differ by explicitly setting default values
+        have the same hash, so this can be used as a cache key for skipping
+        work whose effective configuration hasn't changed.
+
+        Parameters
+        ----------
+        config: dict[str, Any]
+            unpacked configuration
+
+        Returns
+        -------
+        str
+            sha256 hash of the resolved configuration
+        """
+        return sha256(json.dumps(
+            self.validate(config),
+            sort_keys=True,
+            default=str,
+        ).encode()).hexdigest()
+
+    @classmethod
+    def matches(cls, value: Any, annotation: str, /) -> bool:
+        """Check if a value matches a type annotation
+
+        Parameters
+        ----------
+        value: Any
+            configured value
+        annotation: str
+            type annotation, e.g. :code:`list[str] | dict[str, str]`
+
+        Returns
+        -------
+        bool
+            whether the value matches
+        """
+
+        # unions
+        annotation = annotation.replace(' ', '')
+        options = cls._split(annotation, '|')
+        if len(options) > 1:
+            return any(cls.matches(value, option) for option in options)
+        if annotation.startswith(('Union[', 'Optional[')):
+            return value is None or any(
+                cls.matches(value, option)
+                for option in cls._split(annotation.partition('[')[2][:-1])
+            )
+
+        # base type
+        base, _, args = annotation.partition('[')
+        if base == 'None':
+            return value is None
+        if not _types.get(base, _types['Any'])(value):
+            return False
+
+        # item types
+        args = cls._split(args[:-1]) if args else []
+        if base == 'list' and len(args) == 1:
+            return all(cls.matches(item, args[0]) for item in value)
+        if base == 'dict' and len(args) == 2:
+            return all(
+                cls.matches(key, args[0]) and cls.matches(item, args[1])
+                for key, item in value.items()
+            )
+        return True
+
+    @classmethod
+    def _split(cls, annotation: str, sep: str = ',', /) -> list[str]:
+        """Split an annotation on top-level separators"""
+        parts = ['']
+        depth = 0
+        for char in annotation:
+            depth += (char == '[') - (char == ']')
+            if char == sep and depth == 0:
+                parts.append('')
+            else:
+                parts[-1] += char
+        return parts
+
+
+def read_yaml(fname: str, /) -> dict[str, Any]:
+    """Load a configuration file, parsing it only once
+
+    Parsed files are cached until they're modified.
+
+    Parameters
+    ----------
+    fname: str
+        configuration yaml file
+
+    Returns
+    -------
+    dict[str, Any]
+        loaded configuration (a copy, which can be modified)
+    """
+    import yaml
+
+    fname = path.abspath(fname)
+    stat = os.stat(fname)
+    key = (stat.st_mtime_ns, stat.st_size)
+    with _cache_lock:
+        if fname not in _cache or _cache[fname][0] != key:
+            with open(fname, 'r') as file:
+                _cache[fname] = (key, yaml.safe_load(file) or {})
+        return deepcopy(_cache[fname][1])
+
+
+def override(
+    config: dict[str, Any],
+    overrides: list[str],
+    /,
+) -> dict[str, Any]:
+    """Override configuration values, in place
+
+    Each override is formatted :code:`field.key=value`, where :code:`value`
+    is parsed as yaml. E.g. :code:`eval.count=50` sets :code:`count: 50` in
+    the :code:`eval` field, and :code:`query=aging` replaces the :code:`query`
+    field.
+
+    Parameters
+    ----------
+    config: dict[str, Any]
+        loaded configuration
+    overrides: list[str]
+        overrides, formatted :code:`field.key=value`
+
+    Returns
+    -------
+    dict[str, Any]
+        :code:`config`
+    """
+    import yaml
+
+    for item in overrides:
+        keys, sep, value = item.partition('=')
+        if not sep or not keys:
+            raise ConfigError(f'Override must be key=value, got {item!r}')
+        *parents, key = keys.split('.')
+        node = config
+        for parent in parents:
+            node = node.setdefault(parent, {})
+            if not isinstance(node, dict):
+                raise ConfigError(f'{parent} is not a dict in {item!r}')
+        node[key] = yaml.safe_load(value)
+    return config
+
+
+def load_config(
+    fname: str,
+    /,
+    *,
+    overrides: list[str] = [],
+    environ: dict[str, str] = None,
+) -> dict[str, Any]:
+    """Load a configuration file, with environment and command-line overrides
+
+    Environment variables named :code:`LITMON__{FIELD}__{KEY}` override
+    :code:`key` in :code:`field` (e.g. :code:`LITMON__EVAL__COUNT=50`), and
+    are applied first. Then, :code:`overrides` are applied (see
+    :meth:`override`).
+
+    Parameters
+    ----------
+    fname: str
+        configuration yaml file
+    overrides: list[str], optional, default=[]
+        overrides, formatted :code:`field.key=value`
+    environ: dict[str, str], optional, default=None
+        environment variables. If None, use :code:`os.environ`.
+
+    Returns
+    -------
+    dict[str, Any]
+        loaded configuration
+    """
+    if environ is None:
+        environ = os.environ
+    return override(read_yaml(fname), [
+        f'{name[len(env_prefix):].lower().replace("__", ".")}={value}'
+        for name, value in sorted(environ.items())
+        if name.startswith(env_prefix)
+    ] + list(overrides))
@@ -2,10 +2,103 @@
 
 from __future__ import annotations
 
+from datetime import date, timedelta
 import re
+from typing import TYPE_CHECKING, Any, Union
 
+# heavy dependencies are imported when first used, for fast startup
+if TYPE_CHECKING:
+    from numpy import ndarray
 
-def drange(datestr: str, /) -> list[tuple(int, int)]:
+
+# a date range: YYYY/mm[/dd]-[YYYY/mm[/dd]]
+_pattern = re.compile(
+    r'\s*(\d{4})/(\d{1,2})(?:/(\d{1,2}))?'
+    r'\s*-\s*'
+    r'(?:(\d{4})/(\d{1,2})(?:/(\d{1,2}))?)?\s*'
+)
+
+
+def add_months(year: int, month: int, count: int, /) -> tuple[int, int]:
+    """Shift a month forward (or backward) by some number of months
+
+    Parameters
+    ----------
+    year: int
+        input year
+    month: int
+        input month
+    count: int
+        number of months to shift. Negative numbers shift backward.
+
+    Returns
+    -------
+    int
+        year of shifted month
+    int
+        shifted month
+    """
+    year, month = divmod(year * 12 + month - 1 + count, 12)
+    return year, month + 1
+
+
+def parse_range(
+    datestr: str,
+    /,
+    *,
+    today: date = None,
+) -> tuple[date, date]:
+    """Parse a date range
+
+    Each end of the range is either a month (YYYY/mm), which covers the whole
+    month, or a day (YYYY/mm/dd). If the end of the range is left out (e.g.
+    :code:`2019/01-`), the range is open-ended, and runs through
+    :code:`today`.
+
+    Parameters
+    ----------
+    datestr: str
+        dates, in format YYYY/mm[/dd]-[YYYY/mm[/dd]]
+    today: date, optional, default=None
+        end of open-ended ranges. If None, use today's date.
+
+    Returns
+    -------
+    date
+        first day in range
+    date
+        day after the last day in range
+    """
+
+    # parse arguments
+    match = _pattern.fullmatch(datestr) if isinstance(datestr, str) else None
+    if match is None:
+        raise ValueError('Required datestr format is YYYY/mm-YYYY/mm')
+    first_year, first_month, first_day, final_year, final_month, final_day = (
+        int(x) if x is not None else None
+        for x in match.groups()
+    )
+
+    # get first day
+    try:
+        start = date(first_year, first_month, first_day or 1)
+
+        # get day after last day
+        if final_year is None:
+            stop = (today or date.today()) + timedelta(days=1)
+        elif final_day is not None:
+            stop = date(final_year, final_month, final_day) \
+                + timedelta(days=1)
+        else:
+            stop = date(*add_months(final_year, final_month, 1), 1)
+    except ValueError:
+        raise ValueError(f'Invalid date in {datestr!r}')
+
+    # return
+    return start, stop
+
+
+def drange(datestr: str, /, *, today: date = None) -> list[tuple(int, int)]:
     """Transform datestring into list of dates
 
     Each date covered in datestr is unpacked so that its year/month is
@@ -19,10 +112,15 @@ def drange(datestr: str, /) -> list[tuple(int, int)]:
             (2015, 1),
         ]
 
+    Open-ended ranges (e.g. :code:`2019/01-`) and day ranges are also
+    accepted (see :meth:`parse_range`).
+
     Parameters
     ----------
     datestr: str
         dates, in format YYYY/mm-YYYY/mm
+    today: date, optional, default=None
+        end of open-ended ranges. If None, use today's date.
 
     Returns
     -------
@@ -31,28 +129,143 @@ def drange(datestr: str, /) -> list[tuple(int, int)]:
         :code:`drange[0]=(year, month)` for the first month covered in
         datestr.
     """
+    start, stop = parse_range(datestr, today=today)
+    final = stop - timedelta(days=1)
+    return [
+        add_months(start.year, start.month, count)
+        for count in range(
+            (final.year - start.year) * 12 + final.month - start.month + 1
+        )
+    ]
 
-    # parse arguments
-    try:
-        first_year, first_month, final_year, final_month = \
-            (int(x) for x in re.findall(r'\d+', datestr))
-    except Exception:
-        raise ValueError('Required datestr format is YYYY/mm-YYYY/mm')
 
-    # make range
-    drange = []
-    (year, month) = (first_year, first_month)
-    while (now := (year, month)) <= (final_year, final_month):
+def windows(
+    datestr: str,
+    /,
+    *,
+    freq: Union[str, int] = 'month',
+    today: date = None,
+) -> ndarray:
+    """Split a date range into windows
 
-        # add to list
-        drange.append(now)
+    Windows are generated with vectorized :code:`numpy.datetime64`
+    arithmetic, so long day-level ranges are cheap.
 
-        # increment month
-        if month < 12:
-            month += 1
-        else:
-            month = 1
-            year += 1
+    Parameters
+    ----------
+    datestr: str
+        dates, in format YYYY/mm[/dd]-[YYYY/mm[/dd]] (see :meth:`parse_range`)
+    freq: str | int, optional, default='month'
+        window size: :code:`day`, :code:`week` (starting on Mondays),
+        :code:`month`, :code:`year`, or a number of days (starting on the
+        first day in range)
+    today: date, optional, default=None
+        end of open-ended ranges. If None, use today's date.
 
-    # return
-    return drange
+    Returns
+    -------
+    ndarray
+        :code:`datetime64[D]` array, with shape (number of windows, 2). Each
+        row is the first day of a window, and the day after its last day. The
+        first and last windows are clipped to :code:`datestr`.
+    """
+    import numpy as np
+
+    # get range
+    start, stop = (
+        np.datetime64(day, 'D')
+        for day in parse_range(datestr, today=today)
+    )
+    if stop <= start:
+        return np.empty((0, 2), dtype='datetime64[D]')
+
+    # get window starts
+    if freq in ('month', 'year'):
+        unit = 'M' if freq == 'month' else 'Y'
+        starts = np.arange(
+            start.astype(f'datetime64[{unit}]'),
+            (stop - 1).astype(f'datetime64[{unit}]') + 1,
+        ).astype('datetime64[D]')
+    elif freq == 'week':
+        # (day 0 of datetime64 is a Thursday, so Mondays are day 4 mod 7)
+        monday = start - (start.astype(int) - 4) % 7
+        starts = np.arange(monday, stop, 7)
+    elif freq == 'day' or isinstance(freq, int) and freq > 0:
+        starts = np.arange(start, stop, 1 if freq == 'day' else freq)
+    else:
+        raise ValueError(f'Unknown window frequency: {freq!r}')
+
+    # clip windows to range
+    starts = np.maximum(starts, start)
+    return np.stack([starts, np.append(starts[1:], stop)], axis=1)
+
+
+def split_range(
+    datestr: str,
+    count: int,
+    /,
+    *,
+    volumes: dict[Any, float] = None,
+    today: date = None,
+) -> list[str]:
+    """Split a date range into shards of consecutive months
+
+    Shards are balanced by expected article volume, so each shard takes
+    about the same amount of work to process.
+
+    Parameters
+    ----------
+    datestr: str
+        dates, in format YYYY/mm-YYYY/mm (see :meth:`drange`)
+    count: int
+        number of shards. If there are fewer months in range, each month is
+        its own shard.
+    volumes: dict[Any, float], optional, default=None
+        historical article count of each month, keyed by :code:`(year,
+        month)` or :code:`'YYYY-mm'` (e.g. the :code:`count` in
+        :meth:`litmon.monitor.DriftMonitor.history`). Months without counts
+        are expected to have the mean count. If None, every month is expected
+        to have the same count.
+    today: date, optional, default=None
+        end of open-ended ranges. If None, use today's date.
+
+    Returns
+    -------
+    list[str]
+        date range of each shard, in format YYYY/mm-YYYY/mm
+    """
+    import numpy as np
+
+    # get expected volume of each month
+    months = drange(datestr, today=today)
+    volumes = {
+        tuple(int(x) for x in key.split('-')) if isinstance(key, str) else key:
+            value
+        for key, value in (volumes or {}).items()
+    }
+    known = [volumes[key] for key in months if key in volumes]
+    mean = np.mean(known) if known else 1
+    cumulative = np.cumsum([volumes.get(key, mean) for key in months])
+
+    # cut after the months closest to each even share of the total volume,
+    # leaving at least one month for each shard
+    count = min(count, len(months))
+    cuts = [0]
+    for shard in range(1, count):
+        first = cuts[-1] + 1
+        final = len(months) - (count - shard)
+        target = cumulative[-1] * shard / count
+        cuts.append(
+            first
+            + int(np.abs(cumulative[first - 1:final] - target).argmin())
+        )
+    cuts.append(len(months))
+
+    # format shards
+    return [
+        '{:4d}/{:02d}-{:4d}/{:02d}'.format(
+            *months[first],
+            *months[final - 1],
+        )
+        for first, final in zip(cuts[:-1], cuts[1:])
+    ]
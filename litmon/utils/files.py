@@ -0,0 +1,85 @@
+"""File helpers"""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+from os import getpid, makedirs, path, remove, replace
+from threading import get_ident
+from typing import TYPE_CHECKING, Any, Iterator
+
+# heavy dependencies are imported when first used, for fast startup
+if TYPE_CHECKING:
+    from pandas import DataFrame
+
+
+# columns of article databases that hold dates
+date_cols = ['publication_date']
+
+
+@contextmanager
+def atomic(fname: str, /) -> Iterator[str]:
+    """Write a file atomically
+
+    Yields a temporary filename to write to. When the block exits without
+    error, the temporary file replaces :code:`fname`, so readers never see a
+    partially-written file. The temporary filename is unique to the calling
+    process and thread, so concurrent writers never clobber each other's
+    partial output. E.g.
+
+    .. code-block:: python
+
+        with atomic('data/2020-01-fit.csv') as tmp_fname:
+            df.to_csv(tmp_fname)
+
+    Parameters
+    ----------
+    fname: str
+        file to write
+
+    Yields
+    ------
+    str
+        temporary file to write to
+    """
+    if dirname := path.dirname(fname):
+        makedirs(dirname, exist_ok=True)
+    tmp_fname = f'{fname}.{getpid()}-{get_ident()}.tmp'
+    try:
+        yield tmp_fname
+        replace(tmp_fname, fname)
+    finally:
+        if path.isfile(tmp_fname):
+            remove(tmp_fname)
+
+
+def read_articles(fname: str, /, **kwargs: Any) -> DataFrame:
+    """Read article database csv file, with typed date columns
+
+    Date columns (:code:`publication_date`) are parsed as
+    :code:`datetime64` while reading, so that callers never need to re-parse
+    them. Values that aren't dates (e.g. blank cells of a reviewer workbook)
+    become :code:`NaT`.
+
+    Parameters
+    ----------
+    fname: str
+        csv file to read
+    **kwargs: Any
+        passed to :code:`pandas.read_csv`
+
+    Returns
+    -------
+    DataFrame
+        articles
+    """
+    from pandas import read_csv, to_datetime
+    header = read_csv(fname, nrows=0).columns
+    articles = read_csv(
+        fname,
+        parse_dates=[col for col in date_cols if col in header],
+        **kwargs,
+    )
+    for col in date_cols:
+        if col in articles and articles[col].dtype.kind != 'M':
+            articles[col] = to_datetime(articles[col], errors='coerce')
+    return articles
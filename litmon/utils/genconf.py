@@ -2,12 +2,16 @@
 
 from __future__ import annotations
 
-from datetime import datetime
+from argparse import ArgumentParser
+from datetime import datetime, timedelta
+from typing import Any
 
 import yaml
 
+from litmon.utils.dates import add_months
 
-def last_month(year: int, month: int) -> tuple(int, int):
+
+def last_month(year: int, month: int) -> tuple[int, int]:
     """Rewind one month
 
     Parameters
@@ -24,14 +28,35 @@ def last_month(year: int, month: int) -> tuple(int, int):
     int
         previous month
     """
-    month -= 1
-    if month == 0:
-        month = 12
-        year -= 1
-    return year, month
+    return add_months(year, month, -1)
 
 
-if __name__ == '__main__':
+def genconf(
+    template_fname: str = 'config/live-template.yaml',
+    /,
+    *,
+    daily: bool = False,
+) -> dict[str, Any]:
+    """Generate config for live run
+
+    The evaluation date range is set to last month, and the feedback date
+    range is extended through the month before that. If the template has a
+    :code:`sync_dates` field, its date range is set to the month before last
+    month, whose database is then refreshed with revised records (see
+    :class:`litmon.cli.sync.DBaseSyncer`).
+
+    Parameters
+    ----------
+    template_fname: str, optional, default='config/live-template.yaml'
+        template configuration file
+    daily: bool, optional, default=False
+        also configure daily incremental ingestion of yesterday's articles
+
+    Returns
+    -------
+    dict[str, Any]
+        configuration for live run
+    """
 
     # get dates
     now = datetime.now()
@@ -41,9 +66,32 @@ if __name__ == '__main__':
     prev_datestr = f'{prev_year:4d}/{prev_month:02d}'
 
     # create config
-    config = yaml.safe_load(open('config/live-template.yaml', 'r'))
+    config = yaml.safe_load(open(template_fname, 'r'))
     config['fback']['fback_range'] += prev_datestr
     config['eval_dates']['date_range'] = f'{this_datestr}-{this_datestr}'
+    if 'sync_dates' in config:
+        config['sync_dates']['date_range'] = f'{prev_datestr}-{prev_datestr}'
+
+    # configure daily ingestion
+    if daily:
+        yesterday = now - timedelta(days=1)
+        config['daily']['date'] = yesterday.strftime('%Y/%m/%d')
+
+    # return
+    return config
+
+
+if __name__ == '__main__':
+
+    # parse command-line arguments
+    parser = ArgumentParser('Generate config for live run')
+    parser.add_argument(
+        '--daily',
+        action='store_true',
+        help='Configure daily incremental ingestion of yesterday\'s articles',
+    )
+    args = parser.parse_args()
 
-    # save config
+    # create and save config
+    config = genconf(daily=args.daily)
     yaml.dump(config, open('config/live.yaml', 'w'))
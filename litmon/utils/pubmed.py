@@ -0,0 +1,140 @@
+"""PubMed client that sends requests through a resilient session"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Callable, Iterator, Union
+from xml.etree import ElementTree
+
+from pymed import PubMed
+from pymed.article import PubMedArticle
+from pymed.book import PubMedBookArticle
+from requests import Response
+
+from litmon.utils.session import ResilientSession
+
+
+class ResilientPubMed(PubMed):
+    """:code:`pymed.PubMed`, with requests sent through a resilient session
+
+    Parameters
+    ----------
+    tool: str
+        passed to :code:`pymed.PubMed`
+    email: str
+        passed to :code:`pymed.PubMed`
+    session: ResilientSession
+        session used for all requests
+    base_url: str
+        E-utilities base url
+
+    Attributes
+    ----------
+    throttle: Callable[[], None]
+        if set, called before each request (e.g. to share a rate limit
+        between processes, see :meth:`litmon.tasks.TaskQueue.throttle`)
+    """
+    def __init__(
+        self,
+        /,
+        tool: str,
+        email: str,
+        session: ResilientSession,
+        base_url: str,
+    ):
+        PubMed.__init__(self, tool=tool, email=email)
+        self._session = session
+        self._base_url = base_url
+        self.throttle: Callable[[], None] = None
+
+    def _get(
+        self,
+        url: str,
+        parameters: dict,
+        output: str = 'json',
+    ) -> Union[dict, ElementTree.Element]:
+        """Make a request to PubMed (overrides :code:`pymed.PubMed._get`)
+
+        The response is parsed as part of the request, so a truncated body is
+        retried like any other failed request.
+
+        Parameters
+        ----------
+        url: str
+            last part of the url, appended to :code:`base_url`
+        parameters: dict
+            query parameters
+        output: str, optional, default='json'
+            requested response format
+
+        Returns
+        -------
+        Union[dict, ElementTree.Element]
+            parsed json response, or root of parsed xml response
+        """
+
+        # respect rate limit
+        while self._exceededRateLimit():
+            pass
+        if self.throttle is not None:
+            self.throttle()
+
+        # make request
+        parameters['retmode'] = output
+        result = self._session.get(
+            f'{self._base_url}{url}',
+            params=parameters,
+            parse=self.__class__.parser(output),
+        )
+        self._requestsMade.append(datetime.now())
+
+        # return
+        return result
+
+    @classmethod
+    def parser(
+        cls,
+        output: str,
+        /,
+    ) -> Callable[[Response], Union[dict, ElementTree.Element]]:
+        """Get the parser of a response format
+
+        Parameters
+        ----------
+        output: str
+            response format: :code:`json` or :code:`xml`
+
+        Returns
+        -------
+        Callable[[Response], Union[dict, ElementTree.Element]]
+            parses a response's json, or the root of its xml
+        """
+        if output == 'json':
+            return Response.json
+        return lambda response: ElementTree.fromstring(response.text)
+
+    def _getArticles(
+        self,
+        article_ids: list[str],
+    ) -> Iterator[Union[PubMedArticle, PubMedBookArticle]]:
+        """Fetch articles (overrides :code:`pymed.PubMed._getArticles`)
+
+        Parameters
+        ----------
+        article_ids: list[str]
+            PubMed ids to fetch
+
+        Returns
+        -------
+        Iterator[Union[PubMedArticle, PubMedBookArticle]]
+            parsed articles
+        """
+        root = self._get(
+            '/entrez/eutils/efetch.fcgi',
+            self.parameters | {'id': article_ids},
+            output='xml',
+        )
+        for article in root.iter('PubmedArticle'):
+            yield PubMedArticle(xml_element=article)
+        for book in root.iter('PubmedBookArticle'):
+            yield PubMedBookArticle(xml_element=book)
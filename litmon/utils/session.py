@@ -0,0 +1,341 @@
+"""Resilient HTTP session, with retries, circuit breaking, and metrics"""
+
+from __future__ import annotations
+
+from random import uniform
+from threading import Lock
+from time import monotonic, sleep
+from typing import TYPE_CHECKING, Any, Callable
+
+# heavy dependencies are imported when first used, for fast startup
+if TYPE_CHECKING:
+    from requests import Response
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when a request is blocked by an open circuit breaker"""
+
+
+class RetryBudgetError(RuntimeError):
+    """Raised when a session has used up its retry budget"""
+
+
+class RequestMetrics:
+    """Running counters for requests made through a :class:`ResilientSession`
+
+    Attributes
+    ----------
+    attempts: int
+        number of http requests attempted (including retries)
+    failures: int
+        number of attempts that failed
+    retries: int
+        number of attempts that were retries of a failed attempt
+    successes: int
+        number of requests that eventually succeeded
+    bytes: int
+        total size of successful response bodies
+    latency: float
+        total time (s) spent waiting on http requests
+    """
+    def __init__(self):
+        self.attempts = 0
+        self.failures = 0
+        self.retries = 0
+        self.successes = 0
+        self.bytes = 0
+        self.latency = 0.
+
+    def __repr__(self) -> str:
+        return (
+            f'{self.__class__.__name__}('
+            f'attempts={self.attempts}, '
+            f'failures={self.failures}, '
+            f'retries={self.retries}, '
+            f'successes={self.successes}, '
+            f'bytes={self.bytes}, '
+            f'latency={self.latency:.3f})'
+        )
+
+    def to_dict(self) -> dict[str, float]:
+        """Get all counters
+
+        Returns
+        -------
+        dict[str, float]
+            value of each counter
+        """
+        return {
+            'attempts': self.attempts,
+            'failures': self.failures,
+            'retries': self.retries,
+            'successes': self.successes,
+            'bytes': self.bytes,
+            'latency': self.latency,
+        }
+
+
+class ResilientSession:
+    """HTTP session with exponential backoff and a circuit breaker
+
+    Connections are pooled and kept alive across requests. Each request that
+    fails (from a connection error, timeout, a retryable status code, or a
+    response body that can't be parsed) is retried with exponential backoff
+    and full jitter, i.e. the :code:`n`-th retry waits
+    :code:`uniform(0, min(max_delay, delay * 2 ** n))` seconds.
+
+    Two limits keep an outage from hanging a run forever:
+
+    #. The retry budget is a token bucket: each retry takes a token, and each
+       successful request puts back :code:`retry_ratio` tokens, up to
+       :code:`retry_budget`. So, a long run can keep retrying occasional
+       failures, but once failures outnumber successes (by more than the
+       ratio allows), the bucket empties, and failures are raised
+       immediately.
+    #. The circuit breaker opens after :code:`breaker_threshold` consecutive
+       failed requests. While it is open, requests fail immediately with
+       :class:`CircuitOpenError`. After :code:`breaker_cooldown` seconds, one
+       trial request is let through; if it succeeds, the circuit closes.
+
+    A session can be shared between threads (e.g. the workers of
+    :code:`asyncio.to_thread`): the retry budget, circuit breaker, and
+    :attr:`metrics` are only updated while holding a lock (which isn't held
+    while waiting on a request, or sleeping before a retry).
+
+    Parameters
+    ----------
+    max_attempts: int, optional, default=5
+        maximum number of attempts for any single request
+    delay: float, optional, default=1
+        base delay (s) for exponential backoff
+    max_delay: float, optional, default=60
+        maximum delay (s) between attempts
+    retry_budget: int, optional, default=100
+        maximum number of retries in a row (the size of the token bucket)
+    retry_ratio: float, optional, default=0.1
+        tokens refilled by each successful request, i.e. the sustained number
+        of retries allowed per successful request
+    breaker_threshold: int, optional, default=10
+        number of consecutive failed requests that opens the circuit
+    breaker_cooldown: float, optional, default=300
+        time (s) the circuit stays open before letting a trial request through
+    timeout: float, optional, default=60
+        timeout (s) for each attempt
+    pool_size: int, optional, default=10
+        maximum number of kept-alive connections per host
+    retry_status: list[int], optional, default=None
+        error status codes that trigger a retry. If None, use 429 and all 5xx
+        codes.
+
+    Attributes
+    ----------
+    metrics: RequestMetrics
+        running request counters
+    """
+    def __init__(
+        self,
+        /,
+        *,
+        max_attempts: int = 5,
+        delay: float = 1,
+        max_delay: float = 60,
+        retry_budget: int = 100,
+        retry_ratio: float = 0.1,
+        breaker_threshold: int = 10,
+        breaker_cooldown: float = 300,
+        timeout: float = 60,
+        pool_size: int = 10,
+        retry_status: list[int] = None,
+    ):
+        from requests import Session
+        from requests.adapters import HTTPAdapter
+
+        # save parameters
+        self._max_attempts = max_attempts
+        self._delay = delay
+        self._max_delay = max_delay
+        self._retry_budget = retry_budget
+        self._retry_ratio = retry_ratio
+        self._breaker_threshold = breaker_threshold
+        self._breaker_cooldown = breaker_cooldown
+        self._timeout = timeout
+        self._retry_status = retry_status
+
+        # create pooled session
+        self._session = Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+        )
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+
+        # initialize state
+        self._lock = Lock()
+        self.metrics = RequestMetrics()
+        self._consecutive_failures = 0
+        self._opened_at = None
+        self._retry_tokens = float(retry_budget)
+
+    def get(
+        self,
+        url: str,
+        /,
+        params: dict = None,
+        *,
+        parse: Callable[[Response], Any] = None,
+    ) -> Any:
+        """Make GET request
+
+        Parameters
+        ----------
+        url: str
+            url to request
+        params: dict, optional, default=None
+            query parameters
+        parse: Callable[[Response], Any], optional, default=None
+            parses the response body (e.g. :code:`Response.json`). If it
+            raises a :code:`ValueError` (e.g. truncated json) or a
+            :code:`SyntaxError` (e.g. truncated xml), the request is retried,
+            like any other failure.
+
+        Returns
+        -------
+        Any
+            successful response, or its parsed body if :code:`parse` is given
+
+        Raises
+        ------
+        CircuitOpenError
+            if the circuit breaker is open
+        RetryBudgetError
+            if a request failed, and the retry budget is used up
+        requests.RequestException
+            if a request failed on every attempt
+        ValueError, SyntaxError
+            if the response couldn't be parsed on any attempt
+        """
+        from requests import RequestException
+
+        error = None
+        for attempt in range(self._max_attempts):
+
+            # check circuit breaker, and take a retry token
+            with self._lock:
+                self._check_circuit()
+                if attempt:
+                    if self._retry_tokens < 1:
+                        raise RetryBudgetError(
+                            f'Retry budget used up requesting {url}'
+                        ) from error
+                    self._retry_tokens -= 1
+                    self.metrics.retries += 1
+                self.metrics.attempts += 1
+
+            # wait before retrying
+            if attempt:
+                sleep(uniform(0, min(
+                    self._max_delay,
+                    self._delay * 2 ** (attempt - 1),
+                )))
+
+            # make request
+            start = monotonic()
+            try:
+                response = self._session.get(
+                    url,
+                    params=params,
+                    timeout=self._timeout,
+                )
+                response.raise_for_status()
+                result = response if parse is None else parse(response)
+            except RequestException as e:
+                error = e
+                self._record_failure(monotonic() - start)
+                if not self._is_retryable(
+                    getattr(e.response, 'status_code', None)
+                ):
+                    raise e
+                continue
+
+            # retry responses that can't be parsed (e.g. truncated bodies)
+            except (ValueError, SyntaxError) as e:
+                error = e
+                self._record_failure(monotonic() - start)
+                continue
+
+            # record success, and refill retry budget
+            with self._lock:
+                self.metrics.latency += monotonic() - start
+                self.metrics.successes += 1
+                self.metrics.bytes += len(response.content)
+                self._consecutive_failures = 0
+                self._opened_at = None
+                self._retry_tokens = min(
+                    self._retry_budget,
+                    self._retry_tokens + self._retry_ratio,
+                )
+            return result
+
+        # out of attempts
+        raise error
+
+    def close(self):
+        """Close all pooled connections"""
+        self._session.close()
+
+    def _check_circuit(self):
+        """Raise error if circuit breaker is open
+
+        Must be called while holding the session's lock.
+
+        Raises
+        ------
+        CircuitOpenError
+            if the circuit breaker is open, and still cooling down
+        """
+        if self._opened_at is None:
+            return
+        if monotonic() - self._opened_at < self._breaker_cooldown:
+            raise CircuitOpenError(
+                f'Circuit open after {self._consecutive_failures} '
+                'consecutive failures'
+            )
+
+        # half-open: allow one trial request, re-open if it fails
+        self._opened_at = None
+        self._consecutive_failures = self._breaker_threshold - 1
+
+    def _is_retryable(self, status_code: int) -> bool:
+        """Check if a failure should be retried
+
+        Parameters
+        ----------
+        status_code: int
+            status code of failed response, or None if there was no response
+
+        Returns
+        -------
+        bool
+            whether the failure should be retried
+        """
+        if status_code is None:
+            return True
+        if self._retry_status is not None:
+            return status_code in self._retry_status
+        return status_code == 429 or status_code >= 500
+
+    def _record_failure(self, latency: float, /):
+        """Count failure, opening circuit if needed
+
+        Parameters
+        ----------
+        latency: float
+            time (s) spent on the failed attempt
+        """
+        with self._lock:
+            self.metrics.latency += latency
+            self.metrics.failures += 1
+            self._consecutive_failures += 1
+            if self._consecutive_failures >= self._breaker_threshold:
+                self._opened_at = monotonic()
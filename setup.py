@@ -26,7 +26,8 @@ if __name__ == '__main__':
             'pandas',
             'pymed',
             'PyYAML',
-            'retry',
+            'requests',
+            'scipy',
             'sklearn',
             'vhash',
             'xlsxwriter',
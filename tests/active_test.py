@@ -0,0 +1,145 @@
+from os import makedirs
+from shutil import rmtree
+
+from numpy import array
+from pandas import DataFrame, read_csv
+
+from litmon import ArticleScorer, ReviewQueue
+from litmon.cli import ModelUser
+from litmon.feedback import FeedbackStore
+
+from articles import as_articles, make_eval_data, make_fit_data
+
+
+def get_fit_data() -> DataFrame:
+    return make_fit_data(
+        ['mike man', 'dinosaur dude', 'dinosaur rex', 'dude rad', 'mike',
+         'man rad'],
+        [0, 1, 1, 1, 0, 0],
+    )
+
+
+def get_eval_data() -> DataFrame:
+    return as_articles(
+        make_eval_data([
+            'dinosaur rex', 'dinosaur dude', 'dude', 'rad', 'mike rad',
+            'man dude', 'mike', 'man',
+        ]),
+        label=[True] + [False] * 7,
+    )
+
+
+def test_select():
+
+    # score articles
+    articles = DataFrame({'pubmed_id': ['1', '2', '3', '4', '5']})
+    scores = array([.9, .55, .1, .4, .5])
+    features = array([
+        [1., 0.],
+        [1., 0.],
+        [0., 1.],
+        [1., .1],
+        [1., 0.],
+    ])
+
+    # check most uncertain articles are selected, excluding top articles
+    queue = ReviewQueue(None, strategy='uncertainty')
+    exclude = array([True, False, False, False, False])
+    selected = queue.select(articles, scores, features, 2, exclude=exclude)
+    assert(list(selected['pubmed_id']) == ['5', '2'])
+    selected = queue.select(
+        articles,
+        scores,
+        features,
+        2,
+        exclude=exclude,
+        probs=array([1., .9, .2, .5, .1]),
+    )
+    assert(list(selected['pubmed_id']) == ['4', '3'])
+
+    # check diverse articles are selected, far from top articles
+    queue = ReviewQueue(None, strategy='diversity')
+    selected = queue.select(articles, scores, features, 2, exclude=exclude)
+    assert(list(selected['pubmed_id']) == ['3', '4'])
+
+    # check hybrid selection is diverse among uncertain articles
+    queue = ReviewQueue(None, pool=1)
+    selected = queue.select(articles, scores, features, 2, exclude=exclude)
+    assert(list(selected['pubmed_id']) == ['5', '2'])
+    queue = ReviewQueue(None, pool=3)
+    selected = queue.select(articles, scores, features, 1, exclude=exclude)
+    assert(list(selected['pubmed_id']) == ['4'])
+
+    # check bad strategy
+    try:
+        ReviewQueue(strategy='random')
+        raise RuntimeError('ValueError not raised')
+    except ValueError:
+        pass
+
+
+def test():
+
+    # directories
+    results_dir = 'data/active-test'
+
+    # delete temporary files after test
+    try:
+
+        # score articles, selecting articles for review
+        makedirs(results_dir, exist_ok=True)
+        model = ArticleScorer(
+            ml_kwargs={'random_state': 0},
+            use_cols=['1', '2'],
+        ).fit(get_fit_data())
+        kwargs = {
+            'count': 2,
+            'dbases': {(2020, 1): get_eval_data()},
+            'model': model,
+            'results_dir': results_dir,
+            'review_count': 3,
+            'review_fname': f'{results_dir}/review-queue.csv',
+        }
+        user = ModelUser('2020/01-2020/01', **kwargs)
+        review = user.review_results[(2020, 1)]
+        top = set(user.results[(2020, 1)]['pubmed_id'])
+        assert(review.shape[0] == 3)
+        assert(not set(review['pubmed_id']) & (top | {'1'}))
+        assert('uncertainty' in review)
+
+        # check selected articles are tracked, and never selected again
+        log = read_csv(kwargs['review_fname'], dtype={'pubmed_id': str})
+        assert(list(log['pubmed_id']) == list(review['pubmed_id']))
+        assert(set(log['month']) == {'2020-01'})
+        user = ModelUser('2020/01-2020/01', **kwargs)
+        second = user.review_results[(2020, 1)]
+        assert(second.shape[0] == 3)
+        assert(not set(second['pubmed_id']) & set(review['pubmed_id']))
+
+        # label selected articles, and check feedback store reads them
+        fname = f'{results_dir}/2020-01-results.xlsx'
+        workbook = FeedbackStore.read_workbook(fname)
+        assert(set(second['pubmed_id']) <= set(workbook['pubmed_id']))
+        sheets = {
+            'Top-Scoring Articles': ModelUser.rearrange(
+                user.results[(2020, 1)].assign(feedback=''),
+            ),
+            ReviewQueue.sheet_name: ModelUser.rearrange(
+                second.assign(feedback=1),
+            ),
+        }
+        ModelUser.write_xlsx(f'{results_dir}/2020-01-feedback.xlsx', sheets)
+        store = FeedbackStore(f'{results_dir}/feedback')
+        assert(store.ingest(f'{results_dir}/2020-01-feedback.xlsx') == 3)
+        assert(
+            set(store.labels()['pubmed_id']) == set(second['pubmed_id'])
+        )
+
+    # delete temp files
+    finally:
+        rmtree(results_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    test_select()
+    test()
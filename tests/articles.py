@@ -0,0 +1,92 @@
+"""Small article databases, shared by model tests"""
+
+from __future__ import annotations
+
+from typing import Any
+
+from pandas import DataFrame
+
+
+# article fields that tests leave empty
+empty_fields = [
+    'abstract', 'authors', 'conclusions', 'copyrights', 'doi', 'journal',
+    'keywords', 'methods', 'publication_date', 'results', 'title',
+]
+
+
+def make_fit_data(
+    texts: list[str],
+    labels: list,
+    /,
+    **columns: list,
+) -> DataFrame:
+    """Create training data
+
+    Each article has field :code:`1` (always :code:`'hello'`) and field
+    :code:`2` (its text).
+
+    Parameters
+    ----------
+    texts: list[str]
+        field :code:`2` of each article
+    labels: list
+        label of each article
+    **columns: list
+        other columns (e.g. :code:`label_{topic}`)
+
+    Returns
+    -------
+    DataFrame
+        training data
+    """
+    return DataFrame({'1': 'hello', '2': texts, 'label': labels, **columns})
+
+
+def make_eval_data(texts: list[str] = None, /) -> DataFrame:
+    """Create data to score, with the same fields as :func:`make_fit_data`
+
+    Parameters
+    ----------
+    texts: list[str], optional, default=None
+        field :code:`2` of each article. If None, use :code:`'mike'`,
+        :code:`'dinosaur'`, :code:`'man'`, and :code:`'dude'`.
+
+    Returns
+    -------
+    DataFrame
+        data to score
+    """
+    return DataFrame({
+        '1': 'hello',
+        '2': texts or ['mike', 'dinosaur', 'man', 'dude'],
+    })
+
+
+def as_articles(data: DataFrame, /, **columns: Any) -> DataFrame:
+    """Add the fields of a monthly database, for scoring with ModelUser
+
+    Unless they're already in :code:`data`, or given in :code:`columns`,
+    articles are unlabeled, their PubMed IDs count up from 1, and the rest of
+    their fields are empty.
+
+    Parameters
+    ----------
+    data: DataFrame
+        articles
+    **columns: Any
+        columns to set
+
+    Returns
+    -------
+    DataFrame
+        articles, with every field of a monthly database
+    """
+    defaults = {
+        'label': False,
+        'pubmed_id': [str(pmid) for pmid in range(1, data.shape[0] + 1)],
+        **dict.fromkeys(empty_fields, ''),
+    }
+    return data.assign(**{
+        **{col: value for col, value in defaults.items() if col not in data},
+        **columns,
+    })
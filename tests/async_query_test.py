@@ -0,0 +1,114 @@
+import asyncio
+from os import makedirs
+from shutil import rmtree
+
+from pandas import read_csv
+
+from litmon.cli import DBaseBuilder
+from litmon.query import AsyncPubMedQuerier, PubMedQuerier
+
+from pubmed_stub import serve, StubPubMed, url
+
+
+def get_kwargs(server) -> dict:
+    return {
+        'email': 'mike@lakeslegendaries.com',
+        'tool': 'org.mfoundation.litmon.test',
+        'base_url': url(server),
+        'retry_kwargs': {'max_attempts': 1},
+    }
+
+
+async def stream(querier: AsyncPubMedQuerier, query: str) -> list[int]:
+    return [batch.shape[0] async for batch in querier.stream(query)]
+
+
+def test():
+
+    # start stub server
+    server = serve()
+    try:
+
+        # check async query matches sync query
+        expected = PubMedQuerier(**get_kwargs(server)).query('aging')
+        querier = AsyncPubMedQuerier(
+            **get_kwargs(server),
+            max_concurrency=2,
+            rate_limit=100,
+            batch_size=100,
+        )
+        articles = asyncio.run(querier.query('aging'))
+        assert(list(articles.columns) == querier.header)
+        assert(list(articles['pubmed_id']) == list(expected['pubmed_id']))
+        assert(articles['publication_date'].dtype.kind == 'M')
+        assert(querier.count == 300)
+
+        # check batches are streamed
+        assert(sorted(asyncio.run(stream(querier, 'aging'))) == [100] * 3)
+        assert(querier.count == 600)
+
+        # check max_results
+        querier = AsyncPubMedQuerier(
+            **get_kwargs(server),
+            max_results=30,
+            rate_limit=100,
+        )
+        assert(asyncio.run(querier.query('aging')).shape[0] == 30)
+
+    # stop stub server
+    finally:
+        server.shutdown()
+
+
+def test_dbase():
+
+    # directories
+    dbase_dir = 'data/async-query-test'
+
+    # delete temporary files after test
+    try:
+
+        # write pmids to file
+        makedirs(dbase_dir, exist_ok=True)
+        with open(f'{dbase_dir}/pmids.txt', 'w') as file:
+            print('09010000', file=file)
+            print('09300002', file=file)
+
+        # build databases synchronously, and asynchronously
+        server = serve()
+        try:
+            for suffix, async_kwargs in [
+                ('-sync', None),
+                ('-async', {'max_concurrency': 4, 'rate_limit': 100}),
+            ]:
+                builder = DBaseBuilder(
+                    query='aging',
+                    date_range='2013/09-2013/09',
+                    async_kwargs=async_kwargs,
+                    balance_ratio=0,
+                    dbase_dir=dbase_dir,
+                    dbase_suffix=suffix,
+                    pmids_fname=f'{dbase_dir}/pmids.txt',
+                    verbose=False,
+                    **get_kwargs(server),
+                )
+                assert(builder.count == 90)
+                assert(builder.metrics.successes == 2 * 30)
+        finally:
+            server.shutdown()
+        assert(StubPubMed.num_requests == 2 * 2 * 30)
+
+        # check databases match (except xml, which holds object reprs)
+        sync = read_csv(f'{dbase_dir}/2013-09-sync.csv').drop(columns='xml')
+        async_ = read_csv(f'{dbase_dir}/2013-09-async.csv').drop(columns='xml')
+        assert(sync.equals(async_))
+        assert(async_['label'].sum() == 2)
+
+    # delete temp files
+    finally:
+        rmtree(dbase_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    test()
+    test_dbase()
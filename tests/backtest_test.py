@@ -0,0 +1,81 @@
+from os import makedirs
+from shutil import rmtree
+
+from pandas import DataFrame
+
+from litmon.cli.backtest import Backtester
+
+
+def write_dbase(fname: str, month: int, topic: str):
+    DataFrame([
+        [
+            f'Article {month}-{n}',
+            f'about {topic}' if n < 3 else 'about cancer',
+            n < 3,
+        ]
+        for n in range(10)
+    ], columns=['title', 'abstract', 'label']).to_csv(fname)
+
+
+def backtest(**kwargs) -> DataFrame:
+    return Backtester(
+        '2020/02-2020/04',
+        window=1,
+        count=3,
+        cache_dir='data/backtest-test/cache',
+        dbase_dir='data/backtest-test',
+        results_fname='data/backtest-test/results.csv',
+        verbose=False,
+        use_cols=['title', 'abstract'],
+        **kwargs,
+    ).results
+
+
+def test():
+
+    # directories
+    dbase_dir = 'data/backtest-test'
+
+    # delete temporary files after test
+    try:
+
+        # write databases
+        makedirs(dbase_dir, exist_ok=True)
+        for month in range(1, 5):
+            for suffix in ['fit', 'eval']:
+                fname = f'{dbase_dir}/2020-{month:02d}-{suffix}.csv'
+                write_dbase(fname, month, 'aging')
+
+        # run backtest in parallel
+        results = backtest(max_workers=2)
+        assert(list(results['month']) == ['2020-02', '2020-03', '2020-04'])
+        assert(list(results['train_range']) == [
+            '2020/01-2020/01',
+            '2020/02-2020/02',
+            '2020/03-2020/03',
+        ])
+        assert((results['positive'] == 3).all())
+        assert((results['recall'] == 1).all())
+        assert(not results['cached'].any())
+
+        # re-run, changing one training month
+        write_dbase(f'{dbase_dir}/2020-02-fit.csv', 2, 'longevity')
+        results = backtest(max_workers=1)
+        assert(list(results['cached']) == [True, False, True])
+
+        # check expanding window
+        results = backtest(max_workers=1, train_start='2020/01')
+        assert(list(results['train_range']) == [
+            '2020/01-2020/01',
+            '2020/01-2020/02',
+            '2020/01-2020/03',
+        ])
+        assert(list(results['cached']) == [True, False, False])
+
+    # delete temp files
+    finally:
+        rmtree(dbase_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    test()
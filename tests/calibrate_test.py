@@ -0,0 +1,144 @@
+from os import remove
+
+from numpy import linspace, quantile, random
+from pandas import DataFrame
+
+from litmon import ArticleScorer, ScoreCalibrator, ScoreSketch
+from litmon.cli import ModelUser
+
+from articles import as_articles
+
+
+def test_sketch():
+
+    # create sketch
+    scores = random.default_rng(0).normal(size=10000)
+    sketch = ScoreSketch(scores)
+
+    # check quantiles
+    for q in [0, 0.005, 0.25, 0.5, 0.9, 0.99, 1]:
+        assert(abs(sketch.quantile(q) - quantile(scores, q)) < 0.05)
+
+    # check ranks
+    ranks = sketch.rank([scores.min(), 0, scores.max()])
+    assert(ranks[0] == 0 and ranks[2] == 1)
+    assert(abs(ranks[1] - 0.5) < 0.02)
+
+
+def test_calibrator():
+
+    # create scores, where higher scores are more often targets
+    rng = random.default_rng(0)
+    scores = rng.normal(size=2000)
+    labels = rng.random(2000) < 1 / (1 + 2.718 ** (-3 * scores))
+
+    # check probabilities are monotonic and bounded
+    for method in ['isotonic', 'platt']:
+        calibrator = ScoreCalibrator(scores, labels, method=method)
+        probs = calibrator.transform(linspace(-3, 3, 50))
+        assert((probs >= 0).all() and (probs <= 1).all())
+        assert((probs[1:] >= probs[:-1]).all())
+        assert(probs[0] < 0.2 and probs[-1] > 0.8)
+
+        # check correcting for a rarer target class lowers probabilities
+        calibrator.prevalence = calibrator.train_prevalence / 10
+        rare = calibrator.transform(linspace(-3, 3, 50))
+        assert((rare <= probs).all() and (rare[1:] >= rare[:-1]).all())
+        assert(rare[25] < probs[25] / 5)
+
+
+def test_model():
+
+    # temporary files
+    model_fname = 'data/calibrate-test'
+
+    # create datasets
+    fit_data = DataFrame([
+        ['hello', 'mike man', 0],
+        ['hello', 'dinosaur dude', 2],
+        ['hello', 'dude', 2],
+        ['hello', 'mike dinosaur', 1],
+        ['hello', 'man', 0],
+    ], columns=['1', '2', 'label'])
+    eval_data = DataFrame([
+        ['hello', 'mike'],
+        ['hello', 'dude'],
+    ], columns=['1', '2'])
+
+    # run test
+    try:
+
+        # train model, check sketch and calibration are saved with it
+        model = ArticleScorer(use_cols=['1', '2']).fit(fit_data)
+        model.save(model_fname)
+        model = ArticleScorer.load(model_fname)
+        assert(model.sketch.values.size == 1001)
+        probs = model.predict_proba(eval_data)
+        assert(probs[0] <= probs[1])
+
+        # check single-class models aren't calibrated
+        fit_data['label'] = 1
+        model1 = ArticleScorer(use_cols=['1', '2']).fit(fit_data)
+        assert(model1.calibrator is None)
+
+    # remove temporary files
+    finally:
+        remove(f'{model_fname}.bin')
+        remove(f'{model_fname}.pickle')
+
+    # score articles with a quantile threshold
+    articles = as_articles(eval_data)
+    results = ModelUser(
+        '2020/01-2020/01',
+        dbases={(2020, 1): articles},
+        model=model,
+        quantile=0,
+        write_xlsx=False,
+    ).results
+    assert(results[(2020, 1)].shape[0] == 2)
+
+
+def test_summarize():
+
+    # create balanced training data, and unbalanced data of the same kind
+    rng = random.default_rng(0)
+    words = ['mike', 'man', 'hello', 'dinosaur', 'dude', 'rex']
+
+    def create(num_rows, frac):
+        labels = rng.random(num_rows) < frac
+        return DataFrame({
+            'text': [
+                ' '.join(rng.choice(words[3 * label:3 * label + 3], 3))
+                + ' ' + ' '.join(rng.choice(words, 2))
+                for label in labels
+            ],
+            'label': labels.astype(float),
+        })
+    fit_data = create(200, 0.5)
+    month_data = create(1000, 0.05)
+
+    # check training scores are held out
+    model = ArticleScorer(use_cols=['text'], calibration_folds=5)
+    model.fit(fit_data)
+    assert(model.calibrator.train_prevalence == fit_data['label'].mean())
+    assert(model.calibrator.prevalence is None)
+
+    # check thresholds select the intended fraction of an unbalanced month
+    scores = model.predict(month_data)
+    balanced = (scores >= model.sketch.quantile(0.9)).mean()
+    model.summarize(month_data)
+    selected = (scores >= model.sketch.quantile(0.9)).mean()
+    assert(abs(selected - 0.1) < abs(balanced - 0.1))
+    assert(abs(selected - 0.1) < 0.02)
+
+    # check probabilities are corrected for the month's prevalence
+    assert(model.calibrator.prevalence == month_data['label'].mean())
+    probs = model.predict_proba(month_data)
+    assert(abs(probs.mean() - month_data['label'].mean()) < 0.05)
+
+
+if __name__ == '__main__':
+    test_sketch()
+    test_calibrator()
+    test_model()
+    test_summarize()
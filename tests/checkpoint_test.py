@@ -0,0 +1,108 @@
+from datetime import date
+import json
+from os import makedirs, path, remove
+from shutil import rmtree
+
+from pandas import DataFrame, read_csv, to_datetime
+
+from litmon.cli import DBaseBuilder
+
+from pubmed_stub import serve, StubPubMed, url
+
+
+def build(server, **kwargs):
+    DBaseBuilder(
+        query='aging',
+        date_range='2013/09-2013/10',
+        balance_ratio=0,
+        dbase_dir='data/checkpoint-test',
+        dbase_suffix='-test',
+        pmids_fname='data/checkpoint-test/pmids.txt',
+        dedupe_fname='data/checkpoint-test/signatures-test.pickle',
+        verbose=False,
+        email='mike@lakeslegendaries.com',
+        tool='org.mfoundation.litmon.test',
+        base_url=url(server),
+        retry_kwargs={'max_attempts': 1},
+        **kwargs,
+    )
+
+
+def test():
+
+    # directories
+    dbase_dir = 'data/checkpoint-test'
+    manifest_fname = f'{dbase_dir}/manifest-test.json'
+
+    # delete temporary files after test
+    try:
+
+        # write pmids to file
+        makedirs(dbase_dir, exist_ok=True)
+        with open(f'{dbase_dir}/pmids.txt', 'w') as file:
+            print('09010000', file=file)
+
+        # fail partway through october (2 requests / day)
+        server = serve(fail_after=2 * (30 + 10))
+        try:
+            build(server)
+            assert(False)
+        except Exception:
+            pass
+        finally:
+            server.shutdown()
+        manifest = json.load(open(manifest_fname))
+        assert(list(manifest.keys()) == ['2013-09'])
+        assert(manifest['2013-09']['articles'] == 90)
+
+        # resume, only re-querying the remaining october days
+        server = serve()
+        try:
+            build(server, resume=True)
+        finally:
+            server.shutdown()
+        assert(StubPubMed.num_requests == 2 * 21)
+        dbase = read_csv(f'{dbase_dir}/2013-10-test.csv')
+        assert(dbase.shape[0] == 93)
+        manifest = json.load(open(manifest_fname))
+        assert(manifest['2013-10']['articles'] == 93)
+        assert(not path.isdir(f'{dbase_dir}/checkpoints/2013-10-test'))
+
+        # only fill missing months (rebuilding september, which is already
+        # in the duplicate-detection store)
+        remove(f'{dbase_dir}/2013-09-test.csv')
+        server = serve()
+        try:
+            build(server, only_missing=True)
+        finally:
+            server.shutdown()
+        assert(StubPubMed.num_requests == 2 * 30)
+        dbase = read_csv(f'{dbase_dir}/2013-09-test.csv')
+        assert(dbase.shape[0] == 90)
+        assert(dbase['label'].sum() == 1)
+
+    # delete temp files
+    finally:
+        rmtree(dbase_dir, ignore_errors=True)
+
+
+def test_bad_dates():
+
+    # create querier that returns articles with good, bad, and missing dates
+    querier = DBaseBuilder.__new__(DBaseBuilder)
+    querier.query = lambda query: DataFrame({
+        'pubmed_id': ['1', '2', '3', '4'],
+        'publication_date': to_datetime(
+            ['2013-09-01', '2013-09-02', None, '2013-09-01'],
+        ),
+    })
+
+    # check only articles matching the query date are kept
+    articles = querier.query_day('aging', date(2013, 9, 1))
+    assert(list(articles['pubmed_id']) == ['1', '4'])
+    assert(articles['publication_date'].dtype.kind == 'M')
+
+
+if __name__ == '__main__':
+    test()
+    test_bad_dates()
@@ -0,0 +1,131 @@
+from os import makedirs
+from shutil import rmtree
+
+from litmon.pipeline import Pipeline
+from litmon.utils import ConfigError, ConfigSchema, load_config, unpack
+
+
+def test_schema():
+
+    # check defaults are filled in, including defaults of **kwargs targets
+    schema = ConfigSchema('litmon.cli.fit.ModelFitter')
+    resolved = schema.validate({
+        'date_range': '2020/01-2020/03',
+        'ml_kwargs': {'max_iter': 1E6},
+    })
+    assert(resolved['model_fname'] == 'data/model')
+    assert(resolved['vocab_size'] == 20000)
+    assert(resolved['ml_kwargs'] == {'max_iter': 1E6})
+
+    # check explicit defaults don't change the hash
+    assert(
+        schema.hash({'date_range': '2020/01-2020/03'})
+        == schema.hash({'date_range': '2020/01-2020/03', 'fusion': 'rank'})
+    )
+    assert(
+        schema.hash({'date_range': '2020/01-2020/03'})
+        != schema.hash({'date_range': '2020/01-2020/04'})
+    )
+
+    # check every problem is reported
+    try:
+        ConfigSchema('litmon.cli.eval.ModelUser').validate({
+            'date_range': None,
+            'count': '30',
+            'prob': .5,
+            'thresh': 1,
+            'unknown': True,
+        })
+        raise RuntimeError('ConfigError not raised')
+    except ConfigError as error:
+        lines = str(error).splitlines()[1:]
+        assert(sorted(line.split(':')[0].strip() for line in lines) == [
+            'count', 'date_range', 'unknown',
+        ])
+
+    # check date formats
+    schema = ConfigSchema('litmon.cli.daily.DailyIngester')
+    config = {'query': 'aging', 'email': 'a@b.c', 'tool': 'test'}
+    schema.validate(config | {'date': '2020/01/31'})
+    for kwargs in [
+        {'date': '2020/01/32'},
+        {'max_results': 1.5},
+        {'tool': None},
+    ]:
+        try:
+            schema.validate(config | kwargs)
+            raise RuntimeError('ConfigError not raised')
+        except ConfigError:
+            pass
+
+    # check type annotations
+    assert(ConfigSchema.matches({'a': 'b'}, 'list[str] | dict[str, str]'))
+    assert(not ConfigSchema.matches(['a', 1], 'list[str] | dict[str, str]'))
+    assert(ConfigSchema.matches(None, 'Optional[int]'))
+    assert(not ConfigSchema.matches(True, 'int'))
+
+
+def test():
+
+    # directories
+    config_dir = 'data/config-test'
+    fname = f'{config_dir}/config.yaml'
+
+    # delete temporary files after test
+    try:
+
+        # write config
+        makedirs(config_dir, exist_ok=True)
+        with open(fname, 'w') as file:
+            print('eval_dates: {date_range: 2020/01-2020/01}', file=file)
+            print('eval: {count: 10}', file=file)
+
+        # check environment and command-line overrides
+        config = load_config(
+            fname,
+            overrides=['eval.count=30', 'eval.write_csv=true'],
+            environ={'LITMON__EVAL__COUNT': '20', 'LITMON__USER__TOOL': 't'},
+        )
+        assert(config['eval'] == {'count': 30, 'write_csv': True})
+        assert(config['user'] == {'tool': 't'})
+
+        # check cached config can't be modified, and is reloaded on change
+        config['eval']['count'] = 0
+        assert(load_config(fname, environ={})['eval'] == {'count': 10})
+        with open(fname, 'a') as file:
+            print('fit: {}', file=file)
+        assert('fit' in load_config(fname, environ={}))
+
+        # check missing fields
+        try:
+            unpack(config, ['eval', 'fit_dates'])
+            raise RuntimeError('ConfigError not raised')
+        except ConfigError:
+            pass
+
+        # check pipeline fails before any stage runs
+        try:
+            Pipeline(
+                config=config | {
+                    'query': 'aging',
+                    'fit_dates': {'date_range': '2013/09-2013/09'},
+                    'fback': {},
+                    'eval_dates': {'date_range': None},
+                    'dbase_eval': {},
+                },
+                cache_fname=f'{config_dir}/cache.json',
+                verbose=False,
+            )
+            raise RuntimeError('ConfigError not raised')
+        except ConfigError as error:
+            assert('date_range: missing' in str(error))
+            assert('email: missing' in str(error))
+
+    # delete temp files
+    finally:
+        rmtree(config_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    test_schema()
+    test()
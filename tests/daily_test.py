@@ -0,0 +1,109 @@
+import json
+from os import makedirs, path
+from shutil import rmtree
+
+from pandas import DataFrame, read_csv
+
+from litmon import ArticleScorer, ModelRegistry
+from litmon.cli import DailyIngester
+from litmon.utils import read_articles
+
+from pubmed_stub import serve, StubPubMed, url
+
+
+def ingest(server, date: str, **kwargs):
+    dbase_dir = 'data/daily-test'
+    DailyIngester(
+        query='aging',
+        date=date,
+        count=2,
+        dbase_dir=dbase_dir,
+        model_fname=f'{dbase_dir}/model',
+        **kwargs,
+        pmids_fname=f'{dbase_dir}/pmids.txt',
+        results_dir=dbase_dir,
+        verbose=False,
+        write_csv=True,
+        write_xlsx=False,
+        email='mike@lakeslegendaries.com',
+        tool='org.mfoundation.litmon.test',
+        base_url=url(server),
+    )
+
+
+def test():
+
+    # directories
+    dbase_dir = 'data/daily-test'
+
+    # delete temporary files after test
+    try:
+
+        # write pmids to file
+        makedirs(dbase_dir, exist_ok=True)
+        with open(f'{dbase_dir}/pmids.txt', 'w') as file:
+            print('09010001', file=file)
+
+        # fail before the model exists, without appending anything
+        server = serve()
+        try:
+            ingest(server, '2013/09/01')
+            assert(False)
+        except (FileNotFoundError, KeyError):
+            pass
+        finally:
+            server.shutdown()
+        assert(not path.isfile(f'{dbase_dir}/2013-09-eval.csv'))
+
+        # train model, and register it
+        model = ArticleScorer(use_cols=['title', 'abstract']).fit(DataFrame([
+            ['Article 09010001', 'about aging', 1],
+            ['Article 09020002', 'about aging', 1],
+            ['Other', 'about cancer', 0],
+            ['Other', 'about cancer', 0],
+        ], columns=['title', 'abstract', 'label']))
+        model.save(f'{dbase_dir}/model')
+        registry = ModelRegistry(f'{dbase_dir}/registry')
+        registry.promote(registry.register(model))
+
+        # ingest two days, re-running the first
+        server = serve()
+        try:
+            ingest(server, '2013/09/01')
+            ingest(server, '2013/09/01')
+            ingest(server, '2013/09/02', registry=f'{dbase_dir}/registry')
+
+            # re-run a day that was appended, but not recorded
+            with open(f'{dbase_dir}/2013-09-eval-days.json', 'w') as file:
+                json.dump(['2013-09-01'], file)
+            ingest(server, '2013/09/02')
+        finally:
+            server.shutdown()
+
+        # check each day was queried once (plus the re-run)
+        assert(StubPubMed.num_requests == 6)
+        days = json.load(open(f'{dbase_dir}/2013-09-eval-days.json'))
+        assert(days == ['2013-09-01', '2013-09-02'])
+
+        # check month database
+        dbase = read_articles(f'{dbase_dir}/2013-09-eval.csv')
+        assert(dbase.shape[0] == 6)
+        assert(dbase['label'].sum() == 1)
+        assert(dbase['publication_date'].dtype.kind == 'M')
+        assert(set(dbase['publication_date'].dt.day) == {1, 2})
+
+        # check rolling top-k and materialized results
+        topk = read_csv(f'{dbase_dir}/2013-09-topk.csv')
+        results = read_csv(f'{dbase_dir}/2013-09-results.csv')
+        assert(topk.shape[0] == 2)
+        assert(results.shape[0] == 2)
+        assert(results['score'].is_monotonic_decreasing)
+        assert('explanation' in results)
+
+    # delete temp files
+    finally:
+        rmtree(dbase_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    test()
@@ -1,4 +1,15 @@
-from litmon.utils import drange
+from datetime import date
+
+from numpy import datetime64
+
+from litmon.utils import (
+    add_months,
+    drange,
+    parse_range,
+    split_range,
+    windows,
+)
+from litmon.utils.genconf import last_month
 
 
 def test():
@@ -10,5 +21,54 @@ def test():
     assert(drng[3] == (2014, 2))
 
 
+def test_calendar():
+
+    # check month arithmetic
+    assert(add_months(2020, 1, -1) == (2019, 12) == last_month(2020, 1))
+    assert(add_months(2019, 11, 14) == (2021, 1))
+
+    # check open-ended and day ranges
+    today = date(2020, 3, 15)
+    assert(drange('2019/11-', today=today) == [
+        (2019, 11), (2019, 12), (2020, 1), (2020, 2), (2020, 3),
+    ])
+    assert(parse_range('2020/01/30-2020/02', today=today) == (
+        date(2020, 1, 30), date(2020, 3, 1),
+    ))
+    assert(drange('2020/02-2020/01') == [])
+    for datestr in ['2020/13-2021/01', '2020/02/30-', '2020-01', None]:
+        try:
+            parse_range(datestr)
+            raise RuntimeError('ValueError not raised')
+        except ValueError:
+            pass
+
+    # check windows are clipped to range
+    months = windows('2020/01/15-2020/03/10')
+    assert(months.shape == (3, 2))
+    assert(months[0, 0] == datetime64('2020-01-15'))
+    assert(months[1, 0] == datetime64('2020-02-01'))
+    assert(months[-1, 1] == datetime64('2020-03-11'))
+    weeks = windows('2020/01/01-2020/01/31', freq='week')
+    assert(weeks[1, 0] == datetime64('2020-01-06'))
+    assert(weeks.shape == (5, 2))
+    assert(windows('2020/01-2020/02', freq='day').shape == (60, 2))
+    days = windows('2020/01-2020/02', freq=10)
+    assert(days[-1, 0] == datetime64('2020-02-20'))
+    assert(windows('2020/02-2020/01').shape == (0, 2))
+
+    # check shards are balanced by volume
+    assert(split_range('2020/01-2020/06', 3) == [
+        '2020/01-2020/02', '2020/03-2020/04', '2020/05-2020/06',
+    ])
+    volumes = {(2020, 1): 60, '2020-02': 10, (2020, 3): 10}
+    volumes |= {(2020, 4): 10, (2020, 5): 10}
+    assert(split_range('2020/01-2020/06', 2, volumes=volumes) == [
+        '2020/01-2020/01', '2020/02-2020/06',
+    ])
+    assert(len(split_range('2020/01-2020/02', 5)) == 2)
+
+
 if __name__ == '__main__':
     test()
+    test_calendar()
@@ -0,0 +1,84 @@
+from os import remove
+from pickle import dumps
+
+from pandas import DataFrame
+
+from litmon import ArticleDeduplicator
+
+
+def get_articles() -> DataFrame:
+    abstract = (
+        'Telomere attrition limits the replicative lifespan of human '
+        'fibroblasts, and reactivating telomerase extends it in culture '
+        'without inducing malignant transformation in any tested line.'
+    )
+    return DataFrame([
+        ['11111111', '10.1/a', 'Telomeres and aging', abstract],
+        ['22222222', '10.1/b', 'Telomeres and aging.', abstract + ' Erratum'],
+        ['11111111', '', 'Different title', 'Different abstract'],
+        ['33333333', '10.1/A', 'Another title', 'Another abstract'],
+        ['44444444', '10.1/d', 'Autophagy in yeast', 'Lysosomes and more'],
+    ], columns=['pubmed_id', 'doi', 'title', 'abstract'])
+
+
+def test():
+
+    # temporary files
+    store_fname = 'data/signatures-test.pickle'
+
+    # run test
+    try:
+
+        # exact and near duplicates are removed
+        dedupe = ArticleDeduplicator()
+        kept = dedupe.drop(get_articles())
+        assert(kept['pubmed_id'].tolist() == ['11111111', '44444444'])
+
+        # persisted store catches duplicates in later batches
+        dedupe.save(store_fname)
+        dedupe = ArticleDeduplicator.load(store_fname)
+        kept = dedupe.drop(get_articles())
+        assert(kept.shape[0] == 0)
+        assert(dedupe.signatures.shape == (2, 128))
+
+        # rebuilding a month replaces its entries
+        dedupe = ArticleDeduplicator()
+        kept = dedupe.drop(get_articles(), month='2020-01')
+        assert(kept.shape[0] == 2)
+        kept = dedupe.drop(get_articles(), month='2020-01')
+        assert(kept['pubmed_id'].tolist() == ['11111111', '44444444'])
+        assert(dedupe.months == ['2020-01', '2020-01'])
+
+        # only added articles are registered
+        assert(dedupe.remove('2020-01') == 2)
+        kept = dedupe.drop(get_articles(), month='2020-02', register=False)
+        assert(kept.shape[0] == 2)
+        assert(len(dedupe.keys) == 0)
+        dedupe.add(kept.iloc[[1], :], month='2020-02')
+        kept = dedupe.drop(get_articles(), month='2020-03')
+        assert(kept['pubmed_id'].tolist() == ['11111111'])
+        assert(dedupe.keys['pubmed_id:44444444'] == '2020-02')
+
+        # rebuilding a month without registering leaves the store unchanged
+        before = dumps(dedupe)
+        kept = dedupe.drop(get_articles(), month='2020-03', register=False)
+        assert(kept['pubmed_id'].tolist() == ['11111111'])
+        assert(dumps(dedupe) == before)
+
+        # removing a month only touches its own entries
+        dedupe.add(get_articles().iloc[[3], :], month='2020-04')
+        buckets = [dict(bucket) for bucket in dedupe._buckets]
+        dedupe.add(get_articles().iloc[[1], :], month='2020-05')
+        assert(dedupe.remove('2020-05') == 1)
+        assert(dedupe._buckets == buckets)
+        assert(len(dedupe._months) == 4)
+        assert(dedupe.months == ['2020-02', '2020-03', '2020-04'])
+        assert('pubmed_id:22222222' not in dedupe.keys)
+
+    # remove temporary file
+    finally:
+        remove(store_fname)
+
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,119 @@
+from os import remove
+
+from pandas import DataFrame
+
+from litmon import ArticleScorer, EnsembleScorer
+from litmon.cli import ModelFitter, ModelUser
+
+from articles import as_articles, make_eval_data, make_fit_data
+
+
+def get_fit_data() -> DataFrame:
+    return make_fit_data(
+        ['mike man', 'dinosaur dude', 'dinosaur rex', 'dude', 'mike',
+         'man rad'],
+        [0, 1, 1, 1, 0, 0],
+    )
+
+
+def get_members() -> list[ArticleScorer]:
+    kwargs = {'ml_kwargs': {'random_state': 0}, 'use_cols': ['1', '2']}
+    return [
+        ArticleScorer(**kwargs),
+        ArticleScorer(**{**kwargs, 'ml_kwargs': {'C': 10, 'random_state': 0}}),
+        ArticleScorer(**{**kwargs, 'use_cols': ['2']}),
+    ]
+
+
+def test():
+
+    # temporary files
+    model_fname = 'data/ensemble-test'
+
+    # train ensemble
+    fit_data = get_fit_data()
+    eval_data = make_eval_data()
+    model = EnsembleScorer(get_members(), use_cols=['1', '2']).fit(fit_data)
+
+    # check members that vectorize articles the same way share a vhash table
+    assert(model.groups == [[0, 1], [2]])
+    assert(model.members[0].vhash is model.members[1].vhash)
+    assert(model.members[0].vhash is not model.members[2].vhash)
+
+    # check each member matches a separately-trained model
+    scores = model.predict_members(eval_data)
+    for m, member in enumerate(get_members()):
+        expected = member.fit(fit_data).predict(eval_data)
+        assert(abs(scores[m].to_numpy() - expected).max() < 1E-4)
+
+    # check rank fusion
+    fused = model.predict(eval_data)
+    ranks = [
+        member.sketch.rank(scores[m].to_numpy())
+        for m, member in enumerate(model.members)
+    ]
+    assert(abs(fused - sum(ranks) / 3).max() < 1E-6)
+    assert(fused[1] > fused[0] and fused[3] > fused[2])
+    assert(model.explain(eval_data, num_terms=1)[1] == ['dinosaur'])
+
+    # check weighted score fusion
+    weighted = EnsembleScorer(
+        get_members(),
+        fusion='score',
+        weights=[1, 1, 2],
+    ).fit(fit_data)
+    standardized = [
+        (scores[m].to_numpy() - weighted.model.centers[m])
+        / weighted.model.scales[m]
+        for m in range(3)
+    ]
+    expected = (standardized[0] + standardized[1] + 2 * standardized[2]) / 4
+    assert(abs(weighted.predict(eval_data) - expected).max() < 1E-4)
+
+    # check bad parameters
+    for kwargs in [{'fusion': 'vote'}, {'weights': [1]}]:
+        try:
+            EnsembleScorer(get_members(), **kwargs)
+            raise RuntimeError('ValueError not raised')
+        except ValueError:
+            pass
+
+    # run test
+    try:
+
+        # check ensemble survives saving
+        model.save(model_fname)
+        loaded = ArticleScorer.load(model_fname)
+        assert((loaded.predict(eval_data) == fused).all())
+        assert(loaded.members[0].vhash is loaded.members[1].vhash)
+
+        # train ensemble from command line interface
+        fitter = ModelFitter(
+            '2020/01-2020/01',
+            data=fit_data,
+            ensemble=[{}, {'ml_kwargs': {'C': 10, 'random_state': 0}}],
+            ml_kwargs={'random_state': 0},
+            model_fname=None,
+            use_cols=['1', '2'],
+        )
+        assert(fitter.model.groups == [[0, 1]])
+
+    # remove temporary files
+    finally:
+        remove(f'{model_fname}.bin')
+        remove(f'{model_fname}.pickle')
+
+    # score articles with ensemble
+    articles = as_articles(eval_data, label=[False, True, False, True])
+    user = ModelUser(
+        '2020/01-2020/01',
+        count=2,
+        dbases={(2020, 1): articles},
+        model=loaded,
+        write_xlsx=False,
+    )
+    assert(set(user.results[(2020, 1)]['pubmed_id']) == {'2', '4'})
+
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,90 @@
+from os import makedirs
+from shutil import rmtree
+
+from pandas import DataFrame
+
+from litmon.cli import ModelFitter, ModelUser
+from litmon.feedback import FeedbackStore
+
+
+def write_feedback(fname: str, feedback: dict[str, float]):
+    articles = DataFrame([
+        [pmid, f'Article {pmid}', 'about aging', 1., False, '', '', '']
+        for pmid in feedback
+    ], columns=[
+        'pubmed_id', 'title', 'abstract', 'score', 'label', 'journal',
+        'authors', 'keywords',
+    ])
+    ModelUser.add_columns(articles)
+    articles['feedback'] = list(feedback.values())
+    articles['publication_date'] = '2020-02-01'
+    for field in [
+        'doi', 'methods', 'results', 'conclusions',
+        'copyrights',
+    ]:
+        articles[field] = ''
+    ModelUser.write_xlsx(fname, {
+        'Top-Scoring Articles': ModelUser.rearrange(articles),
+    })
+
+
+def test():
+
+    # directories
+    dbase_dir = 'data/feedback-test'
+
+    # delete temporary files after test
+    try:
+
+        # write training database and feedback files
+        makedirs(dbase_dir, exist_ok=True)
+        DataFrame([
+            ['11111111', 'Article 11111111', 'about aging', '2020-01-01', 0],
+            ['22222222', 'Article 22222222', 'about cancer', '2020-01-02', 0],
+        ], columns=[
+            'pubmed_id', 'title', 'abstract', 'publication_date', 'label',
+        ]).astype({'label': bool}).to_csv(f'{dbase_dir}/2020-01-fit.csv')
+        write_feedback(f'{dbase_dir}/2020-02-feedback.xlsx', {
+            '11111111': 1,
+            '33333333': 0,
+            '44444444': None,
+            '55555555': 'maybe',
+            '66666666': ' ',
+        })
+        write_feedback(f'{dbase_dir}/2020-03-feedback.xlsx', {
+            '33333333': 1,
+        })
+
+        # ingest feedback, check workbooks are only ingested once
+        store = FeedbackStore(f'{dbase_dir}/feedback')
+        assert(store.ingest(f'{dbase_dir}/2020-02-feedback.xlsx') == 2)
+        assert(store.ingest(f'{dbase_dir}/2020-02-feedback.xlsx') == 0)
+        assert(store.has(f'{dbase_dir}/2020-02-feedback.xlsx'))
+        labels = store.labels()
+        assert(list(labels['pubmed_id']) == ['11111111', '33333333'])
+        assert(list(labels['label']) == [1, 0])
+
+        # load training data, joining feedback by pmid
+        data = ModelFitter.load_data(
+            '2020/01-2020/01',
+            '2020/02-2020/03',
+            dbase_dir=dbase_dir,
+            fback_dir=dbase_dir,
+            fback_store=f'{dbase_dir}/feedback',
+        )
+        labels = dict(zip(data['pubmed_id'].astype(str), data['label']))
+        assert(labels == {'11111111': 1, '22222222': 0, '33333333': 1})
+        assert(data['publication_date'].dtype.kind == 'M')
+
+        # check store persisted across instances
+        store = FeedbackStore(f'{dbase_dir}/feedback')
+        assert(store.has(f'{dbase_dir}/2020-03-feedback.xlsx'))
+        assert(store.articles().shape[0] == 2)
+
+    # delete temp files
+    finally:
+        rmtree(dbase_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    test()
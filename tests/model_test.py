@@ -44,6 +44,91 @@ def test_scoring():
     assert(scores[2] < scores[0] < scores[1] < scores[3])
 
 
+def test_sparse():
+
+    # create datasets
+    fit_data = get_fit_data()
+    eval_data = get_eval_data()
+
+    # train sparse and dense models, with small batches
+    scores = {}
+    for sparse in [True, False]:
+        model = ArticleScorer(
+            batch_size=3,
+            sparse=sparse,
+            use_cols=['1', '2'],
+        ).fit(fit_data)
+        scores[sparse] = model.predict(eval_data)
+
+        # check memory footprint
+        assert(model.matrix_info['sparse'] == sparse)
+        assert(model.matrix_info['dtype'] == 'float32')
+        assert(model.matrix_info['shape'][0] == eval_data.shape[0])
+        num_rows, num_cols = model.matrix_info['shape']
+        assert(model.matrix_info['dense_nbytes'] == num_rows * num_cols * 4)
+        if not sparse:
+            assert(
+                model.matrix_info['nbytes']
+                == model.matrix_info['dense_nbytes']
+            )
+
+    # check results
+    assert(abs(scores[True] - scores[False]).max() < 1E-3)
+
+    # check the default never uses more memory than a dense float32 matrix
+    model = ArticleScorer(batch_size=3, use_cols=['1', '2']).fit(fit_data)
+    assert(model.matrix_info['nbytes'] <= model.matrix_info['dense_nbytes'])
+    model.predict(eval_data)
+    assert(model.matrix_info['nbytes'] <= model.matrix_info['dense_nbytes'])
+
+    # check sparse-enough batches are stored as sparse matrices
+    model = ArticleScorer(batch_size=3, use_cols=['1', '2'])
+    model.max_sparse_density = 1
+    model.fit(fit_data)
+    assert(model.matrix_info['sparse'])
+
+    # check models that don't accept sparse input fall back to dense
+    ml_model = 'sklearn.ensemble.HistGradientBoostingRegressor'
+    model = ArticleScorer(ml_model=ml_model, use_cols=['1', '2'])
+    model.fit(fit_data)
+    assert(not model.matrix_info['sparse'])
+    try:
+        ArticleScorer(ml_model=ml_model, sparse=True, use_cols=['1', '2']) \
+            .fit(fit_data)
+        raise RuntimeError('ValueError not raised')
+    except ValueError:
+        pass
+
+
+def test_explain():
+
+    # train model
+    model = ArticleScorer(use_cols=['1', '2']).fit(get_fit_data())
+
+    # check term weights are ordered like single-term scores
+    weights = dict(zip(model.terms, model.term_weights))
+    assert(weights['man'] < weights['mike'] < weights['dinosaur'])
+    assert(weights['dinosaur'] < weights['dude'])
+
+    # check top terms, highest contribution first, without negative terms
+    explanations = model.explain(DataFrame([
+        ['hello', 'dinosaur dude'],
+        ['hello', 'man'],
+        ['hello', 'dude dinosaur man'],
+    ], columns=['1', '2']), num_terms=2)
+    assert(explanations == [['dude', 'dinosaur'], [], ['dude', 'dinosaur']])
+    assert(model.explain(get_eval_data().iloc[0:0]) == [])
+
+    # check models without terms can't explain
+    model = ArticleScorer(use_cols=['1', '2'], vocab_size=0) \
+        .fit(get_fit_data())
+    try:
+        model.explain(get_eval_data())
+        raise RuntimeError('ValueError not raised')
+    except ValueError:
+        pass
+
+
 def test_io():
 
     # temporary files
@@ -84,4 +169,6 @@ def test_io():
 
 if __name__ == '__main__':
     test_scoring()
+    test_sparse()
+    test_explain()
     test_io()
@@ -0,0 +1,106 @@
+from os import makedirs
+from shutil import rmtree
+
+from pandas import DataFrame
+
+from litmon import ArticleScorer, DriftMonitor, MonthStats
+from litmon.cli import DriftReporter, ModelUser
+
+from articles import as_articles
+
+
+def get_articles(count: int, methods: str = 'we did it') -> DataFrame:
+    return DataFrame({
+        'pubmed_id': [str(pmid) for pmid in range(count)],
+        'title': ['aging well'] * count,
+        'abstract': ['a long abstract about aging ' * 4] * count,
+        'methods': [methods] * count,
+        'label': [pmid % 4 == 0 for pmid in range(count)],
+    })
+
+
+def test_stats():
+
+    # accumulate statistics one chunk at a time
+    stats = MonthStats(fields=['title', 'methods', 'doi'])
+    stats.update(get_articles(3))
+    stats.update(get_articles(5, methods=''))
+    summary = stats.add_scores([1, 2]).add_scores([3]).summary()
+
+    # check counts, fill rates, histograms, and quantiles
+    assert(summary['count'] == 8)
+    assert(summary['positive_rate'] == 3 / 8)
+    assert(summary['fill_rates'] == {'title': 1, 'methods': 3 / 8, 'doi': 0})
+    assert(summary['token_hist']['title'][0:3] == [0, 0, 8])
+    assert(summary['token_hist']['methods'][0:3] == [5, 0, 3])
+    assert(summary['token_hist']['doi'][0] == 8)
+    assert(summary['score_quantiles']['0.5'] == 2)
+
+
+def test():
+
+    # directories
+    dbase_dir = 'data/monitor-test'
+    monitor_fname = f'{dbase_dir}/monitor.json'
+
+    # delete temporary files after test
+    try:
+
+        # record stable months, then a month with a volume spike, and an
+        # empty field
+        makedirs(dbase_dir, exist_ok=True)
+        monitor = DriftMonitor(monitor_fname)
+        for month in ['2020-01', '2020-02', '2020-03']:
+            monitor.record(month, 'ingest', MonthStats().update(
+                get_articles(20),
+            ))
+        monitor.record('2020-04', 'ingest', MonthStats().update(
+            get_articles(60, methods=''),
+        ))
+
+        # check alerts
+        report = monitor.check('2020-04')
+        alerts = set(report.loc[report['alert'], 'check'])
+        assert(alerts == {'count', 'fill_rate:methods', 'token_psi:methods'})
+        assert(not monitor.check('2020-03')['alert'].any())
+        assert(monitor.check('2020-01').empty)
+        assert(list(monitor.history().index) == [
+            '2020-01', '2020-02', '2020-03', '2020-04',
+        ])
+
+        # record scores, while scoring articles
+        model = ArticleScorer(use_cols=['title', 'abstract']).fit(
+            get_articles(8).assign(title=['aging', 'well'] * 4),
+        )
+        articles = as_articles(get_articles(10))
+        for month in [1, 2]:
+            ModelUser(
+                f'2020/{month:02d}-2020/{month:02d}',
+                dbases={(2020, month): articles},
+                model=model,
+                monitor_fname=monitor_fname,
+                write_xlsx=False,
+            )
+        series = DriftMonitor(monitor_fname).series
+        assert(set(series['2020-01']) == {'ingest', 'score'})
+        assert(series['2020-02']['score']['count'] == 10)
+        assert('score_quantiles' in series['2020-02']['score'])
+
+        # report drift from command line interface
+        reporter = DriftReporter(
+            '2020/01-2020/04',
+            monitor_fname=monitor_fname,
+            report_fname=f'{dbase_dir}/report.csv',
+            verbose=False,
+        )
+        assert(set(reporter.report['stage']) == {'ingest', 'score'})
+        assert(set(reporter.alerts['month']) == {'2020-04'})
+
+    # delete temp files
+    finally:
+        rmtree(dbase_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    test_stats()
+    test()
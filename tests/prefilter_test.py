@@ -0,0 +1,122 @@
+from os import makedirs
+from shutil import rmtree
+
+from pandas import DataFrame, Timestamp
+import yaml
+
+from litmon import QueryFilter
+from litmon.cli import DBaseFilter
+from litmon.utils import read_articles
+
+
+def get_articles() -> DataFrame:
+    return DataFrame({
+        'title': [
+            'Mitochondrial decline in aging mice',
+            'Platelet aggregation after surgery',
+            'Protein aggregates in neurons',
+            'A review of regenerative medicine',
+            'Cardiac surgery outcomes',
+            'HIV integrase inhibitors',
+            '7-Ketocholesterol toxicity',
+            'Lewy bodies in late disease',
+        ],
+        'abstract': [
+            'Mitochondria fail.', 'Platelets clump.', 'Proteins clump.',
+            'Regeneration of tissue.', None, 'Inhibitors block integrase.',
+            'Oxysterols are toxic.', 'Synuclein inclusions.',
+        ],
+        'keywords': [
+            "['aging']", '[]', '[]', '[]', "['telomeres']", '[]', '[]', '[]',
+        ],
+        'publication_date': [Timestamp(2013, 9, 1)] * 7
+        + [Timestamp(2026, 1, 1)],
+        'pubmed_id': [str(pmid) for pmid in range(8)],
+    })
+
+
+def test():
+
+    # index articles
+    index = QueryFilter(get_articles())
+
+    # check operators are evaluated left to right, with implicit AND
+    assert(index.parse('a OR b AND c NOT d[ti]') == (
+        'not',
+        ('and', ('or', ('term', ['a'], None, False),
+                 ('term', ['b'], None, False)), ('term', ['c'], None, False)),
+        ('term', ['d'], 'ti', False),
+    ))
+    assert(index.parse('a b') == index.parse('a AND b'))
+
+    # check terms, prefixes, and phrases
+    assert(list(index.match('surgery').nonzero()[0]) == [1, 4])
+    assert(list(index.match('mitochondri*').nonzero()[0]) == [0])
+    assert(list(index.match('"regenerative medicine"').nonzero()[0]) == [3])
+    assert(not index.match('"medicine regenerative"').any())
+    assert(list(index.match('7-ketocholesterol').nonzero()[0]) == [6])
+    assert(list(index.match('aggregat* NOT platelet').nonzero()[0]) == [2])
+
+    # check search tags
+    assert(list(index.match('telomer*[mh]').nonzero()[0]) == [4])
+    assert(not index.match('telomer*[tiab]').any())
+    assert(list(index.match('clump [ab]').nonzero()[0]) == [1, 2])
+    assert(list(index.match('surgery NOT hasabstract').nonzero()[0]) == [4])
+    assert(index.match('2013/09 [dp]').sum() == 7)
+    assert(index.match('(2007 : 2025[dp])').sum() == 7)
+    assert(index.match('english[la]').all())
+
+    # check errors
+    for query in ['(aging', 'aging AND', 'AND aging', '[ti]']:
+        try:
+            index.match(query)
+            raise RuntimeError('ValueError not raised')
+        except ValueError:
+            pass
+    try:
+        QueryFilter(get_articles(), unindexed='raise').match('english[la]')
+        raise RuntimeError('ValueError not raised')
+    except ValueError:
+        pass
+
+    # check standard query
+    query = yaml.safe_load(open('config/std.yaml'))['query']
+    matched = index.filter(query)
+    assert(list(matched['pubmed_id']) == ['0', '2', '3', '4', '6'])
+
+
+def test_dbase():
+
+    # directories
+    dbase_dir = 'data/prefilter-test'
+
+    # delete temporary files after test
+    try:
+
+        # write superset database
+        makedirs(dbase_dir, exist_ok=True)
+        get_articles().to_csv(f'{dbase_dir}/2013-09-superset.csv')
+
+        # re-filter it
+        dbase_filter = DBaseFilter(
+            'mitochondri* OR surgery',
+            '2013/09-2013/10',
+            dbase_dir=dbase_dir,
+            verbose=False,
+        )
+        assert(dbase_filter.counts == {'2013-09': (8, 3)})
+        filtered = read_articles(
+            f'{dbase_dir}/2013-09-filtered.csv',
+            index_col=0,
+        )
+        assert(list(filtered.index) == [0, 1, 4])
+        assert(filtered['publication_date'].dtype.kind == 'M')
+
+    # delete temp files
+    finally:
+        rmtree(dbase_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    test()
+    test_dbase()
@@ -0,0 +1,155 @@
+"""Local stub of the PubMed E-utilities, with fault injection"""
+
+from __future__ import annotations
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import re
+from threading import Thread
+from urllib.parse import parse_qs, urlparse
+
+
+class StubPubMed(BaseHTTPRequestHandler):
+    """Stub E-utilities server
+
+    esearch returns :code:`per_day` articles for each :code:`[edat]` day in the
+    query term (or 300 articles, if the term has no date). If the search has a
+    :code:`mindate`, only the :code:`modified` articles in the term's
+    :code:`[edat]` month are returned (skipping those whose
+    :code:`modified_on` date is outside :code:`mindate` to :code:`maxdate`).
+    Only :code:`retmax` ids are returned, starting from :code:`retstart`.
+    efetch returns a minimal record for each requested id.
+    """
+
+    # request numbers (1-based) that fail with a 503
+    fail_on: set[int] = set()
+
+    # request numbers (1-based) whose body is cut off, with a 200
+    truncate_on: set[int] = set()
+
+    # fail every request after this many requests
+    fail_after: int = None
+
+    # articles returned for each day
+    per_day: int = 3
+
+    # number of requests received
+    num_requests = 0
+
+    # publication date of each id served
+    dates: dict[str, tuple[str, str, str]] = {}
+
+    # revised abstract of each modified id
+    modified: dict[str, str] = {}
+
+    # modification date (YYYY/mm/dd) of modified ids (default: any date)
+    modified_on: dict[str, str] = {}
+
+    def do_GET(self):
+        cls = self.__class__
+        cls.num_requests += 1
+        if (
+            cls.num_requests in cls.fail_on
+            or cls.fail_after is not None
+            and cls.num_requests > cls.fail_after
+        ):
+            self.send_response(503)
+            self.end_headers()
+            return
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        if url.path.endswith('esearch.fcgi'):
+            ids = self.search(
+                params['term'][0],
+                (params['mindate'][0], params['maxdate'][0])
+                if 'mindate' in params
+                else None,
+            )
+            start = int(params.get('retstart', [0])[0])
+            stop = start + int(params.get('retmax', [len(ids)])[0])
+            body = json.dumps({'esearchresult': {
+                'count': str(len(ids)),
+                'retmax': str(len(ids[start:stop])),
+                'idlist': ids[start:stop],
+            }})
+        else:
+            body = '<PubmedArticleSet>' + ''.join(
+                self.article(pmid)
+                for pmid in params['id']
+            ) + '</PubmedArticleSet>'
+        if cls.num_requests in cls.truncate_on:
+            body = body[0:len(body) // 2]
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    def log_message(self, *args):
+        pass
+
+    @classmethod
+    def search(
+        cls,
+        term: str,
+        modified: tuple[str, str] = None,
+    ) -> list[str]:
+        if modified is not None:
+            year, month = re.search(r'(\d{4})/(\d{2}) \[edat\]', term).groups()
+            ids = [
+                pmid for pmid in cls.modified
+                if pmid[0:2] == month
+                and (
+                    pmid not in cls.modified_on
+                    or modified[0] <= cls.modified_on[pmid] <= modified[1]
+                )
+            ]
+            for pmid in ids:
+                cls.dates[pmid] = (year, month, pmid[2:4])
+            return ids
+        match = re.search(r'(\d{4})/(\d{2})/(\d{2}) \[edat\]', term)
+        if match is None:
+            return [str(10000000 + x) for x in range(300)]
+        year, month, day = match.groups()
+        ids = [f'{month}{day}{x:04d}' for x in range(cls.per_day)]
+        for pmid in ids:
+            cls.dates[pmid] = (year, month, day)
+        return ids
+
+    @classmethod
+    def article(cls, pmid: str) -> str:
+        year, month, day = cls.dates.get(pmid, ('2020', '01', '01'))
+        return (
+            '<PubmedArticle><MedlineCitation><Article>'
+            f'<ArticleTitle>Article {pmid}</ArticleTitle>'
+            '<Abstract><AbstractText>'
+            + cls.modified.get(pmid, f'Abstract of article {pmid} about aging')
+            + '</AbstractText></Abstract>'
+            '</Article></MedlineCitation><PubmedData><History>'
+            f'<PubMedPubDate PubStatus="pubmed"><Year>{year}</Year>'
+            f'<Month>{month}</Month><Day>{day}</Day></PubMedPubDate>'
+            '</History><ArticleIdList>'
+            f'<ArticleId IdType="pubmed">{pmid}</ArticleId>'
+            '</ArticleIdList></PubmedData></PubmedArticle>'
+        )
+
+
+def serve(
+    *,
+    fail_on: set[int] = set(),
+    fail_after: int = None,
+    truncate_on: set[int] = set(),
+) -> ThreadingHTTPServer:
+    """Start stub server in a background thread"""
+    StubPubMed.fail_on = fail_on
+    StubPubMed.truncate_on = truncate_on
+    StubPubMed.fail_after = fail_after
+    StubPubMed.num_requests = 0
+    StubPubMed.modified = {}
+    StubPubMed.modified_on = {}
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubPubMed)
+    Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def url(server: ThreadingHTTPServer) -> str:
+    """Get base url of stub server"""
+    return f'http://127.0.0.1:{server.server_port}'
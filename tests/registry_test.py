@@ -0,0 +1,105 @@
+from shutil import rmtree
+
+from pandas import DataFrame
+
+from litmon import ModelRegistry
+from litmon.cli import ModelFitter, ModelPromoter, ModelUser
+
+from articles import as_articles, make_eval_data, make_fit_data
+
+
+def get_fit_data(flip: bool = False) -> DataFrame:
+    return make_fit_data(
+        ['mike man', 'dinosaur dude', 'dude', 'mike dinosaur'],
+        [int(flip), int(not flip), int(not flip), int(flip)],
+    )
+
+
+def test():
+
+    # directories
+    root = 'data/registry-test'
+
+    # delete temporary files after test
+    try:
+
+        # train and register two models
+        kwargs = {
+            'model_fname': None,
+            'registry': root,
+            'use_cols': ['1', '2'],
+        }
+        first = ModelFitter('2020/01-2020/01', data=get_fit_data(), **kwargs)
+        second = ModelFitter(
+            '2020/01-2020/02',
+            data=get_fit_data(flip=True),
+            **kwargs,
+        )
+
+        # check versions and metadata
+        registry = ModelRegistry(root)
+        assert([v['number'] for v in registry.versions] == [1, 2])
+        info = registry.info('v2')
+        assert(info['digest'] == second.version)
+        assert(info['metadata']['date_range'] == '2020/01-2020/02')
+        assert(info['metadata']['params']['use_cols'] == ['1', '2'])
+        assert(info['metadata']['metrics']['num_positive'] == 2)
+        assert(info['metadata']['fit_seconds'] >= 0)
+
+        # check references resolve
+        assert(registry.resolve('production') == second.version)
+        assert(registry.resolve('production~1') == first.version)
+        assert(registry.resolve('v1') == first.version)
+        assert(registry.resolve(first.version[0:6]) == first.version)
+        for ref in ['v3', 'production~2', 'nope']:
+            try:
+                registry.resolve(ref)
+                raise RuntimeError('KeyError not raised')
+            except KeyError:
+                pass
+
+        # check identical models are stored once
+        registry.register(first.model)
+        assert(registry.versions[-1]['digest'] == first.version)
+        assert(registry.resolve('production') == second.version)
+
+        # check loaded models are cached, and match the trained models
+        eval_data = as_articles(make_eval_data())
+        model = registry.load('v1')
+        assert(registry.load(first.version) is model)
+        assert((model.predict(eval_data) == first.model.predict(eval_data))
+               .all())
+
+        # score with production model, shadowed by previous model
+        user = ModelUser(
+            '2020/01-2020/01',
+            count=2,
+            dbases={(2020, 1): eval_data},
+            registry=root,
+            shadow_version='production~1',
+            write_xlsx=False,
+        )
+        assert(set(user.results[(2020, 1)]['pubmed_id']) == {'1', '3'})
+        assert(set(user.shadow_results[(2020, 1)]['pubmed_id']) == {'2', '4'})
+        assert(user.shadow_stats[(2020, 1)]['overlap'] == 0)
+        assert(user.shadow_stats[(2020, 1)]['rank_corr'] < 0)
+
+        # roll back, then promote again
+        promoter = ModelPromoter(registry=root, rollback=True, verbose=False)
+        assert(promoter.digest == first.version)
+        assert(registry.resolve('production') == first.version)
+        try:
+            registry.rollback()
+            raise RuntimeError('ValueError not raised')
+        except ValueError:
+            pass
+        promoter = ModelPromoter('v2', registry=root, verbose=False)
+        assert(registry.aliases == {'production': second.version})
+
+    # delete temp files
+    finally:
+        rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    test()
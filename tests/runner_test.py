@@ -0,0 +1,135 @@
+from os import makedirs
+from shutil import rmtree
+
+from pandas import DataFrame, read_csv
+
+from litmon.cli import DailyIngester
+from litmon.pipeline import Pipeline
+
+from pubmed_stub import serve, StubPubMed, url
+
+
+def get_config(server, count: int) -> dict:
+    dbase_dir = 'data/runner-test'
+    return {
+        'query': 'aging',
+        'user': {
+            'email': 'mike@lakeslegendaries.com',
+            'tool': 'org.mfoundation.litmon.test',
+            'base_url': url(server),
+        },
+        'fit_dates': {'date_range': '2013/09-2013/09'},
+        'fback': {},
+        'eval_dates': {'date_range': '2013/10-2013/10'},
+        'dbase_eval': {
+            'dbase_dir': dbase_dir,
+            'dbase_suffix': '-eval',
+            'balance_ratio': 0,
+            'pmids_fname': f'{dbase_dir}/pmids.txt',
+            'verbose': False,
+        },
+        'fit': {
+            'dbase_dir': dbase_dir,
+            'model_fname': f'{dbase_dir}/model',
+            'use_cols': ['title', 'abstract'],
+        },
+        'eval': {
+            'count': count,
+            'dbase_dir': dbase_dir,
+            'results_dir': dbase_dir,
+            'write_csv': True,
+            'write_xlsx': False,
+        },
+    }
+
+
+def run(server, count: int, month: str = '2013/10') -> Pipeline:
+    StubPubMed.num_requests = 0
+    config = get_config(server, count)
+    config['eval_dates']['date_range'] = f'{month}-{month}'
+    return Pipeline(
+        config=config,
+        cache_fname='data/runner-test/cache.json',
+        verbose=False,
+    )
+
+
+def test():
+
+    # directories
+    dbase_dir = 'data/runner-test'
+
+    # delete temporary files after test
+    server = serve()
+    try:
+
+        # write pmids and training data
+        makedirs(dbase_dir, exist_ok=True)
+        with open(f'{dbase_dir}/pmids.txt', 'w') as file:
+            print('10010001', file=file)
+        DataFrame([
+            ['Article 10010001', 'about aging', 1],
+            ['Article 10020002', 'about aging', 1],
+            ['Other', 'about cancer', 0],
+            ['Other', 'about cancer', 0],
+        ], columns=['title', 'abstract', 'label']).to_csv(
+            f'{dbase_dir}/2013-09-fit.csv')
+
+        # run full pipeline
+        pipeline = run(server, 5)
+        assert(StubPubMed.num_requests == 2 * 31)
+        assert(pipeline.skipped == [])
+        top_scoring = pipeline.outputs['eval'][(2013, 10)]
+        results = read_csv(f'{dbase_dir}/2013-10-results.csv')
+        assert(top_scoring.shape[0] >= 5)
+        assert(results.shape[0] == top_scoring.shape[0])
+
+        # re-run: nothing changed
+        pipeline = run(server, 5)
+        assert(StubPubMed.num_requests == 0)
+        assert(sorted(pipeline.skipped) == ['dbase', 'eval', 'fit'])
+
+        # re-run: only eval config changed
+        pipeline = run(server, 10)
+        assert(StubPubMed.num_requests == 0)
+        assert(sorted(pipeline.skipped) == ['dbase', 'fit'])
+        assert(pipeline.outputs['eval'][(2013, 10)].shape[0] >= 10)
+
+        # ingest every day of a month with daily runs
+        for day in range(1, 31):
+            DailyIngester(
+                query='aging',
+                date=f'2013/11/{day:02d}',
+                count=10,
+                dbase_dir=dbase_dir,
+                model_fname=f'{dbase_dir}/model',
+                pmids_fname=f'{dbase_dir}/pmids.txt',
+                results_dir=dbase_dir,
+                verbose=False,
+                write_xlsx=False,
+                **get_config(server, 10)['user'],
+            )
+        daily = read_csv(f'{dbase_dir}/2013-11-eval.csv')
+
+        # check the month is materialized from the daily store
+        pipeline = run(server, 10, '2013/11')
+        assert(StubPubMed.num_requests == 0)
+        assert(
+            pipeline.outputs['dbase'][(2013, 11)].shape[0]
+            == daily.shape[0]
+        )
+        top_scoring = pipeline.outputs['eval'][(2013, 11)]
+        results = read_csv(f'{dbase_dir}/2013-11-results.csv')
+        topk = read_csv(f'{dbase_dir}/2013-11-topk.csv')
+        assert(top_scoring.shape[0] == results.shape[0] == 10)
+        assert(set(results['title']) == set(topk['title']))
+        assert(read_csv(f'{dbase_dir}/2013-11-eval.csv').equals(daily))
+
+    # delete temp files
+    finally:
+        server.shutdown()
+        rmtree(dbase_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    test()
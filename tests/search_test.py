@@ -0,0 +1,86 @@
+from os import makedirs, utime
+from shutil import rmtree
+
+from litmon import ArticleIndex
+from litmon.cli import ArticleSearcher
+
+from prefilter_test import get_articles
+
+
+def test():
+
+    # directories
+    dbase_dir = 'data/search-test'
+    index_fname = f'{dbase_dir}/search.db'
+
+    # delete temporary files after test
+    try:
+
+        # write monthly databases
+        makedirs(dbase_dir, exist_ok=True)
+        articles = get_articles()
+        articles.iloc[0:7].to_csv(f'{dbase_dir}/2013-09-eval.csv')
+        articles.iloc[7:].to_csv(f'{dbase_dir}/2026-01-eval.csv')
+
+        # index them, then check unchanged files aren't re-indexed
+        with ArticleIndex(index_fname) as index:
+            kwargs = {'dbase_dir': dbase_dir, 'dbase_suffix': '-eval'}
+            assert(
+                index.update('2013/01-2026/12', **kwargs)
+                == ['2013-09', '2026-01']
+            )
+            assert(index.update('2013/01-2026/12', **kwargs) == [])
+            assert(index.months == {'2013-09': 7, '2026-01': 1})
+
+            # check keyword, prefix, phrase, and stemmed search
+            def pmids(terms: str, **kwargs) -> list[str]:
+                return list(index.search(terms, **kwargs)['pubmed_id'])
+            assert(sorted(pmids('surgery')) == ['1', '4'])
+            assert(pmids('mitochondri*') == ['0'])
+            assert(pmids('"regenerative medicine"') == ['3'])
+            assert(pmids('"medicine regenerative"') == [])
+            assert(pmids('7-ketocholesterol') == ['6'])
+            assert(pmids('inhibitor') == ['5'])
+            assert(pmids('telomere') == ['4'])
+
+            # check ranking, date filters, limits, and raw FTS5 syntax
+            assert(pmids('surgery outcomes') == ['4'])
+            assert(
+                pmids('surgery OR lewy', syntax=True, limit=2) == ['7', '4']
+            )
+            assert(pmids('lewy', date_range='2013/01-2013/12') == [])
+            assert(pmids('lewy', date_range='2026/01-2026/01') == ['7'])
+            results = index.search('surgery')
+            assert(results['score'].is_monotonic_decreasing)
+            assert(results['link'][0] == 'https://pubmed.ncbi.nlm.nih.gov/4/')
+            assert(results['publication_date'].dtype.kind == 'M')
+
+            # check re-indexing a changed month replaces its articles
+            articles.iloc[0:2].to_csv(f'{dbase_dir}/2013-09-eval.csv')
+            utime(f'{dbase_dir}/2013-09-eval.csv', (0, 0))
+            assert(index.update('2013/09-2013/09', **kwargs) == ['2013-09'])
+            assert(index.months['2013-09'] == 2)
+            assert(pmids('surgery') == ['1'])
+
+            # check bad FTS5 syntax
+            try:
+                index.search('AND (', syntax=True)
+                raise RuntimeError('ValueError not raised')
+            except ValueError:
+                pass
+
+        # search from command line interface
+        searcher = ArticleSearcher(
+            'lewy',
+            index_fname=index_fname,
+            verbose=False,
+        )
+        assert(list(searcher.results['pubmed_id']) == ['7'])
+
+    # delete temp files
+    finally:
+        rmtree(dbase_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    test()
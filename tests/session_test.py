@@ -0,0 +1,160 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from litmon import AsyncPubMedQuerier, PubMedQuerier
+from litmon.utils.session import (
+    CircuitOpenError,
+    ResilientSession,
+    RetryBudgetError,
+)
+
+from pubmed_stub import serve, StubPubMed, url
+
+
+def get_querier(server, **kwargs) -> PubMedQuerier:
+    return PubMedQuerier(
+        email='mike@lakeslegendaries.com',
+        tool='org.mfoundation.litmon.test',
+        base_url=url(server),
+        retry_kwargs={'delay': 0.01} | kwargs,
+    )
+
+
+def test_retry():
+    server = serve(fail_on={2, 3})
+    try:
+        querier = get_querier(server)
+        results = querier.query('aging')
+        assert(results.shape[0] == 300)
+        assert(querier.metrics.attempts == 5)
+        assert(querier.metrics.retries == 2)
+        assert(querier.metrics.successes == 3)
+        assert(querier.metrics.bytes > 0)
+    finally:
+        server.shutdown()
+
+
+def test_truncated():
+
+    # truncated json and xml bodies are retried
+    server = serve(truncate_on={1, 3})
+    try:
+        querier = get_querier(server)
+        results = querier.query('aging')
+        assert(results.shape[0] == 300)
+        assert(querier.metrics.retries == 2)
+    finally:
+        server.shutdown()
+
+    # ... by the async querier too
+    server = serve(truncate_on={1, 3})
+    try:
+        querier = AsyncPubMedQuerier(
+            email='mike@lakeslegendaries.com',
+            tool='org.mfoundation.litmon.test',
+            base_url=url(server),
+            retry_kwargs={'delay': 0.01},
+        )
+        results = asyncio.run(querier.query('aging'))
+        assert(results.shape[0] == 300)
+        assert(querier.metrics.retries == 2)
+    finally:
+        server.shutdown()
+
+
+def test_budget():
+    server = serve(fail_on={2, 3, 6, 7})
+    try:
+        session = ResilientSession(
+            delay=0.01,
+            retry_budget=2,
+            retry_ratio=1,
+        )
+
+        search_url = f'{url(server)}/esearch.fcgi'
+        params = {'term': 'aging'}
+
+        # budget is refilled by successful requests
+        for _ in range(4):
+            session.get(search_url, params)
+        assert(session.metrics.retries == 4)
+
+        # ... but runs out after too many failures in a row
+        StubPubMed.fail_on = {9, 10, 11}
+        try:
+            session.get(search_url, params)
+            assert(False)
+        except RetryBudgetError:
+            pass
+    finally:
+        server.shutdown()
+
+
+def test_resume():
+    server = serve(fail_on={3, 4})
+    try:
+        querier = get_querier(server, max_attempts=2)
+
+        # first batch downloads, second batch fails
+        try:
+            querier.query('aging')
+            assert(False)
+        except Exception:
+            pass
+
+        # resume from second batch
+        results = querier.query('aging')
+        assert(results.shape[0] == 300)
+        assert(len(set(results['pubmed_id'])) == 300)
+        assert(StubPubMed.num_requests == 5)
+    finally:
+        server.shutdown()
+
+
+def test_circuit():
+    server = serve(fail_after=0)
+    try:
+        session = ResilientSession(
+            delay=0.01,
+            breaker_threshold=3,
+            breaker_cooldown=60,
+        )
+        try:
+            session.get(url(server))
+            assert(False)
+        except CircuitOpenError:
+            pass
+        assert(session.metrics.attempts == 3)
+    finally:
+        server.shutdown()
+
+
+def test_threads():
+
+    # share session between threads, retrying some requests
+    server = serve(fail_on=set(range(2, 400, 10)))
+    try:
+        session = ResilientSession(delay=0.01, retry_budget=400)
+        search_url = f'{url(server)}/esearch.fcgi'
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(
+                lambda _: session.get(search_url, {'term': 'aging'}),
+                range(320),
+            ))
+
+        # check no counter updates were lost
+        assert(session.metrics.successes == 320)
+        assert(session.metrics.failures == session.metrics.retries)
+        assert(session.metrics.attempts == 320 + session.metrics.retries)
+        assert(session.metrics.retries > 0)
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    test_retry()
+    test_truncated()
+    test_budget()
+    test_resume()
+    test_circuit()
+    test_threads()
@@ -0,0 +1,179 @@
+import json
+from os import makedirs
+from shutil import rmtree
+from time import sleep, time
+
+from pandas import read_csv
+
+from litmon import TaskQueue
+from litmon.cli import ShardCoordinator, ShardWorker
+
+from pubmed_stub import serve, StubPubMed, url
+
+
+def get_kwargs(server, dbase_dir: str) -> dict:
+    return {
+        'query': 'aging',
+        'dbase_dir': dbase_dir,
+        'dbase_suffix': '-test',
+        'pmids_fname': f'{dbase_dir}/pmids.txt',
+        'verbose': False,
+        'email': 'mike@lakeslegendaries.com',
+        'tool': 'org.mfoundation.litmon.test',
+        'base_url': url(server),
+        'retry_kwargs': {'max_attempts': 1},
+    }
+
+
+def test_queue():
+
+    # directories
+    queue_dir = 'data/queue-test'
+
+    # delete temporary files after test
+    try:
+
+        # add tasks, skipping duplicates
+        queue = TaskQueue(f'{queue_dir}/queue.db', lease=.2, max_attempts=2)
+        assert(queue.add({'a': 1, 'b': 2}) == 2)
+        assert(queue.add({'b': 3, 'c': 3}) == 1)
+
+        # claim, renew, and complete tasks in order
+        assert(queue.claim('w1') == ('a', 1))
+        assert(queue.renew('a', 'w1'))
+        assert(not queue.renew('a', 'w2'))
+        assert(queue.complete('a', 'w1', {'rows': 5}))
+        assert(queue.claim('w1') == ('b', 2))
+        assert(queue.claim('w2') == ('c', 3))
+        assert(queue.counts() == {
+            'pending': 0, 'leased': 2, 'done': 1, 'failed': 0,
+        })
+
+        # reclaim expired leases, ignoring their previous workers
+        sleep(.3)
+        assert(queue.counts()['pending'] == 2)
+        assert(queue.claim('w3') == ('b', 2))
+        assert(not queue.complete('b', 'w1'))
+        assert(queue.complete('b', 'w3'))
+
+        # retry failed tasks, up to max_attempts
+        queue.fail('c', 'w2', 'error')
+        assert(queue.claim('w2') == ('c', 3))
+        queue.fail('c', 'w2', 'error')
+        assert(queue.claim('w2') is None)
+        tasks = queue.tasks()
+        assert(tasks['c']['status'] == 'failed')
+        assert(tasks['c']['attempts'] == 2)
+        assert(tasks['a']['result'] == {'rows': 5})
+        assert(list(queue.tasks('done')) == ['a', 'b'])
+
+        # store values, and throttle requests
+        queue.set('query_hash', 'abc')
+        assert(queue.get('query_hash') == 'abc')
+        assert(queue.get('missing', 1) == 1)
+        start = time()
+        for _ in range(5):
+            queue.throttle(20)
+        assert(time() - start >= .15)
+        queue.close()
+
+    # delete temp files
+    finally:
+        rmtree(queue_dir, ignore_errors=True)
+
+
+def test():
+
+    # directories
+    dbase_dir = 'data/shard-test'
+
+    # delete temporary files after test
+    server = serve()
+    try:
+
+        # write pmids to file
+        makedirs(dbase_dir, exist_ok=True)
+        with open(f'{dbase_dir}/pmids.txt', 'w') as file:
+            print('09010000', file=file)
+
+        # build databases with local workers, querying each day once
+        StubPubMed.num_requests = 0
+        kwargs = get_kwargs(server, dbase_dir)
+        coordinator = ShardCoordinator(
+            date_range='2013/09-2013/10',
+            balance_ratio=0,
+            keep=True,
+            rate=1000,
+            timeout=60,
+            workers=2,
+            **kwargs,
+        )
+        assert(StubPubMed.num_requests == 2 * 61)
+        assert(len(coordinator.partitions) == 61)
+        assert(coordinator.partitions['2013-09-01']['articles'] == 3)
+        assert(coordinator.dbases[(2013, 9)].shape[0] == 90)
+        dbase = read_csv(f'{dbase_dir}/2013-09-test.csv')
+        assert(dbase.shape[0] == 90)
+        assert(dbase['label'].sum() == 1)
+        assert(dbase['pubmed_id'].is_unique)
+        assert(dbase['publication_date'].is_monotonic_increasing)
+        partitions = json.load(open(f'{dbase_dir}/partitions-test.json'))
+        assert(list(partitions)[0] == '2013-09-01')
+        manifest = json.load(open(f'{dbase_dir}/manifest-test.json'))
+        assert(list(manifest) == ['2013-09', '2013-10'])
+
+        # re-run: completed months are skipped
+        StubPubMed.num_requests = 0
+        ShardCoordinator(date_range='2013/09-2013/10', **kwargs)
+        assert(StubPubMed.num_requests == 0)
+
+        # workers refuse queues of other queries
+        try:
+            ShardWorker(**kwargs | {'query': 'cancer'})
+            raise RuntimeError('ValueError not raised')
+        except ValueError:
+            pass
+
+        # add shards of months, without workers
+        shard_kwargs = kwargs | {
+            'date_range': '2013/11-2013/12',
+            'balance_ratio': 0,
+            'queue_fname': f'{dbase_dir}/queue-shards.db',
+            'tasks': 2,
+        }
+        try:
+            ShardCoordinator(**shard_kwargs, poll=0, timeout=0)
+            raise RuntimeError('TimeoutError not raised')
+        except TimeoutError:
+            pass
+
+        # run a worker separately, for one shard
+        StubPubMed.num_requests = 0
+        worker = ShardWorker(
+            **kwargs,
+            max_tasks=1,
+            queue_fname=shard_kwargs['queue_fname'],
+            rate=0,
+            worker_id='worker-0',
+        )
+        assert(worker.completed == ['2013/11-2013/11'])
+        assert(StubPubMed.num_requests == 2 * 30)
+
+        # coordinator only runs the remaining shard
+        StubPubMed.num_requests = 0
+        coordinator = ShardCoordinator(**shard_kwargs, timeout=60, workers=1)
+        assert(StubPubMed.num_requests == 2 * 31)
+        partition = coordinator.partitions['2013-11-03']
+        assert(partition['worker'] == 'worker-0')
+        assert(partition['task'] == '2013/11-2013/11')
+        assert(read_csv(f'{dbase_dir}/2013-12-test.csv').shape[0] == 93)
+
+    # delete temp files
+    finally:
+        server.shutdown()
+        rmtree(dbase_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    test_queue()
+    test()
@@ -0,0 +1,125 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from numpy import random
+from pandas import DataFrame
+
+from litmon import ArticleScorer
+from litmon.shared import SharedScorer
+
+
+def get_eval_data() -> DataFrame:
+    return DataFrame([
+        ['hello', 'mike'],
+        ['hello', 'dinosaur'],
+        ['hello', 'man'],
+        ['hello', 'dude'],
+    ], columns=['1', '2'])
+
+
+def score(name: str) -> tuple[list[float], bool, bool]:
+    with SharedScorer.attach(name) as shared:
+        scores = list(shared.model.predict(get_eval_data()))
+        writeable = shared.model.model.coef_.flags.writeable \
+            or shared.model.term_weights.flags.writeable
+        return scores, writeable, shared.inherited
+
+
+def private_memory() -> int:
+    """Get memory (bytes) of this process that isn't shared"""
+    fields = {
+        line.split(':')[0]: int(line.split()[1])
+        for line in open('/proc/self/smaps_rollup')
+        if line.split()[-1] == 'kB'
+    }
+    return 1024 * (fields['Private_Clean'] + fields['Private_Dirty'])
+
+
+def memory_growth(name: str) -> tuple[int, bool]:
+    import sklearn.svm, vhash  # noqa
+    articles = DataFrame({'text': ['w1 w2 w3', 'w4 w5 w6']})
+    before = private_memory()
+    with SharedScorer.attach(name) as shared:
+        shared.model.predict(articles)
+        return private_memory() - before, shared.inherited
+
+
+def test():
+
+    # train model
+    model = ArticleScorer(use_cols=['1', '2']).fit(DataFrame([
+        ['hello', 'mike man', 0],
+        ['hello', 'dinosaur dude', 2],
+        ['hello', 'dude', 2],
+        ['hello', 'mike dinosaur', 1],
+    ], columns=['1', '2', 'label']))
+    scores = list(model.predict(get_eval_data()))
+
+    # publish model
+    with SharedScorer.publish(model) as shared:
+        assert(shared.refcount == 1)
+
+        # score in forked and spawned worker processes
+        for method in ['fork', 'spawn']:
+            with ProcessPoolExecutor(
+                max_workers=2,
+                mp_context=get_context(method),
+            ) as pool:
+                results = list(pool.map(score, [shared.name] * 4))
+            for worker_scores, writeable, inherited in results:
+                assert(max(
+                    abs(x - y) for x, y in zip(worker_scores, scores)
+                ) < 1E-6)
+                assert(not writeable)
+                assert(inherited == (method == 'fork'))
+
+        # check workers released their references
+        assert(shared.refcount == 1)
+
+        # check reference counting in this process
+        worker = SharedScorer.attach(shared.name)
+        assert(shared.refcount == 2)
+        worker.release()
+        worker.release()
+        assert(shared.refcount == 1)
+        name = shared.name
+
+    # check segment was freed
+    try:
+        SharedScorer.attach(name)
+        raise RuntimeError('FileNotFoundError not raised')
+    except FileNotFoundError:
+        pass
+
+
+def test_memory():
+
+    # train model with a large vhash table
+    rng = random.default_rng(0)
+    vocab = [f'w{n}' for n in range(20000)]
+    model = ArticleScorer(use_cols=['text'], vocab_size=10).fit(DataFrame({
+        'text': [' '.join(rng.choice(vocab, 200)) for _ in range(300)],
+        'label': (rng.random(300) < 0.5).astype(float),
+    }))
+
+    # measure memory added by attaching and scoring, in each worker
+    with SharedScorer.publish(model) as shared:
+        growth = {}
+        for method in ['fork', 'spawn']:
+            with ProcessPoolExecutor(
+                max_workers=2,
+                mp_context=get_context(method),
+            ) as pool:
+                results = list(pool.map(memory_growth, [shared.name] * 2))
+            growth[method] = max(nbytes for nbytes, _ in results)
+
+        # forked workers don't copy the table, spawned workers rebuild it
+        # (which takes ~5x its serialized size), but copy nothing else
+        assert(growth['fork'] < shared.nbytes)
+        assert(growth['fork'] < growth['spawn'])
+        assert(growth['spawn'] < 8 * shared.nbytes)
+
+
+if __name__ == '__main__':
+    test()
+    test_memory()
@@ -0,0 +1,80 @@
+import subprocess
+import sys
+
+
+# modules that should only be imported when first used
+heavy = [
+    'ezazure', 'nptyping', 'numpy', 'pandas', 'pymed', 'requests', 'vhash',
+]
+
+# maximum time (s) to import a command-line module (e.g. pymed alone takes
+# ~0.12s, and pandas ~0.4s)
+max_import_time = 0.1
+
+
+def import_times(code: str) -> dict[str, float]:
+    """Get time (s) to import each module, running code in a fresh interpreter
+
+    Times are cumulative: they include the time to import each dependency.
+    """
+    output = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stderr
+    return {
+        line.split('|')[-1].strip(): int(line.split('|')[1]) / 1e6
+        for line in output.splitlines()
+        if line.startswith('import time:')
+        and line.split('|')[1].strip().isdigit()
+    }
+
+
+def imported(code: str) -> list[str]:
+    """Get heavy modules imported by running code in a fresh interpreter"""
+    modules = {module.split('.')[0] for module in import_times(code)}
+    return [module for module in heavy if module in modules]
+
+
+def test():
+
+    # importing packages, or showing cli help, doesn't load heavy modules
+    assert(not imported('import litmon, litmon.cli, litmon.utils'))
+    assert(not imported('import litmon.utils.genconf'))
+    for module in [
+        'backtest', 'dbase', 'eval', 'fit', 'mbox', 'monitor', 'promote',
+        'refilter', 'search', 'shard', 'sync', 'worker',
+    ]:
+        assert(not imported(f'import litmon.cli.{module}'))
+    assert(not imported('import litmon.pipeline'))
+
+    # importing a command-line module is fast (best of 3 runs, for noise)
+    for module in ['dbase', 'fit', 'sync']:
+        elapsed = min(
+            import_times(f'import litmon.cli.{module}')[f'litmon.cli.{module}']
+            for _ in range(3)
+        )
+        assert(elapsed < max_import_time)
+
+    # attributes are still importable from each package
+    from litmon import ArticleScorer, PubMedQuerier  # noqa
+    from litmon.cli import DBaseBuilder, ModelUser  # noqa
+    from litmon.utils import atomic, cli, drange  # noqa
+    assert(callable(cli))
+    assert('ArticleScorer' in dir(__import__('litmon')))
+
+    # accessing an attribute loads its module
+    loaded = imported('import litmon; litmon.ArticleScorer')
+    assert('pandas' in loaded and 'vhash' in loaded)
+
+    # unknown attributes still raise
+    try:
+        __import__('litmon').NotAnAttribute
+        raise RuntimeError('AttributeError not raised')
+    except AttributeError:
+        pass
+
+
+if __name__ == '__main__':
+    test()
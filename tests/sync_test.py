@@ -0,0 +1,171 @@
+from contextlib import redirect_stdout
+from io import StringIO
+import json
+from os import makedirs
+from shutil import rmtree
+
+from litmon import ArticleIndex
+from litmon.cli import DBaseBuilder
+from litmon.cli.sync import DBaseSyncer
+from litmon.utils import read_articles
+
+from pubmed_stub import serve, StubPubMed, url
+
+
+def get_kwargs(server) -> dict:
+    return {
+        'query': 'aging',
+        'dbase_dir': 'data/sync-test',
+        'dbase_suffix': '-test',
+        'pmids_fname': 'data/sync-test/pmids.txt',
+        'search_fname': 'data/sync-test/search.db',
+        'verbose': False,
+        'email': 'mike@lakeslegendaries.com',
+        'tool': 'org.mfoundation.litmon.test',
+        'base_url': url(server),
+        'retry_kwargs': {'max_attempts': 1},
+    }
+
+
+def test():
+
+    # directories
+    dbase_dir = 'data/sync-test'
+    dbase_fname = f'{dbase_dir}/2013-09-test.csv'
+
+    # delete temporary files after test
+    try:
+
+        # write pmids to file
+        makedirs(dbase_dir, exist_ok=True)
+        with open(f'{dbase_dir}/pmids.txt', 'w') as file:
+            print('09309999', file=file)
+
+        # build database
+        server = serve()
+        try:
+            DBaseBuilder(
+                date_range='2013/09-2013/09',
+                balance_ratio=0,
+                **get_kwargs(server),
+            )
+            built = read_articles(dbase_fname, index_col=0)
+            with ArticleIndex(f'{dbase_dir}/search.db') as index:
+                assert(index.months == {'2013-09': built.shape[0]})
+
+            # revise one record, re-index one unchanged record, add one record
+            StubPubMed.modified = {
+                '09010001': 'Revised abstract about aging',
+                '09020000': 'Abstract of article 09020000 about aging',
+                '09309999': 'Abstract of a new article about aging',
+            }
+            StubPubMed.num_requests = 0
+            syncer = DBaseSyncer(
+                date_range='2013/09-2013/09',
+                until='2024/01/31',
+                **get_kwargs(server),
+            )
+            assert(StubPubMed.num_requests == 2)
+            assert(syncer.stats['2013-09'] == {
+                'modified': 3,
+                'inserted': 1,
+                'updated': 1,
+                'unchanged': 1,
+            })
+
+            # check records were upserted
+            synced = read_articles(dbase_fname, index_col=0, dtype={
+                'pubmed_id': str,
+            })
+            assert(synced.shape[0] == built.shape[0] + 1)
+            abstracts = dict(zip(synced['pubmed_id'], synced['abstract']))
+            assert(abstracts['09010001'] == 'Revised abstract about aging')
+            assert(abstracts['09010002'] == built['abstract'][2])
+            assert(synced.iloc[-1]['pubmed_id'] == '09309999')
+            assert(synced.iloc[-1]['label'])
+            assert(synced['publication_date'].dtype.kind == 'M')
+
+            # check search index was updated
+            with ArticleIndex(f'{dbase_dir}/search.db') as index:
+                assert(index.months == {'2013-09': synced.shape[0]})
+                assert(
+                    list(index.search('revised')['pubmed_id'])
+                    == ['09010001']
+                )
+
+            # check watermarks
+            state = json.load(open(f'{dbase_dir}/2013-09-test-sync.json'))
+            assert(state['watermark'] == '2024/01/31')
+            assert(state['max_pmid'] == 9309999)
+
+            # re-sync, with no new changes
+            syncer = DBaseSyncer(
+                date_range='2013/09-2013/09',
+                until='2024/02/29',
+                **get_kwargs(server),
+            )
+            assert(syncer.stats['2013-09']['unchanged'] == 3)
+            assert(read_articles(dbase_fname).shape[0] == synced.shape[0])
+
+            # revise more records than a single query returns, with three on
+            # the same day
+            StubPubMed.modified = {
+                pmid: f'Abstract of {pmid}, revised'
+                for pmid in [
+                    '09010001', '09020001', '09030000', '09030001', '09030002',
+                ]
+            }
+            StubPubMed.modified_on = {
+                '09010001': '2024/03/05',
+                '09020001': '2024/03/10',
+                '09030000': '2024/03/20',
+                '09030001': '2024/03/20',
+                '09030002': '2024/03/20',
+            }
+            output = StringIO()
+            with redirect_stdout(output):
+                syncer = DBaseSyncer(
+                    date_range='2013/09-2013/09',
+                    until='2024/03/31',
+                    max_results=2,
+                    **get_kwargs(server),
+                )
+            assert(syncer.stats['2013-09']['updated'] == 4)
+            assert(not output.getvalue())
+            state = json.load(open(f'{dbase_dir}/2013-09-test-sync.json'))
+            assert(state['watermark'] == '2024/03/20')
+
+            # check the truncated day is pulled again
+            syncer = DBaseSyncer(
+                date_range='2013/09-2013/09',
+                until='2024/03/31',
+                **get_kwargs(server),
+            )
+            assert(syncer.stats['2013-09'] == {
+                'modified': 3,
+                'inserted': 0,
+                'updated': 1,
+                'unchanged': 2,
+            })
+            synced = read_articles(dbase_fname, index_col=0, dtype={
+                'pubmed_id': str,
+            })
+            abstracts = dict(zip(synced['pubmed_id'], synced['abstract']))
+            assert(all(
+                abstracts[pmid] == abstract
+                for pmid, abstract in StubPubMed.modified.items()
+            ))
+            state = json.load(open(f'{dbase_dir}/2013-09-test-sync.json'))
+            assert(state['watermark'] == '2024/03/31')
+
+        # stop stub server
+        finally:
+            server.shutdown()
+
+    # delete temp files
+    finally:
+        rmtree(dbase_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    test()
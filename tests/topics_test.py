@@ -0,0 +1,117 @@
+from os import remove
+
+from numpy import nan
+from pandas import DataFrame
+
+from litmon import ArticleScorer, MultiTopicScorer
+from litmon.cli import DBaseBuilder, ModelUser
+
+from articles import as_articles, make_eval_data, make_fit_data
+
+
+def get_fit_data() -> DataFrame:
+    return make_fit_data(
+        ['mike man', 'dinosaur dude', 'dinosaur rex', 'dude', 'dude rad',
+         'mike dinosaur'],
+        [0, 1, 1, 1, 1, 1],
+        label_dino=[0, 1, 1, 0, 0, nan],
+        label_dude=[0, 0, 0, 1, 1, nan],
+    )
+
+
+def test():
+
+    # temporary files
+    model_fname = 'data/topics-test'
+
+    # train multi-topic model
+    fit_data = get_fit_data()
+    eval_data = make_eval_data()
+    kwargs = {'ml_kwargs': {'random_state': 0}, 'use_cols': ['1', '2']}
+    model = MultiTopicScorer(['dino', 'dude'], **kwargs).fit(fit_data)
+
+    # check each head matches a separately-trained model
+    for topic in model.topics:
+        has_label = fit_data[f'label_{topic}'].notna()
+        single = ArticleScorer(**kwargs)
+        single.vhash = model.vhash
+        single._fit_model(
+            model.transform(fit_data[has_label]),
+            fit_data.loc[has_label, f'label_{topic}'].to_numpy(),
+            [],
+        )
+        head = model.head(topic)
+        assert(
+            abs(head.predict(eval_data) - single.predict(eval_data)).max()
+            < 1E-6
+        )
+
+    # check all topics are scored at once, matching each head
+    scores = model.predict_topics(eval_data)
+    assert(list(scores.columns) == ['dino', 'dude'])
+    for topic in model.topics:
+        expected = model.head(topic).predict(eval_data)
+        assert(abs(scores[topic].to_numpy() - expected).max() < 1E-4)
+    assert(scores['dino'][1] > scores['dino'][3])
+    assert(scores['dude'][3] > scores['dude'][1])
+
+    # check each head explains its own topic
+    explanations = model.heads['dino'].explain(eval_data, num_terms=1)
+    assert(explanations[1] == ['dinosaur'])
+
+    # run test
+    try:
+
+        # check topics survive saving
+        model.save(model_fname)
+        loaded = ArticleScorer.load(model_fname)
+        assert(
+            (loaded.predict_topics(eval_data).to_numpy()
+             == scores.to_numpy()).all()
+        )
+
+    # remove temporary files
+    finally:
+        remove(f'{model_fname}.bin')
+        remove(f'{model_fname}.pickle')
+
+    # score each topic's articles
+    articles = as_articles(
+        eval_data,
+        label=[False, True, False, True],
+        label_dino=[False, True, False, False],
+        label_dude=[False, False, False, True],
+    )
+    user = ModelUser(
+        '2020/01-2020/01',
+        count=1,
+        dbases={(2020, 1): articles},
+        model=loaded,
+        write_xlsx=False,
+    )
+    assert(user.results[(2020, 1)].shape[0] == 1)
+    results = user.topic_results[(2020, 1)]
+    assert(list(results) == ['dino', 'dude'])
+    assert(list(results['dino']['pubmed_id']) == ['2'])
+    assert(list(results['dude']['pubmed_id']) == ['4'])
+    assert(results['dude']['label'].all())
+
+
+def test_label():
+
+    # label articles for each topic
+    articles = DataFrame({'pubmed_id': ['1', '2', '3', '4']})
+    DBaseBuilder.label(articles, ['1'], topics={
+        'dino': ['2'],
+        'dude': ['2', '3'],
+    })
+
+    # check topic labels, and union label
+    assert(list(articles['label_dino']) == [False, True, False, False])
+    assert(list(articles['label_dude']) == [False, True, True, False])
+    assert(list(articles['label']) == [True, True, True, False])
+
+
+if __name__ == '__main__':
+    test()
+    test_label()